@@ -9,8 +9,10 @@ from sqlmodel import Session, select
 
 from app.admin.deps import require_admin_cookie
 from app.core.database import get_db
+from app.core.pagination import approximate_count, keyset_page, page_links
 from app.models import AnalysisRecord, User
 from app.services.report_pdf import build_report_pdf
+from app.services.search import search_analyses, user_ids_by_email_prefix
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
@@ -38,32 +40,48 @@ def analyses_list(
     date_to: str | None = None,
     source: str | None = None,
     limit: int = 200,
+    cursor: str | None = None,
 ):
-    stmt = select(AnalysisRecord).order_by(AnalysisRecord.created_at.desc()).limit(limit)
-    if date_from:
-        start = _parse_date(date_from)
-        if start:
-            stmt = stmt.where(AnalysisRecord.created_at >= start)
+    stmt = select(AnalysisRecord)
+    start = _parse_date(date_from) if date_from else None
+    end_of_day = None
     if date_to:
         end = _parse_date(date_to)
         if end:
             end_of_day = end.replace(hour=23, minute=59, second=59, microsecond=999999)
-            stmt = stmt.where(AnalysisRecord.created_at <= end_of_day)
-    if source and source.strip().lower() in ("text", "pdf", "image"):
-        stmt = stmt.where(AnalysisRecord.source == source.strip().lower())
+    if start:
+        stmt = stmt.where(AnalysisRecord.created_at >= start)
+    if end_of_day:
+        stmt = stmt.where(AnalysisRecord.created_at <= end_of_day)
+    src = source.strip().lower() if source and source.strip().lower() in ("text", "pdf", "image") else None
+    if src:
+        stmt = stmt.where(AnalysisRecord.source == src)
+    snippets: dict[int, str] = {}
+    records = None
+    page = None
     if q and q.strip():
         q = q.strip()
-        try:
-            uid = int(q)
-            stmt = stmt.where(AnalysisRecord.user_id == uid)
-        except ValueError:
-            users = list(db.exec(select(User).where(User.email.contains(q))).all())
-            user_ids = [u.id for u in users if u.id is not None]
-            if user_ids:
-                stmt = stmt.where(AnalysisRecord.user_id.in_(user_ids))
+        if q.isdigit():
+            stmt = stmt.where(AnalysisRecord.user_id == int(q))
+        else:
+            # E-posta öneki (indeksli aralık) eşleşirse kullanıcı filtresi; yoksa tam metin arama
+            user_ids = user_ids_by_email_prefix(db, q)
+            if user_ids or "@" in q:
+                stmt = stmt.where(AnalysisRecord.user_id.in_(user_ids or [-1]))
             else:
-                stmt = stmt.where(AnalysisRecord.id == -1)
-    records = list(db.exec(stmt).all())
+                hits = search_analyses(
+                    db, q, source=src, created_from=start, created_to=end_of_day, limit=limit,
+                )
+                snippets = {h.analysis_id: h.snippet for h in hits}
+                by_id = {}
+                if snippets:
+                    by_id = {r.id: r for r in db.exec(select(AnalysisRecord).where(AnalysisRecord.id.in_(list(snippets)))).all()}
+                records = [by_id[h.analysis_id] for h in hits if h.analysis_id in by_id]
+    if records is None:
+        page = keyset_page(
+            db, stmt, ts_col=AnalysisRecord.created_at, id_col=AnalysisRecord.id, cursor=cursor, limit=limit,
+        )
+        records = page.items
     user_ids = list({r.user_id for r in records})
     users_map = {}
     if user_ids:
@@ -80,6 +98,7 @@ def analyses_list(
             "input_preview": (r.input_text or "")[:100] + ("…" if len(r.input_text or "") > 100 else ""),
             "result_preview": (r.result_text or "")[:150] + ("…" if len(r.result_text or "") > 150 else ""),
             "has_original": bool(getattr(r, "original_stored_path", None)),
+            "snippet": snippets.get(r.id),
         }
         for r in records
     ]
@@ -92,6 +111,8 @@ def analyses_list(
             "date_from": date_from or "",
             "date_to": date_to or "",
             "source": source or "",
+            "total_estimate": approximate_count(db, AnalysisRecord) if not (q or date_from or date_to or src) else None,
+            **(page_links(request, page) if page else {}),
         },
     )
 
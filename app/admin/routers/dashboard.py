@@ -1,6 +1,5 @@
 """Dashboard: özet metrikler, son işlemler, aylık trend grafiği."""
 import logging
-import time as _time
 from datetime import date, datetime, timedelta
 from pathlib import Path
 
@@ -20,7 +19,9 @@ from app.admin.deps import (
     verify_admin_cookie,
 )
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
+from app.core.pagination import approximate_count
+from app.core.shared_cache import shared_cache
 from app.models import AnalysisJob, AnalysisRecord, ErrorLog, PaymentOrder, Presence, SecurityLog, User
 
 # Ay adları (grafik etiketleri)
@@ -86,8 +87,8 @@ templates = Jinja2Templates(directory=str(_APP_DIR / "templates"))
 log = logging.getLogger(__name__)
 
 # AI durumu cache (60 sn) — dashboard'daki "AI Durumu" bu endpoint'i kullanır
-_ai_health_cache: dict = {"ts": 0.0, "data": None}
 _AI_CACHE_TTL = 60.0
+_ai_health_cache = shared_cache.namespace("admin_ai_health", ttl=_AI_CACHE_TTL)
 
 
 def _ai_error_message(err: str | None) -> str:
@@ -125,9 +126,9 @@ async def admin_api_health_ai(
     if not verify_admin_cookie(c):
         return JSONResponse(status_code=401, content={"status": "fail", "provider": "openai", "error": "Oturum süresi dolmuş. Sayfayı yenileyip tekrar giriş yapın."})
 
-    now = _time.time()
-    if not refresh and _ai_health_cache["data"] is not None and (now - _ai_health_cache["ts"]) < _AI_CACHE_TTL:
-        return JSONResponse(_ai_health_cache["data"])
+    cached = None if refresh else _ai_health_cache.get("openai")
+    if cached is not None:
+        return JSONResponse(cached)
     ok, latency_ms, err = ping_openai()
     if ok:
         data = {"status": "ok", "provider": "openai", "latency_ms": latency_ms}
@@ -138,11 +139,90 @@ async def admin_api_health_ai(
             "latency_ms": latency_ms,
             "error": _ai_error_message(err),
         }
-    _ai_health_cache["ts"] = now
-    _ai_health_cache["data"] = data
+    _ai_health_cache.set("openai", data)
     return JSONResponse(data)
 
 
+@router.get("/api/analysis-routes", response_class=JSONResponse)
+def admin_api_analysis_routes(_=Depends(require_admin_cookie)):
+    """Analiz yolu dağılımı (pdf_text / ocr_text / vision) ve gecikmeleri; bu worker sürecinin sayaçları."""
+    from app.services.ocr import get_engine, route_stats
+
+    engine = get_engine()
+    return JSONResponse({"ocr_engine": engine.name if engine else None, "routes": route_stats.snapshot()})
+
+
+@router.get("/api/upstreams", response_class=JSONResponse)
+def admin_api_upstreams(_=Depends(require_admin_cookie)):
+    """Dış bağımlılıkların devre durumu, uyarlanır zaman aşımı, gecikme yüzdelikleri ve tekrar bütçesi (bu worker)."""
+    from app.services.resilience import snapshot
+
+    return JSONResponse({"upstreams": snapshot()})
+
+
+@router.get("/api/db-pool", response_class=JSONResponse)
+def admin_api_db_pool(_=Depends(require_admin_cookie)):
+    """Veritabanı havuzu: anlık kullanım, bağlantı alma bekleme/tutma yüzdelikleri, zaman aşımları (bu worker)."""
+    from app.core.database import engine, replica_status
+    from app.core.db_profiles import pool_snapshot
+
+    return JSONResponse({"db_pool": pool_snapshot(engine), "replicas": replica_status()})
+
+
+@router.get("/api/jobs", response_class=JSONResponse)
+def admin_api_jobs(_=Depends(require_admin_cookie), runs: int = 50):
+    """Zamanlanmış işler: cron, sonraki çalışma, kira sahibi, son durum ve son çalıştırmalar (tüm worker'lar)."""
+    from app.services.scheduler import scheduler
+
+    return JSONResponse(scheduler.status(runs=max(1, min(runs, 500))))
+
+
+@router.post("/api/jobs/{name}/run", response_class=JSONResponse)
+def admin_api_job_run(name: str, _=Depends(require_admin_cookie)):
+    """İşi hemen vadesi gelmiş yapar; bir sonraki turda kirayı alan worker çalıştırır."""
+    from app.services.scheduler import scheduler
+
+    if not scheduler.trigger(name):
+        return JSONResponse(status_code=404, content={"ok": False, "error": "job_not_found"})
+    return JSONResponse({"ok": True, "job": name})
+
+
+@router.get("/api/auto-renew/pending", response_class=JSONResponse)
+def admin_api_auto_renew_pending(
+    older_than_min: int | None = None,
+    _=Depends(require_admin_cookie),
+    db: Session = Depends(get_db),
+):
+    """Sonucu bilinmeyen otomatik yenileme çekimleri: PayTR kaydıyla mutabakat bekler (otomatik tekrar edilmez)."""
+    from app.services.paytr_recurring import stale_pending_attempts
+
+    iso = lambda d: d.isoformat() if d else None  # noqa: E731
+    return JSONResponse({"attempts": [
+        {
+            "id": a.id, "institution_id": a.institution_id, "period": a.period, "merchant_oid": a.merchant_oid,
+            "attempt": a.attempt, "amount_cents": a.amount_cents, "reason": a.reason,
+            "created_at": iso(a.created_at), "updated_at": iso(a.updated_at),
+        }
+        for a in stale_pending_attempts(db, older_than_min)
+    ]})
+
+
+@router.post("/api/auto-renew/attempts/{attempt_id}/resolve", response_class=JSONResponse)
+def admin_api_auto_renew_resolve(
+    attempt_id: int,
+    _=Depends(require_admin_cookie),
+    db: Session = Depends(get_db),
+    outcome: str = Form(...),
+    reference_no: str = Form(""),
+    note: str = Form(""),
+):
+    """PayTR panelindeki sonuca göre pending denemeyi kapatır: success kredi ekler, failed yeniden denemeye açar."""
+    from app.services.paytr_recurring import resolve_pending_attempt
+
+    result = resolve_pending_attempt(db, attempt_id, outcome, reference_no=reference_no, note=note)
+    return JSONResponse(result, status_code=200 if result["ok"] else 409)
+
+
 @router.post("/api/tasks/drip/run", response_class=JSONResponse)
 def admin_run_drip_campaign(
     _=Depends(require_admin_cookie),
@@ -233,7 +313,7 @@ def admin_legacy_page(_=Depends(require_admin_cookie)):
 
 
 @router.get("/dashboard", response_class=HTMLResponse)
-def admin_dashboard(request: Request, _=Depends(require_admin_cookie), db: Session = Depends(get_db)):
+def admin_dashboard(request: Request, _=Depends(require_admin_cookie), db: Session = Depends(get_read_db)):
     now = datetime.utcnow()
     today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
     month_start = (now.replace(day=1, hour=0, minute=0, second=0, microsecond=0))
@@ -253,7 +333,7 @@ def admin_dashboard(request: Request, _=Depends(require_admin_cookie), db: Sessi
     daily_sales = (daily or 0) / 100  # euro cent -> EUR
     monthly_sales = (monthly or 0) / 100
 
-    total_users = db.exec(select(func.count(User.id))).one() or 0
+    total_users = approximate_count(db, User)
     active_users = db.exec(select(func.count(Presence.id)).where(Presence.last_seen_at >= active_threshold)).one() or 0
 
     # Ortalama analiz süresi (analysis_jobs done)
@@ -345,8 +425,9 @@ def admin_dashboard(request: Request, _=Depends(require_admin_cookie), db: Sessi
     # Bu yüzden metrik hesaplarını try/except ile "boş değerlere" düşürüyoruz.
     try:
         month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        # gpt-4o-mini: input $0.15/1M, output $0.60/1M
+        # gpt-4o-mini: input $0.15/1M (önbellekten gelen input $0.075/1M), output $0.60/1M
         _INPUT_RATE = 0.15 / 1_000_000
+        _CACHED_INPUT_DISCOUNT = 0.075 / 1_000_000
         _OUTPUT_RATE = 0.60 / 1_000_000
 
         # Bu ay
@@ -360,7 +441,12 @@ def admin_dashboard(request: Request, _=Depends(require_admin_cookie), db: Sessi
             .where(AnalysisJob.status == "done")
             .where(AnalysisJob.created_at >= month_start)
         ).one() or 0
-        openai_cost_usd = prompt_sum * _INPUT_RATE + completion_sum * _OUTPUT_RATE
+        cached_sum = db.exec(
+            select(func.coalesce(func.sum(AnalysisJob.cached_tokens), 0))
+            .where(AnalysisJob.status == "done")
+            .where(AnalysisJob.created_at >= month_start)
+        ).one() or 0
+        openai_cost_usd = prompt_sum * _INPUT_RATE - cached_sum * _CACHED_INPUT_DISCOUNT + completion_sum * _OUTPUT_RATE
         openai_tokens_month = int(prompt_sum) + int(completion_sum)
         reports_this_month = db.exec(
             select(func.count(AnalysisJob.id))
@@ -378,7 +464,10 @@ def admin_dashboard(request: Request, _=Depends(require_admin_cookie), db: Sessi
         all_reports = db.exec(
             select(func.count(AnalysisJob.id)).where(AnalysisJob.status == "done")
         ).one() or 0
-        openai_cost_total = all_prompt * _INPUT_RATE + all_completion * _OUTPUT_RATE
+        all_cached = db.exec(
+            select(func.coalesce(func.sum(AnalysisJob.cached_tokens), 0)).where(AnalysisJob.status == "done")
+        ).one() or 0
+        openai_cost_total = all_prompt * _INPUT_RATE - all_cached * _CACHED_INPUT_DISCOUNT + all_completion * _OUTPUT_RATE
         cost_per_report = (openai_cost_total / all_reports) if all_reports else 0
         openai_budget = settings.openai_budget_usd or 0
         openai_remaining = max(openai_budget - openai_cost_total, 0)
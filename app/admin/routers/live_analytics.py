@@ -7,7 +7,7 @@ from app.core.templating import Jinja2Templates
 from sqlmodel import Session
 
 from app.admin.deps import require_admin_cookie
-from app.core.database import get_db
+from app.core.database import get_read_db
 from app.services.live_analytics import (
     PERIOD_OPTIONS,
     get_live_analytics,
@@ -23,7 +23,7 @@ def live_analytics_page(
     request: Request,
     period: int | None = None,
     _=Depends(require_admin_cookie),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Live Analytics Dashboard sayfası; sadece admin cookie ile erişilir."""
     data = get_live_analytics(db, period_minutes=period)
@@ -37,7 +37,7 @@ def live_analytics_page(
 def live_analytics_api(
     period: int | None = None,
     _=Depends(require_admin_cookie),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """JSON API: istemci tarafında yenileme / auto-refresh için."""
     data = get_live_analytics(db, period_minutes=period)
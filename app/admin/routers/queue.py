@@ -6,7 +6,9 @@ from sqlmodel import Session, select
 
 from app.admin.deps import require_admin_cookie
 from app.core.database import get_db
+from app.core.pagination import approximate_count, keyset_page, page_links
 from app.models import AnalysisJob, User
+from app.services.search import user_ids_by_email_prefix
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
@@ -14,11 +16,18 @@ templates = Jinja2Templates(directory="app/templates")
 
 @router.get("", response_class=HTMLResponse)
 @router.get("/", response_class=HTMLResponse)
-def queue_list(request: Request, _=Depends(require_admin_cookie), db: Session = Depends(get_db), limit: int = 100, status_filter: str | None = None):
-    stmt = select(AnalysisJob).order_by(AnalysisJob.id.desc()).limit(limit)
+def queue_list(request: Request, _=Depends(require_admin_cookie), db: Session = Depends(get_db), limit: int = 100, status_filter: str | None = None, q: str | None = None, cursor: str | None = None):
+    stmt = select(AnalysisJob)
     if status_filter and status_filter in ("pending", "processing", "done", "failed"):
         stmt = stmt.where(AnalysisJob.status == status_filter)
-    jobs = list(db.exec(stmt).all())
+    if q and q.strip():
+        q = q.strip()
+        if q.isdigit():
+            stmt = stmt.where(AnalysisJob.user_id == int(q))
+        else:
+            stmt = stmt.where(AnalysisJob.user_id.in_(user_ids_by_email_prefix(db, q) or [-1]))
+    page = keyset_page(db, stmt, id_col=AnalysisJob.id, cursor=cursor, limit=limit)
+    jobs = page.items
     user_ids = {j.user_id for j in jobs}
     users_map = {}
     if user_ids:
@@ -39,5 +48,12 @@ def queue_list(request: Request, _=Depends(require_admin_cookie), db: Session =
     ]
     return templates.TemplateResponse(
         "admin/queue_list.html",
-        {"request": request, "jobs": rows, "status_filter": status_filter or ""},
+        {
+            "request": request,
+            "jobs": rows,
+            "status_filter": status_filter or "",
+            "q": q or "",
+            "total_estimate": None if (status_filter or q) else approximate_count(db, AnalysisJob),
+            **page_links(request, page),
+        },
     )
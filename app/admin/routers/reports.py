@@ -8,7 +8,7 @@ from app.core.templating import Jinja2Templates
 from sqlmodel import Session, select, func
 
 from app.admin.deps import require_admin_cookie
-from app.core.database import get_db
+from app.core.database import get_read_db
 from app.models import AnalysisRecord, PaymentOrder, User
 
 router = APIRouter()
@@ -42,7 +42,7 @@ def _parse_date(s: str | None) -> datetime | None:
 def reports_page(
     request: Request,
     _=Depends(require_admin_cookie),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     date_from: str | None = None,
     date_to: str | None = None,
     export: str | None = None,
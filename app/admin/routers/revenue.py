@@ -6,7 +6,7 @@ from fastapi.responses import HTMLResponse
 from app.core.templating import Jinja2Templates
 from sqlmodel import Session, select, func
 from app.admin.deps import require_admin_cookie
-from app.core.database import get_db
+from app.core.database import get_read_db
 from app.models import PaymentOrder, User
 
 router = APIRouter()
@@ -29,7 +29,7 @@ def _month_minus(d: date, n: int) -> date:
 def revenue_dashboard(
     request: Request,
     _=Depends(require_admin_cookie),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     months: int = Query(12, ge=1, le=36),
 ):
     now = datetime.utcnow()
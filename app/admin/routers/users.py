@@ -8,6 +8,7 @@ from sqlmodel import Session, select, func
 
 from app.admin.deps import require_admin_cookie
 from app.core.database import get_db
+from app.core.pagination import approximate_count, keyset_page, page_links
 from app.models import AnalysisRecord, AuditLog, PaymentOrder, User
 
 router = APIRouter()
@@ -22,12 +23,14 @@ def users_list(
     db: Session = Depends(get_db),
     q: str | None = None,
     limit: int = 100,
+    cursor: str | None = None,
 ):
-    stmt = select(User).order_by(User.id.desc()).limit(limit)
+    stmt = select(User)
     if q and q.strip():
         q = q.strip()
         stmt = stmt.where(User.email.contains(q))
-    users = list(db.exec(stmt).all())
+    page = keyset_page(db, stmt, id_col=User.id, cursor=cursor, limit=limit)
+    users = page.items
     # Analiz sayısı ve son giriş (AuditLog login)
     user_ids = [u.id for u in users]
     analysis_count = {}
@@ -58,7 +61,13 @@ def users_list(
     ]
     return templates.TemplateResponse(
         "admin/users_list.html",
-        {"request": request, "users": rows, "q": q or ""},
+        {
+            "request": request,
+            "users": rows,
+            "q": q or "",
+            "total_estimate": None if q else approximate_count(db, User),
+            **page_links(request, page),
+        },
     )
 
 
@@ -11,6 +11,7 @@ from sqlmodel import Session, select, func
 from app.admin.deps import _admin_secret_constant_time_compare, require_admin_secret_or_cookie
 from app.core.config import settings
 from app.core.database import get_db
+from app.core.pagination import approximate_count, keyset_page
 from app.models import AnalysisRecord, AuditLog, BlogPost, PaymentOrder, Presence, User
 from app.services.analyze import analyze_blood_test
 from app.services.report_pdf import build_report_pdf
@@ -87,10 +88,12 @@ _ADMIN_HTML = """<!DOCTYPE html>
     <section>
       <h2>Son analizler <button class="refresh" onclick="loadAnalyses()">Yenile</button></h2>
       <div id="analyses-wrap"></div>
+      <div id="analyses-pager"></div>
     </section>
     <section>
       <h2>Kullanıcılar <button class="refresh" onclick="loadUsers()">Yenile</button></h2>
       <div id="users-wrap"></div>
+      <div id="users-pager"></div>
     </section>
     <section>
       <h2>Son loglar (login, register, analyze, payment) <button class="refresh" onclick="loadLogs()">Yenile</button></h2>
@@ -113,6 +116,13 @@ _ADMIN_HTML = """<!DOCTYPE html>
     function setSecret(s) { sessionStorage.setItem('norya_admin_secret', s); }
     function headers() { const s = getSecret(); return s ? { 'X-Admin-Secret': s } : {}; }
     function api(path) { return fetch(path, { headers: headers() }).then(r => { if (!r.ok) throw new Error(r.status + ' ' + r.statusText); return r.json(); }); }
+    function apiPage(path) {
+      return fetch(path, { headers: headers() }).then(r => {
+        if (!r.ok) throw new Error(r.status + ' ' + r.statusText);
+        var h = r.headers;
+        return r.json().then(items => ({ items: items, next_cursor: h.get('X-Next-Cursor'), prev_cursor: h.get('X-Prev-Cursor'), total_estimate: h.get('X-Total-Estimate') }));
+      });
+    }
     function enter() {
       const s = document.getElementById('secret').value.trim();
       if (!s) return;
@@ -143,8 +153,18 @@ _ADMIN_HTML = """<!DOCTYPE html>
         .then(function(blob) { var u = URL.createObjectURL(blob); window.open(u, '_blank'); })
         .catch(function(e) { alert('Orijinal belge açılamadı: ' + e.message); });
     }
-    function loadAnalyses() {
-      api('/admin/analyses?limit=50').then(arr => {
+    function pager(id, page, fn) {
+      var el = document.getElementById(id);
+      var html = '';
+      if (page.total_estimate != null) html += '<span style="color:#94a3b8;font-size:0.85rem;">~' + page.total_estimate + ' kayıt</span> ';
+      if (page.prev_cursor) html += '<button type="button" class="refresh" onclick="' + fn + '(\'' + page.prev_cursor + '\')">← Daha yeni</button>';
+      if (page.next_cursor) html += '<button type="button" class="refresh" onclick="' + fn + '(\'' + page.next_cursor + '\')">Daha eski →</button>';
+      el.innerHTML = html;
+    }
+    function loadAnalyses(cursor) {
+      apiPage('/admin/analyses?limit=50' + (cursor ? '&cursor=' + encodeURIComponent(cursor) : '')).then(page => {
+        var arr = page.items;
+        pager('analyses-pager', page, 'loadAnalyses');
         if (arr.length === 0) { document.getElementById('analyses-wrap').innerHTML = '<p>Analiz yok.</p>'; return; }
         let html = '<table><tr><th>ID</th><th>Tarih</th><th>Kullanıcı (e-posta)</th><th>Kaynak</th><th>Giriş önizleme</th><th>Sonuç önizleme</th><th>PDF</th><th>Orijinal belge</th></tr>';
         arr.forEach(a => {
@@ -167,8 +187,10 @@ _ADMIN_HTML = """<!DOCTYPE html>
         ].map(([l,v]) => '<div class="stat"><span>'+l+'</span><strong>'+v+'</strong></div>').join('');
       }).catch(e => { document.getElementById('stats').innerHTML = '<span class="err">'+e.message+'</span>'; });
     }
-    function loadUsers() {
-      api('/admin/users?limit=200').then(arr => {
+    function loadUsers(cursor) {
+      apiPage('/admin/users?limit=200' + (cursor ? '&cursor=' + encodeURIComponent(cursor) : '')).then(page => {
+        var arr = page.items;
+        pager('users-pager', page, 'loadUsers');
         if (arr.length === 0) { document.getElementById('users-wrap').innerHTML = '<p>Kullanıcı yok.</p>'; return; }
         let html = '<table><tr><th>ID</th><th>E-posta</th><th>Ad</th><th>Telefon</th><th>Ülke</th><th>Plan</th><th>Ek hak</th><th>Kayıt</th></tr>';
         arr.forEach(u => { html += '<tr><td>'+u.id+'</td><td>'+escape(u.email)+'</td><td>'+escape(u.full_name||'')+'</td><td>'+(u.phone?escape(u.phone):'-')+'</td><td>'+(u.country||'-')+'</td><td>'+u.plan+'</td><td>'+u.extra_credits+'</td><td>'+(u.created_at||'-')+'</td></tr>'; });
@@ -246,8 +268,9 @@ def admin_stats(
     hour_ago = now - timedelta(hours=1)
     active_threshold = now - timedelta(minutes=2)  # Son 2 dk heartbeat = şu an sitede
 
-    total_users = db.exec(select(func.count(User.id))).one() or 0
-    total_analyses = db.exec(select(func.count(AnalysisRecord.id))).one() or 0
+    # Toplamlar gösterge amaçlı: büyük tablolarda COUNT(*) yerine istatistik tahmini
+    total_users = approximate_count(db, User)
+    total_analyses = approximate_count(db, AnalysisRecord)
     total_payments = db.exec(select(func.count(PaymentOrder.id)).where(PaymentOrder.status == "completed")).one() or 0
 
     logins_24h = db.exec(
@@ -280,24 +303,28 @@ def admin_stats(
 
 @router.get("/analyses")
 def admin_analyses(
+    response: Response,
     db: Session = Depends(get_db),
     _: None = Depends(_require_admin),
-    limit: int = Query(50, le=200),
+    limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None, description="Önceki yanıtın X-Next-Cursor / X-Prev-Cursor başlığı"),
 ):
-    """Son analiz kayıtları: id, input_preview, result_preview, source, created_at."""
-    stmt = (
-        select(AnalysisRecord)
-        .order_by(AnalysisRecord.id.desc())
-        .offset(offset)
-        .limit(limit)
+    """Son analiz kayıtları: id, input_preview, result_preview, source, created_at.
+    Sayfalama (created_at, id) cursor'ı ile; cursor ve tahmini toplam X-Next-Cursor / X-Total-Estimate başlıklarında.
+    """
+    page = keyset_page(
+        db, select(AnalysisRecord), ts_col=AnalysisRecord.created_at, id_col=AnalysisRecord.id,
+        cursor=cursor, limit=limit, offset=offset,
     )
-    rows = list(db.exec(stmt).all())
+    page.total_estimate = approximate_count(db, AnalysisRecord)
+    rows = page.items
     user_ids = {r.user_id for r in rows}
     users_map = {}
     if user_ids:
         for u in db.exec(select(User).where(User.id.in_(user_ids))).all():
             users_map[u.id] = u.email or ""
+    response.headers.update(page.headers())
     return [
         {
             "id": r.id,
@@ -386,14 +413,19 @@ def admin_analysis_original(
 
 @router.get("/users")
 def admin_users(
+    response: Response,
     db: Session = Depends(get_db),
     _: None = Depends(_require_admin),
-    limit: int = Query(200, le=500),
+    limit: int = Query(200, ge=1, le=500),
     offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None, description="Önceki yanıtın X-Next-Cursor / X-Prev-Cursor başlığı"),
 ):
-    """Kullanıcı listesi: id, email, full_name, phone, country, plan, extra_credits, created_at."""
-    stmt = select(User).order_by(User.id.desc()).offset(offset).limit(limit)
-    users = list(db.exec(stmt).all())
+    """Kullanıcı listesi: id, email, full_name, phone, country, plan, extra_credits, created_at.
+    Sayfalama id cursor'ı ile; cursor ve tahmini toplam X-Next-Cursor / X-Total-Estimate başlıklarında.
+    """
+    page = keyset_page(db, select(User), id_col=User.id, cursor=cursor, limit=limit, offset=offset)
+    page.total_estimate = approximate_count(db, User)
+    response.headers.update(page.headers())
     return [
         {
             "id": u.id,
@@ -405,7 +437,7 @@ def admin_users(
             "extra_credits": getattr(u, "extra_credits", 0) or 0,
             "created_at": (u.created_at.isoformat() if getattr(u, "created_at", None) else None),
         }
-        for u in users
+        for u in page.items
     ]
 
 
@@ -690,3 +722,35 @@ def admin_toggle_blog_post_publish(
         "message": "Yayın durumu değiştirildi.",
     }
 
+
+
+class AdminPushBroadcastRequest(BaseModel):
+    """Mobil kullanıcılara toplu bildirim (Expo)."""
+    title: str
+    body: str
+    data: dict | None = None
+    user_ids: list[int] | None = None
+
+
+@router.post("/push/broadcast")
+def admin_push_broadcast(
+    body: AdminPushBroadcastRequest,
+    db: Session = Depends(get_db),
+    _: None = Depends(_require_admin),
+):
+    """Aktif mobil token'lara toplu push gönderir (100'lük paketler, paralel)."""
+    from app.services.push_dispatch import broadcast_to_mobile_users
+
+    if not (body.title or "").strip() or not (body.body or "").strip():
+        raise HTTPException(status_code=400, detail="title ve body gerekli.")
+    return broadcast_to_mobile_users(db, body.title.strip(), body.body.strip(), body.data, body.user_ids)
+
+
+@router.post("/push/receipts")
+def admin_push_poll_receipts(_: None = Depends(_require_admin)):
+    """Bekleyen Expo receipt'lerini hemen sorgular; DeviceNotRegistered token'ları pasifleştirir."""
+    from app.services.push_dispatch import get_push_dispatcher
+
+    dispatcher = get_push_dispatcher()
+    dead = dispatcher.poll_receipts(force=True)
+    return {"deactivated": len(dead), "pending": dispatcher.pending_receipt_count, "stats": dict(dispatcher.stats)}
@@ -9,13 +9,10 @@ from app.core.config import settings
 from app.core.database import get_db
 from app.core.geo import get_geo_from_ip
 from app.core.rate_limit import limiter
-from app.core.security import (
-    create_access_token,
-    decode_access_token,
-    hash_password,
-    verify_password,
-)
-from app.api.deps import get_current_user
+from app.core.passwords import KdfBusy, password_hasher, verify_and_upgrade
+from app.core.security import decode_access_token
+from app.api.deps import get_current_user, get_principal
+from app.api.principal import Principal, issue_access_token
 from app.models import AuditLog, EmailVerifyToken, GuestLoginToken, PasswordResetToken, Presence, SecurityLog, User, UserRegistration
 from app.schemas import (
     ChangePasswordRequest,
@@ -152,7 +149,7 @@ async def register(
             account_claimed_at = getattr(existing, "account_claimed_at", None)
             if account_claimed_at is not None:
                 raise HTTPException(status_code=400, detail="Bu e-posta adresi zaten kayıtlı.")
-            existing.hashed_password = hash_password(password)
+            existing.hashed_password = await password_hasher.hash_async(password)
             existing.full_name = full_name or existing.full_name or ""
             existing.phone = phone or existing.phone
             existing.country = country or existing.country
@@ -185,7 +182,7 @@ async def register(
 
         user = User(
             email=email,
-            hashed_password=hash_password(password),
+            hashed_password=await password_hasher.hash_async(password),
             full_name=full_name,
             phone=phone or None,
             country=country or None,
@@ -240,7 +237,7 @@ async def register(
             verify_email_sent=verify_email_sent,
             created_at=getattr(user, "created_at", None),
         )
-    except HTTPException:
+    except (HTTPException, KdfBusy):
         raise
     except Exception as e:
         raise HTTPException(
@@ -265,7 +262,7 @@ async def login(
     stmt = select(User).where(User.email == email)
     user = db.exec(stmt).first()
     ip = _client_ip(request)
-    if not user or not verify_password(password, user.hashed_password):
+    if not user or not await verify_and_upgrade(db, user, password):
         try:
             db.add(SecurityLog(event="failed_login", ip=ip, endpoint="/auth/login", detail=email or "no_email"))
             db.commit()
@@ -279,7 +276,7 @@ async def login(
         except Exception:
             pass
         raise HTTPException(status_code=403, detail="Hesabınız kısıtlandı.")
-    token = create_access_token({"sub": str(user.id)})
+    token = issue_access_token(user)
     _audit(db, "login", user.id, ip)
     try:
         user.last_login_at = datetime.utcnow()
@@ -344,12 +341,14 @@ def change_password(
     db: Session = Depends(get_db),
 ):
     """Giriş yapmış kullanıcı şifre değiştirir (mevcut şifre + yeni şifre)."""
-    if not verify_password(body.current_password, user.hashed_password):
+    if not password_hasher.verify(body.current_password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Mevcut şifre hatalı.")
-    user.hashed_password = hash_password(body.new_password)
+    user.hashed_password = password_hasher.hash(body.new_password)
     db.add(user)
     db.commit()
-    return {"message": "Şifre güncellendi."}
+    db.refresh(user)
+    # Eski token'lar (ver damgası) geçersiz; bu oturum yeni token ile devam eder
+    return {"message": "Şifre güncellendi.", "access_token": issue_access_token(user), "token_type": "bearer"}
 
 
 @router.post("/delete-account")
@@ -359,7 +358,7 @@ def delete_account(
     db: Session = Depends(get_db),
 ):
     """Hesabı siler (şifre ile onay). Kullanıcı ve ilişkili veriler silinir."""
-    if not verify_password(body.password, user.hashed_password):
+    if not password_hasher.verify(body.password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Şifre hatalı.")
     from app.models import AnalysisRecord, AuditLog, EmailVerifyToken, GuestLoginToken, PasswordResetToken, Presence, ShareToken
 
@@ -411,7 +410,10 @@ def guest_login(
     row.used = True
     db.add(row)
     db.commit()
-    token = create_access_token({"sub": str(row.user_id)})
+    guest = db.get(User, row.user_id)
+    if not guest:
+        raise HTTPException(status_code=400, detail="Geçersiz veya kullanılmış misafir kodu.")
+    token = issue_access_token(guest)
     _audit(db, "guest_login", row.user_id, _client_ip(request))
     return Token(access_token=token)
 
@@ -477,7 +479,7 @@ def reset_password(body: ResetPasswordRequest, db: Session = Depends(get_db)):
     user = db.exec(stmt).first()
     if not user:
         raise HTTPException(status_code=400, detail="Kullanıcı bulunamadı.")
-    user.hashed_password = hash_password(body.new_password)
+    user.hashed_password = password_hasher.hash(body.new_password)
     db.add(user)
     db.delete(row)
     db.commit()
@@ -487,7 +489,7 @@ def reset_password(body: ResetPasswordRequest, db: Session = Depends(get_db)):
 @router.post("/heartbeat")
 def heartbeat(
     request: Request,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
     page: str | None = None,
 ):
@@ -1,14 +1,15 @@
 import hashlib
-import secrets
 
-from fastapi import Depends, HTTPException, Request, status
+from fastapi import Depends, HTTPException, Request, Response, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlmodel import Session, select
+from sqlmodel import Session
 
+from app.api.principal import REFRESHED_TOKEN_HEADER, Principal, principal_cache
 from app.core.config import settings
-from app.core.database import get_db
-from app.core.security import decode_access_token, hash_password
+from app.core.database import engine, get_db
+from app.core.security import create_access_token, decode_access_token
 from app.models import User
+from app.services.passwordless_users import get_or_create_passwordless_user
 
 security = HTTPBearer(auto_error=False)
 
@@ -18,41 +19,104 @@ DEV_GUEST_EMAIL = "dev@local.norya"
 ANON_EMAIL_DOMAIN = "@anonymous.norya"
 
 
-def get_current_user_id(
+_SESSION_EXPIRED = "Oturumunuz sona erdi veya geçersiz. Lütfen tekrar giriş yapın."
+_BANNED = "Hesabınız askıya alındı. Sorularınız için iletişim sayfasından bize ulaşın."
+
+
+def _token_payload(credentials: HTTPAuthorizationCredentials | None) -> dict | None:
+    if not credentials:
+        return None
+    payload = decode_access_token(credentials.credentials)
+    if not payload or "sub" not in payload:
+        return None
+    try:
+        int(payload["sub"])
+    except (TypeError, ValueError):
+        return None
+    return payload
+
+
+def _resolve_principal(payload: dict, db: Session | None = None) -> Principal | None:
+    """Önbellekten (veritabanısız) ya da bir kez User okuyarak Principal. Kullanıcı yok / şifre değişti: None."""
+    user_id = int(payload["sub"])
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        if db is not None:
+            user = db.get(User, user_id)
+        else:
+            with Session(engine) as own:
+                user = own.get(User, user_id)
+        if not user:
+            return None
+        principal = principal_cache.put(Principal.from_user(user))
+    # Eski (ver claim'siz) token'lar süreleri dolana kadar kabul edilir
+    if "ver" in payload and payload["ver"] != principal.ver:
+        return None
+    return principal
+
+
+def get_principal(
+    response: Response,
     credentials: HTTPAuthorizationCredentials | None = Depends(security),
-) -> int:
+) -> Principal:
+    """Kimlik + plan + rol; önbellek isabetinde veritabanına dokunmaz. ORM User gerekmeyen endpoint'ler için."""
     if not credentials:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Giriş yapmanız gerekiyor.",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    payload = decode_access_token(credentials.credentials)
-    if not payload or "sub" not in payload:
+    payload = _token_payload(credentials)
+    if payload is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Geçersiz veya süresi dolmuş token.",
         )
-    return int(payload["sub"])
+    principal = _resolve_principal(payload)
+    if principal is None:
+        # Token geçerli ama kullanıcı DB'de yok ya da şifre değişti → oturumu geçersiz say
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=_SESSION_EXPIRED,
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if principal.is_banned:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=_BANNED)
+    if principal.claims_stale(payload):
+        # Plan/rol değişti (ör. ödeme): istemci güncel claim'li token'ı alabilir
+        response.headers[REFRESHED_TOKEN_HEADER] = create_access_token(principal.claims())
+    return principal
+
+
+def get_principal_optional(
+    credentials: HTTPAuthorizationCredentials | None = Depends(security),
+) -> Principal | None:
+    """Giriş yapılmışsa Principal, yoksa / geçersizse / banlıysa None (veritabanısız hızlı yol)."""
+    payload = _token_payload(credentials)
+    if payload is None:
+        return None
+    principal = _resolve_principal(payload)
+    if principal is None or principal.is_banned:
+        return None
+    return principal
+
+
+def get_current_user_id(principal: Principal = Depends(get_principal)) -> int:
+    return principal.id
 
 
 def get_current_user(
-    user_id: int = Depends(get_current_user_id),
+    principal: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ) -> User:
-    user = db.get(User, user_id)
+    """Tam ORM User (kredi düşme, profil güncelleme vb.); kimlik ve ban kontrolü Principal'da yapılmıştır."""
+    user = db.get(User, principal.id)
     if not user:
-        # Token geçerli ama kullanıcı DB'de yok (örn. geçici veritabanı sıfırlandı) → oturumu geçersiz say
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Oturumunuz sona erdi veya geçersiz. Lütfen tekrar giriş yapın.",
+            detail=_SESSION_EXPIRED,
             headers={"WWW-Authenticate": "Bearer"},
         )
-    if getattr(user, "is_banned", False):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Hesabınız askıya alındı. Sorularınız için iletişim sayfasından bize ulaşın.",
-        )
     return user
 
 
@@ -61,37 +125,18 @@ def get_current_user_optional(
     db: Session = Depends(get_db),
 ) -> User | None:
     """Giriş yapılmışsa User döner, yoksa None. PayTR init gibi opsiyonel auth endpoint'leri için."""
-    if not credentials:
+    payload = _token_payload(credentials)
+    if payload is None:
         return None
-    try:
-        payload = decode_access_token(credentials.credentials)
-        if not payload or "sub" not in payload:
-            return None
-        user_id = int(payload["sub"])
-        user = db.get(User, user_id)
-        if user and getattr(user, "is_banned", False):
-            return None
-        return user
-    except Exception:
+    principal = _resolve_principal(payload, db)
+    if principal is None or principal.is_banned:
         return None
+    return db.get(User, principal.id)
 
 
 def _get_or_create_dev_guest(db: Session) -> User:
     """Development ortamında token yokken kullanılacak dev guest kullanıcıyı getir veya oluştur."""
-    stmt = select(User).where(User.email == DEV_GUEST_EMAIL)
-    user = db.exec(stmt).first()
-    if user:
-        return user
-    user = User(
-        email=DEV_GUEST_EMAIL,
-        hashed_password=hash_password("dev-no-login"),
-        full_name="Dev (yerel test)",
-        plan="free",
-    )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return user
+    return get_or_create_passwordless_user(db, DEV_GUEST_EMAIL, full_name="Dev (yerel test)")
 
 
 def _client_ip_from_request(request: Request) -> str:
@@ -109,23 +154,9 @@ def _client_ip_from_request(request: Request) -> str:
 
 
 def _get_or_create_anonymous_user(db: Session, ip: str) -> User:
-    """IP hash'ine göre anonim misafir kullanıcı getir veya oluştur (ücretsiz plan)."""
+    """IP hash'ine göre anonim misafir kullanıcı getir veya oluştur (ücretsiz plan, KDF'siz)."""
     ip_hash = hashlib.sha256(ip.encode()).hexdigest()[:16]
-    email = f"anon_{ip_hash}{ANON_EMAIL_DOMAIN}"
-    stmt = select(User).where(User.email == email)
-    user = db.exec(stmt).first()
-    if user:
-        return user
-    user = User(
-        email=email,
-        hashed_password=hash_password(secrets.token_hex(32)),
-        full_name="Misafir",
-        plan="free",
-    )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return user
+    return get_or_create_passwordless_user(db, f"anon_{ip_hash}{ANON_EMAIL_DOMAIN}", full_name="Misafir")
 
 
 def get_current_user_or_dev_guest(
@@ -134,22 +165,15 @@ def get_current_user_or_dev_guest(
     db: Session = Depends(get_db),
 ) -> User:
     """Analiz endpoint'leri için: token varsa normal kullanıcı; yoksa anonim misafir (ücretsiz plan)."""
-    if credentials:
-        try:
-            payload = decode_access_token(credentials.credentials)
-            if payload and "sub" in payload:
-                user = db.get(User, int(payload["sub"]))
-                if user and getattr(user, "is_banned", False):
-                    raise HTTPException(
-                        status_code=status.HTTP_403_FORBIDDEN,
-                        detail="Hesabınız askıya alındı. Sorularınız için iletişim sayfasından bize ulaşın.",
-                    )
-                if user:
-                    return user
-        except HTTPException:
-            raise
-        except Exception:
-            pass
+    payload = _token_payload(credentials)
+    if payload is not None:
+        principal = _resolve_principal(payload, db)
+        if principal is not None:
+            if principal.is_banned:
+                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=_BANNED)
+            user = db.get(User, principal.id)  # kimlik haritasında: önbellek kaçırıldıysa ikinci sorgu yok
+            if user:
+                return user
     env = (getattr(settings, "environment", "") or "").strip().lower()
     if env == "production":
         ip = _client_ip_from_request(request)
@@ -0,0 +1,183 @@
+"""Mobil uygulama için delta-sync ve kompakt yanıt API'si.
+
+- GET /api/mobile/history/sync: `updated_after` + keyset cursor ile sadece değişen kayıtlar.
+  Liste görünümü ağır `result_text`'i hiç taşımaz; `fields` ile alan seçimi yapılır.
+- GET /api/mobile/history/{id}/report: rapor gövdesi ayrı; güçlü ETag + If-None-Match → 304.
+  ETag (id, updated_at, alanlar) üzerinden hesaplanır; 304 yolunda metin DB'den okunmaz.
+
+Analiz kayıtları tek tek silinmez (yalnızca hesap silmede toplu silinir), bu yüzden tombstone yok.
+"""
+import hashlib
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import and_, func, or_, select
+from sqlmodel import Session
+
+from app.api.deps import get_principal
+from app.api.principal import Principal
+from app.core.database import get_db
+from app.core.pagination import decode_cursor, encode_cursor
+from app.models.analysis import AnalysisRecord
+
+router = APIRouter(prefix="/api/mobile", tags=["mobile"])
+
+SYNC_PAGE_DEFAULT = 100
+SYNC_PAGE_MAX = 500
+INPUT_PREVIEW_LEN = 120
+RESULT_PREVIEW_LEN = 200
+
+# Liste alanları: hafif sütunlar + SQL tarafında kesilen önizlemeler
+_LIST_COLUMNS = {
+    "id": AnalysisRecord.id,
+    "source": AnalysisRecord.source,
+    "created_at": AnalysisRecord.created_at,
+    "updated_at": AnalysisRecord.updated_at,
+    "is_favorite": AnalysisRecord.is_favorite,
+    "plan_type": AnalysisRecord.plan_type,
+    "input_preview": func.substr(AnalysisRecord.input_text, 1, INPUT_PREVIEW_LEN),
+    "result_preview": func.substr(AnalysisRecord.result_text, 1, RESULT_PREVIEW_LEN),
+}
+DEFAULT_LIST_FIELDS = ("id", "result_preview", "source", "created_at", "updated_at", "is_favorite", "plan_type")
+
+# Rapor gövdesi alanları
+_REPORT_COLUMNS = {
+    "id": AnalysisRecord.id,
+    "input_text": AnalysisRecord.input_text,
+    "result_text": AnalysisRecord.result_text,
+    "source": AnalysisRecord.source,
+    "created_at": AnalysisRecord.created_at,
+    "updated_at": AnalysisRecord.updated_at,
+    "doctor_notes": AnalysisRecord.doctor_notes,
+    "is_favorite": AnalysisRecord.is_favorite,
+    "plan_type": AnalysisRecord.plan_type,
+}
+DEFAULT_REPORT_FIELDS = ("id", "result_text", "source", "created_at", "updated_at", "doctor_notes", "is_favorite", "plan_type")
+
+_NO_INDEX = {"X-Robots-Tag": "noindex, nofollow"}
+
+
+def _parse_fields(raw: str | None, allowed: dict, default: tuple[str, ...]) -> list[str]:
+    if not raw or not raw.strip():
+        return list(default)
+    fields = []
+    for f in raw.split(","):
+        f = f.strip()
+        if not f:
+            continue
+        if f not in allowed:
+            raise HTTPException(status_code=400, detail=f"Geçersiz alan: {f}")
+        if f not in fields:
+            fields.append(f)
+    if "id" not in fields:
+        fields.insert(0, "id")
+    return fields
+
+
+def _to_naive_utc(dt: datetime) -> datetime:
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def _iso(value) -> str | None:
+    if value is None:
+        return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def _serialize(fields: list[str], row) -> dict:
+    out = {}
+    for name, value in zip(fields, row):
+        out[name] = _iso(value) if isinstance(value, datetime) else value
+    return out
+
+
+@router.get("/history/sync")
+def mobile_history_sync(
+    user: Principal = Depends(get_principal),
+    db: Session = Depends(get_db),
+    updated_after: datetime | None = Query(None, description="Bu zamandan sonra değişen kayıtlar (ISO 8601)"),
+    cursor: str | None = Query(None, description="Önceki yanıttaki next_cursor / sync_cursor"),
+    limit: int = Query(SYNC_PAGE_DEFAULT, ge=1, le=SYNC_PAGE_MAX),
+    fields: str | None = Query(None, description="Virgülle ayrılmış alanlar (örn. id,result_preview,created_at)"),
+):
+    """Değişen analiz kayıtlarını (updated_at, id) sırasında sayfa sayfa döner.
+
+    İstemci son yanıttaki `sync_cursor`'u saklar; bir sonraki açılışta `cursor=` ile
+    gönderir ve sadece o noktadan sonra oluşan/değişen kayıtları alır.
+    """
+    selected = _parse_fields(fields, _LIST_COLUMNS, DEFAULT_LIST_FIELDS)
+    # Cursor için updated_at/id her zaman okunur; yanıtta sadece istenen alanlar döner
+    columns = [_LIST_COLUMNS[f] for f in selected] + [AnalysisRecord.updated_at, AnalysisRecord.id]
+    stmt = select(*columns).where(AnalysisRecord.user_id == user.id)
+    if cursor:
+        after_ts, after_id, _ = decode_cursor(cursor)
+        stmt = stmt.where(
+            or_(
+                AnalysisRecord.updated_at > after_ts,
+                and_(AnalysisRecord.updated_at == after_ts, AnalysisRecord.id > after_id),
+            )
+        )
+    elif updated_after is not None:
+        stmt = stmt.where(AnalysisRecord.updated_at > _to_naive_utc(updated_after))
+    stmt = stmt.order_by(AnalysisRecord.updated_at.asc(), AnalysisRecord.id.asc()).limit(limit + 1)
+    rows = list(db.exec(stmt).all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    n = len(selected)
+    items = [_serialize(selected, row[:n]) for row in rows]
+    next_cursor = encode_cursor(rows[-1][n], rows[-1][n + 1]) if rows else cursor
+    return JSONResponse(
+        content={
+            "items": items,
+            "has_more": has_more,
+            "next_cursor": next_cursor,
+            # Son sayfada istemcinin saklayacağı cursor (değişiklik yoksa gelen cursor aynen döner)
+            "sync_cursor": None if has_more else next_cursor,
+            "server_time": datetime.utcnow().isoformat(),
+        },
+        headers={**_NO_INDEX, "Cache-Control": "private, no-store"},
+    )
+
+
+def _report_etag(rec_id: int, updated_at: datetime | None, fields: list[str]) -> str:
+    raw = f"{rec_id}:{_iso(updated_at)}:{','.join(fields)}".encode()
+    return '"' + hashlib.sha256(raw).hexdigest()[:32] + '"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Güçlü karşılaştırma: W/ önekli etiketler eşleşmez
+    return any(t.strip() == etag for t in if_none_match.split(","))
+
+
+@router.get("/history/{analysis_id}/report")
+def mobile_history_report(
+    analysis_id: int,
+    request: Request,
+    user: Principal = Depends(get_principal),
+    db: Session = Depends(get_db),
+    fields: str | None = Query(None, description="Virgülle ayrılmış alanlar (varsayılan: result_text dahil)"),
+):
+    """Tek analizin rapor gövdesi; If-None-Match eşleşirse gövdesiz 304 döner."""
+    selected = _parse_fields(fields, _REPORT_COLUMNS, DEFAULT_REPORT_FIELDS)
+    meta = db.exec(
+        select(AnalysisRecord.user_id, AnalysisRecord.updated_at).where(AnalysisRecord.id == analysis_id)
+    ).first()
+    if not meta or meta[0] != (user.id or 0):
+        raise HTTPException(status_code=404, detail="Kayıt bulunamadı.")
+    etag = _report_etag(analysis_id, meta[1], selected)
+    headers = {**_NO_INDEX, "ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    row = db.exec(
+        select(*[_REPORT_COLUMNS[f] for f in selected]).where(AnalysisRecord.id == analysis_id)
+    ).first()
+    return JSONResponse(content=_serialize(selected, row), headers=headers)
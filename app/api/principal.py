@@ -0,0 +1,126 @@
+"""
+Kimlik doğrulanmış istemci (Principal): her istekte User satırı okumadan kimlik, plan ve rol.
+
+- Token claim'leri: sub, plan, role (tenant_role), inst (institution_id) ve ver (şifre hash'inden türetilen
+  sürüm damgası). Şifre değişince ver tutmaz → eski oturumlar 401.
+- Kullanıcı anlık görüntüleri worker başına küçük bir TTL önbelleğinde tutulur; önbellek isabetinde kimlik
+  doğrulama veritabanına dokunmaz. Bu worker'daki ORM güncellemeleri (şifre, plan, rol, ban) kaydı anında
+  düşürür; diğer worker'lar en geç auth_snapshot_ttl_s içinde yeni durumu görür.
+- Plan / rol token'dakinden farklıysa Principal güncel değeri kullanır ve yanıt X-Access-Token başlığında
+  yenilenmiş token taşır (ödeme sonrası yeniden giriş gerekmez).
+"""
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy import inspect as sa_inspect
+
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.models import User
+
+# Bu alanlardan biri değişince önbellekteki anlık görüntü geçersiz
+_AUTH_FIELDS = ("hashed_password", "plan", "is_banned", "tenant_role", "tenant_is_active", "institution_id", "email")
+
+REFRESHED_TOKEN_HEADER = "X-Access-Token"
+
+
+def auth_version(hashed_password: str) -> str:
+    """Şifre hash'ine bağlı damga; hash'i sızdırmaz (secret_key ile HMAC)."""
+    return hmac.new(settings.secret_key.encode(), (hashed_password or "").encode(), hashlib.sha256).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    email: str
+    plan: str
+    is_banned: bool
+    institution_id: int | None
+    tenant_role: str
+    tenant_is_active: bool
+    ver: str
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id or 0,
+            email=user.email or "",
+            plan=getattr(user, "plan", None) or "free",
+            is_banned=bool(getattr(user, "is_banned", False)),
+            institution_id=getattr(user, "institution_id", None),
+            tenant_role=getattr(user, "tenant_role", None) or "member",
+            tenant_is_active=bool(getattr(user, "tenant_is_active", True)),
+            ver=auth_version(user.hashed_password),
+        )
+
+    def claims(self) -> dict:
+        return {"sub": str(self.id), "plan": self.plan, "role": self.tenant_role, "inst": self.institution_id, "ver": self.ver}
+
+    def claims_stale(self, payload: dict) -> bool:
+        """Token'daki plan/rol/kurum güncel durumdan farklı mı (eski token'larda claim yok: yenileme yok)."""
+        return "ver" in payload and (
+            payload.get("plan") != self.plan or payload.get("role") != self.tenant_role or payload.get("inst") != self.institution_id
+        )
+
+
+def issue_access_token(user: User) -> str:
+    """Giriş token'ı: sub + plan/rol/kurum + sürüm damgası."""
+    principal = Principal.from_user(user)
+    principal_cache.put(principal)
+    return create_access_token(principal.claims())
+
+
+class PrincipalCache:
+    """user_id → (son kullanma, Principal); LRU sınırlı, thread-safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items: OrderedDict[int, tuple[float, Principal]] = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, user_id: int) -> Principal | None:
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is None or item[0] < time.monotonic():
+                self.stats["misses"] += 1
+                return None
+            self._items.move_to_end(user_id)
+            self.stats["hits"] += 1
+            return item[1]
+
+    def put(self, principal: Principal) -> Principal:
+        with self._lock:
+            self._items[principal.id] = (time.monotonic() + settings.auth_snapshot_ttl_s, principal)
+            self._items.move_to_end(principal.id)
+            while len(self._items) > max(1, settings.auth_snapshot_max_entries):
+                self._items.popitem(last=False)
+        return principal
+
+    def invalidate(self, user_id: int | None) -> None:
+        with self._lock:
+            if self._items.pop(user_id, None) is not None:
+                self.stats["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+principal_cache = PrincipalCache()
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_on_update(mapper, connection, target):
+    state = sa_inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in _AUTH_FIELDS):
+        principal_cache.invalidate(target.id)
+
+
+@event.listens_for(User, "after_delete")
+def _invalidate_on_delete(mapper, connection, target):
+    principal_cache.invalidate(target.id)
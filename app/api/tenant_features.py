@@ -1,13 +1,14 @@
-"""Tenant feature APIs: audit logs, API keys, customization, stats, alerts."""
+"""Tenant feature APIs: audit logs, API keys, customization, stats, alerts, exports."""
 import hashlib
 import logging
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from sqlmodel import Session, select
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.api.deps import get_current_user
 from app.models.user import User
 from app.models.institution import Institution, InstitutionMembership
@@ -41,24 +42,28 @@ class AuditLogResponse(BaseModel):
 
 @router.get("/audit-logs", response_model=list[AuditLogResponse])
 async def get_audit_logs(
+    response: Response,
     action: str | None = Query(None),
     entity_type: str | None = Query(None),
     user_id: int | None = Query(None),
-    limit: int = Query(100, le=500),
-    offset: int = Query(0),
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None, description="Önceki yanıtın X-Next-Cursor / X-Prev-Cursor başlığı"),
     tenant: Institution = Depends(require_tenant_active),
     db: Session = Depends(get_db),
 ):
-    """Get audit logs for current tenant."""
-    logs = tenant_audit_service.get_tenant_audit_logs(
+    """Get audit logs for current tenant; keyset cursors are returned in X-Next-Cursor / X-Prev-Cursor."""
+    page = tenant_audit_service.get_tenant_audit_logs(
         db,
         tenant.id,
         limit=limit,
+        cursor=cursor,
         offset=offset,
         action=action,
         entity_type=entity_type,
         user_id=user_id,
     )
+    response.headers.update(page.headers())
     return [
         AuditLogResponse(
             id=log.id,
@@ -70,7 +75,7 @@ async def get_audit_logs(
             ip_address=log.ip_address,
             created_at=log.created_at.isoformat() if log.created_at else None,
         )
-        for log in logs
+        for log in page.items
     ]
 
 
@@ -273,7 +278,7 @@ async def update_customization(
 async def get_tenant_stats(
     days: int = Query(30, ge=1, le=365),
     tenant: Institution = Depends(require_tenant_active),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Get comprehensive statistics for tenant dashboard."""
     return tenant_stats_service.get_tenant_stats(db, tenant.id, days=days)
@@ -342,3 +347,95 @@ async def update_alert_settings(
     db.commit()
 
     return {"success": True, "message": "Alert settings updated"}
+
+
+# ==================== Export APIs ====================
+
+@router.get("/analyses/export")
+def export_tenant_analyses(
+    format: str = Query("ndjson", description="json | ndjson | csv | zip"),
+    mode: str = Query("auto", description="auto | stream | async"),
+    user: User = Depends(get_current_user),
+    tenant: Institution = Depends(require_tenant_active),
+    db: Session = Depends(get_db),
+):
+    """Export all tenant analyses as a chunked stream, or in the background to object storage.
+
+    mode=auto streams unless the tenant has more than ASYNC_EXPORT_THRESHOLD analyses and
+    object storage is configured; async responses return 202 with an export_id to poll.
+    """
+    from sqlalchemy import func
+    from app.models.analysis import AnalysisRecord
+    from app.services import export_stream, storage
+
+    membership_stmt = select(InstitutionMembership).where(
+        InstitutionMembership.institution_id == tenant.id,
+        InstitutionMembership.user_id == user.id,
+        InstitutionMembership.role.in_(["owner", "admin"]),
+    )
+    if not db.exec(membership_stmt).first():
+        raise HTTPException(status_code=403, detail="Admin or owner role required")
+
+    fmt = (format or "").strip().lower()
+    if fmt not in export_stream.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Unsupported format (json, ndjson, csv, zip)")
+    if mode not in ("auto", "stream", "async"):
+        raise HTTPException(status_code=400, detail="Unsupported mode (auto, stream, async)")
+
+    use_async = mode == "async"
+    if mode == "auto" and storage.export_storage_available():
+        total = db.exec(
+            select(func.count()).select_from(AnalysisRecord).where(AnalysisRecord.institution_id == tenant.id)
+        ).one()
+        use_async = total > export_stream.ASYNC_EXPORT_THRESHOLD
+    if use_async and not storage.export_storage_available():
+        raise HTTPException(status_code=503, detail="Object storage is not configured for async exports")
+
+    tenant_audit_service.log_tenant_action(
+        db,
+        tenant.id,
+        action="export",
+        user_id=user.id,
+        entity_type="analysis",
+        detail=f"Analysis export ({fmt}, {'async' if use_async else 'stream'})",
+    )
+
+    if use_async:
+        try:
+            export_id = export_stream.start_async_export(tenant.id, fmt, notify_email=user.email)
+        except RuntimeError:
+            raise HTTPException(status_code=503, detail="Object storage is unavailable for async exports")
+        return JSONResponse(
+            status_code=202,
+            content={
+                "export_id": export_id,
+                "status": "pending",
+                "status_url": f"/api/tenant/analyses/export/{export_id}",
+            },
+        )
+    return export_stream.export_response(
+        export_stream.export_statement(institution_id=tenant.id), fmt, f"norya-tenant-{tenant.id}-analyses"
+    )
+
+
+@router.get("/analyses/export/{export_id}")
+def get_tenant_export_status(
+    export_id: str,
+    user: User = Depends(get_current_user),
+    tenant: Institution = Depends(require_tenant_active),
+    db: Session = Depends(get_db),
+):
+    """Poll an async export; returns a presigned download URL when ready."""
+    from app.services import export_stream
+
+    membership_stmt = select(InstitutionMembership).where(
+        InstitutionMembership.institution_id == tenant.id,
+        InstitutionMembership.user_id == user.id,
+        InstitutionMembership.role.in_(["owner", "admin"]),
+    )
+    if not db.exec(membership_stmt).first():
+        raise HTTPException(status_code=403, detail="Admin or owner role required")
+    status = export_stream.async_export_status(tenant.id, export_id)
+    if status["status"] == "unknown":
+        raise HTTPException(status_code=404, detail="Export not found")
+    return status
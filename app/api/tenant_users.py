@@ -5,7 +5,7 @@ Hospital admins can manage their internal users (doctors, staff).
 
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
 from sqlmodel import Session
 
@@ -35,13 +35,16 @@ class UpdateUserRequest(BaseModel):
 
 @router.get("/")
 async def list_tenant_users(
+    response: Response,
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None, description="Önceki yanıtın X-Next-Cursor / X-Prev-Cursor başlığı"),
     tenant: Institution = Depends(require_tenant_active),
     db: Session = Depends(get_db),
 ):
-    """List all users for current tenant."""
-    users = tenant_user_service.get_tenant_users(db, tenant.id, limit=limit, offset=offset)
+    """List users for current tenant; keyset cursors are returned in X-Next-Cursor / X-Prev-Cursor."""
+    page = tenant_user_service.get_tenant_users(db, tenant.id, limit=limit, cursor=cursor, offset=offset)
+    response.headers.update(page.headers())
     return [
         {
             "id": u.id,
@@ -53,7 +56,7 @@ async def list_tenant_users(
             "created_at": u.created_at.isoformat() if u.created_at else None,
             "last_login_at": u.last_login_at.isoformat() if u.last_login_at else None,
         }
-        for u in users
+        for u in page.items
     ]
 
 
@@ -1,7 +1,7 @@
 """Wallet API endpoints for tenant credit management."""
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
 from sqlmodel import Session, select
 
@@ -74,13 +74,16 @@ async def get_wallet_balance(
 
 @router.get("/transactions")
 async def get_wallet_transactions(
-    limit: int = 50,
-    offset: int = 0,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None, description="Önceki yanıtın X-Next-Cursor / X-Prev-Cursor başlığı"),
     tenant: Institution = Depends(require_tenant_active),
     db: Session = Depends(get_db),
 ):
-    """Get wallet transaction history for current tenant."""
-    transactions = wallet_service.get_transactions(db, tenant.id, limit=limit, offset=offset)
+    """Get wallet transaction history for current tenant; keyset cursors are returned in X-Next-Cursor / X-Prev-Cursor."""
+    page = wallet_service.get_transactions(db, tenant.id, limit=limit, cursor=cursor, offset=offset)
+    response.headers.update(page.headers())
 
     return [
         {
@@ -90,7 +93,7 @@ async def get_wallet_transactions(
             "description": t.description,
             "created_at": t.created_at.isoformat() if t.created_at else None,
         }
-        for t in transactions
+        for t in page.items
     ]
 
 
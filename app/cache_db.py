@@ -1,14 +1,37 @@
 import json
+import os
 import sqlite3
+import threading
 from typing import Any, Optional
 
-from app.cache_utils import is_expired, now_iso
+from app.cache_utils import expires_in_iso, is_expired, now_iso
 
 
-def get_conn(db_path: str = "norya.db") -> sqlite3.Connection:
-    conn = sqlite3.connect(db_path, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+class ProcessLocalConnection:
+    """sqlite3.Connection vekili: süreç (pid) başına ayrı bağlantı. gunicorn --preload ile master'da açılan
+    handle fork edilen worker'larda paylaşılmaz; her worker ilk kullanımda kendi bağlantısını açar."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn: sqlite3.Connection | None = None
+        self._pid = 0
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            with self._lock:
+                if self._conn is None or self._pid != os.getpid():
+                    conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                    conn.row_factory = sqlite3.Row
+                    self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def __getattr__(self, name: str):
+        return getattr(self._connection(), name)
+
+
+def get_conn(db_path: str = "norya.db") -> ProcessLocalConnection:
+    return ProcessLocalConnection(db_path)
 
 
 def init_cache(conn: sqlite3.Connection) -> None:
@@ -23,6 +46,17 @@ def init_cache(conn: sqlite3.Connection) -> None:
     );
     """)
     conn.execute("CREATE INDEX IF NOT EXISTS idx_ai_cache_expires ON ai_cache(expires_at);")
+    # Single-flight kiralama satırı: aynı anahtarı o an hesaplayan worker (status=running) veya
+    # hesaplamanın hata sonucu (status=error, kısa süre tutulur ki bekleyenler de aynı hatayı alsın)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS ai_cache_lease (
+      cache_key TEXT PRIMARY KEY,
+      owner TEXT NOT NULL,
+      status TEXT NOT NULL DEFAULT 'running',
+      expires_at TEXT NOT NULL,
+      error_json TEXT
+    );
+    """)
     conn.commit()
 
 
@@ -70,5 +104,55 @@ def purge_expired(conn: sqlite3.Connection) -> int:
         "DELETE FROM ai_cache WHERE expires_at IS NOT NULL AND expires_at <= ?",
         (now,),
     )
+    deleted = cur.rowcount
+    # Sahibi çökmüş worker'lardan kalan kiralar
+    conn.execute("DELETE FROM ai_cache_lease WHERE expires_at <= ?", (now,))
+    conn.commit()
+    return deleted
+
+
+def lease_acquire(conn: sqlite3.Connection, cache_key: str, owner: str, ttl_seconds: float) -> bool:
+    """Anahtarın hesaplama kirasını almaya çalışır; süresi dolmuş ya da hata ile bitmiş kira devralınır.
+
+    Hata satırı yalnızca o kirayı beklemekte olanlar içindir; yeni gelen istek hatayı almaz, yeniden hesaplar.
+    Alındıysa True.
+    """
+    conn.execute(
+        "DELETE FROM ai_cache_lease WHERE cache_key = ? AND (expires_at <= ? OR status = 'error')",
+        (cache_key, now_iso()),
+    )
+    cur = conn.execute(
+        "INSERT OR IGNORE INTO ai_cache_lease (cache_key, owner, status, expires_at) VALUES (?, ?, 'running', ?)",
+        (cache_key, owner, expires_in_iso(ttl_seconds)),
+    )
+    conn.commit()
+    return cur.rowcount == 1
+
+
+def lease_get(conn: sqlite3.Connection, cache_key: str) -> Optional[dict[str, Any]]:
+    """Geçerli kira satırı (süresi dolmuşsa None)."""
+    row = conn.execute("SELECT * FROM ai_cache_lease WHERE cache_key = ?", (cache_key,)).fetchone()
+    if not row or is_expired(row["expires_at"]):
+        return None
+    return {
+        "owner": row["owner"],
+        "status": row["status"],
+        "error": json.loads(row["error_json"]) if row["error_json"] else None,
+    }
+
+
+def lease_release(conn: sqlite3.Connection, cache_key: str, owner: str) -> None:
+    conn.execute("DELETE FROM ai_cache_lease WHERE cache_key = ? AND owner = ?", (cache_key, owner))
+    conn.commit()
+
+
+def lease_fail(conn: sqlite3.Connection, cache_key: str, owner: str, error: dict, keep_seconds: float) -> None:
+    """Hesaplama hatasını kira satırına yazar; o kirayı yoklayan diğer worker'lar aynı hatayı döner.
+
+    Satır bir sonraki lease_acquire'da (ya da keep_seconds sonunda) silinir; hata önbelleğe alınmaz.
+    """
+    conn.execute(
+        "UPDATE ai_cache_lease SET status = 'error', error_json = ?, expires_at = ? WHERE cache_key = ? AND owner = ?",
+        (json.dumps(error, ensure_ascii=False), expires_in_iso(keep_seconds), cache_key, owner),
+    )
     conn.commit()
-    return cur.rowcount
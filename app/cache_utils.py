@@ -41,6 +41,10 @@ def expires_iso(days: int) -> str:
     return (datetime.now(UTC) + timedelta(days=days)).isoformat()
 
 
+def expires_in_iso(seconds: float) -> str:
+    return (datetime.now(UTC) + timedelta(seconds=seconds)).isoformat()
+
+
 def is_expired(expires_at: Optional[str]) -> bool:
     if not expires_at:
         return False
@@ -0,0 +1,190 @@
+"""
+Rapor varlık önbelleği: grafik SVG'leri ve doğrulama QR PNG'leri (base64) tekrar üretilmez.
+
+- Anahtar, çizime giren girdilerden üretilir: değer/aralık gösterim hassasiyetine yuvarlanır
+  (quantize), etiket metinleri olduğu gibi girer. Dil anahtarda yoktur; aynı metni çizen diller
+  (ör. "Normal") ve aynı raporun PDF/HTML çıktıları aynı varlığı paylaşır.
+- Bellek katmanı: süreç başına sınırlı LRU (settings.asset_cache_max_items).
+- Disk katmanı (isteğe bağlı, settings.asset_cache_dir): worker'lar ve yeniden başlatmalar arası
+  paylaşım; yazma atomik (geçici dosya + rename). Disk hatası önbelleği devre dışı bırakmaz, yalnızca atlanır.
+- Disk sınırı: yazma yolunda en fazla PRUNE_INTERVAL_S'de bir budama; max_age'den eski dosyalar silinir,
+  toplam boyut max_bytes'ı aşarsa en uzun süredir kullanılmayandan başlanarak silinir. Her worker kendi yazdığı dizini budar,
+  zamanlanmış işe (tek kazanan) bağlı değildir.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable
+
+from app.core.config import settings
+
+log = logging.getLogger(__name__)
+
+# Grafiklerde sayıların yuvarlanacağı anlamlı basamak (etiketler f"{v:g}" = 6 basamak gösterir)
+DISPLAY_DIGITS = 6
+PRUNE_INTERVAL_S = 3600
+
+
+def quantize(value: float | None, digits: int = DISPLAY_DIGITS) -> float | None:
+    """Gösterim hassasiyetine yuvarlar: aynı görünen grafik aynı anahtarı alır."""
+    if value is None:
+        return None
+    return float(f"{float(value):.{digits}g}")
+
+
+class AssetCache:
+    """Thread-safe LRU + isteğe bağlı disk katmanı. Değerler str (base64 veya SVG metni)."""
+
+    def __init__(self, max_items: int, disk_dir: str | None = None, max_bytes: int = 0, max_age_s: float = 0):
+        self.max_items = max(0, max_items)
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.max_bytes = max(0, max_bytes)
+        self.max_age_s = max(0.0, max_age_s)
+        self._items: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+        self._last_prune = 0.0
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "pruned": 0}
+
+    @staticmethod
+    def make_key(kind: str, parts: tuple) -> str:
+        raw = repr((kind,) + tuple(parts)).encode("utf-8")
+        return f"{kind}:{hashlib.sha256(raw).hexdigest()[:32]}"
+
+    def _disk_path(self, key: str) -> Path:
+        kind, digest = key.split(":", 1)
+        return self.disk_dir / kind / f"{digest}.txt"
+
+    def _disk_get(self, key: str) -> str | None:
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            value = path.read_text(encoding="ascii")
+        except (OSError, UnicodeDecodeError):
+            return None
+        try:
+            # Okunan dosya tazelenir: boyut budaması en uzun süredir kullanılmayandan başlar
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def _disk_put(self, key: str, value: str) -> None:
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="ascii") as f:
+                f.write(value)
+            os.replace(tmp, path)
+        except (OSError, UnicodeEncodeError) as e:
+            log.debug("Asset cache disk write skipped: %s", e)
+        if time.monotonic() - self._last_prune >= PRUNE_INTERVAL_S:
+            self.prune_disk()
+
+    def prune_disk(self) -> int:
+        """Yaş ve toplam boyut sınırını aşan disk dosyalarını siler; silinen dosya sayısını döner."""
+        if self.disk_dir is None or not (self.max_bytes or self.max_age_s):
+            return 0
+        # Başka thread budamadaysa beklenmez
+        if not self._prune_lock.acquire(blocking=False):
+            return 0
+        try:
+            self._last_prune = time.monotonic()
+            now = time.time()
+            files: list[tuple[float, int, Path]] = []
+            for path in self.disk_dir.glob("*/*"):
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                # Yarım kalmış .tmp dosyaları da dahil: yaşları dolunca temizlenir
+                files.append((st.st_mtime, st.st_size, path))
+            files.sort(key=lambda f: f[0])
+            total = sum(size for _, size, _ in files)
+            deleted = 0
+            for mtime, size, path in files:
+                expired = self.max_age_s and now - mtime > self.max_age_s
+                if not expired and not (self.max_bytes and total > self.max_bytes):
+                    break
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                total -= size
+                deleted += 1
+            if deleted:
+                with self._lock:
+                    self.stats["pruned"] += deleted
+                log.info("Asset cache disk pruned: %d file(s), %d bytes left", deleted, total)
+            return deleted
+        finally:
+            self._prune_lock.release()
+
+    def get_or_build(self, kind: str, parts: tuple, build: Callable[[], str]) -> str:
+        key = self.make_key(kind, parts)
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+                self.stats["hits"] += 1
+                return value
+        value = self._disk_get(key)
+        if value is not None:
+            with self._lock:
+                self.stats["disk_hits"] += 1
+        else:
+            value = build()
+            with self._lock:
+                self.stats["misses"] += 1
+            # Boş sonuç (ör. qrcode yok) saklanmaz; sonraki çağrı yeniden dener
+            if value and value.isascii():
+                self._disk_put(key, value)
+        if value and self.max_items:
+            with self._lock:
+                self._items[key] = value
+                self._items.move_to_end(key)
+                while len(self._items) > self.max_items:
+                    self._items.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            for k in self.stats:
+                self.stats[k] = 0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"items": len(self._items), "max_items": self.max_items, "disk": str(self.disk_dir or ""), **self.stats}
+
+
+_cache: AssetCache | None = None
+_cache_lock = threading.Lock()
+
+
+def asset_cache() -> AssetCache:
+    """Süreç genelinde tek önbellek (ayarlar ilk kullanımda okunur)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AssetCache(
+                    settings.asset_cache_max_items,
+                    (settings.asset_cache_dir or "").strip() or None,
+                    max_bytes=settings.asset_cache_disk_max_mb * 1024 * 1024,
+                    max_age_s=settings.asset_cache_disk_max_age_days * 86400,
+                )
+    return _cache
+
+
+def cached_asset(kind: str, parts: tuple, build: Callable[[], str]) -> str:
+    return asset_cache().get_or_build(kind, parts, build)
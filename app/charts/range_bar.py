@@ -1,8 +1,12 @@
 """
 Premium referans aralığı grafiği: SVG range bar + marker.
 PDF raporuna gömülür; WeasyPrint ile keskin render için SVG kullanılır.
+*_base64 sürümleri asset_cache üzerinden önbelleklidir (girdiler gösterim hassasiyetine yuvarlanır).
 """
 import base64
+
+from app.charts.asset_cache import cached_asset, quantize
+
 # Renkler: İyi=yeşil, Sınırda=sarı, Düşük/Yüksek=kırmızı, arka plan gri
 COLOR_NORMAL = "#16A34A"
 COLOR_BORDER = "#F59E0B"
@@ -147,8 +151,13 @@ def simple_value_bar_svg_base64(
     status_label: str | None = None,
 ) -> str:
     """Referansı olmayan parametre için basit çubuk grafik, base64."""
-    svg = simple_value_bar_svg(name=name, value=value, unit=unit, status=status, status_label=status_label)
-    return base64.b64encode(svg.encode("utf-8")).decode("ascii")
+    value = quantize(value)
+
+    def _build() -> str:
+        svg = simple_value_bar_svg(name=name, value=value, unit=unit, status=status, status_label=status_label)
+        return base64.b64encode(svg.encode("utf-8")).decode("ascii")
+
+    return cached_asset("simple_bar", (name, value, unit, status, status_label), _build)
 
 
 def overall_score_svg(
@@ -196,8 +205,12 @@ def overall_score_svg_base64(
     include_title: bool = True,
 ) -> str:
     """Genel durum 0–100 grafiği, base64."""
-    svg = overall_score_svg(score=score, status=status, title=title, badge_label=badge_label, include_title=include_title)
-    return base64.b64encode(svg.encode("utf-8")).decode("ascii")
+
+    def _build() -> str:
+        svg = overall_score_svg(score=score, status=status, title=title, badge_label=badge_label, include_title=include_title)
+        return base64.b64encode(svg.encode("utf-8")).decode("ascii")
+
+    return cached_asset("overall", (score, status, title if include_title else None, badge_label), _build)
 
 
 def range_bar_svg_base64(
@@ -212,15 +225,23 @@ def range_bar_svg_base64(
     status_label: str | None = None,
 ) -> str:
     """Aynı parametrelerle SVG üretir ve base64 string döndürür (img src için). İyi/Düşük/Yüksek/Sınırda rozeti eklenir."""
-    svg = range_bar_svg(
-        name=name,
-        value=value,
-        unit=unit,
-        ref_min=ref_min,
-        ref_max=ref_max,
-        status=status,
-        display_min=display_min,
-        display_max=display_max,
-        status_label=status_label,
+    value, ref_min, ref_max = quantize(value), quantize(ref_min), quantize(ref_max)
+    display_min, display_max = quantize(display_min), quantize(display_max)
+
+    def _build() -> str:
+        svg = range_bar_svg(
+            name=name,
+            value=value,
+            unit=unit,
+            ref_min=ref_min,
+            ref_max=ref_max,
+            status=status,
+            display_min=display_min,
+            display_max=display_max,
+            status_label=status_label,
+        )
+        return base64.b64encode(svg.encode("utf-8")).decode("ascii")
+
+    return cached_asset(
+        "range_bar", (name, value, unit, ref_min, ref_max, status, display_min, display_max, status_label), _build
     )
-    return base64.b64encode(svg.encode("utf-8")).decode("ascii")
@@ -33,6 +33,10 @@ class Settings(BaseSettings):
     rate_limit_per_minute: int = 60
     # Kayıt endpoint'i için ayrı limit (testte yüksek tutulabilir)
     rate_limit_register_per_minute: int = 3
+    # Rate limit sayaç deposu (limits URI): boş = shared_cache_url'i izler (redis ya da aynı SQLite dosyası), o da boşsa worker başına bellek
+    rate_limit_storage_uri: str = ""
+    # Worker'lar arası önbellek (PDF, geo, saatlik analiz limiti, kurlar): boş = süreç içi, sqlite:///yol veya redis://...
+    shared_cache_url: str = ""
     # PayTR (Türkiye sanal pos): iFrame API, önce ödeme alınır, bildirim URL ile hak tanınır
     paytr_merchant_id: str = ""
     paytr_merchant_key: str = ""
@@ -47,6 +51,11 @@ class Settings(BaseSettings):
     paytr_amount_yearly: int = 10692   # Yıllık Pro (euro cent), 10692 = 106,92 € (KDV dahil)
     paytr_test_mode: str = "0"         # Test için 1
     paytr_debug: bool = False          # True ise get-token'da debug_on=1; PayTR detaylı hata döner (sadece test için)
+    paytr_recurring_url: str = "https://www.paytr.com/odeme"  # kayıtlı kart çekimi (testlerde yerel sahte sunucu)
+    # Otomatik yenileme / düşük bakiye işleri: eşik altı kurumlar sınırlı havuzda paralel işlenir
+    billing_job_concurrency: int = 4
+    auto_renew_max_attempts: int = 3   # aynı dönem için başarısız çekimden sonra en fazla deneme
+    auto_renew_pending_stale_min: int = 30   # sonucu bilinmeyen (pending) deneme bu süreden sonra mutabakat listesine düşer
     admin_secret: str = ""             # Manuel hak tanıma (destek): POST /payment/grant için
     upload_max_mb: int = 10            # /analyze/upload için max dosya boyutu (MB)
     environment: str = "development"   # production: admin cookie Secure=True
@@ -68,6 +77,10 @@ class Settings(BaseSettings):
     # PWA push bildirimleri (opsiyonel): VAPID public key (base64url). Boşsa push aboneliği alınmaz.
     vapid_public_key: str = ""
     vapid_private_key: str = ""  # Bildirim göndermek için (pywebpush ile kullanılır)
+    # Expo push (mobil): base URL testlerde yerel stub'a yönlendirilebilir; access token opsiyonel
+    expo_push_base_url: str = "https://exp.host"
+    expo_access_token: str = ""
+    push_max_concurrency: int = 4      # Aynı anda Expo'ya giden paket (HTTP isteği) sayısı
     # Google Analytics 4: Ölçüm kimliği (G-XXXXXXXXXX). Boşsa script eklenmez.
     ga_measurement_id: str = ""
     # Google Ads: Dönüşüm hesabı kimliği (AW-XXXXXXXXX). Boşsa gtag'a eklenmez.
@@ -122,12 +135,64 @@ class Settings(BaseSettings):
     minio_secure: bool = True         # HTTPS
     minio_use_for_pdf: bool = False   # True ise PDF MinIO'ya yüklenir ve indirme oradan
 
+    # Yerel OCR (görsel / taranmış PDF): yeterli biyobelirteç okunursa Vision yerine metin yolu kullanılır
+    ocr_engine: str = "tesseract"      # "off" kapatır; pytesseract veya tesseract ikilisi yoksa otomatik atlanır
+    ocr_languages: str = "tur+eng"
+    ocr_min_biomarkers: int = 4        # metin yoluna geçmek için gereken tanınan değer sayısı
+    ocr_min_confidence: float = 60.0   # motorun ortalama kelime güveni (0-100)
+    ocr_timeout_seconds: float = 20.0  # tek Tesseract çağrısının süre sınırı (süreç sonlandırılır)
+
+    # Bozulmuş mod (kural tabanlı anlık rapor): "auto" = LLM hatası/aşırı yükte, "force" = her zaman, "off" = yük atma yok
+    llm_degraded_mode: str = "auto"
+    llm_max_inflight: int = 0          # worker başına eşzamanlı LLM açıklama çağrısı; aşan istek bozulmuş moda (0 = sınırsız)
+    # Rapor grafik/QR varlık önbelleği: bellek LRU (öğe sayısı) + isteğe bağlı disk katmanı (boş = kapalı)
+    asset_cache_max_items: int = 4096
+    asset_cache_dir: str = ""
+    # Disk katmanı sınırları: toplam boyut (MB) ve dosya yaşı (gün); aşanlar saatte bir budanır
+    asset_cache_disk_max_mb: int = 256
+    asset_cache_disk_max_age_days: int = 30
+    # Kurumsal toplu PDF dışa aktarımı: süreç havuzu boyutu (0 = CPU sayısı, 1 = havuzsuz, istek sürecinde)
+    enterprise_pdf_workers: int = 0
+    # Veritabanı havuzu (Postgres / dosya SQLite): worker başına kalıcı + taşma bağlantı, bekleme üst sınırı (sn)
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 10.0
+    db_pool_recycle: int = 1800              # sn; bu yaştan eski bağlantı yeniden açılır (LB/pgbouncer boşta kesmesi)
+    db_statement_timeout_ms: int = 30000     # Postgres statement_timeout (0 = sınırsız)
+    db_idle_in_transaction_timeout_ms: int = 60000  # açık bırakılmış transaction'ı sunucu keser (0 = kapalı); akışlı dışa aktarım muaf
+    db_prepared_cache_size: int = 128        # psycopg bağlantı başına hazır ifade sayısı (0 = kapalı; pgbouncer transaction modu)
+    # SQLite (dosya): WAL + kilit bekleme; önbellek/mmap MB
+    db_sqlite_busy_timeout_ms: int = 5000
+    db_sqlite_cache_mb: int = 64
+    db_sqlite_mmap_mb: int = 256
+    db_sqlite_synchronous: str = "NORMAL"    # WAL ile NORMAL güvenli; FULL her commit'te fsync
+    # Okuma replikaları (virgülle ayrılmış URL): panolar, istatistik, geçmiş ve dışa aktarımlar buradan okur (boş = kapalı)
+    database_replica_urls: str = ""
+    db_replica_max_lag_s: float = 5.0        # bu gecikmeyi aşan replika atlanır (birincile düşülür)
+    db_replica_lag_check_s: float = 2.0      # replika başına lag ölçüm aralığı
+    db_replica_probe_timeout_s: int = 2      # lag ölçümünün bağlantı + sorgu zaman aşımı (istek içinde çalışır)
+    db_read_your_writes_s: float = 15.0      # yazan kullanıcı bu süre birincilden okur
+    # Kimlik doğrulama anlık görüntü önbelleği (worker başına): TTL içinde istek başına User okunmaz
+    auth_snapshot_ttl_s: float = 30.0
+    auth_snapshot_max_entries: int = 10000
+    # Şifre KDF (bcrypt): maliyet ve ayrı sınırlı havuz; havuz + kuyruk doluysa 429 (event loop / tüm site kilitlenmez)
+    bcrypt_rounds: int = 12                  # değişince eski hash'ler başarılı girişte yeniden hesaplanır
+    kdf_workers: int = 2
+    kdf_queue_max: int = 16                  # çalışan işlerin üstünde bekleyebilecek iş sayısı
+    # Arka plan iş zamanlayıcısı (app.services.scheduler): işler scheduled_jobs satır kirasıyla küme genelinde tek çalışır
+    scheduler_enabled: bool = True
+    scheduler_poll_s: float = 15.0           # vadesi gelen işleri kiralama turu aralığı
+    scheduler_max_concurrency: int = 2       # worker başına aynı anda çalışan iş
+    scheduler_drain_s: float = 20.0          # kapanışta çalışan işler için bekleme (sonra interrupted)
+    scheduler_run_retention_days: int = 30   # job_runs geçmişi (job_runs_prune işi siler)
+
     # Startup güvenlik bayrakları (deploy stabilitesi)
     startup_run_maintenance_tasks: bool = False   # seed/reset gibi ağır işleri startup'ta çalıştırma
     startup_verify_blog_icons: bool = False       # startup'ta blog ikon dosyası taramasını çalıştırma
     startup_run_drip_loop: bool = False           # startup'ta drip thread başlatma
     startup_enforce_openai_key: bool = False      # startup'ta OPENAI_API_KEY yoksa hard-fail verme
     startup_enforce_secret_key: bool = False      # startup'ta SECRET_KEY hard-fail kontrolü
+    db_migrate_on_startup: bool = True            # şema geride ise worker migration'ı kilit altında çalıştırır (false: yalnızca `python -m app.core.migrate`)
 
     # E-posta gönderimi: production'da bile açıkça istenmedikçe kapatılabilir
     email_send_enabled: bool = True
@@ -1,17 +1,22 @@
-import os
+import hashlib
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
 
-from sqlalchemy import inspect, text
-from sqlalchemy.exc import OperationalError as SQLOperationalError
-from sqlalchemy.pool import StaticPool
-from sqlmodel import Session, SQLModel, create_engine
+from fastapi import Request
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session as _OrmSession
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session, create_engine
 
 from .config import settings
-
-try:
-    import fcntl
-except ImportError:
-    fcntl = None  # Windows
+from .db_profiles import build_engine
+from .runtime import after_fork
+from .security import decode_access_token
+from .shared_cache import shared_cache
 
 
 def _normalized_database_url(raw_url: str) -> str:
@@ -57,14 +62,11 @@ def _normalized_database_url(raw_url: str) -> str:
 
 DATABASE_URL = _normalized_database_url(settings.database_url)
 
-# In-memory SQLite: tek bağlantı kullan ki init_db tabloları tüm isteklerde görünsün (testler için)
-_connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-_use_static_pool = DATABASE_URL.startswith("sqlite") and ":memory:" in DATABASE_URL
-engine = create_engine(
-    DATABASE_URL,
-    connect_args=_connect_args,
-    poolclass=StaticPool if _use_static_pool else None,
-)
+# Profil (havuz, PRAGMA, zaman aşımları) URL'e göre db_profiles'ta seçilir
+engine = build_engine(DATABASE_URL)
+
+
+log = logging.getLogger(__name__)
 
 
 def get_db():
@@ -72,206 +74,197 @@ def get_db():
         yield session
 
 
-def _init_db_tables():
-    inspector = inspect(engine)
-    for table in SQLModel.metadata.sorted_tables:
-        if inspector.has_table(table.name):
-            continue
-        try:
-            table.create(engine)
-        except SQLOperationalError as e:
-            if "already exists" not in str(e).lower() and "zaten mevcut" not in str(e).lower():
-                raise
-        except Exception as e:
-            msg = (str(e) + str(getattr(e, "__cause__", "")) + str(getattr(e, "orig", ""))).lower()
-            if "already exists" in msg or "zaten mevcut" in msg:
-                pass
-            else:
-                raise
+# ──────────────────────────────────────────────
+# Okuma replikası yönlendirmesi
+# ──────────────────────────────────────────────
+# Ağır okuma yolları (admin panoları, istatistikler, geçmiş listeleri, dışa aktarımlar) get_read_db /
+# read_session ile replikaya gider; analiz yazımları ve cüzdan FOR UPDATE kilitleri birincilde kalır.
+# - Gecikme: replika lag'i db_replica_lag_check_s aralıkla ölçülür; db_replica_max_lag_s üstü ya da
+#   ulaşılamayan replika atlanır, hiç uygun replika yoksa birincil kullanılır. Ölçüm istek içinde
+#   çalışır: havuzsuz, db_replica_probe_timeout_s bağlantı ve sorgu zaman aşımlı ayrı bağlantıyla.
+# - Kendi yazdığını okuma: istek birincile yazdıysa kullanıcı (token'daki sub / admin cookie)
+#   db_read_your_writes_s boyunca birincilden okur. İşaret paylaşılan önbellekte (shared_cache) tutulur:
+#   tüm worker'lar ve aynı kullanıcının diğer token'ları (mobil + web) görür; tarayıcıya norya_rw
+#   cookie'si de yazılır (paylaşılan önbellek yoksa worker'lar arası taşıyıcı).
 
+READ_YOUR_WRITES_COOKIE = "norya_rw"
 
-def init_db():
-    # Gunicorn 2 worker aynı anda init_db çalıştırıyor; dosya kilidi ile tek işlem tablo oluştursun.
-    fd = None
-    if fcntl is not None:
-        try:
-            lock_path = os.environ.get("NORYA_INIT_DB_LOCK", "/tmp/norya_init_db.lock")
-            fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o600)
-            fcntl.flock(fd, fcntl.LOCK_EX)
-        except OSError:
-            if fd is not None:
-                try:
-                    os.close(fd)
-                except OSError:
-                    pass
-                fd = None
+# İstek başına [yazıldı mı]; middleware kurar, birincil engine'in after_cursor_execute olayı işaretler
+_request_writes: ContextVar[list | None] = ContextVar("norya_request_writes", default=None)
+
+
+class _Replica:
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = build_engine(url)
+        self.lag: float | None = None
+        self.checked_at = 0.0
+        self._lock = threading.Lock()
+        self._probe = None
+
+    def _probe_engine(self):
+        """Lag ölçümü için havuzsuz engine: düşmüş replikada istek TCP zaman aşımını beklemez."""
+        if self._probe is None:
+            timeout = max(1, int(settings.db_replica_probe_timeout_s))
+            self._probe = create_engine(
+                self.url,
+                poolclass=NullPool,
+                connect_args={"connect_timeout": timeout, "options": f"-c statement_timeout={timeout * 1000}"},
+            )
+        return self._probe
+
+    def _measure_lag(self) -> float:
+        """Saniye cinsinden replikasyon gecikmesi (SQLite: ölçülemez, 0)."""
+        if self.engine.dialect.name != "postgresql":
+            return 0.0
+        with self._probe_engine().connect() as conn:
+            value = conn.execute(text(
+                "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+                "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+            )).scalar()
+        return float(value or 0)
+
+    def current_lag(self) -> float:
+        """Önbellekli lag; ölçümü aynı anda tek thread yapar, diğerleri son değeri kullanır."""
+        now = time.monotonic()
+        if now - self.checked_at >= settings.db_replica_lag_check_s and self._lock.acquire(blocking=False):
+            try:
+                self.lag = self._measure_lag()
+            except Exception as e:
+                log.warning("Replica lag check failed (%s): %s", self.engine.url.render_as_string(hide_password=True), e)
+                self.lag = float("inf")
+            finally:
+                self.checked_at = time.monotonic()
+                self._lock.release()
+        return float("inf") if self.lag is None else self.lag
+
+
+_replicas = [
+    _Replica(_normalized_database_url(url))
+    for url in (settings.database_replica_urls or "").split(",") if url.strip()
+]
+_rr = 0
+# anahtar -> yapışkanlık bitişi (epoch); TTL db_read_your_writes_s
+_recent_writers = shared_cache.namespace("rw", ttl=settings.db_read_your_writes_s)
+
+
+def _sticky_key(request: Request) -> str | None:
+    """Yazan kimlik: token'daki kullanıcı (sub); çözülemeyen kimlik bilgisi ve admin cookie hash'iyle."""
+    authorization = request.headers.get("authorization") or ""
+    if authorization:
+        payload = decode_access_token(authorization.removeprefix("Bearer ").strip())
+        if payload and payload.get("sub"):
+            return f"u:{payload['sub']}"
+    credential = authorization or request.cookies.get("norya_admin") or ""
+    return hashlib.sha256(credential.encode()).hexdigest()[:32] if credential else None
+
+
+def _is_sticky(request: Request | None) -> bool:
+    if request is None:
+        return False
+    now = time.time()
+    try:
+        if float(request.cookies.get(READ_YOUR_WRITES_COOKIE) or 0) > now:
+            return True
+    except ValueError:
+        pass
+    key = _sticky_key(request)
+    return key is not None and (_recent_writers.get(key) or 0) > now
+
+
+def read_engine(request: Request | None = None):
+    """Okuma için engine: sağlıklı replika (sırayla), yoksa / yakın zamanda yazan kullanıcıysa birincil."""
+    global _rr
+    if not _replicas or _is_sticky(request):
+        return engine
+    start = _rr = (_rr + 1) % len(_replicas)
+    for i in range(len(_replicas)):
+        replica = _replicas[(start + i) % len(_replicas)]
+        if replica.current_lag() <= settings.db_replica_max_lag_s:
+            return replica.engine
+    return engine
+
+
+def _read_only_session(bind) -> Session:
+    session = Session(bind)
+    session.info["read_only"] = True
+    return session
+
+
+@contextmanager
+def read_session(request: Request | None = None):
+    """get_read_db'nin istek dışı (arka plan dışa aktarım, üreteç) karşılığı."""
+    with _read_only_session(read_engine(request)) as session:
+        yield session
+
+
+def get_read_db(request: Request):
+    """Salt okunur işler için Session: replikaya yönlenir; yazmaya çalışmak hatadır."""
+    with _read_only_session(read_engine(request)) as session:
+        yield session
+
+
+@event.listens_for(_OrmSession, "before_flush")
+def _reject_read_only_flush(session, flush_context, instances):
+    if session.info.get("read_only") and (session.new or session.dirty or session.deleted):
+        raise RuntimeError("read-only session (get_read_db) cannot write; use get_db")
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _mark_request_write(conn, cursor, statement, parameters, context, executemany):
+    """Birincilde çalışan her INSERT/UPDATE/DELETE isteği işaretler: ORM flush'ı ve session.execute(update(...))
+    gibi Core yazımları (atomik cüzdan / otomatik yenileme güncellemeleri) aynı yoldan geçer."""
+    holder = _request_writes.get()
+    if holder is not None and (context.isinsert or context.isupdate or context.isdelete):
+        holder[0] = True
+
+
+async def read_your_writes_middleware(request: Request, call_next):
+    """Birincile yazan isteğin sahibini kısa süre birincilden okut (replika yoksa no-op)."""
+    if not _replicas:
+        return await call_next(request)
+    holder = [False]
+    token = _request_writes.set(holder)
     try:
-        _init_db_tables()
+        response = await call_next(request)
     finally:
-        if fd is not None:
-            try:
-                fcntl.flock(fd, fcntl.LOCK_UN)
-                os.close(fd)
-            except OSError:
-                pass
-    # Mevcut tablolara yeni sütunlar (Yalnızca SQLite için incremental ALTER komutları)
-    if DATABASE_URL.startswith("sqlite"):
-        for stmt in (
-            "ALTER TABLE user ADD COLUMN email_verified_at DATETIME",
-            "ALTER TABLE analysisrecord ADD COLUMN doctor_notes TEXT",
-            "ALTER TABLE user ADD COLUMN plan TEXT DEFAULT 'free'",
-            "ALTER TABLE user ADD COLUMN extra_credits INTEGER DEFAULT 0",
-            "ALTER TABLE user ADD COLUMN created_at DATETIME",
-            "ALTER TABLE user ADD COLUMN phone TEXT",
-            "ALTER TABLE user ADD COLUMN country TEXT",
-            "ALTER TABLE auditlog ADD COLUMN country TEXT",
-            "ALTER TABLE auditlog ADD COLUMN city TEXT",
-            "ALTER TABLE analysisrecord ADD COLUMN original_filename TEXT",
-            "ALTER TABLE analysisrecord ADD COLUMN original_stored_path TEXT",
-            "ALTER TABLE user ADD COLUMN is_banned BOOLEAN DEFAULT 0",
-            "ALTER TABLE user ADD COLUMN last_login_at DATETIME",
-            "ALTER TABLE user ADD COLUMN account_claimed_at DATETIME",
-            "ALTER TABLE presence ADD COLUMN ip TEXT",
-            "ALTER TABLE presence ADD COLUMN country TEXT",
-            "ALTER TABLE presence ADD COLUMN current_page TEXT",
-            "ALTER TABLE paymentorder ADD COLUMN paytr_transaction_id TEXT",
-            "ALTER TABLE paymentorder ADD COLUMN currency TEXT",
-            "ALTER TABLE paymentorder ADD COLUMN is_processed BOOLEAN DEFAULT 0",
-            "ALTER TABLE paymentorder ADD COLUMN processed_at DATETIME",
-            "CREATE UNIQUE INDEX IF NOT EXISTS ix_paymentorder_paytr_transaction_id ON paymentorder (paytr_transaction_id)",
-            "ALTER TABLE paymentorder ADD COLUMN coupon_code_used TEXT",
-            "ALTER TABLE analysisrecord ADD COLUMN is_favorite BOOLEAN DEFAULT 0",
-            "ALTER TABLE analysisrecord ADD COLUMN plan_type VARCHAR(16) DEFAULT 'single'",
-            "ALTER TABLE paymentorder ADD COLUMN admin_note TEXT",
-            "ALTER TABLE paymentorder ADD COLUMN invoice_ettn TEXT",
-            "ALTER TABLE paymentorder ADD COLUMN invoice_gib_no TEXT",
-            "ALTER TABLE paymentorder ADD COLUMN paid_at DATETIME",
-            "ALTER TABLE paymentorder ADD COLUMN paytr_payment_amount TEXT",
-            "ALTER TABLE paymentorder ADD COLUMN paytr_status TEXT",
-            "ALTER TABLE paymentorder ADD COLUMN raw_callback_json TEXT",
-            "ALTER TABLE paymentorder ADD COLUMN refunded_at DATETIME",
-            "ALTER TABLE paymentorder ADD COLUMN refund_amount_kurus INTEGER",
-            "ALTER TABLE paymentorder ADD COLUMN customer_email TEXT",
-            "ALTER TABLE analysis_jobs ADD COLUMN prompt_tokens INTEGER",
-            "ALTER TABLE analysis_jobs ADD COLUMN completion_tokens INTEGER",
-            "ALTER TABLE discountcode ADD COLUMN is_active BOOLEAN DEFAULT 1",
-            "ALTER TABLE discountcode ADD COLUMN auto_show_on_checkout BOOLEAN DEFAULT 0",
-            "ALTER TABLE discountcode ADD COLUMN auto_apply BOOLEAN DEFAULT 0",
-            "ALTER TABLE discountcode ADD COLUMN display_label VARCHAR(120)",
-            "ALTER TABLE discountcode ADD COLUMN display_note VARCHAR(256)",
-            "ALTER TABLE discountcode ADD COLUMN campaign_badge VARCHAR(64)",
-            "ALTER TABLE discountcode ADD COLUMN old_price_single_cents INTEGER",
-            "ALTER TABLE discountcode ADD COLUMN new_price_single_cents INTEGER",
-            "ALTER TABLE discountcode ADD COLUMN old_price_monthly_cents INTEGER",
-            "ALTER TABLE discountcode ADD COLUMN new_price_monthly_cents INTEGER",
-            "ALTER TABLE discountcode ADD COLUMN old_price_yearly_cents INTEGER",
-            "ALTER TABLE discountcode ADD COLUMN new_price_yearly_cents INTEGER",
-            "ALTER TABLE paymentorder ADD COLUMN quantity INTEGER DEFAULT 1",
-            "ALTER TABLE analysisrecord ADD COLUMN institution_id INTEGER",
-            "ALTER TABLE auditlog ADD COLUMN institution_id INTEGER",
-            "ALTER TABLE auditlog ADD COLUMN entity_type VARCHAR(64)",
-            "ALTER TABLE auditlog ADD COLUMN entity_id INTEGER",
-            "ALTER TABLE auditlog ADD COLUMN metadata_json TEXT",
-            "ALTER TABLE institutions ADD COLUMN status VARCHAR(32) DEFAULT 'pilot'",
-            "ALTER TABLE institutions ADD COLUMN seat_limit INTEGER DEFAULT 25",
-            "ALTER TABLE institutions ADD COLUMN active_languages VARCHAR(255) DEFAULT 'tr,en'",
-            "ALTER TABLE institutions ADD COLUMN onboarding_completed BOOLEAN DEFAULT 0",
-            "ALTER TABLE institutions ADD COLUMN updated_at DATETIME",
-            # Lead e-posta onayları (KVKK/GDPR)
-            "ALTER TABLE email_leads ADD COLUMN consent_kvkk BOOLEAN DEFAULT 0",
-            "ALTER TABLE email_leads ADD COLUMN consent_gdpr BOOLEAN DEFAULT 0",
-            "ALTER TABLE email_leads ADD COLUMN consent_at DATETIME",
-            # Lead UTM tracking
-            "ALTER TABLE email_leads ADD COLUMN utm_source VARCHAR(128)",
-            "ALTER TABLE email_leads ADD COLUMN utm_medium VARCHAR(128)",
-            "ALTER TABLE email_leads ADD COLUMN utm_campaign VARCHAR(128)",
-            "ALTER TABLE email_leads ADD COLUMN utm_content VARCHAR(128)",
-            "ALTER TABLE email_leads ADD COLUMN utm_term VARCHAR(128)",
-            "ALTER TABLE email_leads ADD COLUMN drip_step INTEGER DEFAULT 0",
-            "ALTER TABLE email_leads ADD COLUMN drip_last_sent_at DATETIME",
-            "ALTER TABLE email_leads ADD COLUMN unsubscribed BOOLEAN DEFAULT 0",
-            # User registration tracking (email verification admin)
-            "CREATE TABLE IF NOT EXISTS userregistration (id INTEGER, email VARCHAR, full_name VARCHAR DEFAULT '', status VARCHAR DEFAULT 'pending', user_id INTEGER, verification_mail_sent_at DATETIME, mail_send_error VARCHAR, source VARCHAR, ip_address VARCHAR, user_agent VARCHAR, created_at DATETIME, verified_at DATETIME, PRIMARY KEY (id))",
-            "CREATE INDEX IF NOT EXISTS ix_userregistration_email ON userregistration (email)",
-            "CREATE INDEX IF NOT EXISTS ix_userregistration_status ON userregistration (status)",
-            "CREATE INDEX IF NOT EXISTS ix_userregistration_user_id ON userregistration (user_id)",
-            "CREATE INDEX IF NOT EXISTS ix_userregistration_created_at ON userregistration (created_at)",
-            # Frontend IP (tarayıcı tarafı, cookie'den)
-            "ALTER TABLE userregistration ADD COLUMN frontend_ip_address VARCHAR",
-            # Multi-tenant fields
-            "ALTER TABLE institutions ADD COLUMN tenant_slug VARCHAR(128)",
-            "ALTER TABLE institutions ADD COLUMN billing_wallet_balance INTEGER DEFAULT 0",
-            "ALTER TABLE institutions ADD COLUMN cost_per_analysis INTEGER DEFAULT 100",
-            "ALTER TABLE institutions ADD COLUMN subdomain VARCHAR(255)",
-            "ALTER TABLE institutions ADD COLUMN wallet_low_threshold INTEGER DEFAULT 20000",
-            "ALTER TABLE institutions ADD COLUMN wallet_last_alert DATETIME",
-            "CREATE TABLE IF NOT EXISTS tenant_wallet_transactions (id INTEGER, institution_id INTEGER, amount_cents INTEGER, transaction_type VARCHAR(32), description VARCHAR(512), created_at DATETIME, PRIMARY KEY (id), FOREIGN KEY(institution_id) REFERENCES institutions(id))",
-            "CREATE INDEX IF NOT EXISTS ix_tenant_wallet_transactions_institution_id ON tenant_wallet_transactions (institution_id)",
-            # Tenant customization fields
-            "ALTER TABLE institutions ADD COLUMN logo_url VARCHAR(512)",
-            "ALTER TABLE institutions ADD COLUMN primary_color VARCHAR(16)",
-            "ALTER TABLE institutions ADD COLUMN secondary_color VARCHAR(16)",
-            "ALTER TABLE institutions ADD COLUMN report_header_text VARCHAR(256)",
-            "ALTER TABLE institutions ADD COLUMN report_footer_text VARCHAR(256)",
-            "ALTER TABLE institutions ADD COLUMN custom_css TEXT",
-            # Tenant rate limiting
-            "ALTER TABLE institutions ADD COLUMN daily_analysis_limit INTEGER",
-            "ALTER TABLE institutions ADD COLUMN hourly_analysis_limit INTEGER",
-            # Tenant alert settings
-            "ALTER TABLE institutions ADD COLUMN alert_email_enabled BOOLEAN DEFAULT 1",
-            "ALTER TABLE institutions ADD COLUMN alert_sms_enabled BOOLEAN DEFAULT 0",
-            "ALTER TABLE institutions ADD COLUMN alert_phone VARCHAR(64)",
-            # Tenant auto-renew (recurring payment)
-            "ALTER TABLE institutions ADD COLUMN auto_renew_enabled BOOLEAN DEFAULT 0",
-            "ALTER TABLE institutions ADD COLUMN auto_renew_amount_cents INTEGER DEFAULT 100000",
-            "ALTER TABLE institutions ADD COLUMN auto_renew_threshold_cents INTEGER DEFAULT 20000",
-            "ALTER TABLE institutions ADD COLUMN auto_renew_interval_days INTEGER DEFAULT 30",
-            "ALTER TABLE institutions ADD COLUMN auto_renew_last_at DATETIME",
-            "ALTER TABLE institutions ADD COLUMN paytr_utoken VARCHAR(256)",
-            "ALTER TABLE institutions ADD COLUMN paytr_ctoken VARCHAR(256)",
-            # Tenant user fields
-            "ALTER TABLE user ADD COLUMN institution_id INTEGER",
-            "ALTER TABLE user ADD COLUMN tenant_role VARCHAR(32) DEFAULT 'member'",
-            "ALTER TABLE user ADD COLUMN tenant_is_active BOOLEAN DEFAULT 1",
-            # Tenant audit log
-            "CREATE TABLE IF NOT EXISTS tenant_audit_logs (id INTEGER, institution_id INTEGER, user_id INTEGER, action VARCHAR(64), entity_type VARCHAR(64), entity_id INTEGER, ip_address VARCHAR(64), user_agent VARCHAR(512), detail VARCHAR(1024), metadata_json TEXT, created_at DATETIME, PRIMARY KEY (id), FOREIGN KEY(institution_id) REFERENCES institutions(id), FOREIGN KEY(user_id) REFERENCES user(id))",
-            "CREATE INDEX IF NOT EXISTS ix_tenant_audit_logs_institution_id ON tenant_audit_logs (institution_id)",
-            "CREATE INDEX IF NOT EXISTS ix_tenant_audit_logs_user_id ON tenant_audit_logs (user_id)",
-            "CREATE INDEX IF NOT EXISTS ix_tenant_audit_logs_action ON tenant_audit_logs (action)",
-            # Tenant API keys
-            "CREATE TABLE IF NOT EXISTS tenant_api_keys (id INTEGER, institution_id INTEGER, name VARCHAR(128), key_hash VARCHAR(128), key_prefix VARCHAR(16), is_active BOOLEAN DEFAULT 1, last_used_at DATETIME, expires_at DATETIME, created_by_user_id INTEGER, created_at DATETIME, updated_at DATETIME, PRIMARY KEY (id), FOREIGN KEY(institution_id) REFERENCES institutions(id), FOREIGN KEY(created_by_user_id) REFERENCES user(id))",
-            "CREATE UNIQUE INDEX IF NOT EXISTS ix_tenant_api_keys_key_hash ON tenant_api_keys (key_hash)",
-            "CREATE INDEX IF NOT EXISTS ix_tenant_api_keys_institution_id ON tenant_api_keys (institution_id)",
-        ):
-            try:
-                with engine.connect() as conn:
-                    conn.execute(text(stmt))
-                    conn.commit()
-            except Exception:
-                # Mevcut kurulumlarda sütun zaten varsa veya tablo yoksa sessizce devam et
-                pass
-    # PostgreSQL: admin dashboard ve maliyet sorguları bu sütunlara ihtiyaç duyar.
-    # SQLite için yukarıdaki blokta ekleniyordu; eski Postgres kurulumlarında eksik kalabiliyordu (500).
-    if DATABASE_URL.startswith("postgresql"):
-        for stmt in (
-            "ALTER TABLE analysis_jobs ADD COLUMN IF NOT EXISTS prompt_tokens INTEGER",
-            "ALTER TABLE analysis_jobs ADD COLUMN IF NOT EXISTS completion_tokens INTEGER",
-        ):
-            try:
-                with engine.begin() as conn:
-                    conn.execute(text(stmt))
-            except Exception:
-                pass
-    # Bazı ortamlarda yukarıdaki ALTER sessizce başarısız olabiliyor; şema denetimi ile tamamla
-    if DATABASE_URL.startswith("sqlite"):
-        try:
-            insp = inspect(engine)
-            if insp.has_table("paymentorder"):
-                col_names = {c["name"] for c in insp.get_columns("paymentorder")}
-                if "quantity" not in col_names:
-                    with engine.begin() as conn:
-                        conn.execute(
-                            text("ALTER TABLE paymentorder ADD COLUMN quantity INTEGER DEFAULT 1")
-                        )
-        except Exception:
-            pass
+        _request_writes.reset(token)
+    if holder[0]:
+        until = time.time() + settings.db_read_your_writes_s
+        key = _sticky_key(request)
+        if key:
+            _recent_writers.set(key, until)
+        response.set_cookie(
+            READ_YOUR_WRITES_COOKIE, f"{until:.0f}", max_age=int(settings.db_read_your_writes_s) + 1,
+            httponly=True, samesite="lax", secure=settings.environment == "production",
+        )
+    return response
+
+
+def replica_status() -> list[dict]:
+    """Admin: replika başına son ölçülen gecikme ve kullanılabilirlik."""
+    return [
+        {
+            "url": r.engine.url.render_as_string(hide_password=True),
+            "lag_s": None if r.lag is None else (r.lag if r.lag != float("inf") else "unreachable"),
+            "usable": r.lag is not None and r.lag <= settings.db_replica_max_lag_s,
+        }
+        for r in _replicas
+    ]
+
+
+@after_fork
+def _dispose_inherited_pools() -> None:
+    """Master'dan (preload) kalan havuz bağlantıları worker'da kullanılmaz; kapatmadan bırakılır (soket master'ın)."""
+    engine.dispose(close=False)
+    for replica in _replicas:
+        replica.engine.dispose(close=False)
+        replica._probe = None
+
+
+def init_db():
+    """Worker açılışı: sabit süreli şema sürümü kontrolü; geride ise migration kilit altında bir kez (app.core.migrate)."""
+    from .migrate import ensure_schema
+
+    ensure_schema(engine)
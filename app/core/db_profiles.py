@@ -0,0 +1,226 @@
+"""
+Veritabanı motor profilleri: DATABASE_URL'e göre seçilen create_engine ayarları ve havuz ölçümleri.
+
+- SQLite (dosya): her bağlantıda PRAGMA — WAL (okuyucular yazanı beklemez), busy_timeout (kilitte
+  hemen "database is locked" yerine bekleme), synchronous=NORMAL (WAL ile güvenli), mmap ve sayfa
+  önbelleği. In-memory SQLite (testler) tek bağlantılı StaticPool'da kalır; WAL uygulanmaz.
+- Postgres (psycopg 3): boyutlu QueuePool (pool_size + max_overflow, bekleme üst sınırı), pre_ping,
+  recycle, LIFO (fazla bağlantılar boşta kalıp recycle ile kapanır); sunucu tarafı statement_timeout ve
+  idle_in_transaction_session_timeout; psycopg hazır ifade (prepared statement) önbelleği. Akışlı
+  dışa aktarım transaction'ı idle_in_transaction sınırından muaf tutulur (`exempt_from_idle_timeout`).
+- Ölçüm: havuzdan bağlantı alma bekleme süresi, bağlantı tutma süresi, zaman aşımları ve anlık
+  kullanım (`pool_snapshot`), admin /api/db-pool üzerinden.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event, text
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool, StaticPool
+from sqlmodel import create_engine
+
+from .config import settings
+
+log = logging.getLogger(__name__)
+
+# Ölçüm penceresi: son N bekleme/tutma örneği
+STATS_WINDOW = 2048
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def _summary_ms(values) -> dict:
+    ordered = sorted(values)
+    if not ordered:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    return {
+        "p50": round(_percentile(ordered, 0.50) * 1000, 2),
+        "p95": round(_percentile(ordered, 0.95) * 1000, 2),
+        "p99": round(_percentile(ordered, 0.99) * 1000, 2),
+        "max": round(ordered[-1] * 1000, 2),
+    }
+
+
+class PoolStats:
+    """Havuz sayaçları ve bekleme/tutma süresi örnekleri (thread-safe, süreç başına)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waits: deque[float] = deque(maxlen=STATS_WINDOW)
+        self._holds: deque[float] = deque(maxlen=STATS_WINDOW)
+        self.counters = {"checkouts": 0, "timeouts": 0, "connects": 0, "invalidated": 0}
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def observe_wait(self, seconds: float) -> None:
+        with self._lock:
+            self._waits.append(seconds)
+
+    def observe_hold(self, seconds: float) -> None:
+        with self._lock:
+            self._holds.append(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waits, holds, counters = list(self._waits), list(self._holds), dict(self.counters)
+        return {**counters, "wait_ms": _summary_ms(waits), "hold_ms": _summary_ms(holds)}
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool + bağlantı alma bekleme süresi (taşma bağlantısı açma dahil) ve zaman aşımı sayacı."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sa_exc.TimeoutError:
+            self.stats.count("timeouts")
+            raise
+        finally:
+            self.stats.observe_wait(time.perf_counter() - t0)
+
+    def recreate(self):
+        # engine.dispose() havuzu yeniden kurar; sayaçlar süreç boyunca korunur
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def _sqlite_pragmas(is_file: bool) -> list[str]:
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(settings.db_sqlite_busy_timeout_ms)}",
+        f"PRAGMA cache_size = {-1024 * int(settings.db_sqlite_cache_mb)}",  # negatif: KiB
+        "PRAGMA temp_store = MEMORY",
+    ]
+    if is_file:
+        pragmas += [
+            "PRAGMA journal_mode = WAL",
+            f"PRAGMA synchronous = {settings.db_sqlite_synchronous}",
+            f"PRAGMA mmap_size = {1024 * 1024 * int(settings.db_sqlite_mmap_mb)}",
+        ]
+    return pragmas
+
+
+def _postgres_options() -> str:
+    options = []
+    if settings.db_statement_timeout_ms > 0:
+        options.append(f"-c statement_timeout={int(settings.db_statement_timeout_ms)}")
+    if settings.db_idle_in_transaction_timeout_ms > 0:
+        options.append(f"-c idle_in_transaction_session_timeout={int(settings.db_idle_in_transaction_timeout_ms)}")
+    return " ".join(options)
+
+
+def exempt_from_idle_timeout(db) -> None:
+    """Sunucu taraflı cursor ile akan okuma için idle_in_transaction_session_timeout'u kapatır.
+
+    İstemci yanıtı yavaş okurken bağlantı FETCH'ler arasında "idle in transaction" bekler; sunucu
+    db_idle_in_transaction_timeout_ms sonunda bağlantıyı keser ve dışa aktarım yarıda kalırdı.
+    SET LOCAL yalnız bu transaction'da geçerlidir; bağlantı havuza varsayılan ayarla döner.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SET LOCAL idle_in_transaction_session_timeout = 0"))
+
+
+def engine_options(url: str) -> dict:
+    """URL'e göre create_engine argümanları (profil)."""
+    if url.startswith("sqlite"):
+        if ":memory:" in url or url in ("sqlite://", "sqlite:///"):
+            # In-memory: tek bağlantı kullan ki init_db tabloları tüm isteklerde görünsün (testler için)
+            return {"connect_args": {"check_same_thread": False}, "poolclass": StaticPool}
+        return {
+            "connect_args": {"check_same_thread": False, "timeout": settings.db_sqlite_busy_timeout_ms / 1000},
+            "poolclass": TimedQueuePool,
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "pool_timeout": settings.db_pool_timeout,
+        }
+    if url.startswith("postgresql"):
+        connect_args: dict = {"options": _postgres_options()} if _postgres_options() else {}
+        if "+psycopg" in url.split("://", 1)[0]:
+            # psycopg 3: aynı sorgu 5. çalıştırmada sunucuda hazırlanır (0 = kapalı; pgbouncer transaction modu)
+            connect_args["prepare_threshold"] = 5 if settings.db_prepared_cache_size > 0 else None
+        return {
+            "connect_args": connect_args,
+            "poolclass": TimedQueuePool,
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "pool_timeout": settings.db_pool_timeout,
+            "pool_recycle": settings.db_pool_recycle,
+            "pool_pre_ping": True,
+            "pool_use_lifo": True,
+        }
+    return {}
+
+
+def _install_listeners(engine: Engine, url: str) -> None:
+    stats = getattr(engine.pool, "stats", None)
+    sqlite_pragmas = _sqlite_pragmas(":memory:" not in url) if url.startswith("sqlite") else None
+    psycopg = url.startswith("postgresql") and "+psycopg" in url.split("://", 1)[0]
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        if sqlite_pragmas:
+            cursor = dbapi_connection.cursor()
+            try:
+                for pragma in sqlite_pragmas:
+                    cursor.execute(pragma)
+            finally:
+                cursor.close()
+        elif psycopg and settings.db_prepared_cache_size > 0:
+            dbapi_connection.prepared_max = settings.db_prepared_cache_size
+        if stats is not None:
+            stats.count("connects")
+
+    if stats is None:
+        return
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.count("checkouts")
+        connection_record.info["norya_checkout_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("norya_checkout_at", None)
+        if started is not None:
+            stats.observe_hold(time.perf_counter() - started)
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        stats.count("invalidated")
+
+
+def build_engine(url: str) -> Engine:
+    """Profil ayarlarıyla engine + bağlantı olayları (PRAGMA, prepared cache, ölçüm)."""
+    engine = create_engine(url, **engine_options(url))
+    _install_listeners(engine, url)
+    return engine
+
+
+def pool_snapshot(engine: Engine) -> dict:
+    """Anlık havuz kullanımı + bu worker'ın bekleme/tutma yüzdelikleri."""
+    pool = engine.pool
+    data = {"backend": engine.dialect.name, "pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        data.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+            "timeout_s": pool.timeout(),
+        })
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        data.update(stats.snapshot())
+    return data
@@ -3,14 +3,11 @@ import json
 from urllib.request import urlopen, Request
 from urllib.error import URLError
 
-# Önbellek: IP -> (country_code, city, expires). Basit in-memory cache.
-_geo_cache: dict[str, tuple[str, str | None, float]] = {}
-_CACHE_TTL = 3600.0  # 1 saat
-
+from app.core.shared_cache import shared_cache
 
-def _now() -> float:
-    import time
-    return time.monotonic()
+# Önbellek: IP -> (country_code, city); worker'lar arası paylaşılır (SHARED_CACHE_URL)
+_CACHE_TTL = 3600.0  # 1 saat
+_geo_cache = shared_cache.namespace("geo", ttl=_CACHE_TTL)
 
 
 def get_geo_from_ip(ip: str | None) -> tuple[str | None, str | None]:
@@ -20,12 +17,9 @@ def get_geo_from_ip(ip: str | None) -> tuple[str | None, str | None]:
     """
     if not ip or ip in ("127.0.0.1", "::1", "localhost"):
         return (None, None)
-    now = _now()
-    if ip in _geo_cache:
-        code, city, exp = _geo_cache[ip]
-        if exp > now:
-            return (code, city)
-        del _geo_cache[ip]
+    cached = _geo_cache.get(ip)
+    if cached is not None:
+        return tuple(cached)  # paylaşılan önbellek JSON'dan liste döner
     try:
         req = Request(
             f"http://ip-api.com/json/{ip}?fields=countryCode,city",
@@ -36,7 +30,7 @@ def get_geo_from_ip(ip: str | None) -> tuple[str | None, str | None]:
             code = data.get("countryCode") or None
             city = (data.get("city") or "").strip() or None
             if code or city:
-                _geo_cache[ip] = (code, city, now + _CACHE_TTL)
+                _geo_cache.set(ip, (code, city))
                 return (code, city)
     except (URLError, OSError, ValueError, KeyError):
         pass
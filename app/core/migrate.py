@@ -0,0 +1,388 @@
+"""
+Şema yönetimi: Alembic sürümü kayıtlı; worker açılışında DDL yok, yalnızca sabit süreli sürüm kontrolü.
+
+- `ensure_schema(engine)` (init_db): alembic_version tek satır okunur; SCHEMA_HEAD ile aynıysa hiçbir DDL
+  çalışmaz (açılış süresi şema geçmişinin uzunluğundan bağımsız). Geride ise ve db_migrate_on_startup
+  açıksa migration veritabanı kilidi altında (Postgres advisory lock / SQLite dosya kilidi) bir kez çalışır;
+  kilidi bekleyen diğer worker'lar sürümü yeniden okuyup atlar. Postgres'te migration havuz dışı ayrı bir
+  bağlantıda statement_timeout / idle_in_transaction_session_timeout kapalı çalışır (uzun DDL / doldurma kesilmez).
+- Sürüm tablosu olmayan (eski init_db ile büyümüş ya da boş) veritabanı: init_db şeması 0014'e denk olduğundan
+  0014'e damgalanır, sonra head'e normal yükseltilir. 0015 eksik tabloları (dondurulmuş şema) ve eski ALTER
+  listesini yalnız eksikler için uygular; sonraki revizyonlar yeni tabloları, mevcut tablolardaki indeksleri ve
+  doldurmaları (ör. tenant_daily_stats) çalıştırır. Damgalayıp head'e atlamak bunları atlardı.
+- Sürüm adımı: `python -m app.core.migrate` (Procfile release / Docker CMD) — worker'lardan önce bir kez.
+"""
+import argparse
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.pool import NullPool
+
+from .config import settings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows
+
+log = logging.getLogger(__name__)
+
+# Son Alembic revizyonu; yeni migration eklenince güncellenir (test, migrations/versions ile eşitliği denetler).
+# Başlangıç kontrolü revizyon dosyalarını taramaz, yalnızca bu sabitle karşılaştırır.
+SCHEMA_HEAD = "0018_tenant_daily_stats"
+# Sürümsüz (Alembic öncesi init_db) veritabanlarının denk geldiği revizyon: 0010-0014'ün yaptıkları eski
+# init_db ALTER listesinde de vardı; 0015 bu listeyi ve o günkü tabloları yalnız eksikler için uygular.
+UNVERSIONED_BASE = "0014_analysis_job_cached_tokens"
+
+_ROOT = Path(__file__).resolve().parent.parent.parent
+# Postgres advisory lock anahtarı (int64; "norya-migrate" için sabit)
+_PG_LOCK_KEY = 7_312_650_451
+
+_ADD_COLUMN_RE = re.compile(r"^ALTER TABLE (\w+) ADD COLUMN (\w+) ", re.I)
+
+# Alembic öncesi init_db'nin her açılışta çalıştırdığı ALTER listesi. Artık yalnızca 0015 revizyonunda
+# (sürümsüz veritabanları da 0014'ten oradan geçer), var olmayan sütunlar için bir kez uygulanır.
+_LEGACY_SQLITE_DDL = (
+    "ALTER TABLE user ADD COLUMN email_verified_at DATETIME",
+    "ALTER TABLE analysisrecord ADD COLUMN doctor_notes TEXT",
+    "ALTER TABLE user ADD COLUMN plan TEXT DEFAULT 'free'",
+    "ALTER TABLE user ADD COLUMN extra_credits INTEGER DEFAULT 0",
+    "ALTER TABLE user ADD COLUMN created_at DATETIME",
+    "ALTER TABLE user ADD COLUMN phone TEXT",
+    "ALTER TABLE user ADD COLUMN country TEXT",
+    "ALTER TABLE auditlog ADD COLUMN country TEXT",
+    "ALTER TABLE auditlog ADD COLUMN city TEXT",
+    "ALTER TABLE analysisrecord ADD COLUMN original_filename TEXT",
+    "ALTER TABLE analysisrecord ADD COLUMN original_stored_path TEXT",
+    "ALTER TABLE user ADD COLUMN is_banned BOOLEAN DEFAULT 0",
+    "ALTER TABLE user ADD COLUMN last_login_at DATETIME",
+    "ALTER TABLE user ADD COLUMN account_claimed_at DATETIME",
+    "ALTER TABLE presence ADD COLUMN ip TEXT",
+    "ALTER TABLE presence ADD COLUMN country TEXT",
+    "ALTER TABLE presence ADD COLUMN current_page TEXT",
+    "ALTER TABLE paymentorder ADD COLUMN paytr_transaction_id TEXT",
+    "ALTER TABLE paymentorder ADD COLUMN currency TEXT",
+    "ALTER TABLE paymentorder ADD COLUMN is_processed BOOLEAN DEFAULT 0",
+    "ALTER TABLE paymentorder ADD COLUMN processed_at DATETIME",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_paymentorder_paytr_transaction_id ON paymentorder (paytr_transaction_id)",
+    "ALTER TABLE paymentorder ADD COLUMN coupon_code_used TEXT",
+    "ALTER TABLE analysisrecord ADD COLUMN is_favorite BOOLEAN DEFAULT 0",
+    "ALTER TABLE analysisrecord ADD COLUMN plan_type VARCHAR(16) DEFAULT 'single'",
+    "ALTER TABLE paymentorder ADD COLUMN admin_note TEXT",
+    "ALTER TABLE paymentorder ADD COLUMN invoice_ettn TEXT",
+    "ALTER TABLE paymentorder ADD COLUMN invoice_gib_no TEXT",
+    "ALTER TABLE paymentorder ADD COLUMN paid_at DATETIME",
+    "ALTER TABLE paymentorder ADD COLUMN paytr_payment_amount TEXT",
+    "ALTER TABLE paymentorder ADD COLUMN paytr_status TEXT",
+    "ALTER TABLE paymentorder ADD COLUMN raw_callback_json TEXT",
+    "ALTER TABLE paymentorder ADD COLUMN refunded_at DATETIME",
+    "ALTER TABLE paymentorder ADD COLUMN refund_amount_kurus INTEGER",
+    "ALTER TABLE paymentorder ADD COLUMN customer_email TEXT",
+    "ALTER TABLE analysis_jobs ADD COLUMN prompt_tokens INTEGER",
+    "ALTER TABLE analysis_jobs ADD COLUMN completion_tokens INTEGER",
+    "ALTER TABLE analysis_jobs ADD COLUMN cached_tokens INTEGER",
+    "ALTER TABLE discountcode ADD COLUMN is_active BOOLEAN DEFAULT 1",
+    "ALTER TABLE discountcode ADD COLUMN auto_show_on_checkout BOOLEAN DEFAULT 0",
+    "ALTER TABLE discountcode ADD COLUMN auto_apply BOOLEAN DEFAULT 0",
+    "ALTER TABLE discountcode ADD COLUMN display_label VARCHAR(120)",
+    "ALTER TABLE discountcode ADD COLUMN display_note VARCHAR(256)",
+    "ALTER TABLE discountcode ADD COLUMN campaign_badge VARCHAR(64)",
+    "ALTER TABLE discountcode ADD COLUMN old_price_single_cents INTEGER",
+    "ALTER TABLE discountcode ADD COLUMN new_price_single_cents INTEGER",
+    "ALTER TABLE discountcode ADD COLUMN old_price_monthly_cents INTEGER",
+    "ALTER TABLE discountcode ADD COLUMN new_price_monthly_cents INTEGER",
+    "ALTER TABLE discountcode ADD COLUMN old_price_yearly_cents INTEGER",
+    "ALTER TABLE discountcode ADD COLUMN new_price_yearly_cents INTEGER",
+    "ALTER TABLE paymentorder ADD COLUMN quantity INTEGER DEFAULT 1",
+    "ALTER TABLE analysisrecord ADD COLUMN institution_id INTEGER",
+    "ALTER TABLE auditlog ADD COLUMN institution_id INTEGER",
+    "ALTER TABLE auditlog ADD COLUMN entity_type VARCHAR(64)",
+    "ALTER TABLE auditlog ADD COLUMN entity_id INTEGER",
+    "ALTER TABLE auditlog ADD COLUMN metadata_json TEXT",
+    "ALTER TABLE institutions ADD COLUMN status VARCHAR(32) DEFAULT 'pilot'",
+    "ALTER TABLE institutions ADD COLUMN seat_limit INTEGER DEFAULT 25",
+    "ALTER TABLE institutions ADD COLUMN active_languages VARCHAR(255) DEFAULT 'tr,en'",
+    "ALTER TABLE institutions ADD COLUMN onboarding_completed BOOLEAN DEFAULT 0",
+    "ALTER TABLE institutions ADD COLUMN updated_at DATETIME",
+    # Lead e-posta onayları (KVKK/GDPR)
+    "ALTER TABLE email_leads ADD COLUMN consent_kvkk BOOLEAN DEFAULT 0",
+    "ALTER TABLE email_leads ADD COLUMN consent_gdpr BOOLEAN DEFAULT 0",
+    "ALTER TABLE email_leads ADD COLUMN consent_at DATETIME",
+    # Lead UTM tracking
+    "ALTER TABLE email_leads ADD COLUMN utm_source VARCHAR(128)",
+    "ALTER TABLE email_leads ADD COLUMN utm_medium VARCHAR(128)",
+    "ALTER TABLE email_leads ADD COLUMN utm_campaign VARCHAR(128)",
+    "ALTER TABLE email_leads ADD COLUMN utm_content VARCHAR(128)",
+    "ALTER TABLE email_leads ADD COLUMN utm_term VARCHAR(128)",
+    "ALTER TABLE email_leads ADD COLUMN drip_step INTEGER DEFAULT 0",
+    "ALTER TABLE email_leads ADD COLUMN drip_last_sent_at DATETIME",
+    "ALTER TABLE email_leads ADD COLUMN unsubscribed BOOLEAN DEFAULT 0",
+    # User registration tracking (email verification admin)
+    "CREATE TABLE IF NOT EXISTS userregistration (id INTEGER, email VARCHAR, full_name VARCHAR DEFAULT '', status VARCHAR DEFAULT 'pending', user_id INTEGER, verification_mail_sent_at DATETIME, mail_send_error VARCHAR, source VARCHAR, ip_address VARCHAR, user_agent VARCHAR, created_at DATETIME, verified_at DATETIME, PRIMARY KEY (id))",
+    "CREATE INDEX IF NOT EXISTS ix_userregistration_email ON userregistration (email)",
+    "CREATE INDEX IF NOT EXISTS ix_userregistration_status ON userregistration (status)",
+    "CREATE INDEX IF NOT EXISTS ix_userregistration_user_id ON userregistration (user_id)",
+    "CREATE INDEX IF NOT EXISTS ix_userregistration_created_at ON userregistration (created_at)",
+    # Frontend IP (tarayıcı tarafı, cookie'den)
+    "ALTER TABLE userregistration ADD COLUMN frontend_ip_address VARCHAR",
+    # Multi-tenant fields
+    "ALTER TABLE institutions ADD COLUMN tenant_slug VARCHAR(128)",
+    "ALTER TABLE institutions ADD COLUMN billing_wallet_balance INTEGER DEFAULT 0",
+    "ALTER TABLE institutions ADD COLUMN cost_per_analysis INTEGER DEFAULT 100",
+    "ALTER TABLE institutions ADD COLUMN subdomain VARCHAR(255)",
+    "ALTER TABLE institutions ADD COLUMN wallet_low_threshold INTEGER DEFAULT 20000",
+    "ALTER TABLE institutions ADD COLUMN wallet_last_alert DATETIME",
+    "CREATE TABLE IF NOT EXISTS tenant_wallet_transactions (id INTEGER, institution_id INTEGER, amount_cents INTEGER, transaction_type VARCHAR(32), description VARCHAR(512), created_at DATETIME, PRIMARY KEY (id), FOREIGN KEY(institution_id) REFERENCES institutions(id))",
+    "CREATE INDEX IF NOT EXISTS ix_tenant_wallet_transactions_institution_id ON tenant_wallet_transactions (institution_id)",
+    # Tenant customization fields
+    "ALTER TABLE institutions ADD COLUMN logo_url VARCHAR(512)",
+    "ALTER TABLE institutions ADD COLUMN primary_color VARCHAR(16)",
+    "ALTER TABLE institutions ADD COLUMN secondary_color VARCHAR(16)",
+    "ALTER TABLE institutions ADD COLUMN report_header_text VARCHAR(256)",
+    "ALTER TABLE institutions ADD COLUMN report_footer_text VARCHAR(256)",
+    "ALTER TABLE institutions ADD COLUMN custom_css TEXT",
+    # Tenant rate limiting
+    "ALTER TABLE institutions ADD COLUMN daily_analysis_limit INTEGER",
+    "ALTER TABLE institutions ADD COLUMN hourly_analysis_limit INTEGER",
+    # Tenant alert settings
+    "ALTER TABLE institutions ADD COLUMN alert_email_enabled BOOLEAN DEFAULT 1",
+    "ALTER TABLE institutions ADD COLUMN alert_sms_enabled BOOLEAN DEFAULT 0",
+    "ALTER TABLE institutions ADD COLUMN alert_phone VARCHAR(64)",
+    # Tenant auto-renew (recurring payment)
+    "ALTER TABLE institutions ADD COLUMN auto_renew_enabled BOOLEAN DEFAULT 0",
+    "ALTER TABLE institutions ADD COLUMN auto_renew_amount_cents INTEGER DEFAULT 100000",
+    "ALTER TABLE institutions ADD COLUMN auto_renew_threshold_cents INTEGER DEFAULT 20000",
+    "ALTER TABLE institutions ADD COLUMN auto_renew_interval_days INTEGER DEFAULT 30",
+    "ALTER TABLE institutions ADD COLUMN auto_renew_last_at DATETIME",
+    "ALTER TABLE institutions ADD COLUMN paytr_utoken VARCHAR(256)",
+    "ALTER TABLE institutions ADD COLUMN paytr_ctoken VARCHAR(256)",
+    # Tenant user fields
+    "ALTER TABLE user ADD COLUMN institution_id INTEGER",
+    "ALTER TABLE user ADD COLUMN tenant_role VARCHAR(32) DEFAULT 'member'",
+    "ALTER TABLE user ADD COLUMN tenant_is_active BOOLEAN DEFAULT 1",
+    # Tenant audit log
+    "CREATE TABLE IF NOT EXISTS tenant_audit_logs (id INTEGER, institution_id INTEGER, user_id INTEGER, action VARCHAR(64), entity_type VARCHAR(64), entity_id INTEGER, ip_address VARCHAR(64), user_agent VARCHAR(512), detail VARCHAR(1024), metadata_json TEXT, created_at DATETIME, PRIMARY KEY (id), FOREIGN KEY(institution_id) REFERENCES institutions(id), FOREIGN KEY(user_id) REFERENCES user(id))",
+    "CREATE INDEX IF NOT EXISTS ix_tenant_audit_logs_institution_id ON tenant_audit_logs (institution_id)",
+    "CREATE INDEX IF NOT EXISTS ix_tenant_audit_logs_user_id ON tenant_audit_logs (user_id)",
+    "CREATE INDEX IF NOT EXISTS ix_tenant_audit_logs_action ON tenant_audit_logs (action)",
+    # Tenant API keys
+    "CREATE TABLE IF NOT EXISTS tenant_api_keys (id INTEGER, institution_id INTEGER, name VARCHAR(128), key_hash VARCHAR(128), key_prefix VARCHAR(16), is_active BOOLEAN DEFAULT 1, last_used_at DATETIME, expires_at DATETIME, created_by_user_id INTEGER, created_at DATETIME, updated_at DATETIME, PRIMARY KEY (id), FOREIGN KEY(institution_id) REFERENCES institutions(id), FOREIGN KEY(created_by_user_id) REFERENCES user(id))",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_tenant_api_keys_key_hash ON tenant_api_keys (key_hash)",
+    "CREATE INDEX IF NOT EXISTS ix_tenant_api_keys_institution_id ON tenant_api_keys (institution_id)",
+    # Push token pasifleştirme (Expo DeviceNotRegistered)
+    "ALTER TABLE push_subscriptions ADD COLUMN is_active BOOLEAN DEFAULT 1",
+    "ALTER TABLE push_subscriptions ADD COLUMN deactivated_at DATETIME",
+    "ALTER TABLE push_subscriptions ADD COLUMN last_error VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS ix_push_subscriptions_is_active ON push_subscriptions (is_active)",
+    # Mobil delta-sync
+    "ALTER TABLE analysisrecord ADD COLUMN updated_at DATETIME",
+    "UPDATE analysisrecord SET updated_at = created_at WHERE updated_at IS NULL",
+    "CREATE INDEX IF NOT EXISTS ix_analysisrecord_user_updated ON analysisrecord (user_id, updated_at, id)",
+    # Tam metin arama: kayıt dili (kök bulma yapılandırması)
+    "ALTER TABLE analysisrecord ADD COLUMN lang VARCHAR(8)",
+    # Keyset sayfalama bileşik indeksleri
+    "CREATE INDEX IF NOT EXISTS ix_analysisrecord_user_created ON analysisrecord (user_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_analysisrecord_created_id ON analysisrecord (created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_user_inst_id ON user (institution_id, id)",
+    "CREATE INDEX IF NOT EXISTS ix_auditlog_inst_created ON auditlog (institution_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_enterprise_cases_inst_created ON enterprise_cases (institution_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_tenant_audit_logs_inst_created ON tenant_audit_logs (institution_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_tenant_wallet_tx_inst_created ON tenant_wallet_transactions (institution_id, created_at, id)",)
+
+_LEGACY_POSTGRES_DDL = (
+    "ALTER TABLE analysis_jobs ADD COLUMN IF NOT EXISTS prompt_tokens INTEGER",
+    "ALTER TABLE analysis_jobs ADD COLUMN IF NOT EXISTS completion_tokens INTEGER",
+    "ALTER TABLE analysis_jobs ADD COLUMN IF NOT EXISTS cached_tokens INTEGER",
+    "ALTER TABLE push_subscriptions ADD COLUMN IF NOT EXISTS is_active BOOLEAN DEFAULT TRUE",
+    "ALTER TABLE push_subscriptions ADD COLUMN IF NOT EXISTS deactivated_at TIMESTAMP",
+    "ALTER TABLE push_subscriptions ADD COLUMN IF NOT EXISTS last_error VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS ix_push_subscriptions_is_active ON push_subscriptions (is_active)",
+    "ALTER TABLE analysisrecord ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP",
+    "UPDATE analysisrecord SET updated_at = created_at WHERE updated_at IS NULL",
+    "CREATE INDEX IF NOT EXISTS ix_analysisrecord_user_updated ON analysisrecord (user_id, updated_at, id)",
+    "ALTER TABLE analysisrecord ADD COLUMN IF NOT EXISTS lang VARCHAR(8)",
+    "CREATE INDEX IF NOT EXISTS ix_analysisrecord_user_created ON analysisrecord (user_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_analysisrecord_created_id ON analysisrecord (created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_user_inst_id ON \"user\" (institution_id, id)",
+    "CREATE INDEX IF NOT EXISTS ix_auditlog_inst_created ON auditlog (institution_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_enterprise_cases_inst_created ON enterprise_cases (institution_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_tenant_audit_logs_inst_created ON tenant_audit_logs (institution_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_tenant_wallet_tx_inst_created ON tenant_wallet_transactions (institution_id, created_at, id)",)
+
+
+def current_revision(bind: Engine | Connection) -> str | None:
+    """alembic_version'daki revizyon (tablo yoksa None). Tek satırlık sorgu."""
+    try:
+        if isinstance(bind, Engine):
+            with bind.connect() as conn:
+                return conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+        return bind.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except Exception:
+        return None
+
+
+def apply_legacy_ddl(conn: Connection) -> int:
+    """Eski init_db ALTER listesi; var olan sütunlar / olmayan tablolar atlanır. Çalışan ifade sayısını döner."""
+    dialect = conn.dialect.name
+    statements = _LEGACY_SQLITE_DDL if dialect == "sqlite" else _LEGACY_POSTGRES_DDL if dialect == "postgresql" else ()
+    insp = inspect(conn)
+    columns: dict[str, set[str] | None] = {}
+    applied = 0
+    for stmt in statements:
+        m = _ADD_COLUMN_RE.match(stmt)
+        if m and "IF NOT EXISTS" not in stmt:
+            table, column = m.group(1), m.group(2)
+            if table not in columns:
+                columns[table] = {c["name"] for c in insp.get_columns(table)} if insp.has_table(table) else None
+            if columns[table] is None or column in columns[table]:
+                continue
+            columns[table].add(column)
+        try:
+            if dialect == "postgresql":
+                # Hata transaction'ı bozmasın: her ifade kendi savepoint'inde
+                with conn.begin_nested():
+                    conn.execute(text(stmt))
+            else:
+                conn.execute(text(stmt))
+            applied += 1
+        except Exception as e:
+            log.warning("Legacy DDL skipped (%s): %s", stmt[:80], e)
+    return applied
+
+
+def _alembic_config(conn: Connection):
+    from alembic.config import Config
+
+    cfg = Config(str(_ROOT / "alembic.ini"))
+    cfg.set_main_option("script_location", str(_ROOT / "migrations"))
+    cfg.attributes["connection"] = conn
+    cfg.attributes["configure_logger"] = False  # uygulamanın logging yapılandırmasını ezme
+    return cfg
+
+
+def disable_session_timeouts(conn: Connection) -> None:
+    """Migration oturumu: uygulama profilinin statement / idle_in_transaction zaman aşımları uzun DDL'i kesmesin."""
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SET statement_timeout = 0"))
+        conn.execute(text("SET idle_in_transaction_session_timeout = 0"))
+        conn.commit()
+
+
+@contextmanager
+def _migration_connection(engine: Engine):
+    """Havuz dışı, zaman aşımsız bağlantı (Postgres); oturum ayarı havuza dönen bağlantılara sızmaz."""
+    if engine.dialect.name != "postgresql":
+        with engine.connect() as conn:
+            yield conn
+        return
+    dedicated = create_engine(engine.url, poolclass=NullPool)
+    try:
+        with dedicated.connect() as conn:
+            disable_session_timeouts(conn)
+            yield conn
+    finally:
+        dedicated.dispose()
+
+
+@contextmanager
+def _migration_lock(engine: Engine):
+    """Tek migration: Postgres'te oturum advisory lock'u, SQLite'ta dosya kilidi. Kilitli bağlantıyı verir."""
+    with _migration_connection(engine) as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": _PG_LOCK_KEY})
+            conn.commit()
+            try:
+                yield conn
+            finally:
+                conn.rollback()
+                conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _PG_LOCK_KEY})
+                conn.commit()
+            return
+        fd = None
+        if fcntl is not None:
+            try:
+                lock_path = os.environ.get("NORYA_INIT_DB_LOCK", "/tmp/norya_init_db.lock")
+                fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o600)
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            except OSError:
+                if fd is not None:
+                    os.close(fd)
+                fd = None
+        try:
+            yield conn
+        finally:
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+
+def migrate(engine: Engine) -> str:
+    """Bekleyen revizyonları kilit altında bir kez uygula; sonuçtaki revizyonu döner."""
+    from alembic import command
+
+    t0 = time.perf_counter()
+    with _migration_lock(engine) as conn:
+        before = current_revision(conn)
+        conn.rollback()
+        if before == SCHEMA_HEAD:
+            return before  # kilidi beklerken başka worker / sürüm adımı tamamladı
+        cfg = _alembic_config(conn)
+        with conn.begin():
+            if before is None:
+                # Sürümsüz veritabanı: init_db şeması 0014'e denk; 0015+ (tablolar, indeksler, doldurmalar) çalışır
+                command.stamp(cfg, UNVERSIONED_BASE)
+            command.upgrade(cfg, "head")
+        after = current_revision(conn)
+    log.info("Schema migrated %s -> %s in %.0f ms", before or "(unversioned)", after, (time.perf_counter() - t0) * 1000)
+    return after
+
+
+def ensure_schema(engine: Engine) -> bool:
+    """Worker açılışı: sürüm güncelse hiçbir şey yapma. Migration çalıştıysa True."""
+    from app.services.search import detect_search_index
+
+    revision = current_revision(engine)
+    if revision == SCHEMA_HEAD:
+        # Arama yolu (FTS / LIKE) seçimi için yalnızca katalog okunur
+        detect_search_index(engine)
+        return False
+    if not settings.db_migrate_on_startup:
+        log.error(
+            "Schema revision %s != %s; run `python -m app.core.migrate` (DB_MIGRATE_ON_STARTUP=false)",
+            revision or "(unversioned)", SCHEMA_HEAD,
+        )
+        detect_search_index(engine)
+        return False
+    migrate(engine)
+    detect_search_index(engine)
+    return True
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.core.migrate", description="Norya şema migration adımı")
+    parser.add_argument("action", nargs="?", default="upgrade", choices=("upgrade", "current", "check"))
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+
+    from .database import engine
+
+    revision = current_revision(engine)
+    if args.action == "current":
+        print(revision or "(unversioned)")
+        return 0
+    if args.action == "check":
+        # Sürüm adımı sonrası doğrulama / CI: head değilse 1
+        print(f"{revision or '(unversioned)'} (head {SCHEMA_HEAD})")
+        return 0 if revision == SCHEMA_HEAD else 1
+    print(migrate(engine))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,213 @@
+"""Keyset (cursor) sayfalama ve yaklaşık kayıt sayıları.
+
+OFFSET/LIMIT derin sayfalarda önceki tüm satırları okuyup atar; burada sayfa sınırı
+(created_at, id) çiftiyle taşınır ve (…, created_at, id) bileşik indeksiyle her sayfa
+ilk sayfa kadar ucuzdur.
+
+- Cursor opak: base64url(JSON {"t": zaman, "i": id, "d": "n"|"p"}). "n" daha eski kayıtlara
+  (sonraki sayfa), "p" daha yeni kayıtlara (önceki sayfa) gider. Zaman sütunu NULL olabilen
+  tablolar (user) yalnızca id ile sayfalanır (ts_col=None; cursor'da "t" yok).
+- JSON liste uç noktalarının gövdesi eskisi gibi düz liste kalır; cursor ve tahmini toplam
+  `Page.headers()` ile X-Next-Cursor / X-Prev-Cursor / X-Total-Estimate başlıklarında döner.
+  Eski istemciler için `offset` hâlâ kabul edilir (cursor verilmediyse; derin sayfada yavaş).
+- Filtresiz toplamlar için `approximate_count`: Postgres pg_class.reltuples, SQLite sqlite_stat1
+  (ANALYZE yoksa max(rowid)); küçük tablolarda tam COUNT(*) yapılır.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, literal, or_, select, text
+from sqlmodel import Session
+
+DIR_NEXT = "n"
+DIR_PREV = "p"
+
+# Tahmin bu değerin altındaysa tam sayım yapılır (indeks taraması ucuz)
+EXACT_COUNT_THRESHOLD = 10_000
+
+
+def _to_naive_utc(dt: datetime) -> datetime:
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def encode_cursor(ts: datetime | None, rec_id: int, direction: str = DIR_NEXT) -> str:
+    data = {"i": rec_id, "d": direction}
+    if ts is not None:
+        data["t"] = ts.isoformat()
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime | None, int, str]:
+    """Cursor'u (zaman | None, id, yön) olarak çözer; bozuksa 400."""
+    try:
+        pad = "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(cursor + pad))
+        ts = data.get("t")
+        direction = data.get("d", DIR_NEXT)
+        if direction not in (DIR_NEXT, DIR_PREV):
+            raise ValueError(direction)
+        return (_to_naive_utc(datetime.fromisoformat(ts)) if ts is not None else None), int(data["i"]), direction
+    except Exception:
+        raise HTTPException(status_code=400, detail="Geçersiz cursor.")
+
+
+@dataclass
+class Page:
+    items: list
+    limit: int
+    has_more: bool = False
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+    total_estimate: int | None = None
+
+    def headers(self) -> dict[str, str]:
+        """Gövdesi düz liste olan uç noktalar için sayfalama bilgisi (X-Next-Cursor vb.)."""
+        h = {}
+        if self.next_cursor:
+            h["X-Next-Cursor"] = self.next_cursor
+        if self.prev_cursor:
+            h["X-Prev-Cursor"] = self.prev_cursor
+        if self.total_estimate is not None:
+            h["X-Total-Estimate"] = str(self.total_estimate)
+        return h
+
+
+def _default_key(ts_col, id_col) -> Callable[[Any], tuple[datetime | None, int]]:
+    id_name = id_col.key
+    if ts_col is None:
+        return lambda row: (None, getattr(row, id_name))
+    ts_name = ts_col.key
+    return lambda row: (getattr(row, ts_name), getattr(row, id_name))
+
+
+def _after(ts_col, id_col, ts, rec_id, older: bool):
+    if ts_col is None or ts is None:
+        return id_col < rec_id if older else id_col > rec_id
+    if older:
+        return or_(ts_col < ts, and_(ts_col == ts, id_col < rec_id))
+    return or_(ts_col > ts, and_(ts_col == ts, id_col > rec_id))
+
+
+def keyset_page(
+    db: Session,
+    stmt,
+    *,
+    ts_col=None,
+    id_col,
+    cursor: str | None = None,
+    limit: int = 50,
+    offset: int = 0,
+    key: Callable[[Any], tuple[datetime | None, int]] | None = None,
+) -> Page:
+    """`stmt`'i (filtreleri uygulanmış, sırasız SELECT) (ts_col, id_col) azalan sırada sayfalar.
+
+    ts_col=None ise yalnızca id ile. key: satırdan (zaman, id) çıkarır; varsayılan sütun adlarıyla getattr.
+    ts_col NOT NULL olmalı; NULL zamanlı satırlar keyset karşılaştırmasından düşer.
+    offset: eski offset parametreli istemciler için; yalnızca cursor yokken uygulanır, dönen cursor'lar
+    yine keyset'tir (istemci sonraki sayfada cursor'a geçebilir).
+    """
+    key = key or _default_key(ts_col, id_col)
+    order_cols = [id_col] if ts_col is None else [ts_col, id_col]
+    direction = DIR_NEXT
+    if cursor:
+        ts, rec_id, direction = decode_cursor(cursor)
+        stmt = stmt.where(_after(ts_col, id_col, ts, rec_id, older=direction == DIR_NEXT))
+    elif offset > 0:
+        stmt = stmt.offset(offset)
+    if direction == DIR_NEXT:
+        stmt = stmt.order_by(*[c.desc() for c in order_cols])
+    else:
+        stmt = stmt.order_by(*[c.asc() for c in order_cols])
+    rows = list(db.exec(stmt.limit(limit + 1)).all())
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == DIR_PREV:
+        rows.reverse()
+    page = Page(items=rows, limit=limit)
+    if not rows:
+        return page
+    first, last = key(rows[0]), key(rows[-1])
+    if direction == DIR_NEXT:
+        page.has_more = more
+        page.next_cursor = encode_cursor(*last, DIR_NEXT) if more else None
+        page.prev_cursor = encode_cursor(*first, DIR_PREV) if (cursor or offset > 0) else None
+    else:
+        # Geri giderken: daha yeni kayıt varsa prev, geldiğimiz yön (eski kayıtlar) her zaman var
+        page.has_more = True
+        page.next_cursor = encode_cursor(*last, DIR_NEXT)
+        page.prev_cursor = encode_cursor(*first, DIR_PREV) if more else None
+    return page
+
+
+def approximate_count(db: Session, model) -> int:
+    """Tablonun yaklaşık satır sayısı (filtresiz listeler için); küçük tablolarda tam sayım."""
+    table = model.__tablename__ if hasattr(model, "__tablename__") else str(model)
+    bind = db.get_bind()
+    estimate = None
+    try:
+        if bind.dialect.name == "postgresql":
+            row = db.execute(
+                text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(quote_ident(:t))"), {"t": table}
+            ).first()
+            # -1: hiç ANALYZE/VACUUM edilmemiş
+            if row and row[0] is not None and row[0] >= 0:
+                estimate = int(row[0])
+        elif bind.dialect.name == "sqlite":
+            has_stat = db.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type='table' AND name='sqlite_stat1'")
+            ).first()
+            if has_stat:
+                row = db.execute(text("SELECT stat FROM sqlite_stat1 WHERE tbl = :t LIMIT 1"), {"t": table}).first()
+                if row and row[0]:
+                    estimate = int(str(row[0]).split()[0])
+            if estimate is None:
+                # rowid B-ağacının ucu: O(log n); silinen kayıtlar kadar fazla sayar
+                row = db.execute(text(f'SELECT max(rowid) FROM "{table}"')).first()
+                estimate = int(row[0] or 0) if row else None
+    except Exception:
+        db.rollback()
+        estimate = None
+    if estimate is None or estimate < EXACT_COUNT_THRESHOLD:
+        return int(db.execute(select(func.count()).select_from(text(f'"{table}"'))).scalar() or 0)
+    return estimate
+
+
+def capped_count(db: Session, stmt, cap: int = EXACT_COUNT_THRESHOLD) -> tuple[int, bool]:
+    """Filtreli `stmt` için sınırlı sayım: en fazla cap+1 satır taranır; (sayı, cap aşıldı mı) döner.
+
+    Büyük kiracılarda tam COUNT(*) her sayfa görüntülemesinde tüm eşleşmeleri okur; gösterim için "10000+" yeterli.
+    """
+    sub = stmt.with_only_columns(literal(1)).order_by(None).limit(cap + 1).subquery()
+    n = int(db.execute(select(func.count()).select_from(sub)).scalar() or 0)
+    return min(n, cap), n > cap
+
+
+def page_links(request, page: Page, page_no: int | None = None) -> dict[str, str | None]:
+    """HTML listeleri için önceki/sonraki bağlantıları (mevcut filtreler korunur).
+
+    page_no verilirse yalnızca gösterim amaçlı "page" parametresi de ±1 taşınır.
+    """
+    base = request.url.remove_query_params(["cursor", "page"])
+
+    def _url(cur: str | None, n: int | None) -> str | None:
+        if not cur:
+            return None
+        params = {"cursor": cur}
+        if n is not None:
+            params["page"] = max(n, 1)
+        url = base.include_query_params(**params)
+        return f"{url.path}?{url.query}"
+
+    return {
+        "prev_url": _url(page.prev_cursor, page_no - 1 if page_no else None),
+        "next_url": _url(page.next_cursor, page_no + 1 if page_no else None),
+    }
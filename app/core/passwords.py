@@ -0,0 +1,97 @@
+"""
+Şifre KDF servisi: bcrypt işi istek thread'inde / event loop'ta değil, ayrı sınırlı bir havuzda.
+
+- Havuz kdf_workers thread (bcrypt GIL'i bırakır; thread yeterli). Aynı anda en fazla
+  kdf_workers + kdf_queue_max iş kabul edilir; fazlası beklemeden KdfBusy → 429 (Retry-After).
+- async handler'lar (login, register) `await password_hasher.verify_async(...)` ile loop'u bloklamaz;
+  sync handler'lar `password_hasher.verify(...)` ile aynı sınırı paylaşır.
+- Giriş yapılamayan (şifresiz) hesaplar havuza hiç girmez.
+- bcrypt_rounds değişince `verify_and_upgrade` başarılı girişte hash'i yeni maliyetle yeniden yazar.
+  Hash değiştiği için o kullanıcının diğer oturumları (ver damgası) bir kez yeniden giriş ister.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.runtime import after_fork
+from app.core.security import has_usable_password, hash_password, password_needs_rehash, verify_password
+from app.models import User
+
+log = logging.getLogger(__name__)
+
+
+class KdfBusy(Exception):
+    """KDF havuzu ve kuyruğu dolu; istemci kısa süre sonra yeniden denemeli."""
+
+
+class PasswordHasher:
+    def __init__(self, workers: int, queue_max: int):
+        self.workers = max(1, workers)
+        self.capacity = self.workers + max(0, queue_max)
+        self.stats = {"submitted": 0, "rejected": 0, "in_flight": 0}
+        self.reset()
+
+    def reset(self) -> None:
+        """Havuz ve sayaçları baştan kurar (fork sonrası worker'da master'ın thread'leri yoktur)."""
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="kdf")
+        self._lock = threading.Lock()
+        self.stats["in_flight"] = 0
+
+    def _release(self, _future: Future) -> None:
+        with self._lock:
+            self.stats["in_flight"] -= 1
+        self._slots.release()
+
+    def submit(self, fn, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.stats["rejected"] += 1
+            log.warning("KDF pool saturated (capacity=%d); rejecting password operation", self.capacity)
+            raise KdfBusy()
+        with self._lock:
+            self.stats["submitted"] += 1
+            self.stats["in_flight"] += 1
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(self._release)
+        return future
+
+    def hash(self, password: str) -> str:
+        return self.submit(hash_password, password).result()
+
+    def verify(self, password: str, hashed: str) -> bool:
+        if not has_usable_password(hashed):
+            return False
+        return self.submit(verify_password, password, hashed).result()
+
+    async def hash_async(self, password: str) -> str:
+        return await asyncio.wrap_future(self.submit(hash_password, password))
+
+    async def verify_async(self, password: str, hashed: str) -> bool:
+        if not has_usable_password(hashed):
+            return False
+        return await asyncio.wrap_future(self.submit(verify_password, password, hashed))
+
+
+password_hasher = PasswordHasher(settings.kdf_workers, settings.kdf_queue_max)
+after_fork(password_hasher.reset)
+
+
+async def verify_and_upgrade(db: Session, user: User, password: str) -> bool:
+    """Şifreyi doğrula; maliyet değiştiyse hash'i yeni bcrypt_rounds ile yenile (giriş yolunda)."""
+    if not await password_hasher.verify_async(password, user.hashed_password):
+        return False
+    if password_needs_rehash(user.hashed_password):
+        try:
+            user.hashed_password = await password_hasher.hash_async(password)
+            db.add(user)
+            db.commit()
+            db.refresh(user)
+        except KdfBusy:
+            # Giriş başarılı; yükseltme sonraki girişe kalır
+            pass
+    return True
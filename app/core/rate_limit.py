@@ -1,10 +1,115 @@
-"""IP bazlı rate limiting (SlowAPI); proxy (X-Forwarded-For) destekli."""
+"""IP bazlı rate limiting (SlowAPI); proxy (X-Forwarded-For) destekli.
+
+Sayaçlar worker'lar arasında paylaşılır: redis'li paylaşılan önbellekte Redis, yerel SQLite paylaşılan
+önbellekte (gunicorn.conf.py çok worker'da bunu kendisi seçer) aynı dosyadaki rate_limit tablosu
+(norya+sqlite:// deposu). Yalnızca tek worker / paylaşılan önbellek yokken worker başına bellek kullanılır.
+"""
+import os
+import sqlite3
+import time
+
+from limits.storage import Storage
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
+from app.core.config import settings
+
+
+class SqliteStorage(Storage):
+    """limits deposu: sabit pencere sayaçları SQLite dosyasında; bağlantı süreç (pid) başına açılır."""
+
+    STORAGE_SCHEME = ["norya+sqlite"]
+    _PURGE_EVERY = 500
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.path = uri.split(":///", 1)[1]
+        self._conn: sqlite3.Connection | None = None
+        self._pid = 0
+        self._writes = 0
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self) -> sqlite3.Connection:
+        # Master'dan (preload) kalan handle worker'da kullanılmaz, yalnızca bırakılır
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit (key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def incr(self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1) -> int:
+        now = time.time()
+        with self.lock:
+            conn = self._connection()
+            # Tek ifade: sayaç worker'lar arası atomik artar, süresi dolan pencere sıfırdan başlar
+            row = conn.execute(
+                """
+                INSERT INTO rate_limit (key, value, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                  value = CASE WHEN expires_at <= ? THEN excluded.value ELSE value + excluded.value END,
+                  expires_at = CASE WHEN expires_at <= ? OR ? THEN excluded.expires_at ELSE expires_at END
+                RETURNING value
+                """,
+                (key, amount, now + expiry, now, now, int(elastic_expiry)),
+            ).fetchone()
+            self._writes += 1
+            if self._writes % self._PURGE_EVERY == 0:
+                conn.execute("DELETE FROM rate_limit WHERE expires_at <= ?", (now,))
+        return int(row[0])
+
+    def get(self, key: str) -> int:
+        with self.lock:
+            row = self._connection().execute(
+                "SELECT value FROM rate_limit WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return int(row[0]) if row else 0
+
+    def get_expiry(self, key: str) -> int:
+        now = time.time()
+        with self.lock:
+            row = self._connection().execute(
+                "SELECT expires_at FROM rate_limit WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        return int(row[0] if row else now)
+
+    def check(self) -> bool:
+        try:
+            with self.lock:
+                self._connection().execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int | None:
+        with self.lock:
+            return self._connection().execute("DELETE FROM rate_limit").rowcount
+
+    def clear(self, key: str) -> None:
+        with self.lock:
+            self._connection().execute("DELETE FROM rate_limit WHERE key = ?", (key,))
+
+
+def _storage_uri() -> str:
+    """Sayaç deposu: açık ayar > redis'li paylaşılan önbellek > SQLite paylaşılan önbellek dosyası > worker başına bellek."""
+    if settings.rate_limit_storage_uri:
+        return settings.rate_limit_storage_uri
+    if settings.shared_cache_url.startswith(("redis://", "rediss://")):
+        return settings.shared_cache_url
+    if settings.shared_cache_url.startswith("sqlite:///"):
+        return "norya+" + settings.shared_cache_url
+    return "memory://"
+
 
-# Varsayılan global limit: IP başına 60 istek / dakika.
+# Varsayılan global limit: IP başına dakikada rate_limit_per_minute (60) istek.
 limiter = Limiter(
     key_func=get_remote_address,
-    default_limits=["60/minute"],
+    default_limits=[f"{settings.rate_limit_per_minute}/minute"],
+    storage_uri=_storage_uri(),
 )
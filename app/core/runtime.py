@@ -0,0 +1,35 @@
+"""
+Çok süreçli (gunicorn --preload) çalışma: fork sonrası worker başına yeniden açılacak kaynaklar.
+
+Uygulama master süreçte bir kez import edilir (i18n / blog verisi copy-on-write paylaşılır); worker'lar
+fork ile doğar. Master'da oluşmuş bağlantı havuzları, SQLite handle'ları, thread havuzları ve süreç
+kimliğine bağlı değerler worker'da kullanılmamalı. Modüller sıfırlama fonksiyonunu `@after_fork` ile
+kaydeder; gunicorn.conf.py `post_fork` kancasında `reinit_after_fork()` çağırır.
+
+Yalnızca stdlib: gunicorn.conf.py uygulama ayarlarını yüklemeden önce de import edebilir.
+"""
+import logging
+import os
+from typing import Callable
+
+log = logging.getLogger(__name__)
+
+_hooks: list[Callable[[], None]] = []
+
+
+def after_fork(fn: Callable[[], None]) -> Callable[[], None]:
+    """Worker fork'undan sonra çağrılacak sıfırlama fonksiyonunu kaydeder (dekoratör)."""
+    _hooks.append(fn)
+    return fn
+
+
+def reinit_after_fork() -> int:
+    """Kayıtlı sıfırlamaları sırayla çalıştırır; biri hata verirse diğerleri yine çalışır. Çalışan sayısını döner."""
+    done = 0
+    for fn in list(_hooks):
+        try:
+            fn()
+            done += 1
+        except Exception:
+            log.exception("after_fork hook %s failed in pid %d", getattr(fn, "__qualname__", fn), os.getpid())
+    return done
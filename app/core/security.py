@@ -1,5 +1,6 @@
 import hashlib
 import hmac
+import secrets
 from datetime import datetime, timedelta
 
 import bcrypt
@@ -10,14 +11,38 @@ from .config import settings
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 gün
 MAX_BCRYPT_BYTES = 72  # bcrypt limiti
+# Giriş yapılamayan hesaplar (anonim / misafir): bcrypt çıktısı asla "!" ile başlamaz
+UNUSABLE_PASSWORD_PREFIX = "!"
 
 
 def hash_password(password: str) -> str:
+    """Senkron bcrypt; istek yolunda app.core.passwords.password_hasher üzerinden çağrılır."""
     p = password.encode("utf-8")[:MAX_BCRYPT_BYTES]
-    return bcrypt.hashpw(p, bcrypt.gensalt()).decode("utf-8")
+    return bcrypt.hashpw(p, bcrypt.gensalt(rounds=settings.bcrypt_rounds)).decode("utf-8")
+
+
+def unusable_password() -> str:
+    """Anonim / misafir hesaplar için KDF'siz, hiçbir şifreyle eşleşmeyen değer (benzersiz: auth sürüm damgası için)."""
+    return UNUSABLE_PASSWORD_PREFIX + secrets.token_hex(16)
+
+
+def has_usable_password(hashed: str | None) -> bool:
+    return bool(hashed) and not hashed.startswith(UNUSABLE_PASSWORD_PREFIX)
+
+
+def password_needs_rehash(hashed: str | None) -> bool:
+    """bcrypt maliyeti ayardakinden farklı mı ($2b$<rounds>$...)."""
+    if not has_usable_password(hashed):
+        return False
+    try:
+        return int(hashed.split("$")[2]) != settings.bcrypt_rounds
+    except (IndexError, ValueError):
+        return False
 
 
 def verify_password(plain: str, hashed: str) -> bool:
+    if not has_usable_password(hashed):
+        return False
     p = plain.encode("utf-8")[:MAX_BCRYPT_BYTES]
     return bcrypt.checkpw(p, hashed.encode("utf-8"))
 
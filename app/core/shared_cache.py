@@ -0,0 +1,270 @@
+"""
+Worker'lar arası paylaşılan önbellek arayüzü (TTL'li anahtar/değer + pencere sayacı).
+
+Arka uç SHARED_CACHE_URL ile seçilir:
+- boş / memory://   süreç içi sözlük (tek worker, testler)
+- sqlite:///yol     aynı makinedeki tüm worker'ların paylaştığı dosya (WAL); gunicorn.conf.py çok worker'da
+                    ayarlı değilse bunu kendisi seçer
+- redis://...       birden çok makine; `redis` paketi kuruluysa
+
+Taşınan süreç-yerel önbellekler: PDF çıktı önbelleği, IP → ülke/şehir, saatlik analiz limiti, EUR kurları,
+okuma-yazma yapışkanlığı (app.core.database, kullanıcı başına). SlowAPI rate limit sayaçları da aynı arka uca
+gider (app.core.rate_limit; SQLite'ta aynı dosyada ayrı tablo).
+Bilerek worker başına kalanlar: kimlik anlık görüntüleri (kısa TTL, app.api.principal), devre kesiciler
+(worker kendi upstream gözlemine göre karar verir), blog / i18n lru_cache'leri (değişmeyen veri; preload
+ile paylaşılır). AI yanıt önbelleği zaten SQLite dosyasında.
+
+Değerler SQLite / Redis'e JSON olarak yazılır (pickle değil: önbellek dosyasına ya da Redis'e yazabilen biri
+worker'larda kod çalıştıramaz). bytes base64 ile taşınır; tuple liste olarak döner. JSON'a çevrilemeyen değer
+yazılmaz (uyarı loglanır), çözülemeyen kayıt (ör. eski pickle) kaçak sayılır.
+"""
+import base64
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any
+
+from app.core.config import settings
+from app.core.runtime import after_fork
+
+log = logging.getLogger(__name__)
+
+_BYTES_KEY = "__b64__"
+
+
+def _encode_default(value: Any) -> Any:
+    if isinstance(value, (bytes, bytearray)):
+        return {_BYTES_KEY: base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"shared cache value is not JSON-serializable: {type(value).__name__}")
+
+
+def _decode_hook(obj: dict) -> Any:
+    if len(obj) == 1 and _BYTES_KEY in obj:
+        return base64.b64decode(obj[_BYTES_KEY])
+    return obj
+
+
+def dumps(value: Any) -> str:
+    return json.dumps(value, default=_encode_default, ensure_ascii=False, separators=(",", ":"))
+
+
+def loads(raw: str | bytes) -> Any | None:
+    try:
+        return json.loads(raw, object_hook=_decode_hook)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self, max_entries: int = 10000):
+        self._lock = threading.Lock()
+        self._items: dict[str, tuple[float, Any]] = {}
+        self.max_entries = max_entries
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[0] <= time.time():
+                del self._items[key]
+                return None
+            return item[1]
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            if len(self._items) >= self.max_entries:
+                for k in [k for k, (exp, _) in self._items.items() if exp <= now]:
+                    del self._items[k]
+                while len(self._items) >= self.max_entries:
+                    self._items.pop(next(iter(self._items)))
+            self._items[key] = (now + ttl, value)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def incr(self, key: str, window: float) -> int:
+        """Sabit pencere sayacı: pencere içindeki kaçıncı çağrı olduğunu döner."""
+        now = time.time()
+        with self._lock:
+            exp, count = self._items.get(key, (0.0, 0))
+            if exp <= now:
+                exp, count = now + window, 0
+            self._items[key] = (exp, count + 1)
+            return count + 1
+
+    def reset(self) -> None:
+        pass
+
+
+class SqliteBackend:
+    """Dosya tabanlı paylaşılan önbellek; bağlantı süreç (pid) başına açılır, fork sonrası yeniden."""
+
+    name = "sqlite"
+    _PURGE_EVERY = 500
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._pid = 0
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS shared_cache (key TEXT PRIMARY KEY, value BLOB, expires_at REAL NOT NULL)"
+            )
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value FROM shared_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO shared_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, dumps(value), now + ttl),
+            )
+            self._writes += 1
+            if self._writes % self._PURGE_EVERY == 0:
+                conn.execute("DELETE FROM shared_cache WHERE expires_at <= ?", (now,))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._connection().execute("DELETE FROM shared_cache WHERE key = ?", (key,))
+
+    def incr(self, key: str, window: float) -> int:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            # Tek ifade: sayaç satırı worker'lar arası atomik artar, pencere dolunca sıfırdan başlar
+            row = conn.execute(
+                """
+                INSERT INTO shared_cache (key, value, expires_at) VALUES (?, 1, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                  value = CASE WHEN expires_at <= ? THEN 1 ELSE CAST(value AS INTEGER) + 1 END,
+                  expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END
+                RETURNING value
+                """,
+                (key, now + window, now, now),
+            ).fetchone()
+        return int(row[0])
+
+    def reset(self) -> None:
+        # Master'dan kalan handle fork edilmiş süreçte kapatılmaz (aynı dosya tanımlayıcısı), yalnızca bırakılır
+        self._conn, self._pid = None, 0
+
+
+class RedisBackend:
+    name = "redis"
+
+    def __init__(self, url: str):
+        import redis  # opsiyonel bağımlılık: yalnızca redis:// seçilince
+
+        self._url = url
+        self._redis = redis
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Any | None:
+        raw = self._client.get(key)
+        return loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self._client.set(key, dumps(value), px=max(1, int(ttl * 1000)))
+
+    def delete(self, key: str) -> None:
+        self._client.delete(key)
+
+    def incr(self, key: str, window: float) -> int:
+        pipe = self._client.pipeline()
+        pipe.incr(key)
+        pipe.pexpire(key, max(1, int(window * 1000)), nx=True)
+        return int(pipe.execute()[0])
+
+    def reset(self) -> None:
+        self._client = self._redis.Redis.from_url(self._url)
+
+
+def build_backend(url: str):
+    url = (url or "").strip()
+    if not url or url.startswith("memory://"):
+        return MemoryBackend()
+    if url.startswith("sqlite:///"):
+        return SqliteBackend(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://")):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported SHARED_CACHE_URL scheme: {url.split('://')[0]}")
+
+
+class CacheNamespace:
+    """Önek + varsayılan TTL ile backend görünümü (ör. shared_cache.namespace("geo", ttl=3600))."""
+
+    def __init__(self, cache: "SharedCache", prefix: str, ttl: float):
+        self._cache = cache
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _key(self, key: Any) -> str:
+        return f"{self.prefix}:{key}"
+
+    def get(self, key: Any) -> Any | None:
+        try:
+            return self._cache.backend.get(self._key(key))
+        except Exception as e:
+            # Önbellek hatası isteği düşürmez: kaçak gibi davranılır
+            log.warning("shared cache get failed (%s): %s", self.prefix, e)
+            return None
+
+    def set(self, key: Any, value: Any, ttl: float | None = None) -> None:
+        try:
+            self._cache.backend.set(self._key(key), value, self.ttl if ttl is None else ttl)
+        except Exception as e:
+            log.warning("shared cache set failed (%s): %s", self.prefix, e)
+
+    def delete(self, key: Any) -> None:
+        try:
+            self._cache.backend.delete(self._key(key))
+        except Exception as e:
+            log.warning("shared cache delete failed (%s): %s", self.prefix, e)
+
+    def incr(self, key: Any, window: float | None = None) -> int:
+        """Pencere sayacı; arka uç hatasında 0 (limit uygulanmaz, istek geçer)."""
+        try:
+            return self._cache.backend.incr(self._key(key), self.ttl if window is None else window)
+        except Exception as e:
+            log.warning("shared cache incr failed (%s): %s", self.prefix, e)
+            return 0
+
+
+class SharedCache:
+    def __init__(self, url: str = ""):
+        self.backend = build_backend(url)
+
+    def namespace(self, prefix: str, ttl: float) -> CacheNamespace:
+        return CacheNamespace(self, prefix, ttl)
+
+
+shared_cache = SharedCache(settings.shared_cache_url)
+
+
+@after_fork
+def _reset_shared_cache() -> None:
+    shared_cache.backend.reset()
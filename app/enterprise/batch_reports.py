@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""Enterprise batch reports — multi-language translation and pooled PDF/ZIP export.
+
+- Translation: a case is analysed once. Extra languages are produced from the canonical report.
+  The deterministic sections (risk summary, values table, disclaimer) are rebuilt from the
+  stored lab text without an LLM. Only the interpretation is translated, into all requested
+  languages at once, in a single JSON-mode LLM request. If the LLM is unavailable, a missing
+  language falls back to the rule-based interpretation (degraded_report), so no re-analysis
+  happens.
+- Export: PDFs are rendered in a process pool. Each worker keeps its own pdf_render context,
+  so stylesheets and fonts are parsed once per worker. Pages are written into a ZIP as they
+  complete. Large exports are streamed to object storage in the background, following the
+  tenant export flow in export_stream; without storage the ZIP is streamed in the response.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import multiprocessing
+import os
+import re
+import secrets
+import tempfile
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator
+
+from fastapi import HTTPException
+from openai import APIError
+
+from app.core.config import settings
+from app.core.runtime import after_fork
+from app.enterprise.pdf_export import generate_report_pdf
+from app.services import analyze as analyze_service
+from app.services import storage
+from app.services.analyze import REPORT_LANG_NAMES, build_tables, format_report_to_markdown
+from app.services.degraded_report import LlmUnavailable, build_explanation, llm_admission
+from app.services.export_stream import ZipSink, mark_export_failed, mark_export_started, marker_status
+from app.services.lab_parser import parse_lab_text
+from app.services.resilience import CircuitOpen
+from app.services.risk_engine import compute_risk
+
+log = logging.getLogger("norya.enterprise.batch")
+
+# One JSON response holds every language; split into several calls above this output budget
+MAX_OUTPUT_TOKENS = 12_000
+# In-flight renders per pool worker (bounds memory of finished-but-unzipped PDFs)
+RENDER_WINDOW_PER_WORKER = 2
+
+_SECTION_RE = re.compile(r"^## .*$", re.M)
+
+_TRANSLATE_PROMPT = (
+    "You translate blood test report interpretations written for patients. Translate the user's text "
+    "from {source} into each requested language. Keep the meaning, markdown formatting, line breaks, "
+    "numbers, units and biomarker abbreviations unchanged; do not add, drop or summarise content. "
+    'Reply with a JSON object only: {{"<language code>": "<translated text>", ...}} with exactly '
+    "these keys: {codes}."
+)
+
+
+# ──────────────────────────────────────────────
+# Translation
+# ──────────────────────────────────────────────
+
+def interpretation_of(report_text: str) -> str | None:
+    """Interpretation block of a report in the analyze.format_report_to_markdown layout, else None."""
+    parts = _SECTION_RE.split(report_text or "")
+    # ["", risk summary, interpretation, values, disclaimer]
+    if len(parts) != 5 or parts[0].strip():
+        return None
+    return parts[2].strip() or None
+
+
+def _language_groups(text: str, langs: list[str]) -> list[list[str]]:
+    """Split target languages so each JSON response stays within MAX_OUTPUT_TOKENS."""
+    per_lang = max(64, len(text) // 2)  # non-Latin scripts take ~2 chars/token
+    size = max(1, MAX_OUTPUT_TOKENS // per_lang)
+    return [langs[i : i + size] for i in range(0, len(langs), size)]
+
+
+def _llm_translate(text: str, source_lang: str, langs: list[str]) -> dict[str, str]:
+    """One chat completion (JSON mode) translating text into all langs. Missing/invalid keys are dropped."""
+    codes = ", ".join(f"{code} ({REPORT_LANG_NAMES.get(code, code)})" for code in langs)
+    messages = [
+        {"role": "system", "content": _TRANSLATE_PROMPT.format(
+            source=REPORT_LANG_NAMES.get(source_lang, source_lang), codes=codes)},
+        {"role": "user", "content": text},
+    ]
+    max_tokens = min(MAX_OUTPUT_TOKENS, 200 + len(langs) * max(64, len(text) // 2))
+
+    def _create(client):
+        return analyze_service._openai_safe_call(lambda timeout: client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"},
+            timeout=timeout,
+        ))
+
+    response = analyze_service._openai_create_with_fallback(_create)
+    data = json.loads(response.choices[0].message.content or "{}")
+    return {
+        code: value.strip()
+        for code, value in (data.items() if isinstance(data, dict) else ())
+        if code in langs and isinstance(value, str) and value.strip()
+    }
+
+
+def translate_report(
+    report_text: str,
+    input_text: str | None,
+    source_lang: str,
+    target_langs: Iterable[str],
+) -> dict[str, str]:
+    """Return {lang: report_text} for target_langs from one canonical report.
+
+    Languages the LLM could not deliver get the rule-based interpretation when the lab values
+    can be parsed from input_text; otherwise they are left out of the result.
+    """
+    langs = list(dict.fromkeys((code or "").strip().lower() for code in target_langs if (code or "").strip()))
+    out = {source_lang: report_text} if source_lang in langs else {}
+    pending = [code for code in langs if code not in out]
+    if not pending:
+        return out
+
+    lab_values = parse_lab_text(input_text or "")
+    tables = build_tables(lab_values)
+    risk_summary = compute_risk(lab_values)
+    interpretation = interpretation_of(report_text) if tables else None
+    # Canonical layout: only the interpretation goes to the LLM; otherwise (e.g. Vision) the whole text
+    source_text = interpretation or report_text
+
+    translated: dict[str, str] = {}
+    with llm_admission() as shed_reason:
+        if shed_reason:
+            log.warning("Batch translation shed (%s), rule-based fallback for %s", shed_reason, pending)
+        else:
+            for group in _language_groups(source_text, pending):
+                try:
+                    translated.update(_llm_translate(source_text, source_lang, group))
+                except (APIError, HTTPException, CircuitOpen, LlmUnavailable, ValueError) as e:
+                    log.warning("Batch translation failed for %s: %s", group, e)
+
+    for code in pending:
+        meta = {"lang": code, "plan": "enterprise"}
+        if code in translated:
+            out[code] = (
+                format_report_to_markdown(risk_summary, translated[code], tables, meta)
+                if interpretation else translated[code]
+            )
+        elif tables:
+            meta["degraded"] = "translation_unavailable"
+            out[code] = format_report_to_markdown(risk_summary, build_explanation(risk_summary, tables, code), tables, meta)
+    return out
+
+
+# ──────────────────────────────────────────────
+# PDF pool + ZIP
+# ──────────────────────────────────────────────
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def pool_workers() -> int:
+    return settings.enterprise_pdf_workers or os.cpu_count() or 1
+
+
+def _pdf_pool() -> ProcessPoolExecutor | None:
+    """Shared render pool (None = render in-process). spawn: safe next to the server's threads."""
+    global _pool
+    if pool_workers() <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=pool_workers(), mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+@after_fork
+def _forget_inherited_pool() -> None:
+    """A pool created in the preloading master belongs to the master; the worker starts its own lazily."""
+    global _pool, _pool_lock
+    _pool, _pool_lock = None, threading.Lock()
+
+
+def _render(kwargs: dict) -> bytes:
+    return generate_report_pdf(**kwargs)
+
+
+def _result(name: str, render) -> bytes | None:
+    try:
+        return render()
+    except Exception as e:
+        log.warning("Batch PDF render failed for %s: %s", name, e)
+        return None
+
+
+def render_pdfs(jobs: Iterable[tuple[str, dict]]) -> Iterator[tuple[str, bytes | None]]:
+    """Yield (name, pdf bytes or None on failure) in completion order; jobs are (name, generate_report_pdf kwargs)."""
+    queue = deque(jobs)
+    pool = _pdf_pool()
+    if pool is None:
+        while queue:
+            name, kwargs = queue.popleft()
+            yield name, _result(name, lambda: _render(kwargs))
+        return
+
+    window = pool_workers() * RENDER_WINDOW_PER_WORKER
+    running: dict = {}
+    while queue or running:
+        while queue and len(running) < window:
+            name, kwargs = queue.popleft()
+            running[pool.submit(_render, kwargs)] = name
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        broken = False
+        for future in done:
+            name = running.pop(future)
+            broken = broken or isinstance(future.exception(), BrokenProcessPool)
+            yield name, _result(name, future.result)
+        if broken:
+            # A worker died: in-flight jobs are lost, the rest continue on a fresh pool
+            for name in running.values():
+                yield name, None
+            _reset_pool()
+            yield from render_pdfs(queue)
+            return
+
+
+def iter_zip(jobs: Iterable[tuple[str, dict]], manifest: dict) -> Iterator[bytes]:
+    """ZIP of rendered PDFs plus manifest.json, produced chunk by chunk (PDFs are stored, not deflated)."""
+    sink = ZipSink()
+    files, failed = [], []
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as zf:
+        for name, pdf in render_pdfs(jobs):
+            if pdf is None:
+                failed.append(name)
+                continue
+            zf.writestr(name, pdf)
+            files.append(name)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+        zf.writestr(
+            "manifest.json",
+            json.dumps({**manifest, "files": sorted(files), "failed": sorted(failed)}, ensure_ascii=False, indent=2),
+            compress_type=zipfile.ZIP_DEFLATED,
+        )
+    yield sink.drain()
+
+
+# ──────────────────────────────────────────────
+# Object storage (background) mode
+# ──────────────────────────────────────────────
+
+def _object_name(institution_id: int, export_id: str) -> str:
+    return f"exports/enterprise-{institution_id}/{export_id}.zip"
+
+
+def _state_marker(institution_id: int, export_id: str) -> str:
+    return f"exports/enterprise-{institution_id}/{export_id}.state"
+
+
+def _run_batch_export(institution_id: int, export_id: str, jobs: list[tuple[str, dict]], manifest: dict) -> None:
+    filename = f"NoryaAI_reports_{export_id}.zip"
+    try:
+        with tempfile.TemporaryFile() as tmp:
+            size = 0
+            for chunk in iter_zip(jobs, manifest):
+                tmp.write(chunk)
+                size += len(chunk)
+            tmp.seek(0)
+            url = storage.upload_export_file(
+                _object_name(institution_id, export_id), tmp, size, "application/zip", filename
+            )
+        if not url:
+            raise RuntimeError("export upload failed")
+        log.info("Enterprise batch export ready institution_id=%s export_id=%s pdfs=%s bytes=%s",
+                 institution_id, export_id, len(jobs), size)
+    except Exception as e:
+        log.exception("Enterprise batch export failed institution_id=%s export_id=%s: %s", institution_id, export_id, e)
+        mark_export_failed(_state_marker(institution_id, export_id), e)
+
+
+def start_batch_export(institution_id: int, jobs: list[tuple[str, dict]], manifest: dict) -> str:
+    """Render + upload in a background thread; poll with `batch_export_status`.
+
+    Raises RuntimeError (and starts nothing) if the state marker cannot be written.
+    """
+    export_id = f"batch-{secrets.token_urlsafe(12)}"
+    mark_export_started(_state_marker(institution_id, export_id))
+    threading.Thread(
+        target=_run_batch_export,
+        args=(institution_id, export_id, jobs, manifest),
+        daemon=True,
+        name=f"enterprise-batch-{institution_id}",
+    ).start()
+    return export_id
+
+
+def batch_export_status(institution_id: int, export_id: str) -> dict:
+    """{"status": "ready"|"failed"|"pending"|"unknown", "url"?} looked up under the institution prefix."""
+    if not export_id.startswith("batch-") or not all(c.isalnum() or c in "-_" for c in export_id):
+        return {"export_id": export_id, "status": "unknown"}
+    url = storage.presigned_download_url(
+        _object_name(institution_id, export_id), f"NoryaAI_reports_{export_id}.zip"
+    )
+    if url:
+        return {"export_id": export_id, "status": "ready", "url": url}
+    return {"export_id": export_id, "status": marker_status(_state_marker(institution_id, export_id))}
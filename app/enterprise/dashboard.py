@@ -10,20 +10,25 @@ import time
 from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, File, Form, Query, Request, UploadFile
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
 from sqlmodel import Session, select, func
 
 from app.core.database import get_db
+from app.core.pagination import capped_count, keyset_page, page_links
 from app.core.templating import Jinja2Templates
 from app.enterprise.deps import require_enterprise_user
 from app.models import AnalysisRecord, AuditLog, User
 from app.models.enterprise_case import EnterpriseCase, EnterpriseReport
 from app.models.enterprise_subscription import EnterpriseSubscription
 from app.models.institution import Institution, InstitutionInvite, InstitutionMembership
-from app.services.analyze import analyze_blood_test, analyze_blood_test_from_image
+from app.services.analyze import VISION_DETAIL, analyze_blood_test, analyze_blood_test_from_image
+from app.services.image_intake import prepare_image
+from app.services.ocr import ocr_image, ocr_pdf, route_stats
+from app.services import storage, tenant_rollups
 from app.services.pdf_extract import extract_text_from_pdf
 from app.enterprise.i18n import get_t, is_rtl, detect_lang
 from app.enterprise.email import send_invite_email
+from app.enterprise.batch_reports import batch_export_status, iter_zip, start_batch_export, translate_report
 from app.enterprise.pdf_export import generate_report_pdf
 
 log = logging.getLogger("norya.enterprise")
@@ -476,22 +481,27 @@ def enterprise_uploads(
     db: Session = Depends(get_db),
     page: int = 1,
     status_filter: str = "",
+    cursor: str | None = None,
 ):
     user, membership, inst, redir = _ctx(ctx)
     if redir:
         return redir
 
     per_page = 30
-    offset = (max(page, 1) - 1) * per_page
+    # page yalnızca gösterim içindir; sayfa sınırı (created_at, id) cursor'ı ile taşınır
+    page = max(page, 1) if cursor else 1
 
+    # Toplam ve durum sayıları kurum sayaçlarından (tenant_daily_stats); vaka tablosu sayılmaz
+    counts = tenant_rollups.prefixed(tenant_rollups.case_totals(db, inst.id), "status:")
     q = select(EnterpriseCase).where(EnterpriseCase.institution_id == inst.id)
-    q_count = select(func.count(EnterpriseCase.id)).where(EnterpriseCase.institution_id == inst.id)
     if status_filter and status_filter in STATUS_LABELS:
         q = q.where(EnterpriseCase.status == status_filter)
-        q_count = q_count.where(EnterpriseCase.status == status_filter)
+        total = counts.get(status_filter, 0)
+    else:
+        total = sum(counts.values())
 
-    total = db.exec(q_count).one()
-    cases = list(db.exec(q.order_by(EnterpriseCase.created_at.desc()).offset(offset).limit(per_page)).all())
+    pg = keyset_page(db, q, ts_col=EnterpriseCase.created_at, id_col=EnterpriseCase.id, cursor=cursor, limit=per_page)
+    cases = pg.items
 
     case_user_ids = list({c.uploaded_by_user_id for c in cases})
     reviewer_ids = list({c.reviewed_by_user_id for c in cases if c.reviewed_by_user_id})
@@ -516,15 +526,7 @@ def enterprise_uploads(
         for c in cases
     ]
 
-    status_counts = {}
-    for s_key in STATUS_LABELS:
-        cnt = db.exec(
-            select(func.count(EnterpriseCase.id)).where(
-                EnterpriseCase.institution_id == inst.id, EnterpriseCase.status == s_key
-            )
-        ).one()
-        if cnt > 0:
-            status_counts[s_key] = cnt
+    status_counts = {s_key: counts[s_key] for s_key in STATUS_LABELS if counts.get(s_key)}
 
     ctx = _base_ctx(request, user, membership, inst, "uploads")
     ctx.update({
@@ -532,8 +534,9 @@ def enterprise_uploads(
         "total": total,
         "page": page,
         "per_page": per_page,
-        "has_next": offset + per_page < total,
-        "has_prev": page > 1,
+        "has_next": bool(pg.next_cursor),
+        "has_prev": bool(pg.prev_cursor),
+        **page_links(request, pg, page),
         "status_filter": status_filter,
         "status_labels": _status_labels(ctx["t"]),
         "status_counts": status_counts,
@@ -604,13 +607,25 @@ async def enterprise_upload_file(
     analysis_text = None
     analysis_error = None
     try:
-        if source_type == "image":
+        t0 = time.perf_counter()
+        ocr = ocr_image(content) if source_type == "image" else None
+        if source_type == "image" and not (ocr and ocr.accepted):
             mime = MIME_MAP.get(ext, "image/jpeg")
-            result_text, _usage = analyze_blood_test_from_image(content, mime, lang=lang)
+            prepared = prepare_image(content, mime, detail=VISION_DETAIL)
+            result_text, _usage = analyze_blood_test_from_image(prepared.data, prepared.mime, lang=lang)
             input_preview = f"[Görsel: {file.filename}]"
             analysis_text = result_text
+            route_stats.record("vision", time.perf_counter() - t0)
         else:
-            extracted = extract_text_from_pdf(content)
+            # Görsel yerel OCR ile okunduysa ya da PDF: metin yolu
+            if ocr and ocr.accepted:
+                extracted, route = ocr.text, "ocr_text"
+            else:
+                extracted, route = extract_text_from_pdf(content), "pdf_text"
+                if "çıkarılamadı" in extracted:
+                    ocr = ocr_pdf(content)
+                    if ocr and ocr.accepted:
+                        extracted, route = ocr.text, "ocr_text"
             if "çıkarılamadı" in extracted:
                 analysis_error = "PDF'den metin okunamadı."
             else:
@@ -619,6 +634,7 @@ async def enterprise_upload_file(
                 result_text = report_payload["sonuc"]
                 input_preview = extracted[:2000]
                 analysis_text = result_text
+                route_stats.record(route, time.perf_counter() - t0)
     except Exception as exc:
         log.exception("Enterprise upload analysis failed for case %s: %s", case.id, exc)
         analysis_error = str(exc)[:500]
@@ -631,6 +647,7 @@ async def enterprise_upload_file(
             source=source_type,
             plan_type="enterprise",
             institution_id=inst.id,
+            lang=(lang or "").strip().lower()[:8] or None,
             original_filename=file.filename,
             original_stored_path=stored_name,
         )
@@ -715,16 +732,42 @@ def enterprise_case_detail(
     return templates.TemplateResponse("enterprise/case_detail.html", ctx)
 
 
+def _analyze_case(case: EnterpriseCase, input_text: str, lang: str) -> str:
+    """Run the analysis for a case again in lang and return the report text."""
+    # Yerel OCR ile okunmuş görsellerde input_text OCR metnidir; yalnızca Vision'la işlenenler yeniden Vision'a gider
+    if case.source_type == "image" and case.stored_path and input_text.startswith("[Görsel"):
+        fpath = os.path.join(UPLOAD_DIR, case.stored_path)
+        if os.path.isfile(fpath):
+            with open(fpath, "rb") as fh:
+                img_data = fh.read()
+            ext = os.path.splitext(case.stored_path)[1].lower()
+            mime = MIME_MAP.get(ext, "image/jpeg")
+            prepared = prepare_image(img_data, mime, detail=VISION_DETAIL)
+            text, _ = analyze_blood_test_from_image(prepared.data, prepared.mime, lang=lang)
+            if text:
+                return text
+    labs_norm = {"t": " ".join(input_text.split()).strip(), "dn": None}
+    payload, _ = analyze_blood_test(input_text, lang=lang, plan="enterprise", labs_norm=labs_norm)
+    return payload["sonuc"]
+
+
 @router.post("/case/{case_id}/regenerate")
 def enterprise_case_regenerate(
     case_id: int,
     request: Request,
     ctx=Depends(require_enterprise_user),
     db: Session = Depends(get_db),
-    target_lang: str = Form("tr"),
+    target_lang: list[str] = Form(["tr"]),
     csrf_token: str = Form(""),
 ):
-    """Re-generate a report for the given case in a specific language."""
+    """Generate reports for the given case in one or more languages.
+
+    The latest report (approved first) is the canonical result. A target in the canonical
+    language is analysed again (that is what regenerating means); every other target reuses the
+    canonical deterministic sections and gets its interpretation translated, all languages in one
+    LLM request (batch_reports.translate_report). A case without any report is analysed once in
+    the first target language and translated into the rest.
+    """
     user, membership, inst, redir = _ctx(ctx)
     if redir:
         return redir
@@ -740,35 +783,47 @@ def enterprise_case_regenerate(
     if not analysis or not analysis.input_text:
         return RedirectResponse(url=f"/enterprise/case/{case_id}", status_code=303)
 
-    regen_text = None
+    canonical = db.exec(
+        select(EnterpriseReport)
+        .where(
+            EnterpriseReport.case_id == case.id,
+            EnterpriseReport.report_text.is_not(None),
+            EnterpriseReport.approval_status != "rejected",
+        )
+        .order_by((EnterpriseReport.approval_status == "approved").desc(), EnterpriseReport.created_at.desc())
+    ).first()
+    if canonical:
+        source_text, source_lang = canonical.report_text, canonical.language or "tr"
+    else:
+        source_text, source_lang = analysis.result_text, analysis.lang or "tr"
+
+    targets = [lc for lc in dict.fromkeys((lc or "").strip().lower() for lc in target_lang) if lc]
+    if not targets:
+        return RedirectResponse(url=f"/enterprise/case/{case_id}", status_code=303)
+    generated: dict[str, str] = {}
     try:
-        input_src = analysis.input_text
-        if case.source_type == "image" and case.stored_path:
-            fpath = os.path.join(UPLOAD_DIR, case.stored_path)
-            if os.path.isfile(fpath):
-                with open(fpath, "rb") as fh:
-                    img_data = fh.read()
-                ext = os.path.splitext(case.stored_path)[1].lower()
-                mime = MIME_MAP.get(ext, "image/jpeg")
-                regen_text, _ = analyze_blood_test_from_image(img_data, mime, lang=target_lang)
-        if not regen_text:
-            labs_norm = {"t": " ".join(input_src.split()).strip(), "dn": None}
-            payload, _ = analyze_blood_test(input_src, lang=target_lang, plan="enterprise", labs_norm=labs_norm)
-            regen_text = payload["sonuc"]
+        if not source_text or source_lang in targets:
+            # Source-language regeneration (or no result yet): a fresh analysis, not a copy
+            source_lang = source_lang if source_text else targets[0]
+            source_text = _analyze_case(case, analysis.input_text, source_lang)
+            generated[source_lang] = source_text
+        others = [lc for lc in targets if lc not in generated]
+        if others:
+            generated.update(translate_report(source_text, analysis.input_text, source_lang, others))
     except Exception as exc:
-        log.exception("Regenerate failed for case %s lang=%s: %s", case_id, target_lang, exc)
+        log.exception("Regenerate failed for case %s langs=%s: %s", case_id, targets, exc)
         return RedirectResponse(url=f"/enterprise/case/{case_id}", status_code=303)
 
-    if regen_text:
-        report = EnterpriseReport(
+    for lang, text in generated.items():
+        db.add(EnterpriseReport(
             case_id=case.id,
-            language=target_lang,
-            report_text=regen_text,
+            language=lang,
+            report_text=text,
             approval_status="pending",
-        )
-        db.add(report)
+        ))
         _enterprise_audit(db, "case_status_change", user.id, inst.id, "case", case.id,
-                          {"action": "regenerate", "language": target_lang})
+                          {"action": "regenerate", "language": lang, "source_language": source_lang})
+    if generated:
         db.commit()
 
     return RedirectResponse(url=f"/enterprise/case/{case_id}", status_code=303)
@@ -830,6 +885,118 @@ def enterprise_case_export_pdf(
     )
 
 
+@router.post("/cases/export-batch")
+def enterprise_cases_export_batch(
+    request: Request,
+    ctx=Depends(require_enterprise_user),
+    db: Session = Depends(get_db),
+    case_ids: list[int] = Form([]),
+    month: str = Form(""),
+    languages: list[str] = Form([]),
+    csrf_token: str = Form(""),
+):
+    """Export the approved reports of many cases (explicit ids or a YYYY-MM month) as one ZIP of PDFs.
+
+    PDFs are rendered in the shared process pool (batch_reports). With object storage configured the
+    ZIP is built in the background and 202 + a status URL is returned; otherwise it streams back.
+    """
+    user, membership, inst, redir = _ctx(ctx)
+    if redir:
+        return redir
+    if membership.role not in ("admin", "owner", "reviewer"):
+        return JSONResponse({"error": "forbidden"}, status_code=403)
+
+    stmt = select(EnterpriseCase).where(EnterpriseCase.institution_id == inst.id)
+    if case_ids:
+        stmt = stmt.where(EnterpriseCase.id.in_(case_ids))
+    elif month:
+        try:
+            start = datetime.strptime(month.strip(), "%Y-%m")
+        except ValueError:
+            return JSONResponse({"error": "month must be YYYY-MM"}, status_code=400)
+        end = (start + timedelta(days=32)).replace(day=1)
+        stmt = stmt.where(EnterpriseCase.created_at >= start, EnterpriseCase.created_at < end)
+    else:
+        return JSONResponse({"error": "case_ids or month required"}, status_code=400)
+    cases = {c.id: c for c in db.exec(stmt).all()}
+
+    langs = [lc for lc in dict.fromkeys((lc or "").strip().lower() for lc in languages) if lc]
+    langs = langs or (inst.active_languages or "tr,en").replace(" ", "").split(",")
+    latest: dict[tuple[int, str], EnterpriseReport] = {}
+    if cases:
+        for report in db.exec(
+            select(EnterpriseReport).where(
+                EnterpriseReport.case_id.in_(list(cases)),
+                EnterpriseReport.approval_status == "approved",
+                EnterpriseReport.language.in_(langs),
+            ).order_by(EnterpriseReport.created_at.desc())
+        ).all():
+            latest.setdefault((report.case_id, report.language), report)
+
+    jobs, missing = [], []
+    for case_id, case in sorted(cases.items()):
+        safe_name = (case.source_filename or f"case_{case_id}").rsplit(".", 1)[0]
+        for lang in langs:
+            report = latest.get((case_id, lang))
+            if not report or not report.report_text:
+                missing.append(f"{case_id}:{lang}")
+                continue
+            jobs.append((f"case_{case_id}/NoryaAI_{safe_name}_{lang}.pdf", {
+                "report_text": report.report_text,
+                "case_filename": case.source_filename,
+                "institution_name": inst.name,
+                "language": lang,
+                "case_id": case_id,
+                "report_date": report.created_at,
+            }))
+    if not jobs:
+        return JSONResponse({"error": "no approved reports", "missing": missing}, status_code=404)
+
+    manifest = {"institution_id": inst.id, "month": month or None, "languages": langs,
+                "cases": len(cases), "missing": missing}
+    _enterprise_audit(db, "case_status_change", user.id, inst.id, "case", None,
+                      {"action": "batch_export", "cases": len(cases), "pdfs": len(jobs), "languages": langs})
+    db.commit()
+
+    if storage.export_storage_available():
+        try:
+            export_id = start_batch_export(inst.id, jobs, manifest)
+        except RuntimeError:
+            return JSONResponse({"error": "export_storage_unavailable"}, status_code=503)
+        return JSONResponse(status_code=202, content={
+            "export_id": export_id,
+            "status": "pending",
+            "pdfs": len(jobs),
+            "status_url": f"/enterprise/exports/{export_id}",
+        })
+    return StreamingResponse(
+        iter_zip(jobs, manifest),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="NoryaAI_reports_{inst.id}_{month or "selection"}.zip"',
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+@router.get("/exports/{export_id}")
+def enterprise_export_status(
+    export_id: str,
+    request: Request,
+    ctx=Depends(require_enterprise_user),
+):
+    """Poll a background batch export; returns a presigned download URL when ready."""
+    user, membership, inst, redir = _ctx(ctx)
+    if redir:
+        return redir
+    if membership.role not in ("admin", "owner", "reviewer"):
+        return JSONResponse({"error": "forbidden"}, status_code=403)
+    status = batch_export_status(inst.id, export_id)
+    if status["status"] == "unknown":
+        return JSONResponse({"error": "not_found"}, status_code=404)
+    return JSONResponse(status)
+
+
 # ──────────────────────────────────────────────
 # REVIEW — Case review queue
 # ──────────────────────────────────────────────
@@ -841,6 +1008,7 @@ def enterprise_review(
     db: Session = Depends(get_db),
     page: int = 1,
     show: str = "pending",
+    cursor: str | None = None,
 ):
     user, membership, inst, redir = _ctx(ctx)
     if redir:
@@ -849,29 +1017,24 @@ def enterprise_review(
         return HTMLResponse("İnceleme yetkiniz yok.", status_code=403)
 
     per_page = 20
-    offset = (max(page, 1) - 1) * per_page
+    # page yalnızca gösterim içindir; sayfa sınırı (created_at, id) cursor'ı ile taşınır
+    page = max(page, 1) if cursor else 1
 
+    pending_statuses = ["new", "needs_review", "processing"]
+    counts = tenant_rollups.prefixed(tenant_rollups.case_totals(db, inst.id), "status:")
+    pending_count = sum(counts.get(s, 0) for s in pending_statuses)
     if show == "all":
         q = select(EnterpriseCase).where(EnterpriseCase.institution_id == inst.id)
-        q_count = select(func.count(EnterpriseCase.id)).where(EnterpriseCase.institution_id == inst.id)
+        total = sum(counts.values())
     else:
         q = select(EnterpriseCase).where(
             EnterpriseCase.institution_id == inst.id,
-            EnterpriseCase.status.in_(["new", "needs_review", "processing"]),
-        )
-        q_count = select(func.count(EnterpriseCase.id)).where(
-            EnterpriseCase.institution_id == inst.id,
-            EnterpriseCase.status.in_(["new", "needs_review", "processing"]),
+            EnterpriseCase.status.in_(pending_statuses),
         )
+        total = pending_count
 
-    total = db.exec(q_count).one()
-    pending_count = db.exec(
-        select(func.count(EnterpriseCase.id)).where(
-            EnterpriseCase.institution_id == inst.id,
-            EnterpriseCase.status.in_(["new", "needs_review", "processing"]),
-        )
-    ).one()
-    cases = list(db.exec(q.order_by(EnterpriseCase.created_at.desc()).offset(offset).limit(per_page)).all())
+    pg = keyset_page(db, q, ts_col=EnterpriseCase.created_at, id_col=EnterpriseCase.id, cursor=cursor, limit=per_page)
+    cases = pg.items
 
     all_uids = list({c.uploaded_by_user_id for c in cases} | {c.reviewed_by_user_id for c in cases if c.reviewed_by_user_id})
     u_map = {}
@@ -911,8 +1074,9 @@ def enterprise_review(
         "total": total,
         "page": page,
         "per_page": per_page,
-        "has_next": offset + per_page < total,
-        "has_prev": page > 1,
+        "has_next": bool(pg.next_cursor),
+        "has_prev": bool(pg.prev_cursor),
+        **page_links(request, pg, page),
         "show": show,
         "pending_count": pending_count,
         "status_labels": _status_labels(ctx["t"]),
@@ -1052,6 +1216,7 @@ def enterprise_audit(
     db: Session = Depends(get_db),
     page: int = 1,
     event_filter: str = "",
+    cursor: str | None = None,
 ):
     user, membership, inst, redir = _ctx(ctx)
     if redir:
@@ -1060,16 +1225,17 @@ def enterprise_audit(
         return HTMLResponse("Bu sayfaya erişim yetkiniz yok.", status_code=403)
 
     per_page = 50
-    offset = (max(page, 1) - 1) * per_page
+    # page yalnızca gösterim içindir; sayfa sınırı (created_at, id) cursor'ı ile taşınır
+    page = max(page, 1) if cursor else 1
 
     q = select(AuditLog).where(AuditLog.institution_id == inst.id)
-    q_count = select(func.count(AuditLog.id)).where(AuditLog.institution_id == inst.id)
     if event_filter:
         q = q.where(AuditLog.event == event_filter)
-        q_count = q_count.where(AuditLog.event == event_filter)
 
-    total = db.exec(q_count).one()
-    logs = list(db.exec(q.order_by(AuditLog.created_at.desc()).offset(offset).limit(per_page)).all())
+    # Gösterim için sınırlı sayım: büyük kurumlarda "10000+"
+    total, total_capped = capped_count(db, q)
+    pg = keyset_page(db, q, ts_col=AuditLog.created_at, id_col=AuditLog.id, cursor=cursor, limit=per_page)
+    logs = pg.items
 
     log_user_ids = list({l.user_id for l in logs if l.user_id})
     log_users = {}
@@ -1099,10 +1265,12 @@ def enterprise_audit(
     ctx.update({
         "logs": rows,
         "total": total,
+        "total_capped": total_capped,
         "page": page,
         "per_page": per_page,
-        "has_next": offset + per_page < total,
-        "has_prev": page > 1,
+        "has_next": bool(pg.next_cursor),
+        "has_prev": bool(pg.prev_cursor),
+        **page_links(request, pg, page),
         "event_filter": event_filter,
         "event_labels": _event_labels(ctx["t"]),
         "distinct_events": distinct_events,
@@ -19,10 +19,17 @@ def generate_report_pdf(
     case_id: int | None = None,
     report_date: datetime | None = None,
 ) -> bytes:
-    """Generate a styled PDF from a report text. Returns PDF bytes."""
+    """Generate a styled PDF from a report text. Returns PDF bytes.
+
+    The stylesheet only depends on text direction, so it is parsed once per process and
+    direction by the shared render context (with its font configuration) instead of being
+    inlined into every document.
+    """
     try:
-        from weasyprint import HTML
-    except ImportError:
+        from app.services.pdf_render import render_context
+
+        ctx = render_context()
+    except (ImportError, OSError):
         log.error("weasyprint not installed — cannot generate PDF")
         raise RuntimeError("PDF generation unavailable")
 
@@ -36,20 +43,6 @@ def generate_report_pdf(
 <html lang="{language}" dir="{direction}">
 <head>
 <meta charset="utf-8">
-<style>
-  @page {{ size: A4; margin: 2cm; }}
-  body {{ font-family: Inter, 'Noto Sans', system-ui, sans-serif; font-size: 11pt;
-         line-height: 1.65; color: #1a1c1e; direction: {direction}; }}
-  .header {{ border-bottom: 2px solid #006a69; padding-bottom: 12px; margin-bottom: 20px; }}
-  .header h1 {{ font-size: 18pt; font-weight: 700; color: #006a69; margin: 0 0 4px; }}
-  .header .meta {{ font-size: 9pt; color: #74777f; }}
-  .header .meta span {{ margin-{("left" if direction == "ltr" else "right")}: 12px; }}
-  .report {{ white-space: pre-wrap; font-size: 10.5pt; line-height: 1.7; }}
-  .footer {{ margin-top: 32px; padding-top: 12px; border-top: 1px solid #dde1e6;
-             font-size: 8pt; color: #74777f; }}
-  .disclaimer {{ margin-top: 16px; padding: 10px 14px; background: #f8f9fa;
-                 border-radius: 6px; font-size: 8.5pt; color: #44474e; line-height: 1.5; }}
-</style>
 </head>
 <body>
   <div class="header">
@@ -71,8 +64,26 @@ def generate_report_pdf(
 </body>
 </html>"""
 
-    pdf_bytes = HTML(string=html_content).write_pdf()
-    return pdf_bytes
+    stylesheet = ctx.stylesheet(f"enterprise-report-{direction}", _stylesheet(direction))
+    return ctx.render(html_content, [stylesheet])
+
+
+def _stylesheet(direction: str) -> str:
+    side = "left" if direction == "ltr" else "right"
+    return f"""\
+  @page {{ size: A4; margin: 2cm; }}
+  body {{ font-family: Inter, 'Noto Sans', system-ui, sans-serif; font-size: 11pt;
+         line-height: 1.65; color: #1a1c1e; direction: {direction}; }}
+  .header {{ border-bottom: 2px solid #006a69; padding-bottom: 12px; margin-bottom: 20px; }}
+  .header h1 {{ font-size: 18pt; font-weight: 700; color: #006a69; margin: 0 0 4px; }}
+  .header .meta {{ font-size: 9pt; color: #74777f; }}
+  .header .meta span {{ margin-{side}: 12px; }}
+  .report {{ white-space: pre-wrap; font-size: 10.5pt; line-height: 1.7; }}
+  .footer {{ margin-top: 32px; padding-top: 12px; border-top: 1px solid #dde1e6;
+             font-size: 8pt; color: #74777f; }}
+  .disclaimer {{ margin-top: 16px; padding: 10px 14px; background: #f8f9fa;
+                 border-radius: 6px; font-size: 8.5pt; color: #44474e; line-height: 1.5; }}
+"""
 
 
 def _escape(s: str) -> str:
@@ -25,13 +25,14 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, PlainTextResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
 from app.core.templating import Jinja2Templates
 from pydantic import BaseModel
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
-from sqlalchemy import or_, func
+from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError as SQLIntegrityError
 from sqlmodel import Session, select
 
@@ -40,20 +41,27 @@ from app.admin.deps import ADMIN_COOKIE, require_admin_secret_or_cookie, verify_
 from app.api.admin import get_admin_html, router as admin_router
 from app.api.auth import router as auth_router
 from app.api.institution import router as institution_api_router, page_router as institution_page_router
+from app.api.mobile_sync import router as mobile_sync_router
 from app.enterprise import enterprise_router
-from app.api.deps import get_current_user, get_current_user_optional, get_current_user_or_dev_guest, security
-from app.cache_db import cache_get, cache_set, get_conn as get_cache_conn, init_cache as init_ai_cache, purge_expired as purge_ai_cache_expired
+from app.api.deps import get_current_user, get_current_user_optional, get_current_user_or_dev_guest, get_principal, security
+from app.api.principal import Principal
+from app.cache_db import get_conn as get_cache_conn, init_cache as init_ai_cache
 from app.cache_utils import expires_iso, make_cache_key, now_iso
+from app import single_flight
 from app.core.config import is_openai_configured, settings
-from app.core.database import engine, get_db, init_db
+from app.core.database import engine, get_db, get_read_db, init_db, read_your_writes_middleware
 from app.core.rate_limit import limiter
+from app.core.pagination import keyset_page
+from app.core.passwords import KdfBusy
+from app.core.shared_cache import shared_cache
+from app.services.scheduler import scheduler
+from app.services import tenant_rollups  # noqa: F401  (kurum günlük sayaçları: mapper olayları)
 from app.core.geo import get_geo_from_ip
 from app.legal_i18n import LEGAL_HREFLANG_LANGS, LEGAL_LANGS, get_legal_content, get_legal_ui
 from app.core.security import (
     create_pdf_access_token,
     decode_access_token,
     decode_pdf_access_token,
-    hash_password,
     verify_report_verification_token,
 )
 from app.models import (  # noqa: F401
@@ -163,8 +171,10 @@ from app.services.pricing import (
     get_plan_code_to_product_cents,
     get_active_campaign_with_display,
 )
+from app.services.passwordless_users import get_or_create_passwordless_user
 from app.services.report_pdf import build_doctor_pdf, build_report_pdf, extract_trend_from_results
 from app.services.report_verification import get_or_create_verification
+from app.services.resilience import CircuitOpen, upstream
 from app.services.storage import upload_report_pdf
 from app.schemas.analyze import (
     AnalysisDetail,
@@ -176,8 +186,16 @@ from app.schemas.analyze import (
     UploadJsonRequest,
 )
 from app.schemas.payment import CreateSessionRequest, GrantPaymentRequest, GuestSessionRequest, PaytrInitRequest
-from app.services.analyze import analyze_blood_test, analyze_blood_test_from_image
+from app.services.analyze import (
+    VISION_DETAIL,
+    LlmConfigError,
+    analyze_blood_test,
+    analyze_blood_test_from_image,
+    degraded_blood_test_report,
+)
+from app.services.image_intake import prepare_image
 from app.services.pdf_extract import extract_text_from_pdf
+from app.services.ocr import ocr_image, ocr_pdf, route_stats
 from app.logging import setup_logging
 
 setup_logging(level=logging.INFO)
@@ -195,10 +213,9 @@ IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
 MIME_MAP = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png"}
 ALLOWED_UPLOAD_MIME_TYPES = {"application/pdf", "image/jpeg", "image/jpg", "image/png"}
 
-# Kısa süreli PDF cache: aynı rapor için tekrarlayan isteklerde yeniden üretim engellenir (TTL 2 dk)
-_pdf_cache: dict[tuple, tuple[bytes, float]] = {}
-_pdf_cache_lock = threading.Lock()
+# Kısa süreli PDF cache: aynı rapor için tekrarlayan isteklerde yeniden üretim engellenir (TTL 2 dk, worker'lar arası)
 _PDF_CACHE_TTL_SEC = 120
+_pdf_cache = shared_cache.namespace("pdf", ttl=_PDF_CACHE_TTL_SEC)
 
 
 def _max_upload_bytes() -> int:
@@ -297,27 +314,92 @@ def _seed_pricing_plan():
         log.warning("PricingPlan seed atlandı: %s", e)
 
 
-def _reset_institution_quotas_if_due():
-    """Kurum kotalarını reset günü geldiyse sıfırla (başlangıçta ve günlük)."""
-    try:
-        from app.models.institution import Institution
-        today = datetime.now().day
-        with Session(engine) as db:
-            institutions = list(db.exec(
-                select(Institution).where(
-                    Institution.is_active == True,
-                    Institution.quota_reset_day == today,
-                    Institution.quota_used_this_month > 0,
-                )
-            ).all())
-            for inst in institutions:
-                inst.quota_used_this_month = 0
-                db.add(inst)
-            if institutions:
-                db.commit()
-                log.info("Institution quota reset: %d institution(s) reset", len(institutions))
-    except Exception as e:
-        log.warning("Institution quota reset check failed: %s", e)
+def _reset_institution_quotas_if_due() -> int:
+    """Kurum kotalarını reset günü geldiyse sıfırla (başlangıçta ve günlük). Hata yükselir: iş failed kaydedilir."""
+    from app.models.institution import Institution
+    today = datetime.now().day
+    with Session(engine) as db:
+        institutions = list(db.exec(
+            select(Institution).where(
+                Institution.is_active == True,
+                Institution.quota_reset_day == today,
+                Institution.quota_used_this_month > 0,
+            )
+        ).all())
+        for inst in institutions:
+            inst.quota_used_this_month = 0
+            db.add(inst)
+        if institutions:
+            db.commit()
+            log.info("Institution quota reset: %d institution(s) reset", len(institutions))
+    return len(institutions)
+
+
+# ——— Zamanlanmış işler (app.services.scheduler: küme genelinde tek çalıştırma, geçmiş /admin/api/jobs) ———
+
+
+@scheduler.register("drip_campaign", "0 * * * *", timeout_s=900, enabled=lambda: settings.startup_run_drip_loop)
+def _job_drip_campaign():
+    from app.services.drip_campaign import process_drip_emails
+
+    sent = process_drip_emails(batch_size=50)
+    if sent:
+        log.info("Drip kampanya: %d e-posta gönderildi.", sent)
+    return f"sent={sent}"
+
+
+@scheduler.register("auto_renew", "0 */6 * * *", timeout_s=1800, retries=1, retry_backoff_s=600,
+                    enabled=lambda: settings.startup_run_maintenance_tasks)
+def _job_auto_renew():
+    from app.services.paytr_recurring import process_all_auto_renewals
+
+    with Session(engine) as db:
+        results = process_all_auto_renewals(db)
+    success_count = sum(1 for r in results if r.get("status") == "success")
+    if success_count:
+        log.info("AUTO_RENEW: %d kurum için başarılı yenileme yapıldı.", success_count)
+    return f"processed={len(results)} success={success_count}"
+
+
+@scheduler.register("auto_renew_pending_check", "40 * * * *", timeout_s=300,
+                    enabled=lambda: settings.startup_run_maintenance_tasks)
+def _job_auto_renew_pending_check():
+    from app.services.paytr_recurring import stale_pending_attempts
+
+    with Session(engine) as db:
+        stale = stale_pending_attempts(db)
+    if stale:
+        log.error(
+            "AUTO_RENEW: %d payment(s) with unknown outcome need reconciliation (/admin/api/auto-renew/pending): %s",
+            len(stale), ", ".join(a.merchant_oid for a in stale[:20]),
+        )
+    return f"stale_pending={len(stale)}"
+
+
+@scheduler.register("low_balance_alerts", "15 * * * *", timeout_s=600)
+def _job_low_balance_alerts():
+    from app.services.tenant_alert_service import check_and_send_low_balance_alerts
+
+    with Session(engine) as db:
+        sent = check_and_send_low_balance_alerts(db)
+    return f"sent={len(sent)}"
+
+
+# AI önbelleği worker'ın makinesindeki SQLite dosyası: kiralı iş yalnız kazananın dosyasını temizlerdi
+@scheduler.register("ai_cache_purge", "30 3 * * *", timeout_s=600, per_worker=True)
+def _job_ai_cache_purge():
+    return f"deleted={single_flight.purge_expired(_cache_conn)}"
+
+
+@scheduler.register("institution_quota_reset", "5 0 * * *", timeout_s=300,
+                    enabled=lambda: settings.startup_run_maintenance_tasks)
+def _job_institution_quota_reset():
+    return f"reset={_reset_institution_quotas_if_due()}"
+
+
+@scheduler.register("job_runs_prune", "45 3 * * *", timeout_s=300)
+def _job_job_runs_prune():
+    return f"deleted={scheduler.prune_runs(settings.scheduler_run_retention_days)}"
 
 
 @asynccontextmanager
@@ -328,7 +410,10 @@ async def lifespan(app: FastAPI):
     if settings.startup_run_maintenance_tasks:
         _seed_pricing_plan()
         _seed_default_coupon()
-        _reset_institution_quotas_if_due()
+        try:
+            _reset_institution_quotas_if_due()
+        except Exception as e:
+            log.warning("Institution quota reset check failed: %s", e)
     else:
         log.info("Startup maintenance görevleri kapalı (startup_run_maintenance_tasks=false).")
 
@@ -377,66 +462,31 @@ async def lifespan(app: FastAPI):
     else:
         log.info("Blog ikon doğrulaması startup'ta kapalı (startup_verify_blog_icons=false).")
 
-    # Drip loop startup'ta otomatik başlamaz (varsayılan kapalı).
-    if settings.startup_run_drip_loop:
-        def _drip_loop():
-            import time as _time
-            _INTERVAL = 3600  # 1 saat
-            _time.sleep(30)  # startup'tan 30s sonra ilk çalıştırma
-            while True:
-                try:
-                    from app.services.drip_campaign import process_drip_emails
-                    sent = process_drip_emails(batch_size=50)
-                    if sent:
-                        log.info("Drip kampanya: %d e-posta gönderildi.", sent)
-                except Exception as exc:
-                    log.warning("Drip kampanya hatası: %s", exc)
-                _time.sleep(_INTERVAL)
-
-        threading.Thread(target=_drip_loop, daemon=True, name="drip-campaign").start()
-        log.info("Drip kampanya thread başlatıldı (saatlik).")
-    else:
-        log.info("Drip kampanya otomatik thread kapalı (startup_run_drip_loop=false).")
-
-    # Auto-renew background task (her 6 saatte bir kontrol)
-    if settings.startup_run_maintenance_tasks:
-        def _auto_renew_loop():
-            import time as _time
-            _INTERVAL = 6 * 3600  # 6 saat
-            _time.sleep(60)  # startup'tan 60s sonra ilk çalıştırma
-            while True:
-                try:
-                    from app.core.database import SessionLocal
-                    from app.services.paytr_recurring import process_all_auto_renewals
-                    db = SessionLocal()
-                    try:
-                        results = process_all_auto_renewals(db)
-                        success_count = sum(1 for r in results if r.get("status") == "success")
-                        if success_count:
-                            log.info("AUTO_RENEW: %d kurum için başarılı yenileme yapıldı.", success_count)
-                    except Exception as exc:
-                        log.warning("AUTO_RENEW background hatası: %s", exc)
-                    finally:
-                        db.close()
-                except Exception as exc:
-                    log.warning("AUTO_RENEW loop genel hata: %s", exc)
-                _time.sleep(_INTERVAL)
-
-        threading.Thread(target=_auto_renew_loop, daemon=True, name="auto-renew").start()
-        log.info("Otomatik kredi yenileme thread başlatıldı (6 saatte bir).")
+    # Periyodik işler (drip, otomatik yenileme, bakiye uyarıları, önbellek temizliği) zamanlayıcıda
+    if settings.scheduler_enabled:
+        scheduler.start()
     else:
-        log.info("Otomatik kredi yenileme kapalı (startup_run_maintenance_tasks=false).")
+        log.info("Arka plan iş zamanlayıcısı kapalı (scheduler_enabled=false).")
 
     yield
 
+    # Kuyrukta bekleyen push bildirimlerini gönder
+    from app.services.push_dispatch import shutdown_push_dispatcher
+    shutdown_push_dispatcher()
+    # PDF çıkarma worker süreçleri
+    from app.services.pdf_extract import shutdown_pool
+    shutdown_pool()
+    # Çalışan işler bitirilir; yetişmeyenler interrupted kaydedilip kiraları bırakılır
+    scheduler.shutdown()
+
 
 app = FastAPI(
     title="Norya API",
     description="Kan tahlili açıklama SaaS API",
     lifespan=lifespan,
 )
-# Render start command (önerilen):
-# gunicorn app.main:app -w 1 -k uvicorn.workers.UvicornWorker --bind 0.0.0.0:$PORT --timeout 120
+# Render start command (önerilen; ayarlar gunicorn.conf.py'de):
+# gunicorn -c gunicorn.conf.py app.main:app
 
 # Statik dosyalar: proje kökünde /static klasöründen servis edilir
 # NOT: İkinci mount (satır ~1029) kaldırıldı; buradaki tek mount yeterli.
@@ -472,6 +522,13 @@ async def tenant_resolver(request: Request, call_next):
     return await tenant_resolver_middleware(request, call_next)
 
 
+# Okuma replikası: birincile yazan kullanıcı kısa süre birincilden okur
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    """Replika yapılandırılmışsa, isteğin birincile yazıp yazmadığını izler."""
+    return await read_your_writes_middleware(request, call_next)
+
+
 @app.middleware("http")
 async def static_cache_control(request: Request, call_next):
     """Add Cache-Control headers for static assets to reduce render-blocking and improve PageSpeed."""
@@ -517,7 +574,7 @@ app.state.limiter = limiter
 
 # AI response cache: aynı analiz girdisi (normalize metin + dil + plan + model) tekrar gelirse OpenAI çağrılmaz
 AI_CACHE_TTL_DAYS = 30
-AI_CACHE_PROMPT_VERSION = 3  # 3 = risk_summary + explanation + tables; cache'de risk_summary dahil
+AI_CACHE_PROMPT_VERSION = 4  # 4 = sabit system öneki + sıkıştırılmış lab tablosu (prompt_budget); 3 = risk_summary dahil
 OPENAI_ANALYZE_MODEL = "gpt-4o-mini"
 # Şimdilik ücretsiz kullanıcı da premium grafikleri ve PDF'i görsün (test için; sonra False yapın)
 PREMIUM_VISIBLE_FOR_FREE = True
@@ -532,6 +589,65 @@ _cache_conn = get_cache_conn(_cache_db_path)
 init_ai_cache(_cache_conn)
 
 
+def _compute_cached_report(
+    text: str,
+    doctor_notes: str | None,
+    report_lang: str,
+    plan: str,
+    cache_plan: str,
+    labs_norm: dict,
+    cache_key: str,
+) -> dict:
+    """Önbellek kaçağında LLM analizini yapar ve yanıtı ai_cache'e yazar (single_flight.run compute'u)."""
+    log.info("CACHE MISS key=%s", cache_key[:16])
+    report_payload, usage = analyze_blood_test(
+        text,
+        detailed=True,
+        doctor_notes=doctor_notes,
+        lang=report_lang,
+        plan=plan,
+        labs_norm=labs_norm,
+    )
+    response_obj = {
+        "sonuc": report_payload["sonuc"],
+        "usage": usage or {},
+        "risk_summary": report_payload.get("risk_summary"),
+        "explanation": report_payload.get("explanation"),
+        "tables": report_payload.get("tables"),
+        "meta": report_payload.get("meta"),
+    }
+    if (report_payload.get("meta") or {}).get("degraded"):
+        # Kural tabanlı (bozulmuş mod) yanıt önbelleğe yazılmaz; kesinti bitince tam yorum üretilir
+        return response_obj
+    single_flight.store(
+        _cache_conn,
+        cache_key=cache_key,
+        created_at=now_iso(),
+        expires_at=expires_iso(AI_CACHE_TTL_DAYS),
+        model=OPENAI_ANALYZE_MODEL,
+        input_summary={"lang": report_lang, "plan": cache_plan, "labs_count": len(labs_norm.get("t", ""))},
+        response_obj=response_obj,
+    )
+    return response_obj
+
+
+def _compute_cached_image_report(prepared, report_lang: str, cache_key: str) -> dict:
+    """Görsel için önbellek kaçağı: hazırlanmış (küçültülmüş) görsel Vision'a gider, yanıt ai_cache'e yazılır."""
+    log.info("IMAGE CACHE MISS key=%s", cache_key[:16])
+    result, usage = analyze_blood_test_from_image(prepared.data, prepared.mime, lang=report_lang, detail=VISION_DETAIL)
+    response_obj = {"sonuc": result, "usage": usage or {}}
+    single_flight.store(
+        _cache_conn,
+        cache_key=cache_key,
+        created_at=now_iso(),
+        expires_at=expires_iso(AI_CACHE_TTL_DAYS),
+        model=OPENAI_ANALYZE_MODEL,
+        input_summary={"lang": report_lang, "plan": "image", "bytes": len(prepared.data), "phash": prepared.phash},
+        response_obj=response_obj,
+    )
+    return response_obj
+
+
 def _error_response(request: Request, status_code: int, detail: str) -> JSONResponse:
     rid = getattr(request.state, "request_id", None)
     body = {"error": detail, "status_code": status_code}
@@ -603,6 +719,16 @@ def validation_exception_handler(request: Request, exc: RequestValidationError)
 
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)  # custom handler for {"error":"Too many requests","detail":"..."}
 
+
+@app.exception_handler(KdfBusy)
+def kdf_busy_handler(request: Request, exc: KdfBusy) -> JSONResponse:
+    """Şifre hash havuzu dolu (giriş / kayıt seli): beklemeden 429, kısa Retry-After."""
+    return JSONResponse(
+        status_code=429,
+        content={"error": "Too many requests", "detail": "Sunucu yoğun, lütfen birkaç saniye sonra tekrar deneyin."},
+        headers={"Retry-After": "2"},
+    )
+
 # Tüm istekler için IP bazlı rate limit (SlowAPI middleware)
 app.add_middleware(SlowAPIMiddleware)
 
@@ -809,6 +935,8 @@ app.add_middleware(
     allow_credentials=_cors_allow_credentials,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Keyset sayfalama: gövdesi liste kalan uç noktalar cursor'ı başlıkta döner
+    expose_headers=["X-Next-Cursor", "X-Prev-Cursor", "X-Total-Estimate", "ETag"],
 )
 
 
@@ -881,6 +1009,9 @@ app.include_router(tenant_features_router)
 from app.api.tenant_users import router as tenant_users_router
 app.include_router(tenant_users_router)
 
+# Mobil delta-sync API (kompakt geçmiş + ETag'li rapor gövdesi)
+app.include_router(mobile_sync_router)
+
 
 # Ana sayfa (/) en başta kaydedilsin; GET, HEAD, OPTIONS, POST desteklensin, 405 önlensin
 @app.get("/")
@@ -1060,20 +1191,18 @@ def health():
 
 
 # /health/ai: OpenAI erişim kontrolü, 60 sn TTL cache (admin dashboard için)
-_AI_HEALTH_CACHE: dict = {"ts": 0.0, "data": None}
 _AI_HEALTH_CACHE_TTL = 60.0
+_ai_health_cache = shared_cache.namespace("ai_health", ttl=_AI_HEALTH_CACHE_TTL)
 
 
 @app.get("/health/ai")
 def health_ai():
     """AI (OpenAI) durumu: status, provider, latency_ms, error. 60 sn cache."""
-    import time as _time
     from app.services.analyze import ping_openai
 
-    now = _time.time()
-    cache = _AI_HEALTH_CACHE
-    if cache["data"] is not None and (now - cache["ts"]) < _AI_HEALTH_CACHE_TTL:
-        return cache["data"]
+    cached = _ai_health_cache.get("openai")
+    if cached is not None:
+        return cached
 
     ok, latency_ms, err = ping_openai()
     if ok:
@@ -1085,8 +1214,7 @@ def health_ai():
             "latency_ms": latency_ms,
             "error": err or "Bilinmeyen hata",
         }
-    cache["ts"] = now
-    cache["data"] = data
+    _ai_health_cache.set("openai", data)
     return data
 
 
@@ -1246,29 +1374,31 @@ CURRENCY_SYMBOLS = {
     "CZK": "Kč", "RSD": "дин.", "BAM": "KM",
 }
 
-# Otomatik kur: Frankfurter API (ECB kurları, günlük). Cache 6 saat.
-_EUR_RATES_CACHE: dict[str, float] = {}
-_EUR_RATES_CACHE_TIME: float = 0
+# Otomatik kur: Frankfurter API (ECB kurları, günlük). Cache 6 saat (worker'lar arası).
 _EUR_RATES_CACHE_TTL = 6 * 3600  # 6 saat saniye
+_eur_rates_cache = shared_cache.namespace("fx", ttl=_EUR_RATES_CACHE_TTL)
 
 
 def _fetch_eur_rates_live() -> dict[str, float]:
     """Frankfurter API ile güncel EUR kurlarını çeker. Hata/yanıt yoksa fallback döner."""
-    global _EUR_RATES_CACHE, _EUR_RATES_CACHE_TIME
-    now = time.time()
-    if _EUR_RATES_CACHE and (now - _EUR_RATES_CACHE_TIME) < _EUR_RATES_CACHE_TTL:
-        return _EUR_RATES_CACHE
-    try:
-        with urlopen("https://api.frankfurter.app/latest?from=EUR", timeout=4) as r:
+    cached = _eur_rates_cache.get("EUR")
+    if cached:
+        return cached
+    def _get(timeout: float) -> dict:
+        with urlopen("https://api.frankfurter.app/latest?from=EUR", timeout=timeout) as r:
             import json
-            data = json.loads(r.read().decode())
+            return json.loads(r.read().decode())
+
+    try:
+        # GET idempotent: yavaş yanıtta hedge; devre açıkken beklemeden yedek kurlar
+        data = upstream("frankfurter").call(_get, failure_on=(URLError, OSError), idempotent=True)
         rates = data.get("rates") or {}
         if isinstance(rates, dict) and rates:
             rates["EUR"] = 1.0
-            _EUR_RATES_CACHE = {k: float(v) for k, v in rates.items()}
-            _EUR_RATES_CACHE_TIME = now
-            return _EUR_RATES_CACHE
-    except (URLError, OSError, ValueError, KeyError):
+            fresh = {k: float(v) for k, v in rates.items()}
+            _eur_rates_cache.set("EUR", fresh)
+            return fresh
+    except (URLError, OSError, ValueError, KeyError, CircuitOpen):
         pass
     return EUR_RATES_FALLBACK.copy()
 
@@ -1438,7 +1568,7 @@ def get_push_vapid_public():
 @app.post("/api/push/subscribe")
 async def push_subscribe(
     request: Request,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """Kullanıcının push aboneliğini kaydeder (PWA bildirimleri için)."""
@@ -1473,7 +1603,7 @@ class MobilePushTokenRequest(BaseModel):
 @app.post("/api/push/register-mobile")
 async def register_mobile_push_token(
     body: MobilePushTokenRequest,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """Mobil uygulama (Expo) push token'ını kaydeder."""
@@ -1488,6 +1618,10 @@ async def register_mobile_push_token(
         )
     ).first()
     if existing:
+        # Uygulama yeniden kurulduysa daha önce pasifleşen token tekrar aktif olur
+        existing.is_active = True
+        existing.deactivated_at = None
+        existing.last_error = None
         db.add(existing)
     else:
         db.add(PushSubscription(user_id=user_id, endpoint=token, p256dh="", auth=""))
@@ -2980,11 +3114,12 @@ async def api_chat(request: Request):
         from app.services.analyze import _openai_create_with_fallback, _openai_safe_call
 
         def _create(client):
-            return _openai_safe_call(lambda: client.chat.completions.create(
+            return _openai_safe_call(lambda timeout: client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=messages,
                 max_tokens=500,
                 temperature=0.7,
+                timeout=timeout,
             ))
 
         response = _openai_create_with_fallback(_create)
@@ -4452,28 +4587,19 @@ def _client_ip(request: Request) -> str:
     return request.client.host if request.client else ""
 
 
-# 30/hour per user for /analyze and /analyze/upload (in-memory; key = user_id)
-_analyze_hourly: dict[str, list[float]] = {}
-_analyze_hourly_lock = threading.Lock()
+# 30/hour per user for /analyze and /analyze/upload (shared across workers; key = user_id, fixed hourly window)
 ANALYZE_HOURLY_LIMIT = 30
 HOUR_SECONDS = 3600.0
+_analyze_hourly = shared_cache.namespace("analyze_hourly", ttl=HOUR_SECONDS)
 
 
 def _check_analyze_hourly_limit(user_id: int) -> None:
-    """Raises HTTPException 429 if this user has >= ANALYZE_HOURLY_LIMIT analyses in the last hour."""
-    key = f"u_{user_id}"
-    now = time.time()
-    with _analyze_hourly_lock:
-        if key not in _analyze_hourly:
-            _analyze_hourly[key] = []
-        times = _analyze_hourly[key]
-        times[:] = [t for t in times if now - t < HOUR_SECONDS]
-        if len(times) >= ANALYZE_HOURLY_LIMIT:
-            raise HTTPException(
-                status_code=429,
-                detail="Too many analyses in the last hour. Please try again later.",
-            )
-        times.append(now)
+    """Raises HTTPException 429 if this user has > ANALYZE_HOURLY_LIMIT analyses in the current hour window."""
+    if _analyze_hourly.incr(f"u_{user_id}") > ANALYZE_HOURLY_LIMIT:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many analyses in the last hour. Please try again later.",
+        )
 
 
 def _audit(db: Session, event: str, user_id: int | None, ip: str | None, institution_id: int | None = None) -> None:
@@ -4571,10 +4697,12 @@ def _save_analysis(
     plan_type: str | None = None,
     institution_id: int | None = None,
     auto_commit: bool = True,
+    lang: str | None = None,
 ) -> int:
     """Save an analysis record to the database.
 
     Args:
+        lang: Report language; selects the full-text search stemming config.
         auto_commit: If False, caller is responsible for committing.
                      Use False when wallet deduction and analysis save
                      must be in the same transaction.
@@ -4590,11 +4718,15 @@ def _save_analysis(
         doctor_notes=doctor_notes,
         plan_type=pt,
         institution_id=institution_id,
+        lang=(lang or "").strip().lower()[:8] or None,
     )
     db.add(rec)
     if auto_commit:
         db.commit()
         db.refresh(rec)
+    else:
+        # Commit çağıranda; id'nin atanması için flush
+        db.flush()
     return rec.id or 0
 
 
@@ -4702,26 +4834,20 @@ def _is_test_mode(request: Request) -> bool:
 
 
 def _send_push_if_available(db: Session, user_id: int, user_name: str, analysis_id: int | None = None) -> None:
-    """Kullanıcının mobil push token'ı varsa bildirim gönderir."""
+    """Kullanıcının aktif mobil push token'ları varsa bildirimi gönderim kuyruğuna ekler."""
     try:
-        from app.services.push_notification import send_analysis_complete_notification
+        from app.services.push_notification import enqueue_analysis_complete_notifications
         tokens = db.exec(
-            select(PushSubscription).where(
+            select(PushSubscription.endpoint).where(
                 PushSubscription.user_id == user_id,
                 PushSubscription.p256dh == "",  # mobil token'lar boş p256dh ile kaydedilir
+                PushSubscription.is_active.is_(True),
             )
         ).all()
-        for sub in tokens:
-            try:
-                send_analysis_complete_notification(
-                    push_token=sub.endpoint,
-                    user_name=user_name,
-                    analysis_id=analysis_id,
-                )
-            except Exception:
-                log.warning("Push send failed for user %s token %s", user_id, sub.endpoint[:20])
+        if tokens:
+            enqueue_analysis_complete_notifications(list(tokens), user_name=user_name, analysis_id=analysis_id)
     except Exception:
-        pass
+        log.warning("Push enqueue failed for user %s", user_id)
 
 
 def _dev_override_plan(request: Request, user: User) -> str:
@@ -4817,71 +4943,59 @@ async def analyze(
             model=OPENAI_ANALYZE_MODEL,
             prompt_version=AI_CACHE_PROMPT_VERSION,
         )
-        cached = cache_get(_cache_conn, cache_key)
+        cached = single_flight.lookup(_cache_conn, cache_key)
+        if cached is None:
+            # Single-flight: aynı anahtarla uçuştaki hesaplama varsa (çift tıklama, mobil yeniden deneme,
+            # başka worker) onun sonucunu bekle; yoksa LLM çağrısını biz yaparız
+            report_payload, shared = await run_in_threadpool(
+                single_flight.run,
+                _cache_conn,
+                cache_key,
+                lambda: _compute_cached_report(text, doctor_notes, report_lang, plan, plan, labs_norm, cache_key),
+            )
+            if shared:
+                cached, report_payload = report_payload, None
+            else:
+                usage = report_payload.get("usage")
         if cached is not None:
             log.info("CACHE HIT key=%s", cache_key[:16])
             result = cached["sonuc"]
-        # Wallet deduction + analysis record in same transaction (atomicity)
-        wallet_result = _deduct_tenant_wallet(db, user.id or 0, _inst_id_for_save)
-        if not wallet_result["success"]:
-            db.rollback()
-            raise HTTPException(status_code=402, detail=wallet_result.get("error", "Insufficient credits"))
-        aid = _save_analysis(db, user.id or 0, text, result, "text", doctor_notes=doctor_notes, plan_type=plan, institution_id=_inst_id_for_save, auto_commit=False)
-        db.commit()
-        # Refresh the record after commit
-        rec = db.get(AnalysisRecord, aid)
-        if rec:
-            db.refresh(rec)
-        if job:
-            job.status = "done"
-            job.analysis_record_id = aid
-            job.duration_ms = int((time.perf_counter() - t0) * 1000)
-            db.add(job)
+            # Wallet deduction + analysis record in same transaction (atomicity)
+            wallet_result = _deduct_tenant_wallet(db, user.id or 0, _inst_id_for_save)
+            if not wallet_result["success"]:
+                db.rollback()
+                raise HTTPException(status_code=402, detail=wallet_result.get("error", "Insufficient credits"))
+            aid = _save_analysis(db, user.id or 0, text, result, "text", doctor_notes=doctor_notes, plan_type=plan, institution_id=_inst_id_for_save, auto_commit=False, lang=report_lang)
             db.commit()
-        _audit(db, "analyze", user.id, _client_ip(request), institution_id=_inst_id_for_save)
-        # Tenant audit log
-        if _inst_id_for_save:
-            _log_tenant_analysis(
-                db, _inst_id_for_save, user.id or 0, aid,
-                ip_address=_client_ip(request),
-                user_agent=request.headers.get("user-agent"),
+            # Refresh the record after commit
+            rec = db.get(AnalysisRecord, aid)
+            if rec:
+                db.refresh(rec)
+            if job:
+                job.status = "done"
+                job.analysis_record_id = aid
+                job.duration_ms = int((time.perf_counter() - t0) * 1000)
+                db.add(job)
+                db.commit()
+            _audit(db, "analyze", user.id, _client_ip(request), institution_id=_inst_id_for_save)
+            # Tenant audit log
+            if _inst_id_for_save:
+                _log_tenant_analysis(
+                    db, _inst_id_for_save, user.id or 0, aid,
+                    ip_address=_client_ip(request),
+                    user_agent=request.headers.get("user-agent"),
+                )
+            _send_push_if_available(db, user.id or 0, getattr(user, "full_name", ""), aid)
+            return _build_analyze_response(
+                result, aid, cached.get("risk_summary"), plan, user.id or 0, db, cached=True
             )
-        _send_push_if_available(db, user.id or 0, getattr(user, "full_name", ""), aid)
-        return _build_analyze_response(
-            result, aid, cached.get("risk_summary"), plan, user.id or 0, db, cached=True
-        )
-        log.info("CACHE MISS key=%s", cache_key[:16])
-        report_payload, usage = analyze_blood_test(
-            text,
-            detailed=True,
-            doctor_notes=doctor_notes,
-            lang=report_lang,
-            plan=plan,
-            labs_norm=labs_norm,
-        )
         result = report_payload["sonuc"]
-        cache_set(
-            _cache_conn,
-            cache_key=cache_key,
-            created_at=now_iso(),
-            expires_at=expires_iso(AI_CACHE_TTL_DAYS),
-            model=OPENAI_ANALYZE_MODEL,
-            input_summary={"lang": report_lang, "plan": plan, "labs_count": len(labs_norm.get("t", ""))},
-            response_obj={
-                "sonuc": result,
-                "usage": usage or {},
-                "risk_summary": report_payload["risk_summary"],
-                "explanation": report_payload["explanation"],
-                "tables": report_payload["tables"],
-                "meta": report_payload["meta"],
-            },
-        )
         # Wallet deduction + analysis record in same transaction (atomicity)
         wallet_result = _deduct_tenant_wallet(db, user.id or 0, _inst_id_for_save)
         if not wallet_result["success"]:
             db.rollback()
             raise HTTPException(status_code=402, detail=wallet_result.get("error", "Insufficient credits"))
-        aid = _save_analysis(db, user.id or 0, text, result, "text", doctor_notes=doctor_notes, plan_type=plan, institution_id=_inst_id_for_save, auto_commit=False)
+        aid = _save_analysis(db, user.id or 0, text, result, "text", doctor_notes=doctor_notes, plan_type=plan, institution_id=_inst_id_for_save, auto_commit=False, lang=report_lang)
         db.commit()
         # Refresh the record after commit
         rec = db.get(AnalysisRecord, aid)
@@ -4894,6 +5008,7 @@ async def analyze(
             if usage:
                 job.prompt_tokens = usage.get("prompt_tokens")
                 job.completion_tokens = usage.get("completion_tokens")
+                job.cached_tokens = usage.get("cached_tokens")
             db.add(job)
             db.commit()
         _audit(db, "analyze", user.id, _client_ip(request), institution_id=_inst_id_for_save)
@@ -4906,7 +5021,8 @@ async def analyze(
             )
         _send_push_if_available(db, user.id or 0, getattr(user, "full_name", ""), aid)
         return _build_analyze_response(
-            result, aid, report_payload.get("risk_summary"), plan, user.id or 0, db, cached=False
+            result, aid, report_payload.get("risk_summary"), plan, user.id or 0, db, cached=False,
+            degraded=(report_payload.get("meta") or {}).get("degraded"),
         )
     except ValueError as e:
         if job:
@@ -4935,6 +5051,30 @@ async def analyze(
         )
 
 
+@app.post("/analyze/preview")
+@limiter.limit("30/minute")
+async def analyze_preview(
+    request: Request,
+    user: User = Depends(get_current_user_or_dev_guest),
+):
+    """Anlık kural tabanlı önizleme (LLM yok, kayıt/kredi yok): /analyze yanıtı beklenirken gösterilir."""
+    try:
+        body = await request.json()
+    except Exception:
+        raise HTTPException(status_code=400, detail="Geçersiz JSON.")
+    text = (body.get("text") or "").strip()
+    if not text:
+        raise HTTPException(status_code=400, detail="Lütfen tahlil metnini girin veya PDF/görsel yükleyin.")
+    report_lang = _report_lang_from_request(request, body.get("lang"))
+    payload = degraded_blood_test_report(text, report_lang, _dev_override_plan(request, user), "preview")
+    return {
+        "sonuc": payload["sonuc"],
+        "risk_summary": payload["risk_summary"],
+        "tables": payload["tables"],
+        "degraded": "preview",
+    }
+
+
 @app.post("/analyze/upload", response_model=AnalyzeResponse)
 @limiter.limit("10/minute")
 async def analyze_upload(
@@ -5084,7 +5224,9 @@ async def _analyze_upload_impl(
             detail="Sadece PDF, JPG/JPEG veya PNG dosyalarını yükleyebilirsiniz.",
         )
     try:
-        return _process_uploaded_content(
+        # OCR, PDF çıkarımı ve single_flight beklemesi bloklar: olay döngüsü dışında çalışır
+        return await run_in_threadpool(
+            _process_uploaded_content,
             content, file.filename, report_lang, user.id or 0, db, request, save=True,
             plan=getattr(user, "plan", None) or "free",
             institution_id=_inst_id_for_save,
@@ -5106,6 +5248,7 @@ def _build_analyze_response(
     user_id: int,
     db: Session,
     cached: bool = False,
+    degraded: str | None = None,
 ) -> AnalyzeResponse:
     """Ortak: premiumPdf = single|monthly|yearly|pro (gauge+score+PDF), premiumTrend = monthly|yearly|pro (trend açık). PREMIUM_VISIBLE_FOR_FREE=True ise free de görür. Tek analiz ve aylıkta rapor ekranında sadece önizleme + kapı (hepsini görmek için aylık/yıllık)."""
     from app.core.plan_config import normalize_plan_type
@@ -5129,6 +5272,7 @@ def _build_analyze_response(
         ui_hints=UiHintsSchema(locked=not premium_pdf, report_limited_preview=report_limited_preview),
         pdf=PdfInfoSchema(template="premium" if premium_pdf else "basic", available=True),
         plan_type=plan_type,
+        degraded=degraded,
     )
 
 
@@ -5143,7 +5287,10 @@ def _process_uploaded_content(
     plan: str | None = None,
     institution_id: int | None = None,
 ) -> AnalyzeResponse:
-    """Ortak: yüklenen dosya içeriğini analiz eder (görsel veya PDF). Her zaman kaydeder (PDF/rapor için analiz_id döner)."""
+    """Ortak: yüklenen dosya içeriğini analiz eder (görsel veya PDF). Her zaman kaydeder (PDF/rapor için analiz_id döner).
+
+    Bloklayan çağrıdır (OCR, PDF havuzu, single_flight.run); async uç noktalardan run_in_threadpool ile çağrılır.
+    """
     ext = "." + filename.lower().rsplit(".", 1)[-1] if "." in filename else ""
     if ext not in ALLOWED_UPLOAD_EXTENSIONS:
         raise HTTPException(status_code=400, detail="Sadece PDF, JPG/JPEG veya PNG yükleyebilirsiniz.")
@@ -5155,21 +5302,57 @@ def _process_uploaded_content(
         db.refresh(ul)
     t0 = time.perf_counter()
     try:
+        ocr = None
+        image_key = image_report = None
         if ext in IMAGE_EXTENSIONS:
-            mime = MIME_MAP.get(ext, "image/jpeg")
+            # Küçültülmüş görselin parmak izi + dil + prompt sürümü → aynı fotoğrafın tekrar yüklenmesi OpenAI'ye gitmez
+            prepared = prepare_image(content, MIME_MAP.get(ext, "image/jpeg"), detail=VISION_DETAIL)
+            log.info(
+                "image intake: %s -> %s bytes (%sx%s) phash=%s",
+                prepared.original_bytes, len(prepared.data), prepared.width, prepared.height, prepared.phash or "-",
+            )
+            image_key = make_cache_key(
+                labs_norm={"img": prepared.fingerprint, "ph": prepared.phash},
+                lang=report_lang,
+                plan="image",
+                model=OPENAI_ANALYZE_MODEL,
+                prompt_version=AI_CACHE_PROMPT_VERSION,
+            )
+            image_report = single_flight.lookup(_cache_conn, image_key)
+            if image_report is None:
+                # Önbellek kaçağı: yerel OCR yeterli biyobelirteç okursa görsel Vision yerine PDF ile ortak metin yoluna gider
+                ocr = ocr_image(content)
+        if ext in IMAGE_EXTENSIONS and not (ocr and ocr.accepted):
             job = AnalysisJob(user_id=user_id, status="processing") if save else None
             if job:
                 db.add(job)
                 db.commit()
                 db.refresh(job)
-            result, usage = analyze_blood_test_from_image(content, mime, lang=report_lang)
+            try:
+                if image_report is not None:
+                    log.info("IMAGE CACHE HIT key=%s", image_key[:16])
+                    shared = True
+                else:
+                    image_report, shared = single_flight.run(
+                        _cache_conn,
+                        image_key,
+                        lambda: _compute_cached_image_report(prepared, report_lang, image_key),
+                    )
+            except HTTPException as exc:
+                # Vision erişilemez: OCR'ın okuyabildiği değerlerden kural tabanlı rapor (yetersiz olsa da boş rapordan iyi).
+                # Anahtar/billing hatası geçici değil: sessizce bozulmuş rapora düşülmez.
+                if isinstance(exc, LlmConfigError) or exc.status_code not in (429, 502, 503) or not (ocr and ocr.lab_values):
+                    raise
+                image_report, shared = degraded_blood_test_report(ocr.text, report_lang, plan or "free", "llm_unavailable"), False
+            result = image_report["sonuc"]
+            usage = None if shared else image_report.get("usage")
             input_preview = f"[Görsel: {filename}]"
             # Wallet deduction + analysis record in same transaction (atomicity)
             wallet_result = _deduct_tenant_wallet(db, user_id, institution_id)
             if not wallet_result["success"]:
                 db.rollback()
                 raise HTTPException(status_code=402, detail=wallet_result.get("error", "Insufficient credits"))
-            aid = _save_analysis(db, user_id, input_preview, result, "image", plan_type=plan, institution_id=institution_id, auto_commit=False)
+            aid = _save_analysis(db, user_id, input_preview, result, "image", plan_type=plan, institution_id=institution_id, auto_commit=False, lang=report_lang)
             db.commit()
             rec = db.get(AnalysisRecord, aid)
             if rec:
@@ -5181,6 +5364,7 @@ def _process_uploaded_content(
                 if usage:
                     job.prompt_tokens = usage.get("prompt_tokens")
                     job.completion_tokens = usage.get("completion_tokens")
+                    job.cached_tokens = usage.get("cached_tokens")
                 db.add(job)
                 db.commit()
             _attach_original_file(db, aid, content, filename, "image")
@@ -5192,24 +5376,59 @@ def _process_uploaded_content(
             _audit(db, "analyze", user_id, _client_ip(request), institution_id=institution_id)
             _send_push_if_available(db, user_id, getattr(db.get(User, user_id), "full_name", ""), aid)
             plan = plan or (getattr(db.get(User, user_id), "plan", None) or "free")
-            return _build_analyze_response(result, aid, None, plan, user_id, db, cached=False)
-        text = extract_text_from_pdf(content)
-        if "çıkarılamadı" in text:
-            raise HTTPException(status_code=400, detail="PDF'den metin okunamadı. Farklı bir dosya deneyin.")
+            route_stats.record("vision", time.perf_counter() - t0)
+            return _build_analyze_response(
+                result, aid, image_report.get("risk_summary"), plan, user_id, db, cached=shared,
+                degraded=(image_report.get("meta") or {}).get("degraded"),
+            )
+        if ocr and ocr.accepted:
+            text, source, route = ocr.text, "image", "ocr_text"
+        else:
+            text, source, route = extract_text_from_pdf(content), "pdf", "pdf_text"
+            if "çıkarılamadı" in text:
+                # Metin katmanı yok (taranmış PDF): gömülü sayfa görselleri yerel OCR'dan geçer
+                ocr = ocr_pdf(content)
+                if not (ocr and ocr.accepted):
+                    raise HTTPException(status_code=400, detail="PDF'den metin okunamadı. Farklı bir dosya deneyin.")
+                text, route = ocr.text, "ocr_text"
         job = AnalysisJob(user_id=user_id, status="processing") if save else None
         if job:
             db.add(job)
             db.commit()
             db.refresh(job)
         labs_norm = {"t": " ".join(text.split()).strip(), "dn": None}
-        report_payload, usage = analyze_blood_test(text, lang=report_lang, plan="free", labs_norm=labs_norm)
+        cache_key = make_cache_key(
+            labs_norm=labs_norm,
+            lang=report_lang,
+            plan="free",
+            model=OPENAI_ANALYZE_MODEL,
+            prompt_version=AI_CACHE_PROMPT_VERSION,
+        )
+        # Aynı PDF'in tekrar yüklenmesi (kurumsal yeniden yükleme, mobil yeniden deneme) tek LLM çağrısını paylaşır
+        report_payload, shared = single_flight.run(
+            _cache_conn,
+            cache_key,
+            lambda: _compute_cached_report(text, None, report_lang, "free", "free", labs_norm, cache_key),
+        )
+        usage = None if shared else report_payload.get("usage")
         result = report_payload["sonuc"]
+        if image_key and not (report_payload.get("meta") or {}).get("degraded"):
+            # Aynı fotoğraf tekrar yüklenince görsel anahtarında bulunur; OCR yeniden çalışmaz
+            single_flight.store(
+                _cache_conn,
+                cache_key=image_key,
+                created_at=now_iso(),
+                expires_at=expires_iso(AI_CACHE_TTL_DAYS),
+                model=OPENAI_ANALYZE_MODEL,
+                input_summary={"lang": report_lang, "plan": "image", "route": "ocr_text"},
+                response_obj=report_payload,
+            )
         # Wallet deduction + analysis record in same transaction (atomicity)
         wallet_result = _deduct_tenant_wallet(db, user_id, institution_id)
         if not wallet_result["success"]:
             db.rollback()
             raise HTTPException(status_code=402, detail=wallet_result.get("error", "Insufficient credits"))
-        aid = _save_analysis(db, user_id, text[:2000], result, "pdf", plan_type=plan, institution_id=institution_id, auto_commit=False)
+        aid = _save_analysis(db, user_id, text[:2000], result, source, plan_type=plan, institution_id=institution_id, auto_commit=False, lang=report_lang)
         db.commit()
         rec = db.get(AnalysisRecord, aid)
         if rec:
@@ -5221,9 +5440,10 @@ def _process_uploaded_content(
             if usage:
                 job.prompt_tokens = usage.get("prompt_tokens")
                 job.completion_tokens = usage.get("completion_tokens")
+                job.cached_tokens = usage.get("cached_tokens")
             db.add(job)
             db.commit()
-        _attach_original_file(db, aid, content, filename, "pdf")
+        _attach_original_file(db, aid, content, filename, source)
         if ul:
             ul.status = "success"
             ul.duration_ms = int((time.perf_counter() - t0) * 1000)
@@ -5232,7 +5452,11 @@ def _process_uploaded_content(
         _audit(db, "analyze", user_id, _client_ip(request), institution_id=institution_id)
         _send_push_if_available(db, user_id, getattr(db.get(User, user_id), "full_name", ""), aid)
         plan = plan or (getattr(db.get(User, user_id), "plan", None) or "free")
-        return _build_analyze_response(result, aid, report_payload.get("risk_summary"), plan, user_id, db, cached=False)
+        route_stats.record(route, time.perf_counter() - t0)
+        return _build_analyze_response(
+            result, aid, report_payload.get("risk_summary"), plan, user_id, db, cached=shared,
+            degraded=(report_payload.get("meta") or {}).get("degraded"),
+        )
     except Exception as e:
         try:
             db.rollback()
@@ -5301,7 +5525,8 @@ async def analyze_upload_json(
         raise HTTPException(status_code=400, detail="Dosya boş.")
     report_lang = _report_lang_from_request(request, body.lang)
     _inst_id_for_save = _active_inst.id if _active_inst else None
-    return _process_uploaded_content(
+    return await run_in_threadpool(
+        _process_uploaded_content,
         content, body.filename or "upload", report_lang, user.id or 0, db, request, save=not test_mode,
         plan=getattr(user, "plan", None) or "free",
         institution_id=_inst_id_for_save,
@@ -5430,45 +5655,24 @@ async def analyze_guest(
             model=OPENAI_ANALYZE_MODEL,
             prompt_version=AI_CACHE_PROMPT_VERSION,
         )
-        cached = cache_get(_cache_conn, cache_key)
+        cached = single_flight.lookup(_cache_conn, cache_key)
         if cached is not None:
             log.info("GUEST CACHE HIT key=%s", cache_key[:16])
-            result = cached["sonuc"]
-            risk_summary = cached.get("risk_summary")
         else:
-            log.info("GUEST CACHE MISS key=%s", cache_key[:16])
-            report_payload, usage = analyze_blood_test(
-                text,
-                detailed=True,
-                doctor_notes=None,
-                lang=report_lang,
-                plan="free",
-                labs_norm=labs_norm,
-            )
-            result = report_payload["sonuc"]
-            risk_summary = report_payload.get("risk_summary")
-            cache_set(
+            cached, _ = await run_in_threadpool(
+                single_flight.run,
                 _cache_conn,
-                cache_key=cache_key,
-                created_at=now_iso(),
-                expires_at=expires_iso(AI_CACHE_TTL_DAYS),
-                model=OPENAI_ANALYZE_MODEL,
-                input_summary={"lang": report_lang, "plan": "guest", "labs_count": len(labs_norm.get("t", ""))},
-                response_obj={
-                    "sonuc": result,
-                    "usage": usage or {},
-                    "risk_summary": risk_summary,
-                    "explanation": report_payload.get("explanation"),
-                    "tables": report_payload.get("tables"),
-                    "meta": report_payload.get("meta"),
-                },
+                cache_key,
+                lambda: _compute_cached_report(text, None, report_lang, "free", "guest", labs_norm, cache_key),
             )
+        result = cached["sonuc"]
+        risk_summary = cached.get("risk_summary")
 
         # Guest için sınırlı sonuç oluştur
         guest_response = _build_guest_response(result, risk_summary)
 
         # Analizi kaydet (anonymous user'a)
-        aid = _save_analysis(db, anon_user.id or 0, text[:2000], result, "text", plan_type="guest")
+        aid = _save_analysis(db, anon_user.id or 0, text[:2000], result, "text", plan_type="guest", lang=report_lang)
 
         log.info("Guest analysis completed: aid=%s, ip=%s", aid, ip)
         return guest_response
@@ -5524,34 +5728,46 @@ def analyze_usage(
 
 @app.get("/analyze/history", response_model=list[AnalysisHistoryItem])
 def analyze_history(
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    user: Principal = Depends(get_principal),
+    db: Session = Depends(get_read_db),
     limit: int = 50,
     source: str | None = Query(None, description="Filtre: text, pdf, image"),
     q: str | None = Query(None, description="Arama (giriş veya sonuç metninde)"),
     favorite_only: bool = Query(False, description="Sadece favoriler"),
+    cursor: str | None = Query(None, description="Önceki yanıtın X-Next-Cursor / X-Prev-Cursor başlığı"),
 ):
-    """Kullanıcının analiz geçmişini döner.
+    """Kullanıcının analiz geçmişini döner (en yeni önce).
+    Gövde geriye dönük uyumluluk için düz liste; sayfalama cursor'ı X-Next-Cursor başlığında.
     SEO: X-Robots-Tag: noindex, nofollow — authenticated user-specific endpoint.
     """
     from fastapi.responses import JSONResponse
 
-    stmt = (
-        select(AnalysisRecord)
-        .where(AnalysisRecord.user_id == user.id)
-        .order_by(AnalysisRecord.created_at.desc())
-        .limit(limit)
-    )
-    if source and source.strip():
-        stmt = stmt.where(AnalysisRecord.source == source.strip().lower())
-    if getattr(AnalysisRecord, "is_favorite", None) is not None and favorite_only:
-        stmt = stmt.where(AnalysisRecord.is_favorite == True)
+    source = source.strip().lower() if source and source.strip() else None
+    limit = max(1, min(limit, 200))
+    snippets: dict[int, str] = {}
+    page = None
     if q and q.strip():
-        q = q.strip()
-        stmt = stmt.where(
-            or_(AnalysisRecord.input_text.contains(q), AnalysisRecord.result_text.contains(q))
+        # Tam metin arama: alaka sırasına göre (FTS5 / tsvector), vurgulu önizlemeyle
+        from app.services.search import search_analyses
+
+        hits = search_analyses(
+            db, q.strip(), user_id=user.id, source=source, favorite_only=favorite_only, limit=limit,
         )
-    rows = list(db.exec(stmt).all())
+        snippets = {h.analysis_id: h.snippet for h in hits}
+        by_id = {}
+        if snippets:
+            by_id = {r.id: r for r in db.exec(select(AnalysisRecord).where(AnalysisRecord.id.in_(list(snippets)))).all()}
+        rows = [by_id[h.analysis_id] for h in hits if h.analysis_id in by_id]
+    else:
+        stmt = select(AnalysisRecord).where(AnalysisRecord.user_id == user.id)
+        if source:
+            stmt = stmt.where(AnalysisRecord.source == source)
+        if getattr(AnalysisRecord, "is_favorite", None) is not None and favorite_only:
+            stmt = stmt.where(AnalysisRecord.is_favorite == True)
+        page = keyset_page(
+            db, stmt, ts_col=AnalysisRecord.created_at, id_col=AnalysisRecord.id, cursor=cursor, limit=limit,
+        )
+        rows = page.items
     data = [
         AnalysisHistoryItem(
             id=r.id or 0,
@@ -5560,61 +5776,40 @@ def analyze_history(
             source=r.source,
             created_at=r.created_at.isoformat() if hasattr(r.created_at, "isoformat") else str(r.created_at),
             is_favorite=getattr(r, "is_favorite", False),
+            snippet=snippets.get(r.id or 0),
         )
         for r in rows
     ]
     return JSONResponse(
-        content=data,
+        content=[d.model_dump() for d in data],
         headers={
             "X-Robots-Tag": "noindex, nofollow",
+            **(page.headers() if page else {}),
         },
     )
 
 
 @app.get("/analyze/export")
 def analyze_export(
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    format: str = Query("json", description="json | ndjson | csv | zip"),
+    user: Principal = Depends(get_principal),
 ):
-    """Kullanıcının tüm analizlerini JSON olarak döner (KVKK/GDPR veri taşınabilirliği).
+    """Kullanıcının tüm analizlerini dışa aktarır (KVKK/GDPR veri taşınabilirliği).
+    Kayıtlar sunucu taraflı cursor ile akıtılır; bellek kullanımı kayıt sayısından bağımsızdır.
     SEO: X-Robots-Tag: noindex, nofollow — authenticated user-specific endpoint.
     """
-    from fastapi.responses import JSONResponse
+    from app.services.export_stream import EXPORT_FORMATS, export_response, export_statement
 
-    stmt = (
-        select(AnalysisRecord)
-        .where(AnalysisRecord.user_id == user.id)
-        .order_by(AnalysisRecord.created_at.desc())
-    )
-    rows = list(db.exec(stmt).all())
-    data = {
-        "exported_at": datetime.utcnow().isoformat() + "Z",
-        "analyses": [
-            {
-                "id": r.id,
-                "input_text": r.input_text,
-                "result_text": r.result_text,
-                "source": r.source,
-                "created_at": r.created_at.isoformat() if hasattr(r.created_at, "isoformat") else str(r.created_at),
-                "doctor_notes": getattr(r, "doctor_notes", None),
-            }
-            for r in rows
-        ],
-    }
-    return JSONResponse(
-        content=data,
-        media_type="application/json",
-        headers={
-            "Content-Disposition": "attachment; filename=norya-verilerim.json",
-            "X-Robots-Tag": "noindex, nofollow",
-        },
-    )
+    fmt = (format or "json").strip().lower()
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Desteklenmeyen format (json, ndjson, csv, zip).")
+    return export_response(export_statement(user_id=user.id), fmt, "norya-verilerim")
 
 
 @app.get("/analyze/history/{analysis_id}", response_model=AnalysisDetail)
 def analyze_history_detail(
     analysis_id: int,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """Kullanıcının tek bir analiz detayını döner.
@@ -5643,7 +5838,7 @@ def analyze_history_detail(
 @app.patch("/analyze/history/{analysis_id}")
 def analyze_history_toggle_favorite(
     analysis_id: int,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     """Favori işaretini aç/kapa.
@@ -5753,20 +5948,15 @@ def download_analysis_pdf(
     # PDF cache şema versiyonu: çıktı yapısı değiştiğinde eski PDF'ler yerine yenileri üretmek için anahtara eklenir.
     _PDF_SCHEMA_VERSION = 6  # Sağlık yaşı: dürüst etiket + feragatname (std/monthly/premium PDF)
     cache_key = (analysis_id, report_lang, "pro" if use_pro_scope else "std", plan_for_pdf or "free", _PDF_SCHEMA_VERSION)
-    now_ts = time.time()
-    with _pdf_cache_lock:
-        if cache_key in _pdf_cache:
-            cached_bytes, cached_at = _pdf_cache[cache_key]
-            if now_ts - cached_at < _PDF_CACHE_TTL_SEC:
-                filename = f"norya-rapor-{analysis_id}.pdf"
-                disp = "attachment" if (disposition or "").strip().lower() == "attachment" else "inline"
-                return Response(
-                    content=cached_bytes,
-                    media_type="application/pdf",
-                    headers={"Content-Disposition": f'{disp}; filename="{filename}"'},
-                )
-            else:
-                del _pdf_cache[cache_key]
+    cached_bytes = _pdf_cache.get(cache_key)
+    if cached_bytes is not None:
+        filename = f"norya-rapor-{analysis_id}.pdf"
+        disp = "attachment" if (disposition or "").strip().lower() == "attachment" else "inline"
+        return Response(
+            content=cached_bytes,
+            media_type="application/pdf",
+            headers={"Content-Disposition": f'{disp}; filename="{filename}"'},
+        )
     trend_data = _get_trend_for_user(db, user_id, exclude_analysis_id=analysis_id) if premium_trend else None
     verify_base_url = _public_base_url_for_pdf_verify(request)
     from app.core.plan_config import normalize_plan_type
@@ -5791,8 +5981,7 @@ def download_analysis_pdf(
     except Exception as e:
         log.exception("PDF build failed for analysis_id=%s: %s", analysis_id, e)
         raise HTTPException(status_code=500, detail=f"PDF oluşturulamadı: {e!s}")
-    with _pdf_cache_lock:
-        _pdf_cache[cache_key] = (pdf_bytes, time.time())
+    _pdf_cache.set(cache_key, pdf_bytes)
     filename = f"norya-rapor-{analysis_id}.pdf"
     disp = "attachment" if (disposition or "").strip().lower() == "attachment" else "inline"
     # MinIO açıksa yükle ve presigned URL ile yönlendir; frontend MinIO'dan indirir
@@ -5875,7 +6064,7 @@ def download_doctor_pdf(
 @app.post("/analyze/share/{analysis_id}")
 def create_share_link(
     analysis_id: int,
-    user: User = Depends(get_current_user),
+    user: Principal = Depends(get_principal),
     db: Session = Depends(get_db),
 ):
     rec = db.get(AnalysisRecord, analysis_id)
@@ -5949,6 +6138,24 @@ def _paytr_amount_and_currency(amount_eur_cents: int) -> tuple[int, str]:
     return (amount_eur_cents, currency)
 
 
+def _paytr_get_token(post_vals: dict) -> dict:
+    """PayTR get-token POST'u. Tekrar yok (ödeme isteği); devre açıkken beklemeden CircuitOpen."""
+    from urllib.parse import urlencode
+    from urllib.request import Request as UrlRequest
+
+    def _post(timeout: float) -> dict:
+        req = UrlRequest(
+            "https://www.paytr.com/odeme/api/get-token",
+            data=urlencode(post_vals).encode(),
+            method="POST",
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        with urlopen(req, timeout=timeout) as resp:
+            return json.loads(resp.read().decode())
+
+    return upstream("paytr").call(_post, failure_on=(URLError, OSError))
+
+
 def _paytr_reason_to_detail(reason: str | None) -> str:
     """PayTR 'reason' metnini kullanıcıya gösterilecek Türkçe mesaja çevirir."""
     if not reason:
@@ -6029,24 +6236,8 @@ def _paytr_init_impl(body: PaytrInitRequest, request: Request, current_user: Use
     if not user and (body.email or "").strip():
         email = (body.email or "").strip().lower()
         if "@" in email:
-            stmt = select(User).where(User.email == email)
-            user = db.exec(stmt).first()
-            if not user:
-                try:
-                    user = User(
-                        email=email,
-                        hashed_password=hash_password("guest_" + secrets.token_hex(32)),
-                        full_name=(body.name or "").strip()[:200] or "",
-                    )
-                    db.add(user)
-                    db.commit()
-                    db.refresh(user)
-                except SQLIntegrityError:
-                    db.rollback()
-                    user = db.exec(select(User).where(User.email == email)).first()
-                except Exception:
-                    db.rollback()
-                    raise
+            # Ödeme misafiri: giriş yapılamayan hesap (kayıtta claim edilir), KDF yok
+            user = get_or_create_passwordless_user(db, email, full_name=(body.name or "").strip()[:200] or "")
     if not user:
         raise HTTPException(
             status_code=400,
@@ -6109,8 +6300,6 @@ def _paytr_init_impl(body: PaytrInitRequest, request: Request, current_user: Use
     import base64
     import hmac
     import hashlib
-    from urllib.parse import urlencode
-    from urllib.request import urlopen, Request as UrlRequest
 
     raw_mid = (settings.paytr_merchant_id or "").strip()
     merchant_id = raw_mid.replace("Value:", "").strip() if raw_mid else ""
@@ -6188,14 +6377,7 @@ def _paytr_init_impl(body: PaytrInitRequest, request: Request, current_user: Use
         "lang": paytr_lang,
     }
     try:
-        req = UrlRequest(
-            "https://www.paytr.com/odeme/api/get-token",
-            data=urlencode(post_vals).encode(),
-            method="POST",
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-        )
-        with urlopen(req, timeout=20) as resp:
-            result = json.loads(resp.read().decode())
+        result = _paytr_get_token(post_vals)
     except Exception as e:
         order.status = "failed"
         order.admin_note = "init_failed"
@@ -6716,8 +6898,6 @@ def payment_get_token(
     import hmac
     import hashlib
     import json
-    from urllib.parse import urlencode
-    from urllib.request import urlopen, Request as UrlRequest
 
     merchant_oid = f"norya{user.id}{int(datetime.now(timezone.utc).timestamp())}{secrets.token_hex(4)}"
     amount = _paytr_amount(body.product, db)
@@ -6788,14 +6968,7 @@ def payment_get_token(
         "test_mode": test_mode,
     }
     try:
-        req = UrlRequest(
-            "https://www.paytr.com/odeme/api/get-token",
-            data=urlencode(post_vals).encode(),
-            method="POST",
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-        )
-        with urlopen(req, timeout=20) as resp:
-            result = json.loads(resp.read().decode())
+        result = _paytr_get_token(post_vals)
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"PayTR bağlantı hatası: {str(e)[:80]}")
 
@@ -6824,17 +6997,7 @@ def payment_get_token_guest(
     email = (body.email or "").strip().lower()
     if not email or "@" not in email:
         raise HTTPException(status_code=400, detail="Geçerli bir e-posta adresi girin.")
-    stmt = select(User).where(User.email == email)
-    user = db.exec(stmt).first()
-    if not user:
-        user = User(
-            email=email,
-            hashed_password=hash_password("guest_" + secrets.token_hex(32)),
-            full_name=(body.full_name or "").strip()[:200] or "",
-        )
-        db.add(user)
-        db.commit()
-        db.refresh(user)
+    user = get_or_create_passwordless_user(db, email, full_name=(body.full_name or "").strip()[:200] or "")
     user_id = user.id or 0
     merchant_oid = f"noryag{user_id}{int(datetime.now(timezone.utc).timestamp())}{secrets.token_hex(4)}"
     amount = _paytr_amount("single", db)
@@ -6868,8 +7031,6 @@ def payment_get_token_guest(
     import hmac
     import hashlib
     import json
-    from urllib.parse import urlencode
-    from urllib.request import urlopen, Request as UrlRequest
 
     merchant_id = settings.paytr_merchant_id
     merchant_key = settings.paytr_merchant_key.encode() if isinstance(settings.paytr_merchant_key, str) else settings.paytr_merchant_key
@@ -6910,14 +7071,7 @@ def payment_get_token_guest(
         "test_mode": test_mode,
     }
     try:
-        req = UrlRequest(
-            "https://www.paytr.com/odeme/api/get-token",
-            data=urlencode(post_vals).encode(),
-            method="POST",
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-        )
-        with urlopen(req, timeout=20) as resp:
-            result = json.loads(resp.read().decode())
+        result = _paytr_get_token(post_vals)
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"PayTR bağlantı hatası: {str(e)[:80]}")
     if result.get("status") != "success":
@@ -7594,7 +7748,7 @@ def payment_grant(
 @app.post("/admin/cache/purge-expired")
 def admin_cache_purge_expired(_admin: None = Depends(require_admin_secret_or_cookie)):
     """Süresi dolan ai_cache kayıtlarını siler."""
-    deleted = purge_ai_cache_expired(_cache_conn)
+    deleted = single_flight.purge_expired(_cache_conn)
     return {"deleted": deleted}
 
 
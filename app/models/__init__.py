@@ -1,8 +1,10 @@
 from .tenant_wallet_transaction import TenantWalletTransaction
 from .tenant_audit_log import TenantAuditLog
+from .tenant_daily_stat import TenantDailyStat
 from .tenant_api_key import TenantApiKey
 from .analysis import AnalysisRecord
 from .analysis_job import AnalysisJob
+from .auto_renew_attempt import AutoRenewAttempt
 from .audit import AuditLog
 from .blog import BlogPost
 from .discount import DiscountCode
@@ -18,6 +20,7 @@ from .payment import PaymentOrder
 from .presence import Presence
 from .referral import ReferralCode, ReferralUsage
 from .report_verification import ReportVerification
+from .scheduled_job import JobRun, ScheduledJob
 from .security_log import SecurityLog
 from .tokens import EmailVerifyToken, GuestLoginToken, PasswordResetToken, ShareToken
 from .push_subscription import PushSubscription
@@ -28,6 +31,7 @@ from .user_registration import UserRegistration
 __all__ = [
     "AnalysisRecord",
     "AnalysisJob",
+    "AutoRenewAttempt",
     "AuditLog",
     "BlogPost",
     "DiscountCode",
@@ -40,6 +44,7 @@ __all__ = [
     "InstitutionMembership",
     "TenantWalletTransaction",
     "TenantAuditLog",
+    "TenantDailyStat",
     "TenantApiKey",
     "EmailLead",
     "PricingPlan",
@@ -50,6 +55,8 @@ __all__ = [
     "ReferralCode",
     "ReferralUsage",
     "ReportVerification",
+    "JobRun",
+    "ScheduledJob",
     "SecurityLog",
     "UploadLog",
     "EmailVerifyToken",
@@ -1,5 +1,6 @@
 from datetime import datetime
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 
@@ -9,6 +10,13 @@ PLAN_TYPE_DEFAULT = "single"
 
 
 class AnalysisRecord(SQLModel, table=True):
+    # Mobil delta-sync: kullanıcı bazında (updated_at, id); geçmiş/admin listeleri: (created_at, id) keyset taraması
+    __table_args__ = (
+        Index("ix_analysisrecord_user_updated", "user_id", "updated_at", "id"),
+        Index("ix_analysisrecord_user_created", "user_id", "created_at", "id"),
+        Index("ix_analysisrecord_created_id", "created_at", "id"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id", index=True)
     input_text: str
@@ -16,6 +24,8 @@ class AnalysisRecord(SQLModel, table=True):
     source: str = "text"  # "text" | "pdf" | "image"
     doctor_notes: str | None = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Her ORM güncellemesinde (favori, doktor notu) ilerler; mobil sync ve rapor ETag'i buna dayanır
+    updated_at: datetime | None = Field(default_factory=datetime.utcnow, sa_column_kwargs={"onupdate": datetime.utcnow})
     # Yüklenen orijinal belge (PDF/görsel) — admin panelinde "hastanın gönderdiği" ile rapor yan yana
     original_filename: str | None = None  # örn. "tahlil.pdf"
     original_stored_path: str | None = None  # örn. "42.pdf" (data/uploads/ altında)
@@ -23,3 +33,5 @@ class AnalysisRecord(SQLModel, table=True):
     # Paket tipi: "single" | "monthly" | "yearly" — analiz hangi ürünle üretildi (sonuç ekranı/PDF feature gating)
     plan_type: str = Field(default=PLAN_TYPE_DEFAULT, max_length=16, index=True)
     institution_id: int | None = Field(default=None, foreign_key="institutions.id", index=True)
+    # Rapor dili (tr, en, de...) — tam metin aramada kök bulma yapılandırmasını seçer
+    lang: str | None = Field(default=None, max_length=8)
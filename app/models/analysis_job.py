@@ -13,6 +13,7 @@ class AnalysisJob(SQLModel, table=True):
     duration_ms: int | None = None
     prompt_tokens: int | None = None
     completion_tokens: int | None = None
+    cached_tokens: int | None = None  # prompt_tokens'ın sağlayıcı önek önbelleğinden gelen kısmı (indirimli)
     error_message: str | None = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime | None = Field(default_factory=datetime.utcnow)
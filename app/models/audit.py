@@ -1,9 +1,12 @@
 from datetime import datetime
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 
 class AuditLog(SQLModel, table=True):
+    # Keyset sayfalama: (…, created_at, id) sırasında tarama
+    __table_args__ = (Index("ix_auditlog_inst_created", "institution_id", "created_at", "id"),)
     id: int | None = Field(default=None, primary_key=True)
     event: str = Field(index=True)  # login, register, analyze, case_create, case_review, invite_send, etc.
     user_id: int | None = Field(default=None, index=True)
@@ -0,0 +1,25 @@
+"""Otomatik kredi yenileme denemeleri: (kurum, dönem) başına tek satır = idempotency anahtarı + kurum bazlı sonuç."""
+from datetime import datetime
+
+from sqlalchemy import Index, UniqueConstraint
+from sqlmodel import Field, SQLModel
+
+
+class AutoRenewAttempt(SQLModel, table=True):
+    __tablename__ = "auto_renew_attempts"
+    __table_args__ = (
+        # Aynı dönem için ikinci çekim yapılamaz: yeniden denemeler bu satırı devralır
+        UniqueConstraint("institution_id", "period", name="uq_auto_renew_attempts_inst_period"),
+        Index("ix_auto_renew_attempts_inst_created", "institution_id", "created_at", "id"),
+    )
+    id: int | None = Field(default=None, primary_key=True)
+    institution_id: int = Field(foreign_key="institutions.id")
+    period: str = Field(max_length=16)                       # yenileme aralığı penceresinin başlangıcı (YYYYMMDD)
+    merchant_oid: str = Field(max_length=64, unique=True)    # PayTR sipariş no; denemede değişir, aynı oid iki kez gönderilmez
+    attempt: int = 1
+    amount_cents: int
+    status: str = Field(default="pending", max_length=16)     # pending | success | failed
+    reason: str | None = Field(default=None, max_length=512)
+    reference_no: str | None = Field(default=None, max_length=64)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
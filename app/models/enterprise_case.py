@@ -1,11 +1,14 @@
 """Kurumsal iş akışı: vaka (case) ve rapor modelleri."""
 from datetime import datetime
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 
 class EnterpriseCase(SQLModel, table=True):
     __tablename__ = "enterprise_cases"
+    # Keyset sayfalama: (…, created_at, id) sırasında tarama
+    __table_args__ = (Index("ix_enterprise_cases_inst_created", "institution_id", "created_at", "id"),)
     id: int | None = Field(default=None, primary_key=True)
     institution_id: int = Field(foreign_key="institutions.id", index=True)
     uploaded_by_user_id: int = Field(foreign_key="user.id", index=True)
@@ -3,6 +3,7 @@ import re
 from datetime import datetime
 from typing import Optional
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 
@@ -17,6 +18,11 @@ def _slugify(text: str) -> str:
 
 class Institution(SQLModel, table=True):
     __tablename__ = "institutions"
+    # Periyodik işler tüm kurumları taramaz: yalnız yenileme açık / aktif kurumların bakiye aralığı okunur
+    __table_args__ = (
+        Index("ix_institutions_auto_renew_balance", "auto_renew_enabled", "billing_wallet_balance"),
+        Index("ix_institutions_active_balance", "is_active", "billing_wallet_balance"),
+    )
     id: int | None = Field(default=None, primary_key=True)
     name: str = Field(max_length=255, index=True)
     type: str = Field(default="hospital", max_length=64)  # hospital | clinic | lab | network
@@ -12,3 +12,7 @@ class PushSubscription(SQLModel, table=True):
     p256dh: str = ""  # client public key (base64url)
     auth: str = ""    # auth secret (base64url)
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Expo DeviceNotRegistered dönen token'lar pasifleştirilir (gönderim listesinden çıkar)
+    is_active: bool = Field(default=True, index=True)
+    deactivated_at: datetime | None = None
+    last_error: str | None = Field(default=None, max_length=64)
@@ -0,0 +1,35 @@
+"""Zamanlanmış arka plan işleri (app.services.scheduler): iş başına satır kirası + çalıştırma geçmişi."""
+from datetime import datetime
+
+from sqlalchemy import Index
+from sqlmodel import Field, SQLModel
+
+
+class ScheduledJob(SQLModel, table=True):
+    __tablename__ = "scheduled_jobs"
+    name: str = Field(primary_key=True, max_length=64)
+    cron: str = Field(max_length=64)                 # 5 alanlı cron (dakika saat gün ay haftanın-günü), UTC
+    enabled: bool = True
+    next_run_at: datetime = Field(index=True)
+    # Kira: sahibi olan worker çalıştırır; süresi dolan kira (çöken worker) devralınır
+    lease_owner: str | None = Field(default=None, max_length=64)
+    lease_expires_at: datetime | None = None
+    attempt: int = 0                                 # art arda başarısız deneme (yeniden deneme sayacı)
+    last_run_at: datetime | None = None
+    last_status: str | None = Field(default=None, max_length=16)
+
+
+class JobRun(SQLModel, table=True):
+    __tablename__ = "job_runs"
+    __table_args__ = (Index("ix_job_runs_job_started", "job_name", "started_at"),)
+
+    id: int | None = Field(default=None, primary_key=True)
+    job_name: str = Field(max_length=64)
+    owner: str = Field(max_length=64)
+    attempt: int = 1
+    status: str = Field(default="running", max_length=16)  # running | success | failed | timeout | interrupted
+    started_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: datetime | None = None
+    duration_ms: int | None = None
+    result: str | None = Field(default=None, max_length=500)
+    error: str | None = Field(default=None, max_length=2000)
@@ -1,11 +1,14 @@
 """Tenant audit log: Her tenant içindeki tüm aktivitelerin detaylı kaydı (KVKK/GDPR uyumluluğu)."""
 from datetime import datetime
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 
 class TenantAuditLog(SQLModel, table=True):
     __tablename__ = "tenant_audit_logs"
+    # Keyset sayfalama: (…, created_at, id) sırasında tarama
+    __table_args__ = (Index("ix_tenant_audit_logs_inst_created", "institution_id", "created_at", "id"),)
     id: int | None = Field(default=None, primary_key=True)
     institution_id: int = Field(foreign_key="institutions.id", index=True)
     user_id: int | None = Field(default=None, foreign_key="user.id", index=True)
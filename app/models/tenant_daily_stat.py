@@ -0,0 +1,13 @@
+"""Kurum bazlı günlük sayaçlar (app.services.tenant_rollups): pano istatistikleri ham kayıtları taramadan okunur."""
+from datetime import date
+
+from sqlmodel import Field, SQLModel
+
+
+class TenantDailyStat(SQLModel, table=True):
+    __tablename__ = "tenant_daily_stats"
+    # PK (institution_id, day, metric): bir kurumun dönem istatistikleri tek indeks aralığı taramasıdır
+    institution_id: int = Field(foreign_key="institutions.id", primary_key=True)
+    day: date = Field(primary_key=True)
+    metric: str = Field(primary_key=True, max_length=80)  # analyses | cases | reports | credits_spent | action:<ad> | user:<id> | status:<durum>
+    value: int = 0
@@ -1,11 +1,14 @@
 """Tenant wallet transaction audit trail."""
 from datetime import datetime
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 
 class TenantWalletTransaction(SQLModel, table=True):
     __tablename__ = "tenant_wallet_transactions"
+    # Keyset sayfalama: (…, created_at, id) sırasında tarama
+    __table_args__ = (Index("ix_tenant_wallet_tx_inst_created", "institution_id", "created_at", "id"),)
     id: int | None = Field(default=None, primary_key=True)
     institution_id: int = Field(foreign_key="institutions.id", index=True)
     amount_cents: int  # Positive=load, negative=spend
@@ -1,9 +1,13 @@
 from datetime import datetime
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 
 class User(SQLModel, table=True):
+    # Keyset sayfalama: tenant kullanıcı listesi id ile (created_at NULL olabilir)
+    __table_args__ = (Index("ix_user_inst_id", "institution_id", "id"),)
+
     id: int | None = Field(default=None, primary_key=True)
     email: str = Field(unique=True, index=True)
     hashed_password: str
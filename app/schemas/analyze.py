@@ -37,6 +37,8 @@ class AnalyzeResponse(BaseModel):
     pdf: PdfInfoSchema | None = None  # template: premium|basic, available
     # Paket tipi: "single" | "monthly" | "yearly" — sonuç hangi planla üretildi (feature gating altyapısı; UI değişmez)
     plan_type: str | None = None
+    # Kural tabanlı rapor nedeni ("llm_unavailable" | "overload" | "forced"); LLM yorumu kullanıldıysa null
+    degraded: str | None = None
 
 
 class UploadJsonRequest(BaseModel):
@@ -53,6 +55,7 @@ class AnalysisHistoryItem(BaseModel):
     source: str
     created_at: str
     is_favorite: bool = False
+    snippet: str | None = None  # Arama yapıldıysa <mark> vurgulu eşleşme önizlemesi
 
 
 class AnalysisDetail(BaseModel):
@@ -5,20 +5,26 @@ import time
 import threading
 
 from fastapi import HTTPException
-from openai import APIError, APIConnectionError, AuthenticationError, OpenAI, RateLimitError
+from openai import APIError, APIConnectionError, AuthenticationError, InternalServerError, OpenAI, RateLimitError
 
 from app.core.config import get_openai_keys, is_openai_configured
+from app.services.degraded_report import LlmUnavailable, llm_admission
+from app.services.degraded_report import build_explanation as build_degraded_explanation
 from app.services.lab_parser import parse_lab_text
+from app.services.prompt_budget import build_explanation_prompt, usage_from_response
+from app.services.resilience import CircuitOpen, upstream
 from app.services.risk_engine import compute_risk
 
 logger = logging.getLogger(__name__)
-# Render cold start + OpenAI yanıt süresi için yeterli süre (görsel analiz uzun sürebilir)
+# Zaman aşımı, tekrar ve devre kesici resilience.upstream politikalarında (üst sınır 120 sn:
+# Render cold start + uzun Vision yanıtı). SDK'nın kendi tekrarları kapalı; tekrar bütçesi tek yerde.
 OPENAI_TIMEOUT = 120.0
-OPENAI_RETRY_WAIT = 2.5
-OPENAI_RETRY_SECOND_WAIT = 5.0
-OPENAI_RETRY_ONCE = (RateLimitError, APIConnectionError)
-# APIConnectionError'da 2. deneme de başarısızsa bir kez daha dene (cold start / ağ gecikmesi)
-OPENAI_RETRY_TWICE_FOR_CONNECTION = True
+# Metin ve Vision çağrılarının gecikme geçmişi ve devresi ayrı tutulur
+OPENAI_TEXT_UPSTREAM = "openai-text"
+OPENAI_VISION_UPSTREAM = "openai-vision"
+# Bağımlılık sağlığını bozan hatalar (devreyi açabilir) ve tekrar denenenler
+OPENAI_FAILURES = (APIConnectionError, InternalServerError)
+OPENAI_RETRY_ON = (APIConnectionError, InternalServerError, RateLimitError)
 
 # Anahtar başına bir istemci (çoklu anahtar fallback için)
 # Lock: eşzamanlı isteklerde aynı key için çift client oluşturulmasını önler
@@ -29,6 +35,10 @@ _openai_clients_lock = threading.Lock()
 OPENAI_FALLBACK_EXCEPTIONS = (AuthenticationError, RateLimitError)
 
 
+class LlmConfigError(HTTPException):
+    """Anahtar/billing hatası: geçici değil, bozulmuş moda geçilmez; yönetici düzeltmeli."""
+
+
 def _get_client_for_key(key: str) -> OpenAI:
     """Verilen anahtar için OpenAI istemcisi döner (thread-safe önbelleklenmiş)."""
     # Önce lock olmadan oku (fast-path: zaten varsa)
@@ -38,7 +48,7 @@ def _get_client_for_key(key: str) -> OpenAI:
     # Yoksa lock alarak oluştur (double-checked locking)
     with _openai_clients_lock:
         if key not in _openai_clients:
-            _openai_clients[key] = OpenAI(api_key=key, timeout=OPENAI_TIMEOUT)
+            _openai_clients[key] = OpenAI(api_key=key, timeout=OPENAI_TIMEOUT, max_retries=0)
         return _openai_clients[key]
 
 
@@ -66,31 +76,18 @@ def _openai_create_with_fallback(create_fn):
     raise ValueError("Geçerli OpenAI anahtarı yok.")
 
 
-def _openai_safe_call(create_fn):
+def _openai_safe_call(create_fn, upstream_name: str = OPENAI_TEXT_UPSTREAM):
     """
-    OpenAI çağrısını timeout ile yapar; RateLimitError/APIConnectionError'da
-    1–2 kez bekleyip tekrar dener.
+    create_fn(timeout) çağrısını resilience katmanından geçirir: uyarlanır zaman aşımı, bütçeli ve
+    jitter'lı tekrar (bağlantı / 5xx / rate limit), devre açıkken beklemeden CircuitOpen.
+    Chat tamamlama idempotent değil (ücret, farklı yanıt): hedge yapılmaz.
+    Vision çağrıları upstream_name=OPENAI_VISION_UPSTREAM ile kendi geçmişini ve devresini kullanır.
 
     NOT: Bu fonksiyon senkron context içinde (thread pool worker) çağrılır.
     FastAPI async endpoint'lerinden çağırırken run_in_executor kullanın;
     doğrudan async def içinde çağrılmamalıdır (event loop bloklanır).
     """
-    try:
-        return create_fn()
-    except OPENAI_RETRY_ONCE as e:
-        logger.warning("OpenAI retry 1/2 after %s: %s", type(e).__name__, e)
-        # time.sleep burada kasıtlı senkron — bu fonksiyon zaten thread pool'da çalışır
-        time.sleep(OPENAI_RETRY_WAIT)
-        try:
-            return create_fn()
-        except APIConnectionError as e2:
-            if OPENAI_RETRY_TWICE_FOR_CONNECTION:
-                logger.warning("OpenAI retry 2/2 after APIConnectionError: %s", e2)
-                time.sleep(OPENAI_RETRY_SECOND_WAIT)
-                return create_fn()
-            raise
-        except RateLimitError:
-            raise
+    return upstream(upstream_name).call(create_fn, failure_on=OPENAI_FAILURES, retry_on=OPENAI_RETRY_ON)
 
 
 def ping_openai() -> tuple[bool, float, str | None]:
@@ -120,6 +117,9 @@ def ping_openai() -> tuple[bool, float, str | None]:
     latency_ms = round((time.perf_counter() - t0) * 1000, 2)
     return (False, latency_ms, last_err or "Tüm anahtarlar denendi, erişim yok.")
 
+# Vision çözünürlük katmanı: "low" → model 512 px'lik kopyayı görür (image_intake bu boyuta küçültür)
+VISION_DETAIL = "low"
+
 # Rapor diline göre dil adı (modelin anlayacağı şekilde)
 REPORT_LANG_NAMES: dict[str, str] = {
     "tr": "Turkish",
@@ -171,6 +171,13 @@ Never say a value is "within" or "normal" when it is outside the reference. Neve
 
 Use Markdown bold (**text**) for section titles. If the image is unreadable or no lab result is visible, say so briefly."""
 
+IMAGE_SYSTEM_PROMPT = (
+    "You are a medical report assistant. The user will send you ONE image containing blood test or lab results. "
+    "You MUST look at the image, read the values and text in it, and produce a structured report. "
+    "Do NOT say you cannot read or process images. You have vision capability. Always analyze the image and output the report in the requested language."
+    "\n\n" + IMAGE_PROMPT_BASE
+)
+
 DETAILED_PROMPT_BASE = """Explain this blood test to the patient in clear, simple language. Write a DETAILED report so the patient feels the report is worth paying for. Use this structure.
 
 CRITICAL — Value vs reference (you MUST get these right):
@@ -223,149 +230,72 @@ def ai_generate_explanation(
     lang: str | None,
     plan: str,
     doctor_notes: str | None = None,
+    tables: list[dict] | None = None,
+    fallback: bool = True,
 ) -> tuple[str, dict | None]:
     """
     Modele sadece labs_norm + risk_summary + plan + lang verir.
     Returns: (explanation_text, usage_dict). explanation = kısa, madde madde özet/neden/öneriler.
     Single plan için daha açıklayıcı, 4-5 cümle seviyesinde premium açıklama üretilir.
+    Sabit talimat system mesajında (önek önbelleği), tablo/ham metin plan bütçesine sığdırılır (prompt_budget).
+    Geçici LLM hatasında fallback=True ise kural tabanlı açıklama döner (usage None), değilse LlmUnavailable.
     """
-    import json
-    lang_instruction = _language_instruction(lang)
-    # Token tasarrufu: labs metnini kısalt
-    lab_text = (labs_norm.get("t") or "")[:1500]
-    lab_note = (labs_norm.get("dn") or "")[:300] if labs_norm.get("dn") else ""
-    payload = {
-        "labs_norm_preview": lab_text,
-        "doctor_notes": lab_note or None,
-        "risk_summary": risk_summary,
-        "plan": plan,
-    }
-    base_prompt = AI_EXPLANATION_PROMPT
     plan_lower = (plan or "").strip().lower()
-    if plan_lower == "single":
-        base_prompt = SINGLE_PLAN_EXPLANATION_PROMPT
-    prompt = (
-        lang_instruction + "\n\n" + base_prompt + "\n\n"
-        "Input (JSON):\n" + json.dumps(payload, ensure_ascii=False, indent=0)
+    base_prompt = SINGLE_PLAN_EXPLANATION_PROMPT if plan_lower == "single" else AI_EXPLANATION_PROMPT
+    prompt_plan = build_explanation_prompt(
+        static_prompt=base_prompt,
+        lang_instruction=_language_instruction(lang),
+        risk_summary=risk_summary,
+        labs_norm=labs_norm,
+        tables=tables,
+        plan=plan,
     )
 
-    max_tokens = 2048 if plan_lower == "single" else 1024
     def _create(client: OpenAI):
-        return _openai_safe_call(lambda: client.chat.completions.create(
+        return _openai_safe_call(lambda timeout: client.chat.completions.create(
             model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=max_tokens,
+            messages=prompt_plan.messages,
+            max_tokens=prompt_plan.max_tokens,
+            timeout=timeout,
         ))
 
-    def _fallback_explanation(err: Exception | None = None) -> str:
-        """
-        OpenAI erişilemezse tüm analizi bozmak yerine, kural tabanlı risk özetinden
-        rapor şablonunun parse ettiği markdown bölümlerini üretir.
-
-        `report_pdf.py` tarafında `**Summary:**`, `**Possible causes:**`, `**Recommendations:**`
-        başlıklarıyla bölümlere ayrılıp context'e taşınıyor.
-        """
-        overall = (risk_summary or {}).get("overall") or {}
-        score = int(overall.get("score") or 0)
-        overall_level = (overall.get("level") or "").lower()
-        highlights = (risk_summary or {}).get("highlights") or []
-
-        lang_norm = (lang or "tr").strip().lower()
-        is_tr = lang_norm == "tr"
-
-        # İlk birkaç anormal parametreyi özetle
-        abnormal_tests = []
-        for h in highlights[:4]:
-            test = (h.get("test") or "").strip()
-            level = (h.get("level") or "").strip()
-            if test:
-                if level:
-                    abnormal_tests.append(f"{test} ({level})")
-                else:
-                    abnormal_tests.append(test)
-
-        abnormal_tests_str = ", ".join(abnormal_tests) if abnormal_tests else ""
-        # Premium PDF'de `AI/akıllı analiz` kelimeleri otomatik temizleniyor; not metninde geçmesin.
-        ai_unavailable_note_tr = "Not: Yorum üretimi şu an geçici olarak yapılamadı. Aşağıdaki yorum kural tabanlıdır."
-        ai_unavailable_note_en = "Note: Interpretation is temporarily unavailable. The text below is rule-based."
-
-        if is_tr:
-            summary_text = (
-                f"Genel sağlık skorunuz: {score}/100. Genel seviye: {overall_level or '—'}. "
-                f"Referans aralığı dışında veya sınırda kalan parametreler: {abnormal_tests_str or '—'}. "
-                f"{ai_unavailable_note_tr}"
-            )
-            causes_lines = []
-            reco_lines = []
-            for h in highlights[:5]:
-                test = (h.get("test") or "").strip()
-                why = (h.get("why") or "").strip()
-                action = (h.get("action") or "").strip()
-                if test and why:
-                    causes_lines.append(f"- {test}: {why}")
-                if test and action:
-                    reco_lines.append(f"- {test}: {action}")
-            # Min miktar: PDF'de kısaltma işlevi satır satır çalışır.
-            if not causes_lines:
-                causes_lines = ["- Referans dışı değerler tespit edildi."]
-            if not reco_lines:
-                reco_lines = ["- Genel beslenme/yaşam tarzı önerileri için hekiminizle görüşün."]
-
-            summary_md = f"**Summary**: {summary_text}"
-            possible_causes_md = "**Possible causes**:\n" + "\n".join(causes_lines)
-            recommendations_md = "**Recommendations**:\n" + "\n".join(reco_lines)
-            return "\n\n".join([summary_md, possible_causes_md, recommendations_md])
-
-        # English fallback (i18n için sadece temel, kural tabanlı)
-        summary_text = (
-            f"Overall health score: {score}/100. Overall level: {overall_level or '—'}. "
-            f"Parameters outside the reference range: {abnormal_tests_str or '—'}. "
-            f"{ai_unavailable_note_en}"
-        )
-        causes_lines = []
-        reco_lines = []
-        for h in highlights[:5]:
-            test = (h.get("test") or "").strip()
-            level = (h.get("level") or "").strip()
-            action = (h.get("action") or "").strip()
-            why = (h.get("why") or "").strip()
-            if test:
-                if why:
-                    causes_lines.append(f"- {test}: {why} ({level or 'level'})")
-                else:
-                    causes_lines.append(f"- {test}: {level or 'flag'}")
-            if test and action:
-                reco_lines.append(f"- {test}: {action}")
-        if not causes_lines:
-            causes_lines = ["- Values outside the reference range were detected."]
-        if not reco_lines:
-            reco_lines = ["- Discuss results and next steps with your clinician."]
-
-        summary_md = f"**Summary**: {summary_text}"
-        possible_causes_md = "**Possible causes**:\n" + "\n".join(causes_lines)
-        recommendations_md = "**Recommendations**:\n" + "\n".join(reco_lines)
-        return "\n\n".join([summary_md, possible_causes_md, recommendations_md])
-
     try:
         response = _openai_create_with_fallback(_create)
         content = (response.choices[0].message.content or "").strip()
-        usage = None
-        if getattr(response, "usage", None):
-            u = response.usage
-            usage = {"prompt_tokens": getattr(u, "prompt_tokens", 0) or 0, "completion_tokens": getattr(u, "completion_tokens", 0) or 0}
+        usage = usage_from_response(response, estimate=prompt_plan.prompt_tokens_estimate)
+        if usage:
+            logger.info(
+                "LLM usage kind=explanation plan=%s prompt=%s cached=%s completion=%s est=%s max=%s rows=%s dropped=%s",
+                plan_lower or "-", usage["prompt_tokens"], usage["cached_tokens"], usage["completion_tokens"],
+                prompt_plan.prompt_tokens_estimate, prompt_plan.max_tokens,
+                prompt_plan.stats["table_rows"], prompt_plan.stats["dropped_rows"],
+            )
         return content, usage
-    except (AuthenticationError, RateLimitError, APIConnectionError, APIError) as e:
+    except (AuthenticationError, RateLimitError, APIConnectionError, APIError, HTTPException, CircuitOpen) as e:
         logger.exception("OpenAI API error in ai_generate_explanation: %s", e)
-        # OpenAI bağlantı/rate-limit sorunu varsa, raporu tamamen iptal etmek yerine
-        # kural tabanlı fallback üret.
-        if isinstance(e, (APIConnectionError, RateLimitError)):
-            return _fallback_explanation(err=e), None
+        # Bağlantı / zaman aşımı / yoğunluk / 5xx: raporu iptal etmek yerine kural tabanlı açıklama
+        if _is_degradable(e):
+            if fallback:
+                return build_degraded_explanation(risk_summary, tables or [], lang), None
+            raise LlmUnavailable(str(e)[:200]) from e
+        if isinstance(e, HTTPException):
+            raise
         _raise_openai_http_error(e)
     except Exception as e:
         logger.exception("Unexpected error in ai_generate_explanation: %s", e)
         _raise_openai_http_error(e)
 
 
+def _is_degradable(exc: Exception) -> bool:
+    """Geçici LLM hatası mı (bozulmuş moda geçilir) yoksa yapılandırma/istek hatası mı."""
+    if isinstance(exc, LlmConfigError):
+        return False
+    if isinstance(exc, HTTPException):
+        # _openai_create_with_fallback tüm anahtarlar rate limit verince HTTP istisnasına çevirir
+        return exc.status_code in (429, 502, 503)
+    return isinstance(exc, (APIConnectionError, RateLimitError, InternalServerError, CircuitOpen))
+
+
 def _value_status(value: float, ref_low: float | None, ref_high: float | None) -> str:
     if ref_low is not None and value < ref_low:
         return "low"
@@ -464,14 +394,28 @@ def analyze_blood_test(
     """
     İki aşamalı analiz: (1) Risk Engine -> risk_summary, (2) OpenAI -> explanation.
     Returns: (report_payload, usage). report_payload = { risk_summary, explanation, tables, meta, sonuc }.
+    LLM kullanılamazsa (hata, aşırı yük, zorunlu mod) açıklama kural tabanlıdır ve meta["degraded"] nedeni taşır.
     """
     lab_values = parse_lab_text(text)
     risk_summary = compute_risk(lab_values)
     if labs_norm is None:
         labs_norm = {"t": " ".join(text.split()).strip(), "dn": (doctor_notes or "").strip() or None}
-    explanation, usage = ai_generate_explanation(risk_summary, labs_norm, lang, plan, doctor_notes)
     tables = build_tables(lab_values)
     meta = {"lang": lang or "tr", "plan": plan}
+    with llm_admission() as shed_reason:
+        if shed_reason:
+            explanation, usage = build_degraded_explanation(risk_summary, tables, lang), None
+            meta["degraded"] = shed_reason
+        else:
+            try:
+                explanation, usage = ai_generate_explanation(
+                    risk_summary, labs_norm, lang, plan, doctor_notes, tables=tables, fallback=False
+                )
+            except LlmUnavailable:
+                explanation, usage = build_degraded_explanation(risk_summary, tables, lang), None
+                meta["degraded"] = "llm_unavailable"
+    if meta.get("degraded"):
+        logger.warning("Degraded report (%s) lang=%s plan=%s", meta["degraded"], meta["lang"], plan)
     sonuc = format_report_to_markdown(risk_summary, explanation, tables, meta)
     report_payload = {
         "risk_summary": risk_summary,
@@ -483,13 +427,35 @@ def analyze_blood_test(
     return report_payload, usage
 
 
+def degraded_blood_test_report(text: str, lang: str | None = None, plan: str = "free", reason: str = "preview") -> dict:
+    """LLM'siz, ağsız rapor (anlık önizleme / bozulmuş mod); analyze_blood_test ile aynı payload yapısı."""
+    lab_values = parse_lab_text(text)
+    risk_summary = compute_risk(lab_values)
+    tables = build_tables(lab_values)
+    meta = {"lang": lang or "tr", "plan": plan, "degraded": reason}
+    explanation = build_degraded_explanation(risk_summary, tables, lang)
+    return {
+        "risk_summary": risk_summary,
+        "explanation": explanation,
+        "tables": tables,
+        "meta": meta,
+        "sonuc": format_report_to_markdown(risk_summary, explanation, tables, meta),
+    }
+
+
 def _raise_openai_http_error(exc: Exception) -> None:
     """OpenAI hatalarını uygun HTTP istisnalarına çevirir. (401 kullanıcı oturumu ile karışmasın diye API hatası 503.)"""
     if isinstance(exc, AuthenticationError):
-        raise HTTPException(
+        raise LlmConfigError(
             status_code=503,
             detail="AI erişimi başarısız: OPENAI_API_KEY .env içinde doğru tanımlı mı, billing açık mı kontrol edin.",
         ) from exc
+    if isinstance(exc, CircuitOpen):
+        raise HTTPException(
+            status_code=503,
+            detail="AI servisi geçici olarak erişilemiyor: Lütfen biraz sonra tekrar deneyin.",
+            headers={"Retry-After": str(max(1, int(exc.retry_after)))},
+        ) from exc
     if isinstance(exc, RateLimitError):
         raise HTTPException(
             status_code=429,
@@ -508,42 +474,46 @@ def _raise_openai_http_error(exc: Exception) -> None:
     raise HTTPException(status_code=500, detail="Beklenmeyen sunucu hatası.") from exc
 
 
-def analyze_blood_test_from_image(image_bytes: bytes, mime_type: str, lang: str | None = None) -> tuple[str, dict | None]:
-    """Görsel (JPG/PNG) tahlil fotoğrafından doğrudan rapor üretir (OpenAI Vision)."""
+def analyze_blood_test_from_image(
+    image_bytes: bytes,
+    mime_type: str,
+    lang: str | None = None,
+    detail: str = VISION_DETAIL,
+) -> tuple[str, dict | None]:
+    """Görsel (JPG/PNG) tahlil fotoğrafından doğrudan rapor üretir (OpenAI Vision).
+    image_bytes önceden image_intake.prepare_image ile aynı detail için küçültülmüş olmalı."""
     lang_instruction = _language_instruction(lang)
-    image_prompt = lang_instruction + "\n\n" + IMAGE_PROMPT_BASE
     b64 = base64.standard_b64encode(image_bytes).decode("utf-8")
     url = f"data:{mime_type};base64,{b64}"
-    system_msg = (
-        "You are a medical report assistant. The user will send you ONE image containing blood test or lab results. "
-        "You MUST look at the image, read the values and text in it, and produce a structured report. "
-        "Do NOT say you cannot read or process images. You have vision capability. Always analyze the image and output the report in the requested language."
-    )
     def _create(client: OpenAI):
-        return _openai_safe_call(lambda: client.chat.completions.create(
+        return _openai_safe_call(lambda timeout: client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
-                {"role": "system", "content": system_msg},
+                # Sabit önek (önbelleğe alınabilir): rol + rapor yapısı; dil talimatı user mesajında
+                {"role": "system", "content": IMAGE_SYSTEM_PROMPT},
                 {
                     "role": "user",
                     "content": [
-                        {"type": "text", "text": image_prompt},
-                        {"type": "image_url", "image_url": {"url": url, "detail": "low"}},
+                        {"type": "text", "text": lang_instruction},
+                        {"type": "image_url", "image_url": {"url": url, "detail": detail}},
                     ],
                 },
             ],
             max_tokens=8192,
-        ))
+            timeout=timeout,
+        ), OPENAI_VISION_UPSTREAM)
 
     try:
         response = _openai_create_with_fallback(_create)
         content = response.choices[0].message.content or "Görsel analiz edilemedi."
-        usage = None
-        if getattr(response, "usage", None):
-            u = response.usage
-            usage = {"prompt_tokens": getattr(u, "prompt_tokens", 0) or 0, "completion_tokens": getattr(u, "completion_tokens", 0) or 0}
+        usage = usage_from_response(response)
+        if usage:
+            logger.info(
+                "LLM usage kind=image prompt=%s cached=%s completion=%s",
+                usage["prompt_tokens"], usage["cached_tokens"], usage["completion_tokens"],
+            )
         return content, usage
-    except (AuthenticationError, RateLimitError, APIConnectionError, APIError) as e:
+    except (AuthenticationError, RateLimitError, APIConnectionError, APIError, CircuitOpen) as e:
         logger.exception("OpenAI API error in analyze_blood_test_from_image: %s", e)
         _raise_openai_http_error(e)
     except Exception as e:
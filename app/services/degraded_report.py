@@ -0,0 +1,407 @@
+"""
+Bozulmuş mod (degraded) rapor üreticisi: OpenAI yavaş/erişilemezken ağsız, milisaniyede açıklama.
+
+Kaynaklar yalnızca kural tabanlı veriler: compute_risk çıktısı, build_tables satırları (REF_RANGES ile
+tamamlanmış referanslar), PARAM_FLAGS ve dile göre ifade tabloları. Çıktı LLM açıklamasıyla aynı bölüm
+yapısındadır (özet, dikkat edilmesi gerekenler, değerler, olası nedenler, öneriler); report_pdf
+SECTION_PATTERNS bu başlıkları tanır.
+
+Kullanım yerleri:
+- LLM hatası (bağlantı, zaman aşımı, rate limit, 5xx): otomatik yedek.
+- Aşırı yük: llm_admission eşzamanlı LLM çağrısı sınırını (settings.llm_max_inflight) aşan isteği
+  doğrudan bu yola alır; settings.llm_degraded_mode="force" her isteği alır.
+- OpenAI metin devresi (resilience "openai-text") açık: istek LLM'i hiç beklemeden bu yola alınır.
+- Anlık önizleme: /analyze/preview, LLM sonucu beklenirken gösterilir.
+Bozulmuş sonuçlar AI önbelleğine yazılmaz (kesinti bitince tam yorum üretilsin diye).
+"""
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+from app.core.config import settings
+from app.services.resilience import upstream
+from app.services.risk_engine import PARAM_FLAGS
+
+# Parametre + durum → neden/öneri grubu
+_GROUPS: dict[tuple[str, str], str] = {
+    **{(p, "high"): "lipids" for p in ("LDL", "Triglycerides", "Total cholesterol")},
+    ("HDL", "low"): "lipids",
+    ("Glucose", "high"): "glucose_high",
+    ("HbA1c", "high"): "glucose_high",
+    ("Glucose", "low"): "glucose_low",
+    **{(p, "high"): "liver" for p in ("ALT", "AST", "GGT")},
+    ("Creatinine", "high"): "kidney",
+    ("eGFR", "low"): "kidney",
+    ("CRP", "high"): "inflammation",
+    ("Homocysteine", "high"): "inflammation",
+    **{(p, "low"): "iron" for p in ("Ferritin", "Iron", "Hb")},
+    **{(p, "low"): "vitamin" for p in ("Vitamin D", "B12", "Folate")},
+    ("TSH", "high"): "thyroid_high",
+    ("TSH", "low"): "thyroid_low",
+}
+
+PHRASES: dict[str, dict] = {
+    "tr": {
+        "headings": ("Özet", "Dikkat edilmesi gerekenler", "Değerler", "Olası nedenler", "Öneriler"),
+        "status": {"normal": "Normal", "low": "Düşük", "high": "Yüksek"},
+        "levels": {"low": "düşük risk", "mid": "orta risk", "high": "yüksek risk"},
+        "domains": {"cardio": "kalp-damar", "metabolic": "metabolizma", "inflammation": "inflamasyon", "vitamin": "vitamin ve mineral"},
+        "score": "Genel sağlık skorunuz {score}/100 ({level}).",
+        "counted": "{n} parametre değerlendirildi; {k} tanesi referans aralığı dışında.",
+        "all_normal": "Değerlendirilen tüm değerler referans aralığında.",
+        "flagged": "Referans dışı değerler: {items}.",
+        "domains_line": "Dikkat gerektiren alanlar: {items}.",
+        "no_values": "Metinde ayrıştırılabilen tahlil değeri bulunamadı; sonuçlarınızı hekiminizle birlikte değerlendirin.",
+        "note": "Bu yorum kural tabanlı olarak anında üretilmiştir; ayrıntılı yorum hazır olduğunda güncellenebilir.",
+        "no_risk": "Özel dikkat gerektiren değer yok.",
+        "risk_line": "{name}: {value} — referans {ref}, {status}",
+        "no_causes": "Referans dışı değer olmadığından olası neden listelenmedi.",
+        "general": ["Sonuçlarınızı hekiminizle paylaşın.", "Kontrol tahlilini hekiminizin önerdiği aralıkta tekrarlayın."],
+        "see_doctor": "Yüksek risk gösteren değerler için kısa süre içinde hekiminize başvurun.",
+        "groups": {
+            "lipids": ("Yağdan zengin beslenme, hareketsizlik, fazla kilo veya ailesel yatkınlık kan yağlarını etkileyebilir.",
+                       "Doymuş yağ ve işlenmiş gıdaları azaltın; haftada en az 150 dakika tempolu yürüyüş yapın."),
+            "glucose_high": ("Karbonhidrat ve şekerden zengin beslenme, kilo fazlası veya insülin direnci kan şekerini yükseltebilir.",
+                             "Şekerli içecek ve rafine karbonhidratı azaltın; açlık şekeri ve HbA1c takibini hekiminizle planlayın."),
+            "glucose_low": ("Uzun açlık, yoğun egzersiz veya bazı ilaçlar kan şekerini düşürebilir.",
+                            "Öğün atlamayın; baş dönmesi, titreme gibi belirtiler olursa hekiminize danışın."),
+            "liver": ("Yağlanma, alkol, bazı ilaçlar veya yoğun egzersiz karaciğer enzimlerini yükseltebilir.",
+                      "Alkolü sınırlayın, kullandığınız ilaçları hekiminizle gözden geçirin; kontrol tahlili yaptırın."),
+            "kidney": ("Sıvı kaybı, yüksek protein alımı, bazı ilaçlar veya böbrek fonksiyonundaki azalma bu değeri etkileyebilir.",
+                       "Yeterli su için, ağrı kesici kullanımını hekiminize danışın; böbrek değerlerini tekrar kontrol ettirin."),
+            "inflammation": ("Geçirilmekte olan enfeksiyon, iltihaplı durumlar veya B vitamini eksikliği bu değerleri yükseltebilir.",
+                             "Enfeksiyon belirtisi varsa hekiminize başvurun; iyileşme sonrası değeri tekrar ölçtürün."),
+            "iron": ("Yetersiz demir alımı, kan kaybı (ör. yoğun adet) veya emilim sorunları demir depolarını düşürebilir.",
+                     "Kırmızı et, baklagil ve yeşil yapraklı sebzeleri artırın; demir takviyesini hekiminizle konuşun."),
+            "vitamin": ("Az güneş görme, dengesiz beslenme veya emilim sorunları vitamin düzeylerini düşürebilir.",
+                        "Vitamin takviyesinin dozu ve süresi için hekiminize danışın; beslenmenizi çeşitlendirin."),
+            "thyroid_high": ("Tiroid bezinin yavaş çalışması TSH'yi yükseltebilir.",
+                             "Tiroid hormonlarının (sT4) ölçümü için hekiminize başvurun."),
+            "thyroid_low": ("Tiroid bezinin fazla çalışması veya tiroid ilaçları TSH'yi düşürebilir.",
+                            "Çarpıntı, kilo kaybı gibi belirtiler varsa hekiminize başvurun."),
+            "generic": ("Bu değer birçok geçici veya kalıcı nedenle referans dışında olabilir.",
+                        "Bu değeri hekiminizle birlikte değerlendirin ve gerekirse tekrar ölçtürün."),
+        },
+    },
+    "en": {
+        "headings": ("Summary", "Risk indicators", "Values", "Possible causes", "Recommendations"),
+        "status": {"normal": "Normal", "low": "Low", "high": "High"},
+        "levels": {"low": "low risk", "mid": "moderate risk", "high": "high risk"},
+        "domains": {"cardio": "cardiovascular", "metabolic": "metabolic", "inflammation": "inflammation", "vitamin": "vitamins and minerals"},
+        "score": "Your overall health score is {score}/100 ({level}).",
+        "counted": "{n} parameters were assessed; {k} of them are outside the reference range.",
+        "all_normal": "All assessed values are within the reference range.",
+        "flagged": "Values outside the reference range: {items}.",
+        "domains_line": "Areas that need attention: {items}.",
+        "no_values": "No lab values could be parsed from the text; please review your results with your doctor.",
+        "note": "This interpretation was generated instantly from rules; a detailed interpretation may follow.",
+        "no_risk": "No values requiring special attention.",
+        "risk_line": "{name}: {value} — reference {ref}, {status}",
+        "no_causes": "No values are outside the reference range, so no causes are listed.",
+        "general": ["Share your results with your doctor.", "Repeat the test at the interval your doctor recommends."],
+        "see_doctor": "See your doctor soon about the values that indicate high risk.",
+        "groups": {
+            "lipids": ("A diet rich in fat, inactivity, excess weight or family history can affect blood lipids.",
+                       "Cut down on saturated fat and processed food; aim for at least 150 minutes of brisk walking per week."),
+            "glucose_high": ("A diet high in sugar and refined carbohydrates, excess weight or insulin resistance can raise blood sugar.",
+                             "Limit sugary drinks and refined carbohydrates; plan fasting glucose and HbA1c follow-up with your doctor."),
+            "glucose_low": ("Long fasting, intense exercise or some medicines can lower blood sugar.",
+                            "Do not skip meals; talk to your doctor if you have dizziness or shakiness."),
+            "liver": ("Fatty liver, alcohol, some medicines or intense exercise can raise liver enzymes.",
+                      "Limit alcohol, review your medicines with your doctor and repeat the test."),
+            "kidney": ("Dehydration, high protein intake, some medicines or reduced kidney function can affect this value.",
+                       "Drink enough water, ask your doctor about painkiller use and recheck kidney values."),
+            "inflammation": ("A current infection, inflammatory conditions or low B vitamins can raise these values.",
+                             "See your doctor if you have signs of infection; recheck the value after recovery."),
+            "iron": ("Low iron intake, blood loss (e.g. heavy periods) or absorption problems can deplete iron stores.",
+                     "Eat more red meat, legumes and leafy greens; discuss iron supplements with your doctor."),
+            "vitamin": ("Little sun exposure, an unbalanced diet or absorption problems can lower vitamin levels.",
+                        "Ask your doctor about supplement dose and duration; vary your diet."),
+            "thyroid_high": ("An underactive thyroid can raise TSH.",
+                             "See your doctor to have thyroid hormones (free T4) measured."),
+            "thyroid_low": ("An overactive thyroid or thyroid medication can lower TSH.",
+                            "See your doctor if you have palpitations or weight loss."),
+            "generic": ("This value can be outside the reference range for many temporary or lasting reasons.",
+                        "Review this value with your doctor and repeat it if needed."),
+        },
+    },
+    "de": {
+        "headings": ("Zusammenfassung", "Auffällige Werte", "Werte", "Mögliche Ursachen", "Empfehlungen"),
+        "status": {"normal": "Normal", "low": "Niedrig", "high": "Hoch"},
+        "levels": {"low": "niedriges Risiko", "mid": "mittleres Risiko", "high": "hohes Risiko"},
+        "domains": {"cardio": "Herz-Kreislauf", "metabolic": "Stoffwechsel", "inflammation": "Entzündung", "vitamin": "Vitamine und Mineralstoffe"},
+        "score": "Ihr Gesundheitswert beträgt {score}/100 ({level}).",
+        "counted": "{n} Parameter wurden bewertet; {k} davon liegen außerhalb des Referenzbereichs.",
+        "all_normal": "Alle bewerteten Werte liegen im Referenzbereich.",
+        "flagged": "Werte außerhalb des Referenzbereichs: {items}.",
+        "domains_line": "Bereiche mit Handlungsbedarf: {items}.",
+        "no_values": "Aus dem Text konnten keine Laborwerte gelesen werden; besprechen Sie Ihre Ergebnisse mit Ihrem Arzt.",
+        "note": "Diese Auswertung wurde sofort regelbasiert erstellt; eine ausführliche Auswertung kann folgen.",
+        "no_risk": "Keine Werte, die besondere Aufmerksamkeit erfordern.",
+        "risk_line": "{name}: {value} — Referenz {ref}, {status}",
+        "no_causes": "Da kein Wert außerhalb des Referenzbereichs liegt, werden keine Ursachen aufgeführt.",
+        "general": ["Teilen Sie Ihre Ergebnisse Ihrem Arzt mit.", "Wiederholen Sie den Test im von Ihrem Arzt empfohlenen Abstand."],
+        "see_doctor": "Suchen Sie wegen der Werte mit hohem Risiko zeitnah Ihren Arzt auf.",
+        "groups": {
+            "lipids": ("Fettreiche Ernährung, Bewegungsmangel, Übergewicht oder familiäre Veranlagung können die Blutfette beeinflussen.",
+                       "Reduzieren Sie gesättigte Fette und verarbeitete Lebensmittel; gehen Sie mindestens 150 Minuten pro Woche zügig spazieren."),
+            "glucose_high": ("Zucker- und kohlenhydratreiche Ernährung, Übergewicht oder Insulinresistenz können den Blutzucker erhöhen.",
+                             "Meiden Sie gesüßte Getränke und Weißmehlprodukte; planen Sie Kontrollen von Nüchternzucker und HbA1c mit Ihrem Arzt."),
+            "glucose_low": ("Langes Fasten, intensiver Sport oder manche Medikamente können den Blutzucker senken.",
+                            "Lassen Sie keine Mahlzeiten aus; sprechen Sie bei Schwindel oder Zittern mit Ihrem Arzt."),
+            "liver": ("Fettleber, Alkohol, manche Medikamente oder intensiver Sport können die Leberwerte erhöhen.",
+                      "Begrenzen Sie Alkohol, besprechen Sie Ihre Medikamente mit Ihrem Arzt und lassen Sie den Wert kontrollieren."),
+            "kidney": ("Flüssigkeitsmangel, hohe Eiweißzufuhr, manche Medikamente oder eine verminderte Nierenfunktion können diesen Wert beeinflussen.",
+                       "Trinken Sie ausreichend, besprechen Sie Schmerzmittel mit Ihrem Arzt und lassen Sie die Nierenwerte kontrollieren."),
+            "inflammation": ("Eine aktuelle Infektion, entzündliche Erkrankungen oder B-Vitamin-Mangel können diese Werte erhöhen.",
+                             "Gehen Sie bei Infektzeichen zum Arzt; lassen Sie den Wert nach der Genesung erneut messen."),
+            "iron": ("Geringe Eisenzufuhr, Blutverlust (z. B. starke Regel) oder Aufnahmestörungen können die Eisenspeicher senken.",
+                     "Essen Sie mehr rotes Fleisch, Hülsenfrüchte und Blattgemüse; besprechen Sie Eisenpräparate mit Ihrem Arzt."),
+            "vitamin": ("Wenig Sonnenlicht, einseitige Ernährung oder Aufnahmestörungen können Vitaminspiegel senken.",
+                        "Fragen Sie Ihren Arzt nach Dosis und Dauer einer Ergänzung; ernähren Sie sich abwechslungsreich."),
+            "thyroid_high": ("Eine Schilddrüsenunterfunktion kann TSH erhöhen.",
+                             "Lassen Sie beim Arzt die Schilddrüsenhormone (fT4) bestimmen."),
+            "thyroid_low": ("Eine Schilddrüsenüberfunktion oder Schilddrüsenmedikamente können TSH senken.",
+                            "Suchen Sie bei Herzklopfen oder Gewichtsverlust Ihren Arzt auf."),
+            "generic": ("Dieser Wert kann aus vielen vorübergehenden oder dauerhaften Gründen außerhalb des Referenzbereichs liegen.",
+                        "Besprechen Sie diesen Wert mit Ihrem Arzt und lassen Sie ihn bei Bedarf wiederholen."),
+        },
+    },
+    "fr": {
+        "headings": ("Résumé", "Points d'attention", "Valeurs", "Causes possibles", "Recommandations"),
+        "status": {"normal": "Normal", "low": "Bas", "high": "Élevé"},
+        "levels": {"low": "risque faible", "mid": "risque modéré", "high": "risque élevé"},
+        "domains": {"cardio": "cardiovasculaire", "metabolic": "métabolisme", "inflammation": "inflammation", "vitamin": "vitamines et minéraux"},
+        "score": "Votre score de santé global est de {score}/100 ({level}).",
+        "counted": "{n} paramètres ont été évalués ; {k} sont en dehors de l'intervalle de référence.",
+        "all_normal": "Toutes les valeurs évaluées sont dans l'intervalle de référence.",
+        "flagged": "Valeurs hors de l'intervalle de référence : {items}.",
+        "domains_line": "Domaines nécessitant une attention : {items}.",
+        "no_values": "Aucune valeur biologique n'a pu être lue dans le texte ; examinez vos résultats avec votre médecin.",
+        "note": "Cette interprétation a été générée instantanément à partir de règles ; une interprétation détaillée peut suivre.",
+        "no_risk": "Aucune valeur ne nécessite une attention particulière.",
+        "risk_line": "{name} : {value} — référence {ref}, {status}",
+        "no_causes": "Aucune valeur n'est hors de l'intervalle de référence ; aucune cause n'est listée.",
+        "general": ["Partagez vos résultats avec votre médecin.", "Refaites l'analyse à l'intervalle recommandé par votre médecin."],
+        "see_doctor": "Consultez rapidement votre médecin pour les valeurs indiquant un risque élevé.",
+        "groups": {
+            "lipids": ("Une alimentation riche en graisses, la sédentarité, le surpoids ou l'hérédité peuvent influencer les lipides sanguins.",
+                       "Réduisez les graisses saturées et les aliments transformés ; marchez d'un pas vif au moins 150 minutes par semaine."),
+            "glucose_high": ("Une alimentation riche en sucres, le surpoids ou une résistance à l'insuline peuvent élever la glycémie.",
+                             "Limitez les boissons sucrées et les glucides raffinés ; planifiez le suivi de la glycémie et de l'HbA1c avec votre médecin."),
+            "glucose_low": ("Un jeûne prolongé, un exercice intense ou certains médicaments peuvent abaisser la glycémie.",
+                            "Ne sautez pas de repas ; consultez votre médecin en cas de vertiges ou de tremblements."),
+            "liver": ("Une stéatose, l'alcool, certains médicaments ou un exercice intense peuvent élever les enzymes hépatiques.",
+                      "Limitez l'alcool, revoyez vos médicaments avec votre médecin et refaites l'analyse."),
+            "kidney": ("La déshydratation, un apport élevé en protéines, certains médicaments ou une baisse de la fonction rénale peuvent influencer cette valeur.",
+                       "Buvez suffisamment, demandez conseil à votre médecin sur les antalgiques et recontrôlez la fonction rénale."),
+            "inflammation": ("Une infection en cours, une maladie inflammatoire ou un manque de vitamines B peuvent élever ces valeurs.",
+                             "Consultez votre médecin en cas de signes d'infection ; refaites la mesure après guérison."),
+            "iron": ("Un apport en fer insuffisant, des pertes de sang (règles abondantes) ou une malabsorption peuvent réduire les réserves en fer.",
+                     "Consommez plus de viande rouge, de légumineuses et de légumes verts ; parlez d'une supplémentation en fer avec votre médecin."),
+            "vitamin": ("Un faible ensoleillement, une alimentation déséquilibrée ou une malabsorption peuvent abaisser les vitamines.",
+                        "Demandez à votre médecin la dose et la durée d'une supplémentation ; variez votre alimentation."),
+            "thyroid_high": ("Une thyroïde qui fonctionne au ralenti peut élever la TSH.",
+                             "Consultez votre médecin pour doser les hormones thyroïdiennes (T4 libre)."),
+            "thyroid_low": ("Une thyroïde trop active ou un traitement thyroïdien peuvent abaisser la TSH.",
+                            "Consultez votre médecin en cas de palpitations ou de perte de poids."),
+            "generic": ("Cette valeur peut être hors de l'intervalle de référence pour de nombreuses raisons temporaires ou durables.",
+                        "Examinez cette valeur avec votre médecin et refaites-la si nécessaire."),
+        },
+    },
+    "es": {
+        "headings": ("Resumen", "Puntos de atención", "Valores", "Posibles causas", "Recomendaciones"),
+        "status": {"normal": "Normal", "low": "Bajo", "high": "Alto"},
+        "levels": {"low": "riesgo bajo", "mid": "riesgo moderado", "high": "riesgo alto"},
+        "domains": {"cardio": "cardiovascular", "metabolic": "metabolismo", "inflammation": "inflamación", "vitamin": "vitaminas y minerales"},
+        "score": "Su puntuación de salud global es {score}/100 ({level}).",
+        "counted": "Se evaluaron {n} parámetros; {k} están fuera del rango de referencia.",
+        "all_normal": "Todos los valores evaluados están dentro del rango de referencia.",
+        "flagged": "Valores fuera del rango de referencia: {items}.",
+        "domains_line": "Áreas que requieren atención: {items}.",
+        "no_values": "No se pudieron leer valores de laboratorio en el texto; revise sus resultados con su médico.",
+        "note": "Esta interpretación se generó al instante a partir de reglas; puede seguir una interpretación detallada.",
+        "no_risk": "Ningún valor requiere atención especial.",
+        "risk_line": "{name}: {value} — referencia {ref}, {status}",
+        "no_causes": "Ningún valor está fuera del rango de referencia, por lo que no se indican causas.",
+        "general": ["Comparta sus resultados con su médico.", "Repita el análisis en el intervalo que le indique su médico."],
+        "see_doctor": "Consulte pronto a su médico por los valores que indican riesgo alto.",
+        "groups": {
+            "lipids": ("Una dieta rica en grasas, el sedentarismo, el sobrepeso o los antecedentes familiares pueden afectar a los lípidos.",
+                       "Reduzca las grasas saturadas y los alimentos procesados; camine a paso rápido al menos 150 minutos por semana."),
+            "glucose_high": ("Una dieta rica en azúcares, el sobrepeso o la resistencia a la insulina pueden elevar la glucosa.",
+                             "Limite las bebidas azucaradas y los carbohidratos refinados; planifique el control de glucosa y HbA1c con su médico."),
+            "glucose_low": ("El ayuno prolongado, el ejercicio intenso o algunos medicamentos pueden bajar la glucosa.",
+                            "No se salte comidas; consulte a su médico si nota mareos o temblores."),
+            "liver": ("El hígado graso, el alcohol, algunos medicamentos o el ejercicio intenso pueden elevar las enzimas hepáticas.",
+                      "Limite el alcohol, revise sus medicamentos con su médico y repita el análisis."),
+            "kidney": ("La deshidratación, una ingesta alta de proteínas, algunos medicamentos o una función renal reducida pueden afectar este valor.",
+                       "Beba suficiente agua, consulte a su médico sobre los analgésicos y vuelva a controlar la función renal."),
+            "inflammation": ("Una infección actual, enfermedades inflamatorias o déficit de vitaminas B pueden elevar estos valores.",
+                             "Consulte a su médico si tiene signos de infección; repita la medición tras recuperarse."),
+            "iron": ("Una ingesta baja de hierro, pérdidas de sangre (reglas abundantes) o problemas de absorción pueden reducir el hierro.",
+                     "Coma más carne roja, legumbres y verduras de hoja verde; consulte a su médico sobre suplementos de hierro."),
+            "vitamin": ("La poca exposición al sol, una dieta desequilibrada o problemas de absorción pueden bajar las vitaminas.",
+                        "Pregunte a su médico la dosis y duración de un suplemento; varíe su alimentación."),
+            "thyroid_high": ("Una tiroides poco activa puede elevar la TSH.",
+                             "Consulte a su médico para medir las hormonas tiroideas (T4 libre)."),
+            "thyroid_low": ("Una tiroides hiperactiva o la medicación tiroidea pueden bajar la TSH.",
+                            "Consulte a su médico si tiene palpitaciones o pérdida de peso."),
+            "generic": ("Este valor puede estar fuera del rango por muchas razones temporales o duraderas.",
+                        "Revise este valor con su médico y repítalo si es necesario."),
+        },
+    },
+    "it": {
+        "headings": ("Riepilogo", "Punti di attenzione", "Valori", "Possibili cause", "Raccomandazioni"),
+        "status": {"normal": "Normale", "low": "Basso", "high": "Alto"},
+        "levels": {"low": "rischio basso", "mid": "rischio moderato", "high": "rischio alto"},
+        "domains": {"cardio": "cardiovascolare", "metabolic": "metabolismo", "inflammation": "infiammazione", "vitamin": "vitamine e minerali"},
+        "score": "Il tuo punteggio di salute complessivo è {score}/100 ({level}).",
+        "counted": "Sono stati valutati {n} parametri; {k} sono fuori dall'intervallo di riferimento.",
+        "all_normal": "Tutti i valori valutati sono nell'intervallo di riferimento.",
+        "flagged": "Valori fuori dall'intervallo di riferimento: {items}.",
+        "domains_line": "Aree che richiedono attenzione: {items}.",
+        "no_values": "Non è stato possibile leggere valori di laboratorio dal testo; valuta i risultati con il tuo medico.",
+        "note": "Questa interpretazione è stata generata all'istante da regole; può seguire un'interpretazione dettagliata.",
+        "no_risk": "Nessun valore richiede particolare attenzione.",
+        "risk_line": "{name}: {value} — riferimento {ref}, {status}",
+        "no_causes": "Nessun valore è fuori dall'intervallo di riferimento, quindi non sono elencate cause.",
+        "general": ["Condividi i risultati con il tuo medico.", "Ripeti l'esame all'intervallo consigliato dal tuo medico."],
+        "see_doctor": "Rivolgiti presto al tuo medico per i valori che indicano un rischio alto.",
+        "groups": {
+            "lipids": ("Una dieta ricca di grassi, la sedentarietà, il sovrappeso o la familiarità possono influire sui lipidi nel sangue.",
+                       "Riduci i grassi saturi e i cibi processati; cammina a passo svelto almeno 150 minuti a settimana."),
+            "glucose_high": ("Una dieta ricca di zuccheri, il sovrappeso o l'insulino-resistenza possono aumentare la glicemia.",
+                             "Limita bevande zuccherate e carboidrati raffinati; pianifica il controllo di glicemia e HbA1c con il medico."),
+            "glucose_low": ("Il digiuno prolungato, l'esercizio intenso o alcuni farmaci possono abbassare la glicemia.",
+                            "Non saltare i pasti; consulta il medico in caso di vertigini o tremori."),
+            "liver": ("Il fegato grasso, l'alcol, alcuni farmaci o l'esercizio intenso possono aumentare gli enzimi epatici.",
+                      "Limita l'alcol, rivedi i farmaci con il medico e ripeti l'esame."),
+            "kidney": ("La disidratazione, un elevato apporto di proteine, alcuni farmaci o una ridotta funzione renale possono influire su questo valore.",
+                       "Bevi a sufficienza, chiedi al medico sull'uso di antidolorifici e ricontrolla la funzione renale."),
+            "inflammation": ("Un'infezione in corso, malattie infiammatorie o carenza di vitamine B possono aumentare questi valori.",
+                             "Consulta il medico se hai segni di infezione; ripeti la misura dopo la guarigione."),
+            "iron": ("Un basso apporto di ferro, perdite di sangue (mestruazioni abbondanti) o problemi di assorbimento possono ridurre le scorte di ferro.",
+                     "Mangia più carne rossa, legumi e verdure a foglia verde; parla con il medico di un integratore di ferro."),
+            "vitamin": ("Poca esposizione al sole, una dieta squilibrata o problemi di assorbimento possono abbassare le vitamine.",
+                        "Chiedi al medico dose e durata di un integratore; varia la tua alimentazione."),
+            "thyroid_high": ("Una tiroide poco attiva può aumentare il TSH.",
+                             "Rivolgiti al medico per misurare gli ormoni tiroidei (FT4)."),
+            "thyroid_low": ("Una tiroide iperattiva o i farmaci per la tiroide possono abbassare il TSH.",
+                            "Rivolgiti al medico in caso di palpitazioni o perdita di peso."),
+            "generic": ("Questo valore può essere fuori intervallo per molte ragioni temporanee o durature.",
+                        "Valuta questo valore con il medico e ripetilo se necessario."),
+        },
+    },
+}
+DEFAULT_LANG = "en"
+
+
+class LlmUnavailable(Exception):
+    """LLM çağrısı yapılamadı (bağlantı, zaman aşımı, yoğunluk, 5xx); çağıran bozulmuş moda geçer."""
+
+
+def phrases_for(lang: str | None) -> dict:
+    return PHRASES.get((lang or "tr").strip().lower()[:2], PHRASES[DEFAULT_LANG])
+
+
+def _format_value(row: dict) -> str:
+    value = row.get("value")
+    value_str = f"{value:g}" if isinstance(value, float) else str(value)
+    unit = (row.get("unit") or "").strip()
+    return f"{value_str} {unit}".strip()
+
+
+def build_explanation(risk_summary: dict, tables: list[dict], lang: str | None) -> str:
+    """Kural tabanlı açıklama (markdown): LLM açıklamasıyla aynı bölümler, aynı dilde, ağ yok."""
+    ph = phrases_for(lang)
+    h_summary, h_risk, h_values, h_causes, h_reco = ph["headings"]
+    overall = (risk_summary or {}).get("overall") or {}
+    domains = (risk_summary or {}).get("domains") or {}
+    rows = [r for r in tables or [] if r.get("name")]
+    flagged = [r for r in rows if (r.get("status") or "normal") != "normal"]
+
+    summary = [ph["score"].format(score=int(overall.get("score") or 0), level=ph["levels"].get(overall.get("level"), "—"))]
+    if not rows:
+        summary.append(ph["no_values"])
+    else:
+        summary.append(ph["counted"].format(n=len(rows), k=len(flagged)))
+        if flagged:
+            items = ", ".join(f"{PARAM_FLAGS.get(r['name'], r['name'])} ({ph['status'][r['status']].lower()})" for r in flagged[:8])
+            summary.append(ph["flagged"].format(items=items))
+        else:
+            summary.append(ph["all_normal"])
+    attention = [ph["domains"].get(k, k) for k, d in domains.items() if isinstance(d, dict) and d.get("level") in ("mid", "high")]
+    if attention:
+        summary.append(ph["domains_line"].format(items=", ".join(attention)))
+    summary.append(ph["note"])
+
+    risk_lines = [
+        "- " + ph["risk_line"].format(name=r["name"], value=_format_value(r), ref=r.get("ref") or "—", status=ph["status"][r["status"]])
+        for r in flagged
+    ] or [f"- {ph['no_risk']}"]
+
+    value_lines = [
+        f"**{r['name']}:** {_format_value(r)}. Reference: {r.get('ref') or '—'}. {ph['status'][r.get('status') or 'normal']}."
+        for r in flagged + [r for r in rows if r not in flagged]
+    ]
+
+    # Aynı gruptaki parametreler (ör. LDL + TG) tek neden/öneri satırı paylaşır
+    groups: dict[str, list[str]] = {}
+    for r in flagged:
+        groups.setdefault(_GROUPS.get((r["name"], r["status"]), "generic"), []).append(r["name"])
+    cause_lines = [f"- {', '.join(names)}: {ph['groups'][g][0]}" for g, names in groups.items()] or [f"- {ph['no_causes']}"]
+    reco_lines = [f"- {ph['groups'][g][1]}" for g in groups]
+    if overall.get("level") == "high" or any(h.get("level") == "high" for h in (risk_summary or {}).get("highlights") or []):
+        reco_lines.append(f"- {ph['see_doctor']}")
+    reco_lines += [f"- {line}" for line in ph["general"]]
+
+    sections = [
+        f"**{h_summary}**\n" + " ".join(summary),
+        f"**{h_risk}**\n" + "\n".join(risk_lines),
+    ]
+    if value_lines:
+        sections.append(f"**{h_values}**\n" + "\n".join(value_lines))
+    sections += [
+        f"**{h_causes}**\n" + "\n".join(cause_lines),
+        f"**{h_reco}**\n" + "\n".join(reco_lines),
+    ]
+    return "\n\n".join(sections)
+
+
+_inflight = 0
+_inflight_lock = threading.Lock()
+
+
+def llm_inflight() -> int:
+    return _inflight
+
+
+@contextmanager
+def llm_admission() -> Iterator[str | None]:
+    """LLM çağrısı kabulü. None verirse çağrı yapılabilir; aksi halde bozulma nedeni
+    ("forced", "circuit_open", "overload").
+
+    Kabul edilen çağrı bloğun sonuna kadar eşzamanlı çağrı sayacında tutulur.
+    """
+    global _inflight
+    mode = (settings.llm_degraded_mode or "auto").strip().lower()
+    if mode == "force":
+        yield "forced"
+        return
+    if mode != "off" and upstream("openai-text").is_open():
+        yield "circuit_open"
+        return
+    limit = settings.llm_max_inflight
+    with _inflight_lock:
+        admitted = mode == "off" or limit <= 0 or _inflight < limit
+        if admitted:
+            _inflight += 1
+    if not admitted:
+        yield "overload"
+        return
+    try:
+        yield None
+    finally:
+        with _inflight_lock:
+            _inflight -= 1
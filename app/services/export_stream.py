@@ -0,0 +1,296 @@
+"""
+Analiz geçmişinin akışlı (streaming) dışa aktarımı: JSON, NDJSON, CSV ve ZIP.
+
+Kayıtlar sunucu taraflı cursor ile (stream_results + yield_per) partiler hâlinde okunur ve
+StreamingResponse'a ~64 KB'lık parçalar olarak yazılır (chunked transfer); bellek kullanımı
+dışa aktarım boyutundan bağımsızdır. Üreteç kendi Session'ını açar: FastAPI'nin get_db
+oturumu yanıt gövdesi akmaya başlamadan kapanır. Cursor'un transaction'ı Postgres'in
+idle_in_transaction_session_timeout sınırından muaftır; yavaş okuyan istemci akışı kesmez.
+
+Çok büyük kurum (tenant) dışa aktarımları `start_async_export` ile arka planda geçici dosyaya
+yazılır, object storage'a (MinIO) yüklenir ve isteyen kullanıcıya e-posta ile bildirilir.
+Durum object storage'daki nesnelerden okunur (çok worker'lı kurulumda ortak durum tablosu gerekmez):
+hazır dosya varsa "ready"; yoksa başlatılırken yazılan `.state` işareti ("running" / "failed").
+İşareti olmayan export_id bilinmez; ASYNC_EXPORT_MAX_SECONDS içinde bitmeyen iş (worker çöktü,
+süreç yeniden başladı) "failed" sayılır.
+"""
+import csv
+import io
+import json
+import logging
+import secrets
+import tempfile
+import threading
+import zipfile
+from datetime import datetime
+from typing import Iterable, Iterator
+
+from fastapi.responses import StreamingResponse
+from sqlmodel import select
+
+from app.core.database import read_session
+from app.core.db_profiles import exempt_from_idle_timeout
+from app.models.analysis import AnalysisRecord
+from app.services import storage
+
+log = logging.getLogger(__name__)
+
+# format -> (media type, dosya uzantısı)
+EXPORT_FORMATS: dict[str, tuple[str, str]] = {
+    "json": ("application/json", "json"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "zip": ("application/zip", "zip"),
+}
+
+BATCH_SIZE = 500  # yield_per: cursor'dan tek seferde çekilen satır
+CHUNK_BYTES = 64 * 1024  # yanıta yazılan parça boyutu
+# Kurum dışa aktarımı bu kayıt sayısını aşarsa (ve storage varsa) arka planda object storage'a yazılır
+ASYNC_EXPORT_THRESHOLD = 50_000
+# Başlatılmış ama bu süre içinde ne hazır ne hatalı olan arka plan dışa aktarımı "failed" sayılır
+ASYNC_EXPORT_MAX_SECONDS = 2 * 3600
+
+CSV_FIELDS = ("id", "user_id", "created_at", "source", "lang", "input_text", "result_text", "doctor_notes")
+
+_EXPORT_COLUMNS = (
+    AnalysisRecord.id,
+    AnalysisRecord.user_id,
+    AnalysisRecord.created_at,
+    AnalysisRecord.source,
+    AnalysisRecord.lang,
+    AnalysisRecord.input_text,
+    AnalysisRecord.result_text,
+    AnalysisRecord.doctor_notes,
+)
+
+
+def export_statement(*, user_id: int | None = None, institution_id: int | None = None):
+    """Dışa aktarılacak sütunlar; ORM nesnesi yerine hafif satırlar (kimlik haritası büyümez)."""
+    stmt = select(*_EXPORT_COLUMNS)
+    if user_id is not None:
+        stmt = stmt.where(AnalysisRecord.user_id == user_id)
+    if institution_id is not None:
+        stmt = stmt.where(AnalysisRecord.institution_id == institution_id)
+    return stmt.order_by(AnalysisRecord.created_at.desc(), AnalysisRecord.id.desc())
+
+
+def _record_dict(row) -> dict:
+    created = row.created_at
+    return {
+        "id": row.id,
+        "user_id": row.user_id,
+        "input_text": row.input_text,
+        "result_text": row.result_text,
+        "source": row.source,
+        "lang": row.lang,
+        "created_at": created.isoformat() if hasattr(created, "isoformat") else str(created),
+        "doctor_notes": row.doctor_notes,
+    }
+
+
+def iter_rows(stmt) -> Iterator:
+    """Sunucu taraflı cursor ile satırları BATCH_SIZE'lık partilerle okur (okuma replikası varsa oradan)."""
+    with read_session() as db:
+        exempt_from_idle_timeout(db)
+        result = db.exec(stmt.execution_options(stream_results=True, yield_per=BATCH_SIZE))
+        for row in result:
+            yield row
+
+
+def _coalesce(parts: Iterable[str | bytes]) -> Iterator[bytes]:
+    """Küçük parçaları CHUNK_BYTES'lık bloklara toplar (her satır için ayrı write yapılmasın)."""
+    buf = bytearray()
+    for part in parts:
+        buf += part.encode("utf-8") if isinstance(part, str) else part
+        if len(buf) >= CHUNK_BYTES:
+            yield bytes(buf)
+            buf.clear()
+    if buf:
+        yield bytes(buf)
+
+
+def _json_parts(rows) -> Iterator[str]:
+    # /analyze/export'un önceki gövdesiyle aynı şekil: {"exported_at": ..., "analyses": [...]}
+    yield '{"exported_at": ' + json.dumps(datetime.utcnow().isoformat() + "Z") + ', "analyses": ['
+    first = True
+    for row in rows:
+        yield ("" if first else ",") + json.dumps(_record_dict(row), ensure_ascii=False)
+        first = False
+    yield "]}"
+
+
+def _ndjson_parts(rows) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(_record_dict(row), ensure_ascii=False) + "\n"
+
+
+def _csv_parts(rows) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=CSV_FIELDS)
+    buf.write("\ufeff")  # Excel UTF-8 BOM
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(_record_dict(row))
+        if buf.tell() >= CHUNK_BYTES:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+class ZipSink:
+    """Seek edilemeyen yazma hedefi: zipfile veri tanımlayıcılarıyla (data descriptor) akış modunda yazar."""
+
+    def __init__(self):
+        self._buf = bytearray()
+
+    def write(self, data) -> int:
+        self._buf += data
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = bytes(self._buf)
+        self._buf.clear()
+        return data
+
+
+def _zip_parts(rows) -> Iterator[bytes]:
+    # Analiz başına bir .json dosyası; arşivde yalnızca merkez dizin girdileri (~100 B/dosya) birikir
+    sink = ZipSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for row in rows:
+            rec = _record_dict(row)
+            day = rec["created_at"][:10].replace("-", "")
+            zf.writestr(
+                f"analyses/{day}-{rec['id']}.json",
+                json.dumps(rec, ensure_ascii=False, indent=2),
+            )
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    yield sink.drain()
+
+
+_ENCODERS = {"json": _json_parts, "ndjson": _ndjson_parts, "csv": _csv_parts, "zip": _zip_parts}
+
+
+def iter_export(stmt, fmt: str) -> Iterator[bytes]:
+    """Seçilen biçimde bayt parçaları üretir."""
+    return _coalesce(_ENCODERS[fmt](iter_rows(stmt)))
+
+
+def export_response(stmt, fmt: str, filename_base: str) -> StreamingResponse:
+    """Content-Length olmadan (chunked) akan indirme yanıtı."""
+    media_type, ext = EXPORT_FORMATS[fmt]
+    return StreamingResponse(
+        iter_export(stmt, fmt),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename_base}.{ext}",
+            "X-Robots-Tag": "noindex, nofollow",
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+# ---------------------------------------------------------------------------
+# Asenkron (object storage) mod
+# ---------------------------------------------------------------------------
+
+
+def _object_name(institution_id: int, export_id: str, ext: str) -> str:
+    return f"exports/tenant-{institution_id}/{export_id}.{ext}"
+
+
+def _state_marker(institution_id: int, export_id: str) -> str:
+    return f"exports/tenant-{institution_id}/{export_id}.state"
+
+
+def mark_export_started(marker: str) -> None:
+    """Arka plan işi başlamadan "running" işareti yazar; yazılamazsa RuntimeError (izlenemeyen iş başlatılmaz)."""
+    state = {"status": "running", "started_at": datetime.utcnow().isoformat()}
+    if not storage.put_small_object(marker, json.dumps(state).encode()):
+        raise RuntimeError("export state marker could not be written")
+
+
+def mark_export_failed(marker: str, error: Exception) -> None:
+    state = {"status": "failed", "error": str(error)[:200], "failed_at": datetime.utcnow().isoformat()}
+    storage.put_small_object(marker, json.dumps(state).encode())
+
+
+def marker_status(marker: str) -> str:
+    """İşarete göre "pending" | "failed" | "unknown" (hazır dosya kontrolü çağıranda)."""
+    raw = storage.get_small_object(marker)
+    if raw is None:
+        return "unknown"
+    try:
+        state = json.loads(raw)
+        if state.get("status") != "running":
+            return "failed"
+        age = (datetime.utcnow() - datetime.fromisoformat(state["started_at"])).total_seconds()
+    except (ValueError, KeyError, TypeError):
+        return "failed"
+    return "pending" if age < ASYNC_EXPORT_MAX_SECONDS else "failed"
+
+
+def _run_async_export(institution_id: int, export_id: str, fmt: str, notify_email: str | None) -> None:
+    media_type, ext = EXPORT_FORMATS[fmt]
+    filename = f"norya-tenant-{institution_id}-{export_id}.{ext}"
+    try:
+        with tempfile.TemporaryFile() as tmp:
+            size = 0
+            for chunk in iter_export(export_statement(institution_id=institution_id), fmt):
+                tmp.write(chunk)
+                size += len(chunk)
+            tmp.seek(0)
+            url = storage.upload_export_file(
+                _object_name(institution_id, export_id, ext), tmp, size, media_type, filename
+            )
+        if not url:
+            raise RuntimeError("export upload failed")
+        log.info("Tenant export ready institution_id=%s export_id=%s bytes=%s", institution_id, export_id, size)
+        if notify_email:
+            from app.services.email_sender import send_email
+
+            send_email(
+                notify_email,
+                "Norya — dışa aktarımınız hazır",
+                f'<p>Analiz dışa aktarımınız hazır ({size // 1024} KB).</p>'
+                f'<p><a href="{url}">İndir</a> (bağlantı 24 saat geçerlidir)</p>',
+            )
+    except Exception as e:
+        log.exception("Tenant export failed institution_id=%s export_id=%s: %s", institution_id, export_id, e)
+        mark_export_failed(_state_marker(institution_id, export_id), e)
+
+
+def start_async_export(institution_id: int, fmt: str, notify_email: str | None = None) -> str:
+    """Dışa aktarımı arka planda başlatır; export_id döner (durum: `async_export_status`).
+
+    Durum işareti yazılamazsa (storage erişilemez) RuntimeError; iş başlatılmaz.
+    """
+    export_id = f"{fmt}-{secrets.token_urlsafe(12)}"
+    mark_export_started(_state_marker(institution_id, export_id))
+    threading.Thread(
+        target=_run_async_export,
+        args=(institution_id, export_id, fmt, notify_email),
+        daemon=True,
+        name=f"tenant-export-{institution_id}",
+    ).start()
+    return export_id
+
+
+def async_export_status(institution_id: int, export_id: str) -> dict:
+    """{"status": "ready"|"failed"|"pending"|"unknown", "url"?}; export_id tenant öneki altında aranır."""
+    fmt = export_id.split("-", 1)[0]
+    if fmt not in EXPORT_FORMATS or not all(c.isalnum() or c in "-_" for c in export_id):
+        return {"export_id": export_id, "status": "unknown"}
+    ext = EXPORT_FORMATS[fmt][1]
+    url = storage.presigned_download_url(
+        _object_name(institution_id, export_id, ext), f"norya-tenant-{institution_id}-{export_id}.{ext}"
+    )
+    if url:
+        return {"export_id": export_id, "status": "ready", "url": url}
+    return {"export_id": export_id, "status": marker_status(_state_marker(institution_id, export_id))}
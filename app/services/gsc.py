@@ -1,16 +1,16 @@
 """Google Search Console API integration for SEO dashboard."""
 import logging
-import time
 from datetime import date, timedelta
 from pathlib import Path
 from typing import Any
 
 from app.core.config import settings
+from app.core.shared_cache import shared_cache
 
 logger = logging.getLogger(__name__)
 
-_cache: dict[str, Any] = {}
 _CACHE_TTL = 300  # 5 min
+_cache = shared_cache.namespace("gsc", ttl=_CACHE_TTL)
 
 SCOPES = ["https://www.googleapis.com/auth/webmasters.readonly"]
 
@@ -35,14 +35,11 @@ DEVICE_NAMES = {"DESKTOP": "Masaüstü", "MOBILE": "Mobil", "TABLET": "Tablet"}
 
 
 def _cache_get(key: str) -> Any | None:
-    entry = _cache.get(key)
-    if entry and (time.time() - entry["ts"]) < _CACHE_TTL:
-        return entry["data"]
-    return None
+    return _cache.get(key)
 
 
 def _cache_set(key: str, data: Any) -> None:
-    _cache[key] = {"ts": time.time(), "data": data}
+    _cache.set(key, data)
 
 
 def is_configured() -> bool:
@@ -0,0 +1,143 @@
+"""
+Görsel tahlil ön işleme (OpenAI Vision öncesi): EXIF yönü, kenar kırpma, küçültme, yeniden sıkıştırma, parmak izi.
+
+Telefon fotoğrafları 4–12 MB gelir; detail="low" ile model zaten 512 px'lik bir kopyayı görür. Görsel burada
+vision katmanının kullandığı çözünürlüğe indirilir (JPEG draft ile çözme anında küçültülür), JPEG olarak
+yeniden sıkıştırılır; istek boyutu ve yükleme süresi düşer.
+
+Önbellek anahtarı için iki özet üretilir:
+- phash: 64 bit fark özeti (dHash); yakın kopyaları loglamak için.
+- fingerprint: 256 px gri tonlu, 16 seviyeye nicemlenmiş görüntünün SHA-256'sı. Aynı fotoğrafın yeniden
+  yüklenmesi (çift tıklama, mobil yeniden deneme, kurumsal tekrar yükleme) aynı değeri verir; aynı
+  laboratuvar şablonundaki farklı değerler (rakamlar) farklı değer verir. Ağır yeniden sıkıştırılmış
+  kopyalar ıskalayabilir (güvenli yön). Tek başına 64 bit phash aynı şablondaki farklı hastaları ayıramaz.
+"""
+import hashlib
+import io
+import logging
+from dataclasses import dataclass
+
+from PIL import Image, ImageChops, ImageOps
+
+log = logging.getLogger(__name__)
+
+# OpenAI vision: detail="low" → 512x512 içine sığdırılır; "high" → 2048 kutusu, sonra kısa kenar 768
+LOW_DETAIL_MAX_SIDE = 512
+HIGH_DETAIL_MAX_SIDE = 2048
+HIGH_DETAIL_SHORT_SIDE = 768
+JPEG_QUALITY = 85
+FINGERPRINT_SIDE = 256
+FINGERPRINT_LEVELS = 16
+# Kenar kırpma: arka plandan bu kadar farklı pikseller içerik sayılır; kırpım alanın yarısından azını bırakıyorsa yapılmaz
+TRIM_THRESHOLD = 24
+TRIM_MIN_AREA_RATIO = 0.5
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime: str
+    width: int
+    height: int
+    phash: str
+    fingerprint: str
+    original_bytes: int
+    preprocessed: bool = True
+
+
+def target_size(width: int, height: int, detail: str = "low") -> tuple[int, int]:
+    """Vision katmanının görüntüyü ölçeklediği boyut (büyütme yok)."""
+    if detail == "high":
+        scale = min(1.0, HIGH_DETAIL_MAX_SIDE / max(width, height))
+        w, h = width * scale, height * scale
+        scale = min(1.0, HIGH_DETAIL_SHORT_SIDE / min(w, h))
+        return max(1, round(w * scale)), max(1, round(h * scale))
+    scale = min(1.0, LOW_DETAIL_MAX_SIDE / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _trim_borders(img: Image.Image) -> Image.Image:
+    """Köşe rengiyle aynı düz kenarları (tarayıcı / ekran görüntüsü boşlukları) kırpar."""
+    gray = img.convert("L")
+    bg = Image.new("L", gray.size, gray.getpixel((0, 0)))
+    diff = ImageChops.difference(gray, bg).point(lambda p: 255 if p > TRIM_THRESHOLD else 0)
+    bbox = diff.getbbox()
+    if not bbox:
+        return img
+    area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+    if area < TRIM_MIN_AREA_RATIO * img.width * img.height or area == img.width * img.height:
+        return img
+    return img.crop(bbox)
+
+
+def dhash(img: Image.Image, size: int = 8) -> str:
+    """64 bit fark özeti (hex)."""
+    small = img.convert("L").resize((size + 1, size), Image.Resampling.LANCZOS)
+    px = list(small.getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = px[row * (size + 1) + col]
+            right = px[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (1 if left > right else 0)
+    return f"{bits:0{size * size // 4}x}"
+
+
+def fingerprint(img: Image.Image) -> str:
+    gray = img.convert("L")
+    gray.thumbnail((FINGERPRINT_SIDE, FINGERPRINT_SIDE), Image.Resampling.BILINEAR)
+    step = 256 // FINGERPRINT_LEVELS
+    quant = gray.point(lambda p: p // step)
+    h = hashlib.sha256(f"{quant.width}x{quant.height}:".encode())
+    h.update(quant.tobytes())
+    return h.hexdigest()
+
+
+def prepare_image(data: bytes, mime: str = "image/jpeg", detail: str = "low") -> PreparedImage:
+    """Yüklenen görseli vision katmanına hazırlar. Açılamazsa ham bayt ve içerik özetiyle döner."""
+    try:
+        img = Image.open(io.BytesIO(data))
+        w0, h0 = img.size
+        if img.format == "JPEG":
+            # Çözme sırasında 1/2, 1/4, 1/8 ölçekleme: büyük fotoğraflarda bellek ve süre düşer
+            tw, th = target_size(w0, h0, detail)
+            img.draft("RGB", (tw * 2, th * 2))
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "L"):
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            rgba = img.convert("RGBA")
+            background.paste(rgba, mask=rgba.getchannel("A"))
+            img = background
+        img = _trim_borders(img)
+        tw, th = target_size(img.width, img.height, detail)
+        if (tw, th) != img.size:
+            img = img.resize((tw, th), Image.Resampling.LANCZOS)
+        out = io.BytesIO()
+        img.convert("RGB").save(out, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+        prepared = out.getvalue()
+        if len(prepared) >= len(data) and (w0, h0) == img.size:
+            # Zaten küçük ve sıkıştırılmış: orijinali gönder
+            prepared, mime_out = data, mime
+        else:
+            mime_out = "image/jpeg"
+        return PreparedImage(
+            data=prepared,
+            mime=mime_out,
+            width=img.width,
+            height=img.height,
+            phash=dhash(img),
+            fingerprint=fingerprint(img),
+            original_bytes=len(data),
+        )
+    except Exception as e:
+        log.warning("Image preprocessing failed, sending original: %s", e)
+        return PreparedImage(
+            data=data,
+            mime=mime,
+            width=0,
+            height=0,
+            phash="",
+            fingerprint=hashlib.sha256(data).hexdigest(),
+            original_bytes=len(data),
+            preprocessed=False,
+        )
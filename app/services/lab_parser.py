@@ -110,7 +110,8 @@ def parse_biomarkers(values_block: str) -> list[dict]:
         line = raw_line.strip()
         if not line or len(line) < 4:
             continue
-        if line.startswith("-") or line.startswith("•") or line.startswith("*"):
+        # "**" madde işareti değil kalın ad: "**LDL:** 162" satırında soyulmamalı
+        if line.startswith("-") or line.startswith("•") or (line.startswith("*") and not line.startswith("**")):
             line = line.lstrip("-•*").strip()
         if not line:
             continue
@@ -120,7 +121,8 @@ def parse_biomarkers(values_block: str) -> list[dict]:
             m = re.match(r"\*\*([^*]+)\*?\s*:\s*(.+)", line)
             if m:
                 name = (m.group(1) or "").strip().rstrip("*").strip()
-                rest = (m.group(2) or "").strip()
+                # "**Ad:** değer" biçiminde kapanış yıldızları değerin başında kalır
+                rest = (m.group(2) or "").lstrip("*").strip()
         else:
             name = _name_before_value(line)
             if name:
@@ -139,13 +141,19 @@ def parse_biomarkers(values_block: str) -> list[dict]:
         status = "normal"
         # Reference kısmında ondalık (örn 13.5) olduğu için '.' karakterini dışarıda bırakmayalım.
         # Bu regex ayrıca satır sonundaki durum (Normal/Low/High/Borderline...) varsa yakalar.
+        # format_report_to_markdown tablo satırı: "162 mg/dL (Ref: 0-100) — high"
         ref_m = re.search(
+            r"\((?:Reference|Ref\.?|Referans)\s*:\s*([^)]*)\)\s*(?:[—–-]\s*(normal|low|high|border|borderline))?\s*$",
+            rest,
+            re.I,
+        ) or re.search(
             r"(?:Reference|Ref\.?|Referans)\s*:\s*([^\n]+?)(?:\.\s*(Normal|Low|High|Borderline|Düşük|Yüksek|Sınırda|Sınır))?\s*\.?\s*$",
             rest,
             re.I,
         )
         if ref_m:
-            ref = ref_m.group(1).strip() or None
+            ref = ref_m.group(1).strip()
+            ref = None if ref in ("", "—") else ref
             if ref_m.lastindex and ref_m.lastindex >= 2 and ref_m.group(2):
                 status = _norm_status(ref_m.group(2))
             value_str = rest[: ref_m.start()].strip().rstrip(".,")
@@ -221,3 +229,11 @@ def parse_lab_text(text: str) -> list[dict[str, Any]]:
             "ref_high": ref_high,
         })
     return out
+
+
+_CANONICAL_NAMES = frozenset(PARAM_ALIASES.values())
+
+
+def is_recognized_value(value: dict[str, Any]) -> bool:
+    """Sayfa başlığı/numarası gibi gürültü değil, gerçek tahlil satırı mı (bilinen parametre ya da ref aralığı)."""
+    return value.get("name") in _CANONICAL_NAMES or value.get("ref_low") is not None or value.get("ref_high") is not None
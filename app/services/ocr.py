@@ -0,0 +1,260 @@
+"""
+Yerel OCR katmanı: görseller ve metin katmanı olmayan (taranmış) PDF'ler için Vision öncesi ucuz yol.
+
+- Motor takılabilir: OcrEngine arayüzü (name, available(), recognize(img)). Varsayılan Tesseract
+  (pytesseract + sistemde tesseract ikilisi); kurulu değilse katman sessizce atlanır. Başka motor
+  register_engine ile eklenir, settings.ocr_engine ile seçilir ("off" kapatır).
+- Karar: OCR metni parse_lab_text ile ayrıştırılır; en az ocr_min_biomarkers tanınan değer ve motor
+  güveni ocr_min_confidence üstündeyse istek metin yoluna (analyze_blood_test + AI önbelleği) gider.
+  Aksi halde Vision kullanılır.
+- Taranmış PDF: sayfa görsellerinin çıkarılması (PDF ayrıştırma, görsel çözme) pdf_extract havuzunda belge başına
+  CPU/bellek/süre sınırıyla yapılır; motor yalnızca hazırlanmış görselleri okur. Tesseract çağrısı ocr_timeout_seconds
+  ile sınırlıdır.
+- route_stats: analiz yolu başına (pdf_text, ocr_text, vision) sayı ve gecikme; OCR denemeleri ayrıca.
+"""
+import io
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Protocol
+
+from PIL import Image, ImageOps
+
+from app.core.config import settings
+from app.services.lab_parser import is_recognized_value, parse_lab_text
+
+log = logging.getLogger(__name__)
+
+# Tesseract ~300 dpi eşdeğerinde iyi okur: dar kenarı bundan küçük görseller büyütülür
+OCR_MIN_WIDTH = 1600
+OCR_MAX_SIDE = 3000
+# Taranmış PDF'de OCR'lanan en fazla sayfa (tahlil sonuçları ilk sayfalardadır)
+OCR_MAX_PDF_PAGES = 5
+
+
+@dataclass
+class OcrText:
+    text: str
+    confidence: float  # 0–100, motorun kelime ortalaması
+
+
+class OcrEngine(Protocol):
+    name: str
+
+    def available(self) -> bool: ...
+
+    def recognize(self, image: Image.Image) -> OcrText: ...
+
+
+class TesseractEngine:
+    name = "tesseract"
+
+    def __init__(self, languages: str | None = None):
+        self.languages = languages or settings.ocr_languages
+        self._available: bool | None = None
+
+    def available(self) -> bool:
+        if self._available is None:
+            try:
+                import pytesseract
+
+                pytesseract.get_tesseract_version()
+                self._available = True
+            except Exception:
+                self._available = False
+        return self._available
+
+    def recognize(self, image: Image.Image) -> OcrText:
+        import pytesseract
+
+        # psm 6: tek blok metin; tahlil tablolarında satır düzenini korur
+        data = pytesseract.image_to_data(
+            image, lang=self.languages, config="--psm 6", output_type=pytesseract.Output.DICT,
+            timeout=settings.ocr_timeout_seconds,
+        )
+        lines: dict[tuple, list[str]] = {}
+        confs: list[float] = []
+        for i, word in enumerate(data.get("text") or []):
+            word = (word or "").strip()
+            conf = float(data["conf"][i])
+            if not word or conf < 0:
+                continue
+            confs.append(conf)
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            lines.setdefault(key, []).append(word)
+        text = "\n".join(" ".join(words) for _, words in sorted(lines.items()))
+        return OcrText(text=text, confidence=sum(confs) / len(confs) if confs else 0.0)
+
+
+_ENGINES: dict[str, Callable[[], OcrEngine]] = {"tesseract": TesseractEngine}
+_engine: OcrEngine | None = None
+_engine_name: str | None = None
+_engine_lock = threading.Lock()
+
+
+def register_engine(name: str, factory: Callable[[], OcrEngine]) -> None:
+    """settings.ocr_engine ile seçilebilecek yeni bir OCR motoru ekler."""
+    global _engine_name
+    _ENGINES[name] = factory
+    with _engine_lock:
+        _engine_name = None  # sonraki get_engine yeniden seçer
+
+
+def get_engine() -> OcrEngine | None:
+    """Seçili ve kullanılabilir OCR motoru; yoksa None."""
+    global _engine, _engine_name
+    name = (settings.ocr_engine or "").strip().lower()
+    if name in ("", "off", "none"):
+        return None
+    with _engine_lock:
+        if _engine_name != name:
+            factory = _ENGINES.get(name)
+            _engine = factory() if factory else None
+            _engine_name = name
+            if _engine is None:
+                log.warning("OCR engine %r is not registered", name)
+        engine = _engine
+    return engine if engine is not None and engine.available() else None
+
+
+def _prepare_for_ocr(img: Image.Image) -> Image.Image:
+    """EXIF yönü, gri ton, otomatik kontrast; küçük görseller büyütülür, devasa olanlar küçültülür."""
+    img = ImageOps.exif_transpose(img)
+    gray = ImageOps.autocontrast(img.convert("L"))
+    w, h = gray.size
+    if w < OCR_MIN_WIDTH:
+        scale = OCR_MIN_WIDTH / w
+    else:
+        scale = min(1.0, OCR_MAX_SIDE / max(w, h))
+    if scale != 1.0:
+        gray = gray.resize((max(1, round(w * scale)), max(1, round(h * scale))), Image.Resampling.LANCZOS)
+    return gray
+
+
+@dataclass
+class OcrOutcome:
+    engine: str
+    text: str
+    confidence: float
+    lab_values: list[dict[str, Any]] = field(default_factory=list)
+    recognized: int = 0
+    elapsed_ms: int = 0
+    accepted: bool = False
+
+
+def _evaluate(engine: OcrEngine, parts: list[OcrText], t0: float) -> OcrOutcome:
+    text = "\n\n".join(p.text for p in parts if p.text).strip()
+    confidence = sum(p.confidence for p in parts) / len(parts) if parts else 0.0
+    lab_values = parse_lab_text(text)
+    recognized = sum(1 for v in lab_values if is_recognized_value(v))
+    accepted = recognized >= settings.ocr_min_biomarkers and confidence >= settings.ocr_min_confidence
+    outcome = OcrOutcome(
+        engine=engine.name,
+        text=text,
+        confidence=round(confidence, 1),
+        lab_values=lab_values,
+        recognized=recognized,
+        elapsed_ms=int((time.perf_counter() - t0) * 1000),
+        accepted=accepted,
+    )
+    route_stats.record("ocr_accepted" if accepted else "ocr_rejected", outcome.elapsed_ms / 1000)
+    log.info(
+        "OCR %s: %d biomarkers, conf=%.0f, %d ms -> %s",
+        engine.name, recognized, confidence, outcome.elapsed_ms, "text path" if accepted else "vision",
+    )
+    return outcome
+
+
+def ocr_image(data: bytes) -> OcrOutcome | None:
+    """Görsel baytlarını OCR'lar ve metin yoluna uygunluğunu değerlendirir. Motor yoksa/okunamazsa None."""
+    engine = get_engine()
+    if engine is None:
+        return None
+    t0 = time.perf_counter()
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            part = engine.recognize(_prepare_for_ocr(img))
+    except Exception as e:
+        log.warning("OCR failed (%s): %s", engine.name, e)
+        return None
+    return _evaluate(engine, [part], t0)
+
+
+def _scanned_page_images(path: str, max_pages: int) -> list[bytes]:
+    """pdf_extract havuz görevi: her sayfanın en büyük gömülü görseli, OCR'a hazırlanmış PNG baytları olarak."""
+    from pypdf import PdfReader
+
+    out: list[bytes] = []
+    reader = PdfReader(path)
+    for page in reader.pages[:max_pages]:
+        images = [im.image for im in page.images if im.image is not None]
+        if not images:
+            continue
+        largest = max(images, key=lambda im: im.width * im.height)
+        buf = io.BytesIO()
+        _prepare_for_ocr(largest).save(buf, format="PNG")
+        out.append(buf.getvalue())
+    return out
+
+
+def ocr_pdf(content: bytes, max_pages: int = OCR_MAX_PDF_PAGES) -> OcrOutcome | None:
+    """Metin katmanı olmayan PDF: her sayfanın en büyük gömülü görseli OCR'lanır."""
+    from app.services.pdf_extract import run_on_pdf
+
+    engine = get_engine()
+    if engine is None:
+        return None
+    t0 = time.perf_counter()
+    images, limited = run_on_pdf(_scanned_page_images, content, max_pages)
+    if limited:
+        log.warning("PDF OCR image extraction stopped (%s)", limited)
+    if not images:
+        return None
+    try:
+        parts = [engine.recognize(Image.open(io.BytesIO(data))) for data in images]
+    except Exception as e:
+        log.warning("PDF OCR failed (%s): %s", engine.name, e)
+        return None
+    return _evaluate(engine, parts, t0)
+
+
+class RouteStats:
+    """Süreç içi yol sayaçları ve son RECENT gecikmeden p50/p95 (admin paneli için)."""
+
+    RECENT = 500
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: dict[str, int] = {}
+        self._total: dict[str, float] = {}
+        self._recent: dict[str, deque] = {}
+
+    def record(self, route: str, seconds: float) -> None:
+        with self._lock:
+            self._counts[route] = self._counts.get(route, 0) + 1
+            self._total[route] = self._total.get(route, 0.0) + seconds
+            self._recent.setdefault(route, deque(maxlen=self.RECENT)).append(seconds)
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            out = {}
+            for route, count in self._counts.items():
+                recent = sorted(self._recent[route])
+                out[route] = {
+                    "count": count,
+                    "avg_ms": round(self._total[route] / count * 1000, 1),
+                    "p50_ms": round(recent[len(recent) // 2] * 1000, 1),
+                    "p95_ms": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))] * 1000, 1),
+                }
+            return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+            self._total.clear()
+            self._recent.clear()
+
+
+route_stats = RouteStats()
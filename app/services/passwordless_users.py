@@ -0,0 +1,53 @@
+"""Şifresiz kullanıcı kayıtları (anonim IP misafiri, dev guest, ödeme öncesi misafir).
+
+- Giriş yapılamayan hesaplar bcrypt yerine `unusable_password()` taşır: yeni misafir başına KDF işi yok
+  (bcrypt bilinçli olarak ~200-300 ms CPU; misafir patlamasında worker'ları kilitliyordu).
+- Oluşturma e-posta üzerinden upsert: `INSERT ... ON CONFLICT (email) DO NOTHING` + SELECT. Aynı IP'den
+  eşzamanlı ilk istekler aynı satırı alır, IntegrityError / yeniden deneme yok.
+- Ödeme misafirleri kayıt olurken mevcut satır "claim" edilir (auth.register): gerçek şifre o an hash'lenir.
+"""
+from __future__ import annotations
+
+import logging
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.core.security import unusable_password
+from app.models import User
+
+log = logging.getLogger(__name__)
+
+
+def _insert_ignore(db: Session, user: User) -> bool:
+    """E-posta çakışmasında sessizce atlayan INSERT; dialect desteklemiyorsa False."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return False
+    values = user.model_dump(exclude={"id"})
+    db.execute(insert(User.__table__).values(**values).on_conflict_do_nothing(index_elements=["email"]))
+    db.commit()
+    return True
+
+
+def get_or_create_passwordless_user(db: Session, email: str, full_name: str = "", plan: str = "free") -> User:
+    """E-postaya göre kullanıcıyı getir; yoksa giriş yapılamayan (KDF'siz) hesap olarak oluştur."""
+    user = db.exec(select(User).where(User.email == email)).first()
+    if user:
+        return user
+    candidate = User(email=email, hashed_password=unusable_password(), full_name=full_name, plan=plan)
+    if not _insert_ignore(db, candidate):
+        db.add(candidate)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            log.debug("Passwordless user %s created concurrently", email)
+    user = db.exec(select(User).where(User.email == email)).first()
+    if user is None:
+        raise RuntimeError(f"passwordless user upsert failed for {email}")
+    return user
@@ -2,6 +2,15 @@
 
 PayTR Direkt API üzerinden kayıtlı kart ile otomatik kredi yenileme.
 Docs: https://dev.paytr.com/direkt-api/kart-saklama-api/kayitli-kart-tekrarlayan-odeme
+
+- Toplu yenileme yalnız bakiyesi eşik altındaki kurumları (auto_renew_enabled, billing_wallet_balance) indeksinden
+  seçer ve sınırlı havuzda (billing_job_concurrency) paralel işler; yavaş bir PayTR yanıtı diğerlerini bekletmez.
+- (kurum, dönem) başına tek AutoRenewAttempt satırı idempotency anahtarıdır: başarılı dönem tekrar çekilmez,
+  sürmekte olan (pending) deneme ikinci kez başlatılmaz, başarısız deneme koşullu UPDATE ile tek worker'a geçer.
+- Bakiye atomik artırılır (UPDATE ... SET balance = balance + tutar); eşzamanlı analiz düşümleri ezilmez.
+- Sonucu bilinmeyen (pending) denemeler otomatik tekrar edilmez: `stale_pending_attempts` bunları listeler
+  (auto_renew_pending_check işi loglar, admin /admin/api/auto-renew/pending), admin PayTR kaydına bakıp
+  `resolve_pending_attempt` ile başarılı (kredi bir kez eklenir) ya da başarısız (yeniden denenebilir) kapatır.
 """
 
 import base64
@@ -9,13 +18,18 @@ import hashlib
 import hmac
 import json
 import logging
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
 
 import httpx
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 
 from app.core.config import settings
+from app.models.auto_renew_attempt import AutoRenewAttempt
 from app.models.institution import Institution
+from app.services.resilience import CircuitOpen, upstream
 
 log = logging.getLogger(__name__)
 
@@ -53,9 +67,12 @@ def execute_recurring_payment(
     institution: Institution,
     amount_cents: int,
     user_ip: str = "127.0.0.1",
+    merchant_oid: str | None = None,
 ) -> dict:
     """PayTR üzerinden kayıtlı kart ile tekrarlayan ödeme yapar.
 
+    merchant_oid verilirse (otomatik yenileme denemesi) o kullanılır; PayTR aynı oid'i ikinci kez çekmez.
+
     Returns:
         dict: {"status": "success"|"failed", "merchant_oid": str, "reason": str, "reference_no": str}
     """
@@ -90,7 +107,7 @@ def execute_recurring_payment(
         # EUR/USD için aynı format
         payment_amount_str = f"{amount_cents / 100:.2f}"
 
-    merchant_oid = f"autorenew_{institution.id}_{int(datetime.now(timezone.utc).timestamp())}"
+    merchant_oid = merchant_oid or f"autorenew_{institution.id}_{int(datetime.now(timezone.utc).timestamp())}"
 
     user_basket = json.dumps([
         [
@@ -107,7 +124,7 @@ def execute_recurring_payment(
         data={
             "user_ip": user_ip,
             "merchant_oid": merchant_oid,
-            "email": (institution.email or "billing@noryaai.com").strip(),
+            "email": (institution.contact_email or "billing@noryaai.com").strip(),
             "payment_amount": payment_amount_str,
             "user_basket": user_basket,
             "no_installment": "0",
@@ -126,7 +143,7 @@ def execute_recurring_payment(
         "paytr_token": paytr_token,
         "user_ip": user_ip,
         "merchant_oid": merchant_oid,
-        "email": (institution.email or "billing@noryaai.com").strip(),
+        "email": (institution.contact_email or "billing@noryaai.com").strip(),
         "payment_amount": payment_amount_str,
         "user_basket": user_basket,
         "no_installment": "0",
@@ -143,10 +160,14 @@ def execute_recurring_payment(
     }
 
     try:
-        with httpx.Client(timeout=30.0) as client:
-            resp = client.post(PAYTR_RECURRING_URL, data=payload)
-            resp.raise_for_status()
-            result = resp.json()
+        def _post(timeout: float) -> dict:
+            with httpx.Client(timeout=timeout) as client:
+                resp = client.post(settings.paytr_recurring_url or PAYTR_RECURRING_URL, data=payload)
+                resp.raise_for_status()
+                return resp.json()
+
+        # Kart çekimi: tekrar yok; PayTR kesintisinde devre açıkken beklemeden başarısız döner
+        result = upstream("paytr").call(_post, failure_on=(httpx.RequestError, httpx.HTTPStatusError))
 
         status = result.get("status", "failed")
         reason = result.get("reason", "Bilinmeyen hata")
@@ -187,6 +208,14 @@ def execute_recurring_payment(
             "reason": f"HTTP hatası: {e.response.status_code}",
             "reference_no": "",
         }
+    except CircuitOpen as e:
+        log.warning("PAYTR_RECURRING skipped, %s", e)
+        return {
+            "status": "failed",
+            "merchant_oid": merchant_oid,
+            "reason": "PayTR geçici olarak erişilemiyor",
+            "reference_no": "",
+        }
     except httpx.RequestError as e:
         log.error("PAYTR_RECURRING connection error: %s", e)
         return {
@@ -194,6 +223,8 @@ def execute_recurring_payment(
             "merchant_oid": merchant_oid,
             "reason": f"Bağlantı hatası: {e}",
             "reference_no": "",
+            # İstek gönderildikten sonra kopan bağlantıda çekimin yapılıp yapılmadığı bilinmez
+            "outcome_unknown": not isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout)),
         }
     except Exception as e:
         log.exception("PAYTR_RECURRING unexpected error: %s", e)
@@ -205,12 +236,94 @@ def execute_recurring_payment(
         }
 
 
+def renewal_period(institution: Institution, now: datetime | None = None) -> str:
+    """Yenileme aralığı penceresinin başlangıcı (YYYYMMDD); aynı penceredeki tüm denemeler aynı anahtarı paylaşır."""
+    interval = max(1, institution.auto_renew_interval_days or 30)
+    epoch = date(1970, 1, 1)
+    days = ((now or datetime.utcnow()).date() - epoch).days
+    return (epoch + timedelta(days=days - days % interval)).strftime("%Y%m%d")
+
+
+def _claim_attempt(db: Session, inst: Institution, period: str) -> AutoRenewAttempt | dict:
+    """Dönemin deneme satırını bu çağrı için kilitler; alınamazsa "skipped" sonucu döner."""
+    existing = db.exec(
+        select(AutoRenewAttempt).where(
+            AutoRenewAttempt.institution_id == inst.id, AutoRenewAttempt.period == period
+        )
+    ).first()
+    if existing is None:
+        attempt = AutoRenewAttempt(
+            institution_id=inst.id,
+            period=period,
+            merchant_oid=f"autorenew_{inst.id}_{period}_1",
+            amount_cents=inst.auto_renew_amount_cents,
+        )
+        db.add(attempt)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return {"status": "skipped", "message": "Bu dönem için yenileme başka bir işlemde sürüyor"}
+        db.refresh(attempt)
+        return attempt
+    if existing.status == "success":
+        return {"status": "skipped", "message": "Bu dönem için yenileme zaten yapıldı"}
+    if existing.status == "pending":
+        # Sonucu bilinmeyen çekim yeniden gönderilmez (çift çekim riski); PayTR kaydıyla mutabakat gerekir
+        return {"status": "skipped", "message": "Bu dönem için yenileme sürüyor veya sonucu bekleniyor"}
+    if existing.attempt >= settings.auto_renew_max_attempts:
+        return {"status": "skipped", "message": f"Bu dönem için {existing.attempt} deneme başarısız oldu"}
+    next_attempt = existing.attempt + 1
+    won = db.execute(
+        update(AutoRenewAttempt)
+        .where(
+            AutoRenewAttempt.id == existing.id,
+            AutoRenewAttempt.status == "failed",
+            AutoRenewAttempt.attempt == existing.attempt,
+        )
+        .values(
+            status="pending",
+            attempt=next_attempt,
+            merchant_oid=f"autorenew_{inst.id}_{period}_{next_attempt}",
+            amount_cents=inst.auto_renew_amount_cents,
+            reason=None,
+            updated_at=datetime.utcnow(),
+        )
+    ).rowcount == 1
+    db.commit()
+    if not won:
+        return {"status": "skipped", "message": "Bu dönem için yenileme başka bir işlemde sürüyor"}
+    db.refresh(existing)
+    return existing
+
+
+def _credit_wallet(db: Session, attempt: AutoRenewAttempt) -> None:
+    """Başarılı denemenin tutarını cüzdana ekler ve işlem kaydını yazar (commit çağırana aittir)."""
+    from app.models.tenant_wallet_transaction import TenantWalletTransaction
+
+    # Atomik artış: aynı anda düşülen analiz ücretleri kaybolmaz
+    db.execute(
+        update(Institution)
+        .where(Institution.id == attempt.institution_id)
+        .values(
+            billing_wallet_balance=Institution.billing_wallet_balance + attempt.amount_cents,
+            auto_renew_last_at=datetime.utcnow(),
+        )
+    )
+    db.add(TenantWalletTransaction(
+        institution_id=attempt.institution_id,
+        amount_cents=attempt.amount_cents,
+        transaction_type="auto_renew",
+        description=f"Otomatik kredi yenileme (PayTR) - merchant_oid: {attempt.merchant_oid}",
+    ))
+
+
 def process_auto_renew_for_institution(
     db: Session,
     institution_id: int,
     user_ip: str = "127.0.0.1",
 ) -> dict:
-    """Tek bir kurum için otomatik yenileme işlemini gerçekleştirir.
+    """Tek bir kurum için otomatik yenileme işlemini gerçekleştirir (dönem başına en fazla bir başarılı çekim).
 
     Returns:
         dict: {"status": "success"|"failed"|"skipped", "message": str}
@@ -227,7 +340,6 @@ def process_auto_renew_for_institution(
 
     # Son yenileme tarihini kontrol et (çok sık yenilemeyi önle)
     if inst.auto_renew_last_at:
-        from datetime import timedelta
         days_since = (datetime.utcnow() - inst.auto_renew_last_at).days
         if days_since < inst.auto_renew_interval_days:
             return {
@@ -235,44 +347,58 @@ def process_auto_renew_for_institution(
                 "message": f"Son yenilemeden {days_since} gün geçti, {inst.auto_renew_interval_days} gün beklenmeli",
             }
 
+    attempt = _claim_attempt(db, inst, renewal_period(inst))
+    if isinstance(attempt, dict):
+        return attempt
+
     # Ödeme yap
     result = execute_recurring_payment(
         institution=inst,
-        amount_cents=inst.auto_renew_amount_cents,
+        amount_cents=attempt.amount_cents,
         user_ip=user_ip,
+        merchant_oid=attempt.merchant_oid,
     )
 
+    attempt.updated_at = datetime.utcnow()
     if result["status"] == "success":
-        # Cüzdana kredi ekle
-        inst.billing_wallet_balance += inst.auto_renew_amount_cents
-        inst.auto_renew_last_at = datetime.utcnow()
-        db.add(inst)
-
-        # Transaction kaydı
-        from app.models.tenant_wallet_transaction import TenantWalletTransaction
-        txn = TenantWalletTransaction(
-            institution_id=inst.id,
-            amount_cents=inst.auto_renew_amount_cents,
-            transaction_type="auto_renew",
-            description=f"Otomatik kredi yenileme (PayTR) - merchant_oid: {result['merchant_oid']}",
-        )
-        db.add(txn)
+        attempt.status = "success"
+        attempt.reference_no = (result.get("reference_no") or "")[:64] or None
+        db.add(attempt)
+        _credit_wallet(db, attempt)
         db.commit()
+        db.refresh(inst)
 
         log.info(
             "AUTO_RENEW: success institution_id=%s amount=%d new_balance=%d",
             inst.id,
-            inst.auto_renew_amount_cents,
+            attempt.amount_cents,
             inst.billing_wallet_balance,
         )
         return {
             "status": "success",
-            "message": f"Otomatik yenileme başarılı. {inst.auto_renew_amount_cents / 100:.2f} kredi eklendi.",
+            "message": f"Otomatik yenileme başarılı. {attempt.amount_cents / 100:.2f} kredi eklendi.",
         }
+    elif result.get("outcome_unknown"):
+        # Deneme pending kalır: otomatik tekrar yapılmaz (çift çekim riski), PayTR kaydıyla mutabakat gerekir
+        attempt.reason = (result.get("reason") or "")[:512]
+        db.add(attempt)
+        db.commit()
+        log.error(
+            "AUTO_RENEW: outcome unknown institution_id=%s merchant_oid=%s reason=%s",
+            inst.id,
+            attempt.merchant_oid,
+            result.get("reason", ""),
+        )
+        return {"status": "failed", "message": "Ödeme sonucu doğrulanamadı; tekrar denenmeyecek, kontrol ediliyor."}
     else:
+        attempt.status = "failed"
+        attempt.reason = (result.get("reason") or "")[:512]
+        db.add(attempt)
+        db.commit()
         log.warning(
-            "AUTO_RENEW: failed institution_id=%s reason=%s",
+            "AUTO_RENEW: failed institution_id=%s attempt=%d reason=%s",
             inst.id,
+            attempt.attempt,
             result.get("reason", ""),
         )
         return {
@@ -281,22 +407,86 @@ def process_auto_renew_for_institution(
         }
 
 
+def _renew_in_own_session(engine, institution_id: int, user_ip: str) -> dict:
+    with Session(engine) as db:
+        try:
+            return process_auto_renew_for_institution(db, institution_id, user_ip)
+        except Exception as e:
+            log.exception("AUTO_RENEW: institution_id=%s unexpected error", institution_id)
+            return {"status": "failed", "message": f"Beklenmeyen hata: {e}"}
+
+
 def process_all_auto_renewals(db: Session, user_ip: str = "127.0.0.1") -> list[dict]:
-    """Tüm kurumlar için otomatik yenileme kontrolü yapar.
+    """Bakiyesi eşik altındaki otomatik yenilemeli kurumları paralel yeniler.
 
     Returns:
-        list[dict]: Her kurum için işlem sonucu
+        list[dict]: Aday her kurum için işlem sonucu
     """
-    stmt = select(Institution).where(Institution.auto_renew_enabled == True)
-    institutions = db.exec(stmt).all()
-
-    results = []
-    for inst in institutions:
-        result = process_auto_renew_for_institution(db, inst.id, user_ip)
-        results.append({
-            "institution_id": inst.id,
-            "institution_name": inst.name,
-            **result,
-        })
-
-    return results
+    stmt = (
+        select(Institution.id, Institution.name)
+        .where(
+            Institution.auto_renew_enabled == True,
+            Institution.billing_wallet_balance < Institution.auto_renew_threshold_cents,
+        )
+        .order_by(Institution.id)
+    )
+    candidates = db.exec(stmt).all()
+    if not candidates:
+        return []
+
+    engine = db.get_bind()
+    workers = max(1, min(settings.billing_job_concurrency, len(candidates)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="auto-renew") as pool:
+        outcomes = list(pool.map(lambda c: _renew_in_own_session(engine, c[0], user_ip), candidates))
+
+    return [
+        {"institution_id": inst_id, "institution_name": name, **result}
+        for (inst_id, name), result in zip(candidates, outcomes)
+    ]
+
+
+def stale_pending_attempts(db: Session, older_than_min: int | None = None) -> list[AutoRenewAttempt]:
+    """Sonucu bilinmeyen ve older_than_min dakikadan (varsayılan auto_renew_pending_stale_min) eski denemeler."""
+    minutes = settings.auto_renew_pending_stale_min if older_than_min is None else older_than_min
+    cutoff = datetime.utcnow() - timedelta(minutes=minutes)
+    return list(db.exec(
+        select(AutoRenewAttempt)
+        .where(AutoRenewAttempt.status == "pending", AutoRenewAttempt.updated_at < cutoff)
+        .order_by(AutoRenewAttempt.updated_at)
+    ).all())
+
+
+def resolve_pending_attempt(
+    db: Session, attempt_id: int, outcome: str, reference_no: str | None = None, note: str = ""
+) -> dict:
+    """Admin mutabakatı: PayTR kaydındaki sonuca göre pending denemeyi kapatır.
+
+    success: tutar cüzdana bir kez eklenir. failed: deneme başarısız sayılır; sonraki yenileme turu yeni
+    merchant_oid ile yeniden dener (auto_renew_max_attempts sınırı içinde). Koşullu UPDATE: aynı deneme iki kez kapatılamaz.
+    """
+    if outcome not in ("success", "failed"):
+        return {"ok": False, "error": "invalid_outcome"}
+    resolved = db.execute(
+        update(AutoRenewAttempt)
+        .where(AutoRenewAttempt.id == attempt_id, AutoRenewAttempt.status == "pending")
+        .values(
+            status=outcome,
+            reference_no=(reference_no or "")[:64] or None,
+            reason=(f"Mutabakat: {note}" if note else "Mutabakat")[:512],
+            updated_at=datetime.utcnow(),
+        )
+    ).rowcount == 1
+    if not resolved:
+        db.rollback()
+        return {"ok": False, "error": "not_pending"}
+    attempt = db.get(AutoRenewAttempt, attempt_id)
+    if outcome == "success":
+        _credit_wallet(db, attempt)
+    db.commit()
+    log.warning(
+        "AUTO_RENEW: pending attempt reconciled institution_id=%s merchant_oid=%s outcome=%s",
+        attempt.institution_id,
+        attempt.merchant_oid,
+        outcome,
+    )
+    return {"ok": True, "attempt_id": attempt_id, "status": outcome}
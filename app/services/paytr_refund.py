@@ -9,6 +9,7 @@ from typing import NamedTuple
 from urllib.parse import urlencode
 
 from app.core.config import settings
+from app.services.resilience import CircuitOpen, upstream
 
 log = logging.getLogger(__name__)
 
@@ -72,18 +73,25 @@ def paytr_refund(
     if reference_no and len(reference_no) <= 64:
         post_vals["reference_no"] = reference_no
 
-    try:
-        from urllib.request import Request, urlopen
-        from urllib.error import URLError
+    from urllib.request import Request, urlopen
+    from urllib.error import URLError
 
+    def _post(timeout: float) -> str:
         req = Request(
             PAYTR_REFUND_URL,
             data=urlencode(post_vals).encode(),
             method="POST",
             headers={"Content-Type": "application/x-www-form-urlencoded"},
         )
-        with urlopen(req, timeout=30) as resp:
-            body = resp.read().decode("utf-8", errors="replace")
+        with urlopen(req, timeout=timeout) as resp:
+            return resp.read().decode("utf-8", errors="replace")
+
+    try:
+        # İade idempotent değil: tekrar yok; devre açıkken beklemeden hata
+        body = upstream("paytr").call(_post, failure_on=(URLError, OSError))
+    except CircuitOpen as e:
+        log.warning("PayTR iade atlandı: %s", e)
+        return RefundResult(success=False, message="PayTR geçici olarak erişilemiyor, lütfen daha sonra tekrar deneyin.", reference_no=None)
     except URLError as e:
         log.warning("PayTR iade API bağlantı hatası: %s", e)
         return RefundResult(
@@ -1,15 +1,350 @@
+"""
+PDF'den metin çıkarma: süreç havuzunda, belge başına bellek/CPU/süre sınırlı, lab bölümü bitince erken çıkış.
+
+- Her belge havuzda açılır: PDF'in ayrıştırılması (sayfa sayısı dahil) istek sürecinde hiç yapılmaz. İlk görev
+  belgeyi açar, sayfa sayısını döner ve ilk aralığı okur; PARALLEL_MIN_PAGES'ten kısa belgelerin tamamı bu tek
+  görevde okunur (küçük belgede havuza tek gidiş-dönüş). Büyük belgelerin kalan aralıkları (PAGES_PER_CHUNK)
+  paralel okunur; havuzda en fazla worker sayısı kadar aralık uçuştadır, erken çıkışta başlamamışlar işlenmez.
+  PDF baytları görevlere kopyalanmaz, geçici dosya yolu gönderilir.
+- Sınırlar (belge başına, her yolda): DOC_CPU_SECONDS toplam CPU (ITIMER_PROF), DOC_WALL_SECONDS duvar saati;
+  worker süreç başına WORKER_MEMORY_BYTES adres alanı (RLIMIT_AS). Sınır aşılırsa o ana kadar okunan sayfalarla
+  devam edilir. Worker'ı çökerten belge istek sürecinde yeniden denenmez.
+- Sayfa metinleri sırayla parse_lab_text'e akıtılır; tanınan değerler PdfExtraction.lab_values'ta döner. Lab değeri
+  görüldükten sonra art arda EARLY_EXIT_DRY_PAGES metinli sayfada tanınan değer yoksa okuma durur (0: kapalı).
+  Metinsiz (taranmış/görsel) sayfalar bu sayaca girmez; kısa açıklama araları sonraki lab sayfalarını düşürmez.
+- Havuz kurulamazsa (platform, sandbox) süreç içinde sıralı okunur; burada yalnız duvar saati sınırı uygulanabilir.
+- run_on_pdf: PDF'i açan başka işler (ör. taranmış PDF'in sayfa görsellerini OCR için çıkarmak) aynı havuzda,
+  aynı belge sınırlarıyla çalışır.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator
+
 from pypdf import PdfReader
-from io import BytesIO
+
+from app.services.lab_parser import is_recognized_value, parse_lab_text
+
+log = logging.getLogger(__name__)
+
+MAX_PAGES = 50
+PAGES_PER_CHUNK = 5
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+DOC_CPU_SECONDS = float(os.getenv("PDF_DOC_CPU_SECONDS", "20"))
+DOC_WALL_SECONDS = float(os.getenv("PDF_DOC_WALL_SECONDS", "30"))
+WORKER_MEMORY_BYTES = int(os.getenv("PDF_WORKER_MEMORY_MB", "768")) * 1024 * 1024
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "20"))
+EARLY_EXIT_DRY_PAGES = int(os.getenv("PDF_EARLY_EXIT_DRY_PAGES", "5"))
+FAILED_TEXT = "PDF'den metin çıkarılamadı."
+
+_pool: ProcessPoolExecutor | None = None
+_pool_failed = False
+_pool_lock = threading.Lock()
+
+
+@dataclass
+class PdfExtraction:
+    text: str
+    lab_values: list[dict[str, Any]] = field(default_factory=list)
+    page_count: int = 0
+    pages_read: int = 0
+    stopped_early: bool = False
+    # "cpu" | "wall" | "memory" | "error": sınır nedeniyle yarım kalan okuma
+    limited: str | None = None
+
+
+class _CpuLimitExceeded(Exception):
+    pass
+
+
+def _on_cpu_limit(signum, frame):
+    raise _CpuLimitExceeded()
+
+
+def _worker_init(memory_bytes: int) -> None:
+    """Worker süreci: adres alanı sınırı ve CPU zamanlayıcısı işleyicisi."""
+    try:
+        import resource
+
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        limit = memory_bytes if hard == resource.RLIM_INFINITY else min(memory_bytes, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except Exception:
+        pass
+    if hasattr(signal, "SIGPROF"):
+        signal.signal(signal.SIGPROF, _on_cpu_limit)
+    # Ana sürecin Ctrl+C'si worker'larda yığın izi basmasın
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _arm_cpu_timer(seconds: float) -> None:
+    if hasattr(signal, "setitimer"):
+        signal.setitimer(signal.ITIMER_PROF, max(seconds, 0.01))
+
+
+def _disarm_cpu_timer() -> None:
+    if hasattr(signal, "setitimer"):
+        signal.setitimer(signal.ITIMER_PROF, 0)
+
+
+def _page_text(page) -> str:
+    try:
+        return (page.extract_text() or "").strip()
+    except Exception as e:
+        # Tek bozuk sayfa belgenin kalanını düşürmez
+        log.debug("PDF page extract failed: %s", e)
+        return ""
+
+
+def _extract_range_task(
+    path: str, start: int, end: int, cpu_seconds: float, max_pages: int = 0, parallel_min: int = 0,
+) -> tuple[list[str], int, float, str | None]:
+    """[start, end) sayfalarının metni (belge sonunda kırpılır) ve toplam sayfa sayısı.
+
+    İlk görev max_pages/parallel_min alır: okunacak sayfa parallel_min'den azsa end yerine ilk max_pages
+    sayfanın tamamı okunur (küçük belge tek görevde).
+    Açma ve sayfa sayımı da CPU zamanlayıcısının içindedir. Sınır aşılırsa o ana kadar okunanlar ve neden döner.
+    """
+    t0 = time.process_time()
+    texts: list[str] = []
+    page_count = 0
+    _arm_cpu_timer(cpu_seconds)
+    try:
+        reader = PdfReader(path)
+        page_count = len(reader.pages)
+        if max_pages and min(page_count, max_pages) < parallel_min:
+            end = max_pages
+        for i in range(start, min(end, page_count)):
+            texts.append(_page_text(reader.pages[i]))
+        return texts, page_count, time.process_time() - t0, None
+    except _CpuLimitExceeded:
+        return texts, page_count, time.process_time() - t0, "cpu"
+    except MemoryError:
+        return texts, page_count, time.process_time() - t0, "memory"
+    except Exception:
+        return texts, page_count, time.process_time() - t0, "error"
+    finally:
+        _disarm_cpu_timer()
+
+
+def _limited_task(task: Callable[..., Any], path: str, cpu_seconds: float, args: tuple) -> tuple[Any, str | None]:
+    """Havuz görevi: task(path, *args) CPU zamanlayıcısı altında; (sonuç, sınır nedeni)."""
+    _arm_cpu_timer(cpu_seconds)
+    try:
+        return task(path, *args), None
+    except _CpuLimitExceeded:
+        return None, "cpu"
+    except MemoryError:
+        return None, "memory"
+    except Exception:
+        return None, "error"
+    finally:
+        _disarm_cpu_timer()
+
+
+def _get_pool() -> ProcessPoolExecutor | None:
+    """Süreç havuzu (lazy, worker süreci başına bir tane). Kurulamazsa None (sıralı yol)."""
+    global _pool, _pool_failed
+    if _pool is not None or _pool_failed:
+        return _pool
+    with _pool_lock:
+        if _pool is None and not _pool_failed:
+            try:
+                methods = multiprocessing.get_all_start_methods()
+                # Çok iş parçacıklı sunucudan fork güvenli değil; forkserver/spawn temiz süreçten başlar
+                ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                _pool = ProcessPoolExecutor(
+                    max_workers=PDF_WORKERS,
+                    mp_context=ctx,
+                    initializer=_worker_init,
+                    initargs=(WORKER_MEMORY_BYTES,),
+                )
+            except Exception as e:
+                _pool_failed = True
+                log.warning("PDF process pool unavailable, extracting sequentially: %s", e)
+    return _pool
+
+
+def _reset_pool() -> None:
+    """Çöken worker (ör. bellek sınırında sinyal) havuzu bozar; sonraki istek yenisini kurar."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _iter_in_process(path: str, max_pages: int, state: dict) -> Iterator[tuple[int, str]]:
+    """Havuz yokken: süreç içinde sıralı; sayfalar arasında duvar saati denetlenir."""
+    deadline = time.monotonic() + DOC_WALL_SECONDS
+    reader = PdfReader(path)
+    state["page_count"] = len(reader.pages)
+    for i in range(min(len(reader.pages), max_pages)):
+        if time.monotonic() > deadline:
+            state["limited"] = "wall"
+            return
+        yield i, _page_text(reader.pages[i])
+
+
+def _iter_pool(pool: ProcessPoolExecutor, path: str, max_pages: int, state: dict) -> Iterator[tuple[int, str]]:
+    deadline = time.monotonic() + DOC_WALL_SECONDS
+    cpu_left = DOC_CPU_SECONDS
+    # İlk görev: aç + say + ilk aralık (küçük belgede tamamı); sayfa sayısı gelince kalan aralıklar dağıtılır
+    parallel_min = max_pages + 1 if PDF_WORKERS <= 1 else PARALLEL_MIN_PAGES
+    first = pool.submit(_extract_range_task, path, 0, min(PAGES_PER_CHUNK, max_pages), cpu_left, max_pages, parallel_min)
+    inflight: deque = deque([(0, first)])
+    chunks: deque = deque()
+    page_count = None
+    try:
+        while chunks or inflight:
+            # Pencere: worker sayısı kadar aralık; her biri belgenin kalan CPU bütçesiyle sınırlı
+            while chunks and len(inflight) < PDF_WORKERS:
+                start, end = chunks.popleft()
+                inflight.append((start, pool.submit(_extract_range_task, path, start, end, cpu_left)))
+            start, fut = inflight.popleft()
+            texts, count, used, err = fut.result(timeout=max(0.0, deadline - time.monotonic()))
+            cpu_left -= used
+            if page_count is None:
+                page_count = state["page_count"] = count
+                n_pages = min(count, max_pages)
+                chunks.extend((s, min(s + PAGES_PER_CHUNK, n_pages)) for s in range(len(texts), n_pages, PAGES_PER_CHUNK))
+            for offset, text in enumerate(texts):
+                yield start + offset, text
+            if err or cpu_left <= 0:
+                state["limited"] = err or "cpu"
+                return
+    finally:
+        for _, fut in inflight:
+            fut.cancel()
+
+
+def iter_pdf_pages(file_content: bytes, max_pages: int = MAX_PAGES, state: dict | None = None) -> Iterator[tuple[int, str]]:
+    """(sayfa_no, metin) çiftlerini sayfa sırasıyla üretir. state'e page_count ve limited yazılır.
+
+    Tüketici döngüden çıkarsa uçuştaki başlamamış aralıklar iptal edilir.
+    """
+    state = state if state is not None else {}
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(file_content)
+        pool = _get_pool()
+        if pool is None:
+            try:
+                yield from _iter_in_process(path, max_pages, state)
+            except Exception:
+                state["limited"] = "error"
+            return
+        try:
+            yield from _iter_pool(pool, path, max_pages, state)
+        except FutureTimeoutError:
+            log.warning("PDF extraction wall-clock limit reached (%.0fs)", DOC_WALL_SECONDS)
+            state["limited"] = "wall"
+        except (BrokenProcessPool, OSError) as e:
+            # Worker öldü (ör. bellek sınırında sinyal): belge süreç içinde yeniden denenmez
+            log.warning("PDF worker crashed; resetting pool: %s", e)
+            _reset_pool()
+            state["limited"] = "memory"
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def run_on_pdf(task: Callable[..., Any], file_content: bytes, *args) -> tuple[Any, str | None]:
+    """task(pdf_yolu, *args) sonucunu havuzda belge sınırlarıyla çalıştırır; (sonuç, limited).
+
+    task modül düzeyinde tanımlı olmalı (worker'a adıyla gider). Sınır aşılırsa ya da task hata verirse
+    sonuç None'dır; limited "cpu" | "wall" | "memory" | "error" olur.
+    """
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(file_content)
+        pool = _get_pool()
+        if pool is None:
+            try:
+                return task(path, *args), None
+            except Exception:
+                return None, "error"
+        try:
+            return pool.submit(_limited_task, task, path, DOC_CPU_SECONDS, args).result(timeout=DOC_WALL_SECONDS)
+        except FutureTimeoutError:
+            log.warning("PDF task wall-clock limit reached (%.0fs)", DOC_WALL_SECONDS)
+            return None, "wall"
+        except (BrokenProcessPool, OSError) as e:
+            log.warning("PDF worker crashed; resetting pool: %s", e)
+            _reset_pool()
+            return None, "memory"
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def extract_pdf(file_content: bytes, max_pages: int = MAX_PAGES) -> PdfExtraction:
+    """Sayfaları sırayla okuyup parse_lab_text'e akıtır; lab bölümü bitince durur."""
+    state: dict = {}
+    parts: list[str] = []
+    lab_values: list[dict[str, Any]] = []
+    seen: set[tuple] = set()
+    dry_pages = 0
+    pages_read = 0
+    stopped_early = False
+    pages = iter_pdf_pages(file_content, max_pages, state)
+    try:
+        for _, text in pages:
+            pages_read += 1
+            if not text:
+                continue
+            parts.append(text)
+            recognized = False
+            for v in parse_lab_text(text):
+                key = (v.get("name"), v.get("value"))
+                if key in seen or not is_recognized_value(v):
+                    continue
+                seen.add(key)
+                lab_values.append(v)
+                recognized = True
+            if recognized:
+                dry_pages = 0
+            elif lab_values and EARLY_EXIT_DRY_PAGES > 0:
+                dry_pages += 1
+                if dry_pages >= EARLY_EXIT_DRY_PAGES:
+                    stopped_early = True
+                    break
+    finally:
+        pages.close()
+    if state.get("limited"):
+        log.warning("PDF extraction limited (%s) after %d pages", state["limited"], pages_read)
+    return PdfExtraction(
+        text="\n\n".join(parts).strip(),
+        lab_values=lab_values,
+        page_count=state.get("page_count", 0),
+        pages_read=pages_read,
+        stopped_early=stopped_early,
+        limited=state.get("limited"),
+    )
 
 
 def extract_text_from_pdf(file_content: bytes) -> str:
-    """PDF dosyasından metin çıkarır. En fazla ilk 50 sayfa."""
-    reader = PdfReader(BytesIO(file_content))
-    parts = []
-    for i, page in enumerate(reader.pages):
-        if i >= 50:
-            break
-        text = page.extract_text()
-        if text:
-            parts.append(text.strip())
-    return "\n\n".join(parts).strip() or "PDF'den metin çıkarılamadı."
+    """PDF dosyasından metin çıkarır. En fazla ilk 50 sayfa; lab bölümü bitince durur."""
+    return extract_pdf(file_content).text or FAILED_TEXT
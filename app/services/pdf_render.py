@@ -0,0 +1,181 @@
+"""
+WeasyPrint render bağlamı: PDF raporları için süreç başına bir kez hazırlanan paylaşılan durum.
+
+- Stil dosyaları (static/css/report_pdf.css, doctor_pdf.css, report_premium.css + yedek) ilk
+  kullanımda weasyprint.CSS nesnesine ayrıştırılır ve sonraki render'larda yeniden kullanılır.
+- Tek FontConfiguration: @font-face ve fontconfig/pango yazı tipi eşlemesi her PDF'te yeniden kurulmaz.
+- Bellek içi url_fetcher: static/ altındaki file:// varlıkları (logo, görseller) ilk okumadan sonra
+  bellekten sunar; logo artık şablona base64 data URI olarak gömülmez. static/ dışındaki URL'ler
+  WeasyPrint'in varsayılan fetcher'ına düşer.
+
+Ön-ayrıştırılmış sayfalar write_pdf(stylesheets=...) ile "user" kökenli uygulanır; şablonlarda
+satır içi <style> yalnızca çalışma anında değişen kurallar (ör. doktor raporunun @page alt bilgisi)
+için kalır. Render'lar süreç içinde kilitle sıralanır (FontConfiguration thread-safe değildir; render
+CPU/GIL bağımlı olduğundan kilit verimi düşürmez — ölçek worker sayısıyla sağlanır).
+"""
+import logging
+import mimetypes
+import threading
+from pathlib import Path
+from typing import Sequence
+from urllib.parse import urlsplit
+from urllib.request import url2pathname
+
+log = logging.getLogger(__name__)
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+STATIC_DIR = _PROJECT_ROOT / "static"
+
+# Rapor türü -> stil dosyaları (static/ altında, uygulanma sırasıyla)
+REPORT_STYLESHEETS: dict[str, tuple[str, ...]] = {
+    "report": ("css/report_pdf.css",),
+    "doctor": ("css/doctor_pdf.css",),
+    "premium": ("report_premium.css", "css/report_premium_fallback.css"),
+}
+
+# Rapor ikonu öncelik sırası (static/ altında)
+LOGO_CANDIDATES = ("norya_report_icon.png", "norya_logo_transparent_trim.png")
+
+
+class StaticAssets:
+    """static/ altındaki dosyaları file:// URL ile bellekten sunar (ilk okumadan sonra diske gitmez)."""
+
+    def __init__(self, static_dir: Path = STATIC_DIR):
+        self.static_dir = static_dir.resolve()
+        self._items: dict[Path, tuple[bytes, str]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "loads": 0}
+
+    def url(self, relative: str) -> str:
+        """static/ içi göreli yolu file:// URL'e çevirir; dosya yoksa boş string."""
+        path = self.static_dir / relative
+        return path.as_uri() if path.is_file() else ""
+
+    def logo_url(self) -> str:
+        for name in LOGO_CANDIDATES:
+            url = self.url(name)
+            if url:
+                return url
+        return ""
+
+    def _path(self, url: str) -> Path | None:
+        parts = urlsplit(url)
+        if parts.scheme != "file":
+            return None
+        path = Path(url2pathname(parts.path)).resolve()
+        return path if path.is_relative_to(self.static_dir) else None
+
+    def get(self, url: str) -> tuple[bytes, str] | None:
+        """(içerik, mime) veya static/ dışı/bulunamayan URL için None."""
+        path = self._path(url)
+        if path is None:
+            return None
+        with self._lock:
+            item = self._items.get(path)
+            if item is not None:
+                self.stats["hits"] += 1
+                return item
+        try:
+            body = path.read_bytes()
+        except OSError:
+            return None
+        item = (body, mimetypes.guess_type(path.name)[0] or "application/octet-stream")
+        with self._lock:
+            self._items[path] = item
+            self.stats["loads"] += 1
+        return item
+
+
+def _make_url_fetcher(assets: StaticAssets):
+    """WeasyPrint sürümüne uygun fetcher: >=63 URLFetcher alt sınıfı, öncesi dict döndüren fonksiyon."""
+    from weasyprint import urls
+
+    if hasattr(urls, "URLFetcher"):
+        class _StaticFetcher(urls.URLFetcher):
+            def fetch(self, url, headers=None):
+                item = assets.get(url)
+                if item is None:
+                    return super().fetch(url, headers)
+                return urls.URLFetcherResponse(url, item[0], {"Content-Type": item[1]})
+
+        return _StaticFetcher()
+
+    def fetcher(url):
+        item = assets.get(url)
+        if item is None:
+            return urls.default_url_fetcher(url)
+        return {"string": item[0], "mime_type": item[1], "redirected_url": url}
+
+    return fetcher
+
+
+class PdfRenderContext:
+    """Ön-ayrıştırılmış CSS, paylaşılan FontConfiguration ve bellek içi fetcher ile HTML -> PDF."""
+
+    def __init__(self, assets: StaticAssets | None = None):
+        from weasyprint.text.fonts import FontConfiguration
+
+        self.assets = assets or StaticAssets()
+        self.font_config = FontConfiguration()
+        self.url_fetcher = _make_url_fetcher(self.assets)
+        self._sheets: dict[str, object] = {}
+        self._lock = threading.RLock()
+        self.stats = {"renders": 0, "sheets_parsed": 0}
+
+    def stylesheet(self, key: str, css: str | None = None):
+        """Anahtar başına bir kez ayrıştırılan weasyprint.CSS. css verilmezse key static/ içi dosya yoludur."""
+        with self._lock:
+            sheet = self._sheets.get(key)
+            if sheet is None:
+                from weasyprint import CSS
+
+                if css is None:
+                    sheet = CSS(url=(self.assets.static_dir / key).as_uri(), url_fetcher=self.url_fetcher,
+                                font_config=self.font_config)
+                else:
+                    sheet = CSS(string=css, base_url=str(_PROJECT_ROOT), url_fetcher=self.url_fetcher,
+                                font_config=self.font_config)
+                self._sheets[key] = sheet
+                self.stats["sheets_parsed"] += 1
+            return sheet
+
+    def report_stylesheets(self, kind: str) -> list:
+        return [self.stylesheet(name) for name in REPORT_STYLESHEETS[kind]]
+
+    def render(self, html: str, stylesheets: Sequence = ()) -> bytes:
+        from weasyprint import HTML
+
+        with self._lock:
+            doc = HTML(string=html, base_url=str(_PROJECT_ROOT), url_fetcher=self.url_fetcher)
+            pdf = doc.write_pdf(stylesheets=list(stylesheets), font_config=self.font_config)
+            self.stats["renders"] += 1
+            return pdf
+
+    def render_report(self, kind: str, html: str) -> bytes:
+        return self.render(html, self.report_stylesheets(kind))
+
+
+_assets: StaticAssets | None = None
+_context: PdfRenderContext | None = None
+_context_lock = threading.Lock()
+
+
+def static_assets() -> StaticAssets:
+    global _assets
+    if _assets is None:
+        with _context_lock:
+            if _assets is None:
+                _assets = StaticAssets()
+    return _assets
+
+
+def render_context() -> PdfRenderContext:
+    """Süreç genelinde tek bağlam (WeasyPrint ilk PDF'te import edilir; sunucu açılışında gerekmez)."""
+    global _context
+    if _context is None:
+        assets = static_assets()
+        with _context_lock:
+            if _context is None:
+                _context = PdfRenderContext(assets)
+                log.info("PDF render context ready (static=%s)", assets.static_dir)
+    return _context
@@ -0,0 +1,216 @@
+"""
+Prompt düzeni ve token bütçesi (AI açıklama + görsel analiz).
+
+- Önek önbelleği: sağlayıcı tarafı prompt caching yalnızca birebir aynı önekleri yeniden kullanır.
+  Bu yüzden sabit talimatlar (AI_EXPLANATION_PROMPT, SINGLE_PLAN_EXPLANATION_PROMPT, IMAGE_PROMPT_BASE)
+  her zaman ilk (system) mesajdır; dile göre değişen talimat ve hasta verisi sonraki user mesajına gider.
+- Girdi sıkıştırma: ayrıştırılmış lab değerleri "ad|değer birim|ref|durum" satırlarına dönüşür; ham metin
+  tablo yoksa bütçenin kalanı kadar, tablo varsa yalnızca tablonun kapsamadığı içerik varsa kısa bir payla
+  eklenir. Bütçe aşılırsa önce normal satırlar düşer, referans dışı değerler korunur. risk_summary'den
+  bulgusuz alanlar çıkarılır.
+- Token sayımı: tiktoken (o200k_base) kuruluysa onunla; değilse muhafazakâr bir yaklaşık sayım.
+- max_tokens: plan tavanı altında, referans dışı parametre sayısına göre ölçeklenir.
+"""
+import json
+import logging
+import math
+import re
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+_ENCODING = None
+_ENCODING_LOADED = False
+
+# tiktoken yokken: kelime + noktalama parçaları; Türkçe eklemeli kelimeler için %30 pay
+_APPROX_PIECE_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_APPROX_FACTOR = 1.3
+_APPROX_CHARS_PER_TOKEN = 3.2
+# Ham metin tablo satırlarının bu katından uzunsa tabloda olmayan içerik taşıdığı varsayılır
+RAW_COVERAGE_RATIO = 1.5
+# Bundan kısa ham metin kırpıntısı bağlam sağlamaz; hiç eklenmez
+MIN_RAW_TOKENS = 32
+
+
+@dataclass(frozen=True)
+class PlanBudget:
+    input_tokens: int  # sabit önek dahil toplam prompt
+    output_base: int  # max_tokens tabanı
+    output_per_flag: int  # referans dışı her parametre için ek
+    output_max: int  # plan tavanı (eski sabit max_tokens)
+    raw_context_tokens: int  # tablo varken eklenebilecek ham metin payı
+
+
+PLAN_BUDGETS: dict[str, PlanBudget] = {
+    "single": PlanBudget(input_tokens=2000, output_base=1280, output_per_flag=96, output_max=2048, raw_context_tokens=300),
+    "default": PlanBudget(input_tokens=1200, output_base=640, output_per_flag=64, output_max=1024, raw_context_tokens=150),
+}
+
+
+def budget_for_plan(plan: str | None) -> PlanBudget:
+    return PLAN_BUDGETS.get((plan or "").strip().lower(), PLAN_BUDGETS["default"])
+
+
+def _encoding():
+    """tiktoken kodlayıcısı (lazy; kurulu değilse None)."""
+    global _ENCODING, _ENCODING_LOADED
+    if not _ENCODING_LOADED:
+        _ENCODING_LOADED = True
+        try:
+            import tiktoken
+
+            _ENCODING = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _ENCODING = None
+    return _ENCODING
+
+
+def count_tokens(text: str) -> int:
+    """Yerel token sayımı (gpt-4o ailesi)."""
+    if not text:
+        return 0
+    enc = _encoding()
+    if enc is not None:
+        return len(enc.encode(text))
+    return math.ceil(len(_APPROX_PIECE_RE.findall(text)) * _APPROX_FACTOR)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Metni en fazla max_tokens token olacak şekilde keser (kelime sınırında)."""
+    if max_tokens <= 0 or not text:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    enc = _encoding()
+    if enc is not None:
+        return enc.decode(enc.encode(text)[:max_tokens]).rstrip() + " …"
+    cut = text[: int(max_tokens * _APPROX_CHARS_PER_TOKEN)]
+    while cut and count_tokens(cut) > max_tokens:
+        cut = cut[: int(len(cut) * 0.9)]
+    return cut.rsplit(" ", 1)[0].rstrip() + " …"
+
+
+def compact_lab_table(tables: list[dict]) -> list[str]:
+    """build_tables satırlarını yoğun tablo satırlarına çevirir; referans dışı olanlar önce."""
+    flagged, normal = [], []
+    for row in tables or []:
+        name = (row.get("name") or "").strip()
+        if not name:
+            continue
+        value = row.get("value")
+        value_str = f"{value:g}" if isinstance(value, float) else str(value)
+        unit = (row.get("unit") or "").strip()
+        status = row.get("status") or "normal"
+        line = f"{name}|{value_str}{(' ' + unit) if unit else ''}|{row.get('ref') or '-'}|{status}"
+        (normal if status == "normal" else flagged).append(line)
+    return flagged + normal
+
+
+def compact_risk_summary(risk_summary: dict) -> dict:
+    """Modele giden risk özeti: bulgusu olmayan alanlar ve reasons'ı tekrarlayan flags düşer."""
+    if not isinstance(risk_summary, dict):
+        return risk_summary
+    domains = {
+        name: {"level": d.get("level"), "score": d.get("score"), "reasons": d.get("reasons")}
+        for name, d in (risk_summary.get("domains") or {}).items()
+        if isinstance(d, dict) and (d.get("reasons") or d.get("flags"))
+    }
+    out = {"overall": risk_summary.get("overall")}
+    if domains:
+        out["domains"] = domains
+    if risk_summary.get("highlights"):
+        out["highlights"] = risk_summary["highlights"]
+    return out
+
+
+@dataclass
+class PromptPlan:
+    messages: list[dict]
+    max_tokens: int
+    prompt_tokens_estimate: int
+    stats: dict = field(default_factory=dict)
+
+
+def build_explanation_prompt(
+    *,
+    static_prompt: str,
+    lang_instruction: str,
+    risk_summary: dict,
+    labs_norm: dict,
+    tables: list[dict] | None,
+    plan: str,
+) -> PromptPlan:
+    """AI açıklaması için [system: sabit talimat, user: dil + sıkıştırılmış girdi] mesajları ve bütçe."""
+    budget = budget_for_plan(plan)
+    raw_text = labs_norm.get("t") or ""
+    note = (labs_norm.get("dn") or "")[:300] or None
+    rows = compact_lab_table(tables or [])
+    n_flags = sum(1 for r in rows if not r.endswith("|normal"))
+
+    def _user_content(table_rows: list[str], raw: str) -> str:
+        payload = {"risk_summary": compact_risk_summary(risk_summary), "plan": plan}
+        if note:
+            payload["doctor_notes"] = note
+        parts = [lang_instruction, "Input (JSON):\n" + json.dumps(payload, ensure_ascii=False, separators=(",", ":"))]
+        if table_rows:
+            parts.append("labs (name|value unit|ref|status):\n" + "\n".join(table_rows))
+        if raw:
+            parts.append("labs_norm:\n" + raw)
+        return "\n\n".join(parts)
+
+    fixed_tokens = count_tokens(static_prompt) + count_tokens(_user_content([], ""))
+    remaining = budget.input_tokens - fixed_tokens
+
+    # Tablo satırları: referans dışılar önde; bütçe biterse normal satırlar düşer
+    kept: list[str] = []
+    for row in rows:
+        cost = count_tokens(row) + 1
+        if remaining - cost < 0 and len(kept) >= n_flags:
+            break
+        kept.append(row)
+        remaining -= cost
+    dropped_rows = len(rows) - len(kept)
+
+    # Tablo varken ham metin yalnızca tablodan belirgin uzunsa (ayrıştırılamayan satırlar olabilir) eklenir
+    if not kept:
+        raw_allowance = remaining
+    elif count_tokens(raw_text) > RAW_COVERAGE_RATIO * sum(count_tokens(r) for r in kept):
+        raw_allowance = min(remaining, budget.raw_context_tokens)
+    else:
+        raw_allowance = 0
+    raw = truncate_to_tokens(raw_text, raw_allowance) if raw_allowance >= MIN_RAW_TOKENS else ""
+
+    user_content = _user_content(kept, raw)
+    messages = [
+        {"role": "system", "content": static_prompt},
+        {"role": "user", "content": user_content},
+    ]
+    estimate = count_tokens(static_prompt) + count_tokens(user_content)
+    max_tokens = min(budget.output_max, budget.output_base + budget.output_per_flag * n_flags)
+    return PromptPlan(
+        messages=messages,
+        max_tokens=max_tokens,
+        prompt_tokens_estimate=estimate,
+        stats={
+            "table_rows": len(kept),
+            "dropped_rows": dropped_rows,
+            "raw_tokens": count_tokens(raw),
+            "raw_truncated": len(raw) < len(raw_text),
+        },
+    )
+
+
+def usage_from_response(response, *, estimate: int | None = None) -> dict | None:
+    """OpenAI yanıtından token kullanımı; önbellekten gelen prompt token'ları dahil."""
+    u = getattr(response, "usage", None)
+    if not u:
+        return None
+    details = getattr(u, "prompt_tokens_details", None)
+    usage = {
+        "prompt_tokens": getattr(u, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(u, "completion_tokens", 0) or 0,
+        "cached_tokens": (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0,
+    }
+    if estimate is not None:
+        usage["prompt_tokens_estimate"] = estimate
+    return usage
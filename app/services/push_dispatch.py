@@ -0,0 +1,450 @@
+"""Expo push gönderim alt sistemi (toplu gönderim + receipt takibi).
+
+- Mesajlar kuyruğa alınır; arka plan thread'i kuyruğu 100'lük paketlere böler
+  (Expo tek istekte en fazla 100 mesaj kabul eder).
+- Paketler sınırlı sayıda paralel işçiyle gönderilir; her işçi keep-alive
+  HTTP bağlantısını tekrar kullanır (her mesaj için yeni TLS el sıkışması yok).
+- Expo'nun döndüğü ticket id'leri saklanır; receipt'ler sonradan toplu sorgulanır. Bekleyen ticket
+  olduğu sürece arka plan thread'i çalışır (senkron `send`/broadcast dahil) ve receipt'leri periyodik yoklar.
+- `DeviceNotRegistered` dönen token'lar `PushSubscription.is_active=False` yapılır.
+
+Base URL ayarlanabilir (EXPO_PUSH_BASE_URL); testlerde yerel HTTP stub'a yönlendirilir.
+"""
+from __future__ import annotations
+
+import http.client
+import json
+import logging
+import queue
+import select
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Iterable
+from urllib.parse import urlsplit
+
+from app.core.config import settings
+from app.services.resilience import upstream
+
+log = logging.getLogger(__name__)
+
+EXPO_BATCH_SIZE = 100  # Expo /push/send limiti
+EXPO_RECEIPT_BATCH_SIZE = 1000  # Expo /push/getReceipts limiti
+EXPO_SEND_PATH = "/--/api/v2/push/send"
+EXPO_RECEIPTS_PATH = "/--/api/v2/push/getReceipts"
+# Expo receipt'leri gönderimden ~15 dk sonra hazır olur; 24 saat sonra silinir.
+RECEIPT_MIN_AGE_SEC = 15 * 60
+RECEIPT_MAX_AGE_SEC = 24 * 3600
+RECEIPT_POLL_INTERVAL_SEC = 60
+DEAD_TOKEN_ERROR = "DeviceNotRegistered"
+# Expo sağlığını bozan hatalar (bağlantı, zaman aşımı, 5xx → RuntimeError)
+EXPO_FAILURES = (http.client.HTTPException, OSError, RuntimeError)
+
+
+def _chunks(items: list, size: int) -> Iterable[list]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+class _ConnectionPool:
+    """Keep-alive http.client bağlantı havuzu (host başına, en fazla `size` bağlantı)."""
+
+    def __init__(self, base_url: str, size: int, timeout: float):
+        parts = urlsplit(base_url)
+        self._secure = parts.scheme == "https"
+        self._host = parts.hostname or "exp.host"
+        self._port = parts.port
+        self._prefix = (parts.path or "").rstrip("/")
+        self._timeout = timeout
+        self._idle: queue.LifoQueue = queue.LifoQueue(maxsize=max(size, 1))
+
+    def _new_conn(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self._secure else http.client.HTTPConnection
+        return cls(self._host, self._port, timeout=self._timeout)
+
+    def _acquire(self) -> http.client.HTTPConnection:
+        """Boşta bağlantı; sunucunun kapattığı (okunabilir = EOF) keep-alive soketleri istek yazılmadan atılır."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self._new_conn()
+            if conn.sock is None:
+                return conn
+            try:
+                readable, _, _ = select.select([conn.sock], [], [], 0)
+            except (OSError, ValueError):
+                readable = [conn.sock]
+            if not readable:
+                return conn
+            conn.close()
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def post_json(self, path: str, body: dict | list, headers: dict[str, str], timeout: float | None = None) -> dict:
+        """JSON POST; istek yazılamadıysa (bayat keep-alive soketi, bağlanma hatası) bir kez yeni bağlantıyla dener.
+
+        İstek gönderildikten sonraki hatalar (yanıt zaman aşımı, kopan bağlantı) tekrar denenmez: Expo mesajı
+        almış olabilir, ikinci gönderim kullanıcıya çift bildirim olarak düşer.
+        timeout verilirse bu istek için soket zaman aşımı (resilience uyarlanır değeri) olarak uygulanır.
+        """
+        payload = json.dumps(body).encode("utf-8")
+        last_exc: Exception | None = None
+        for attempt in range(2):
+            conn = self._acquire() if attempt == 0 else self._new_conn()
+            if timeout is not None:
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+            try:
+                conn.request("POST", self._prefix + path, body=payload, headers=headers)
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                last_exc = e
+                continue
+            try:
+                resp = conn.getresponse()
+                raw = resp.read()
+            except BaseException:
+                conn.close()
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+            if resp.status >= 500:
+                raise RuntimeError(f"Expo HTTP {resp.status}")
+            return json.loads(raw.decode("utf-8") or "{}")
+        raise last_exc or RuntimeError("Expo request failed")
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def deactivate_push_tokens(tokens: Iterable[str]) -> int:
+    """DeviceNotRegistered token'larını pasifleştirir; güncellenen satır sayısını döner."""
+    tokens = [t for t in set(tokens) if t]
+    if not tokens:
+        return 0
+    from sqlmodel import Session, select
+
+    from app.core.database import engine
+    from app.models.push_subscription import PushSubscription
+
+    now = datetime.utcnow()
+    updated = 0
+    with Session(engine) as db:
+        for chunk in _chunks(tokens, 500):
+            rows = db.exec(
+                select(PushSubscription).where(
+                    PushSubscription.endpoint.in_(chunk),
+                    PushSubscription.is_active == True,  # noqa: E712
+                )
+            ).all()
+            for sub in rows:
+                sub.is_active = False
+                sub.deactivated_at = now
+                sub.last_error = DEAD_TOKEN_ERROR
+                db.add(sub)
+                updated += 1
+        db.commit()
+    if updated:
+        log.info("PUSH: %d token pasifleştirildi (%s).", updated, DEAD_TOKEN_ERROR)
+    return updated
+
+
+class ExpoPushDispatcher:
+    """Expo push mesajlarını kuyruk üzerinden toplu ve paralel gönderir."""
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        *,
+        access_token: str | None = None,
+        max_concurrency: int | None = None,
+        batch_size: int = EXPO_BATCH_SIZE,
+        timeout: float = 10.0,
+        linger_sec: float = 0.05,
+        receipt_min_age_sec: float = RECEIPT_MIN_AGE_SEC,
+        receipt_poll_interval_sec: float = RECEIPT_POLL_INTERVAL_SEC,
+        on_dead_tokens: Callable[[list[str]], object] | None = None,
+    ):
+        self.base_url = (base_url or settings.expo_push_base_url or "https://exp.host").rstrip("/")
+        self.access_token = access_token if access_token is not None else (settings.expo_access_token or "")
+        self.max_concurrency = max(1, int(max_concurrency or settings.push_max_concurrency or 1))
+        self.batch_size = max(1, min(batch_size, EXPO_BATCH_SIZE))
+        self.linger_sec = linger_sec
+        self.receipt_min_age_sec = receipt_min_age_sec
+        self.receipt_poll_interval_sec = receipt_poll_interval_sec
+        self.on_dead_tokens = on_dead_tokens or deactivate_push_tokens
+        self._pool = _ConnectionPool(self.base_url, self.max_concurrency, timeout)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="expo-push")
+        self._queue: queue.Queue = queue.Queue()
+        self._pending_receipts: dict[str, tuple[str, float]] = {}  # ticket_id -> (token, sent_at)
+        self._receipts_lock = threading.Lock()
+        self._worker: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._idle = threading.Condition()
+        self._in_flight = 0
+        self.stats = {"sent": 0, "errors": 0, "requests": 0, "deactivated": 0}
+
+    # --- HTTP ---
+
+    def _headers(self) -> dict[str, str]:
+        headers = {
+            "Accept": "application/json",
+            "Accept-Encoding": "identity",
+            "Content-Type": "application/json",
+            "Connection": "keep-alive",
+        }
+        if self.access_token:
+            headers["Authorization"] = f"Bearer {self.access_token}"
+        return headers
+
+    def _send_chunk(self, chunk: list[dict]) -> list[dict]:
+        try:
+            # Gönderim idempotent değil (çift bildirim): katmanda tekrar/hedge yok, yalnızca devre + zaman aşımı
+            data = upstream("expo").call(
+                lambda timeout: self._pool.post_json(EXPO_SEND_PATH, chunk, self._headers(), timeout),
+                failure_on=EXPO_FAILURES,
+                retry_on=(),
+            )
+        except Exception as e:
+            log.warning("Expo push send failed (%d mesaj): %s", len(chunk), e)
+            return [{"status": "error", "message": str(e)} for _ in chunk]
+        tickets = data.get("data") if isinstance(data, dict) else None
+        if not isinstance(tickets, list):
+            log.warning("Expo push beklenmeyen yanıt: %s", str(data)[:200])
+            return [{"status": "error", "message": "invalid response"} for _ in chunk]
+        return tickets
+
+    def _handle_tickets(self, messages: list[dict], tickets: list[dict]) -> None:
+        dead: list[str] = []
+        now = time.monotonic()
+        with self._receipts_lock:
+            for msg, ticket in zip(messages, tickets):
+                token = msg.get("to") or ""
+                if ticket.get("status") == "ok":
+                    self.stats["sent"] += 1
+                    if ticket.get("id"):
+                        self._pending_receipts[ticket["id"]] = (token, now)
+                    continue
+                self.stats["errors"] += 1
+                if (ticket.get("details") or {}).get("error") == DEAD_TOKEN_ERROR:
+                    dead.append(token)
+        if dead:
+            self._report_dead(dead)
+
+    def _report_dead(self, tokens: list[str]) -> None:
+        try:
+            result = self.on_dead_tokens(tokens)
+            with self._receipts_lock:
+                self.stats["deactivated"] += result if isinstance(result, int) else len(tokens)
+        except Exception as e:
+            log.warning("PUSH: token pasifleştirme hatası: %s", e)
+
+    # --- Senkron API ---
+
+    def send(self, messages: list[dict]) -> list[dict]:
+        """Mesajları 100'lük paketler halinde paralel gönderir; mesaj sırasıyla ticket listesi döner."""
+        messages = [m for m in messages if m and m.get("to")]
+        if not messages:
+            return []
+        chunks = list(_chunks(messages, self.batch_size))
+        with self._receipts_lock:
+            self.stats["requests"] += len(chunks)
+        if len(chunks) == 1:
+            results = [self._send_chunk(chunks[0])]
+        else:
+            results = list(self._executor.map(self._send_chunk, chunks))
+        tickets: list[dict] = []
+        for chunk, chunk_tickets in zip(chunks, results):
+            self._handle_tickets(chunk, chunk_tickets)
+            tickets.extend(chunk_tickets)
+        if self.pending_receipt_count and not self._stop.is_set():
+            # Kuyruk dışı gönderimler (broadcast, senkron bildirim) de receipt yoklamasına girer
+            self.start()
+        return tickets
+
+    def poll_receipts(self, *, force: bool = False) -> list[str]:
+        """Yeterince eski ticket'ların receipt'lerini sorgular; pasifleştirilen token'ları döner."""
+        now = time.monotonic()
+        with self._receipts_lock:
+            # 24 saati geçen ticket'lar Expo'da artık yok; bellekte tutma.
+            for tid, (_, sent_at) in list(self._pending_receipts.items()):
+                if now - sent_at > RECEIPT_MAX_AGE_SEC:
+                    self._pending_receipts.pop(tid, None)
+            ready = {
+                tid: token
+                for tid, (token, sent_at) in self._pending_receipts.items()
+                if force or now - sent_at >= self.receipt_min_age_sec
+            }
+        if not ready:
+            return []
+        dead: list[str] = []
+        done: list[str] = []
+        for ids in _chunks(list(ready), EXPO_RECEIPT_BATCH_SIZE):
+            try:
+                data = upstream("expo").call(
+                    lambda timeout: self._pool.post_json(EXPO_RECEIPTS_PATH, {"ids": ids}, self._headers(), timeout),
+                    failure_on=EXPO_FAILURES,
+                    idempotent=True,
+                )
+            except Exception as e:
+                log.warning("Expo receipt sorgusu başarısız: %s", e)
+                continue
+            receipts = data.get("data") if isinstance(data, dict) else None
+            if not isinstance(receipts, dict):
+                continue
+            for tid, receipt in receipts.items():
+                done.append(tid)
+                if receipt.get("status") == "error":
+                    err = (receipt.get("details") or {}).get("error")
+                    if err == DEAD_TOKEN_ERROR and ready.get(tid):
+                        dead.append(ready[tid])
+                    else:
+                        log.info("Expo receipt hatası: %s %s", err, receipt.get("message", ""))
+        with self._receipts_lock:
+            for tid in done:
+                self._pending_receipts.pop(tid, None)
+        if dead:
+            self._report_dead(dead)
+        return dead
+
+    @property
+    def pending_receipt_count(self) -> int:
+        with self._receipts_lock:
+            return len(self._pending_receipts)
+
+    # --- Kuyruk (arka plan) ---
+
+    def enqueue(self, message: dict) -> None:
+        self.enqueue_many([message])
+
+    def enqueue_many(self, messages: Iterable[dict]) -> None:
+        """Mesajları kuyruğa ekler (istek thread'ini bloklamaz)."""
+        self.start()
+        for m in messages:
+            if m and m.get("to"):
+                with self._idle:
+                    self._in_flight += 1
+                self._queue.put(m)
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, daemon=True, name="expo-push-dispatch")
+            self._worker.start()
+
+    def _drain(self, first: dict) -> list[dict]:
+        batch = [first]
+        limit = self.batch_size * self.max_concurrency
+        deadline = time.monotonic() + self.linger_sec
+        while len(batch) < limit:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=max(remaining, 0)) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        last_poll = time.monotonic()
+        wait = min(1.0, self.receipt_poll_interval_sec)
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=wait)
+            except queue.Empty:
+                first = None
+            if first is not None:
+                batch = self._drain(first)
+                try:
+                    self.send(batch)
+                except Exception as e:
+                    log.warning("PUSH dispatch hatası: %s", e)
+                finally:
+                    with self._idle:
+                        self._in_flight -= len(batch)
+                        self._idle.notify_all()
+            if time.monotonic() - last_poll >= self.receipt_poll_interval_sec:
+                last_poll = time.monotonic()
+                try:
+                    self.poll_receipts()
+                except Exception as e:
+                    log.warning("PUSH receipt poll hatası: %s", e)
+
+    def flush(self, timeout: float | None = 30.0) -> bool:
+        """Kuyruktaki tüm mesajlar gönderilene kadar bekler."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._in_flight <= 0, timeout=timeout)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self.flush(timeout)
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+        self._executor.shutdown(wait=False)
+        self._pool.close()
+
+
+_DISPATCHER: ExpoPushDispatcher | None = None
+_DISPATCHER_LOCK = threading.Lock()
+
+
+def get_push_dispatcher() -> ExpoPushDispatcher:
+    """Process genelinde tek dispatcher (lazy)."""
+    global _DISPATCHER
+    if _DISPATCHER is None:
+        with _DISPATCHER_LOCK:
+            if _DISPATCHER is None:
+                _DISPATCHER = ExpoPushDispatcher()
+    return _DISPATCHER
+
+
+def broadcast_to_mobile_users(
+    db,
+    title: str,
+    body: str,
+    data: dict | None = None,
+    user_ids: list[int] | None = None,
+) -> dict:
+    """Aktif mobil token'ların hepsine (veya verilen kullanıcılara) aynı bildirimi gönderir."""
+    from sqlmodel import select
+
+    from app.models.push_subscription import PushSubscription
+
+    stmt = select(PushSubscription.endpoint).where(
+        PushSubscription.p256dh == "",  # mobil (Expo) token'lar boş p256dh ile kaydedilir
+        PushSubscription.is_active == True,  # noqa: E712
+    )
+    if user_ids is not None:
+        stmt = stmt.where(PushSubscription.user_id.in_(user_ids))
+    tokens = sorted(set(db.exec(stmt).all()))
+    messages = [
+        {"to": t, "title": title, "body": body, "data": data or {}, "sound": "default"}
+        for t in tokens
+    ]
+    tickets = get_push_dispatcher().send(messages)
+    ok = sum(1 for t in tickets if t.get("status") == "ok")
+    return {"tokens": len(tokens), "ok": ok, "failed": len(tickets) - ok}
+
+
+def shutdown_push_dispatcher(timeout: float = 10.0) -> None:
+    """Uygulama kapanırken kuyruktaki bildirimleri gönderip dispatcher'ı kapatır."""
+    global _DISPATCHER
+    with _DISPATCHER_LOCK:
+        dispatcher, _DISPATCHER = _DISPATCHER, None
+    if dispatcher is not None:
+        dispatcher.stop(timeout)
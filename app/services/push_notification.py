@@ -1,67 +1,69 @@
 """Expo Push Notification servisi.
 
 Mobil kullanıcılara analiz tamamlandığında bildirim gönderir.
+Gönderim `app.services.push_dispatch` üzerinden yapılır (100'lük paketler,
+keep-alive bağlantı, DeviceNotRegistered token'ların pasifleştirilmesi).
 """
-import http.client
-import json
 import logging
 
-log = logging.getLogger(__name__)
+from app.services.push_dispatch import get_push_dispatcher
 
-EXPO_PUSH_URL = "https://exp.host/--/api/v2/push/send"
+log = logging.getLogger(__name__)
 
 
 def _send_expo_push(messages: list[dict]) -> dict | None:
-    """Expo push API'ye istek gönderir.
+    """Expo push API'ye senkron gönderim; Expo yanıt formatında {"data": [ticket, ...]} döner.
 
     messages format:
     [{"to": "ExponentPushToken[...]", "title": "...", "body": "...", "data": {...}}]
     """
     if not messages:
         return None
-    payload = json.dumps({"messages": messages}).encode("utf-8")
     try:
-        conn = http.client.HTTPSConnection("exp.host", timeout=10)
-        conn.request(
-            "POST",
-            "/--/api/v2/push/send",
-            body=payload,
-            headers={
-                "Accept": "application/json",
-                "Content-Type": "application/json",
-            },
-        )
-        resp = conn.getresponse()
-        data = json.loads(resp.read().decode("utf-8"))
-        conn.close()
-        return data
+        return {"data": get_push_dispatcher().send(messages)}
     except Exception as e:
         log.warning("Expo push send failed: %s", e)
         return None
 
 
+def build_analysis_complete_message(
+    push_token: str,
+    user_name: str = "",
+    analysis_id: int | None = None,
+) -> dict:
+    """Analiz tamamlandı bildirimi için Expo mesajı."""
+    name = user_name or "Kullanıcı"
+    return {
+        "to": push_token,
+        "title": "Analiz Tamamlandı",
+        "body": f"{name}, tahlil analiziniz hazır. Uygulamayı açarak detayları görüntüleyin.",
+        "data": {
+            "type": "analysis_complete",
+            "analysis_id": analysis_id,
+        },
+        "sound": "default",
+    }
+
+
 def send_analysis_complete_notification(
     push_token: str,
     user_name: str = "",
     analysis_id: int | None = None,
 ) -> dict | None:
     """Analiz tamamlandığında kullanıcıya bildirim gönderir."""
-    name = user_name or "Kullanıcı"
-    title = "Analiz Tamamlandı"
-    body = f"{name}, tahlil analiziniz hazır. Uygulamayı açarak detayları görüntüleyin."
-    messages = [
-        {
-            "to": push_token,
-            "title": title,
-            "body": body,
-            "data": {
-                "type": "analysis_complete",
-                "analysis_id": analysis_id,
-            },
-            "sound": "default",
-        }
-    ]
-    result = _send_expo_push(messages)
+    result = _send_expo_push([build_analysis_complete_message(push_token, user_name, analysis_id)])
     if result:
         log.info("Push notification sent to %s: %s", push_token[:20], result)
     return result
+
+
+def enqueue_analysis_complete_notifications(
+    push_tokens: list[str],
+    user_name: str = "",
+    analysis_id: int | None = None,
+) -> int:
+    """Bildirimleri dispatcher kuyruğuna ekler (istek thread'ini bloklamaz)."""
+    messages = [build_analysis_complete_message(t, user_name, analysis_id) for t in push_tokens if t]
+    if messages:
+        get_push_dispatcher().enqueue_many(messages)
+    return len(messages)
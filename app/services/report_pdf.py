@@ -1,7 +1,6 @@
 """
 Premium tıbbi PDF raporu: result_text (AI çıktısı) → parse → Jinja2 → WeasyPrint → PDF bytes.
 """
-import base64
 import math
 import re
 from datetime import datetime, timezone
@@ -10,7 +9,9 @@ from pathlib import Path
 from jinja2 import Environment, FileSystemLoader
 
 from app.charts import overall_score_svg_base64, range_bar_svg_base64, simple_value_bar_svg_base64
+from app.charts.asset_cache import cached_asset, quantize
 from app.services.lab_parser import parse_biomarkers as parse_biomarkers_from_lab
+from app.services.pdf_render import render_context, static_assets
 from app.services.risk_engine import compute_risk
 
 
@@ -40,35 +41,8 @@ def _gauge_svg(score: int, fill_class: str) -> str:
 
 # Şablon dizini: app/templates (package içinden çalışırken app/templates)
 _TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates"
-_PROJECT_ROOT = _TEMPLATES_DIR.parent.parent  # norya/ (static/logo.png burada)
 _ENV = Environment(loader=FileSystemLoader(str(_TEMPLATES_DIR)), autoescape=True)
 
-# Rapor ikonu: Tüm PDF raporlarında kullanılan tek ikon (Norya N ikonu — dikkat çekecek kadar, çok büyük değil)
-_REPORT_ICON_PATH = _PROJECT_ROOT / "static" / "norya_report_icon.png"
-_LOGO_BASE64_CACHE: str | None = None
-
-
-def _logo_base64() -> str:
-    """Rapor header'ında kullanılan Norya ikonunu base64 döndürür (WeasyPrint uyumlu). Öncelik: norya_report_icon.png."""
-    global _LOGO_BASE64_CACHE
-    if _LOGO_BASE64_CACHE is not None:
-        return _LOGO_BASE64_CACHE
-    for candidate in (
-        _REPORT_ICON_PATH,
-        _PROJECT_ROOT / "static" / "norya_report_icon.png",
-        Path.cwd() / "static" / "norya_report_icon.png",
-        _PROJECT_ROOT / "static" / "norya_logo_transparent_trim.png",
-        Path.cwd() / "static" / "norya_logo_transparent_trim.png",
-    ):
-        try:
-            if candidate and getattr(candidate, "exists", None) and candidate.exists():
-                _LOGO_BASE64_CACHE = base64.b64encode(candidate.read_bytes()).decode("ascii")
-                return _LOGO_BASE64_CACHE
-        except Exception:
-            continue
-    _LOGO_BASE64_CACHE = ""
-    return _LOGO_BASE64_CACHE
-
 # Yaygın parametreler için varsayılan referans aralıkları (kan şekeri, lipid vb.) — raporda ref yoksa kullanılır
 DEFAULT_REF_RANGES: dict[str, str] = {
     "glucose": "70–100 mg/dL",
@@ -1440,20 +1414,26 @@ SECTION_PATTERNS = [
     (r"\*\*Olası nedenler\*\*", "possible_causes"),
     (r"\*\*Recommendations?\*\*", "recommendations"),
     (r"\*\*Öneriler\*\*", "recommendations"),
+    # Kural tabanlı (degraded_report) raporun de/fr/es/it başlıkları
+    (r"^(?:Zusammenfassung|Résumé|Resumen|Riepilogo)$", "summary"),
+    (r"^(?:Auffällige Werte|Points d'attention|Puntos de atención|Punti di attenzione)$", "risk_indicators"),
+    (r"^(?:Werte|Valeurs|Valores|Valori)$", "values"),
+    (r"^(?:Mögliche Ursachen|Causes possibles|Posibles causas|Possibili cause)$", "possible_causes"),
+    (r"^(?:Empfehlungen|Recommandations|Recomendaciones|Raccomandazioni)$", "recommendations"),
 ]
 
 # Values bloğundaki satır: **Parametre adı:** değer birim. Reference: ... Normal/Low/High (sonunda nokta olabilir)
 BIOMARKER_LINE = re.compile(
     r"\*\*([^*]+)\*?\s*:\s*([^\n]+?)\s*\.\s*"
     r"(?:Reference:\s*([^\n]+?)\s*\.\s*)?"
-    r"(Normal|Low|High|Borderline|Düşük|Yüksek|Sınırda|Sınır)\s*\.?\s*$",
+    r"(Normale|Normal|Low|High|Borderline|Düşük|Yüksek|Sınırda|Sınır|Niedrig|Hoch|Bas|Élevé|Bajo|Alto|Basso)\s*\.?\s*$",
     re.IGNORECASE,
 )
 # Daha esnek: Reference ve/veya status ayrı satırda veya noktasız olabilir
 BIOMARKER_LINE_RELAXED = re.compile(
     r"\*\*([^*]+)\*?\s*:\s*([^\n]+?)(?:\s*\.\s*)?"
     r"(?:\s*Reference:\s*([^\n]+?)(?:\s*\.\s*)?)?"
-    r"(?:\s+(Normal|Low|High|Borderline|Düşük|Yüksek|Sınırda|Sınır))?\s*$",
+    r"(?:\s+(Normale|Normal|Low|High|Borderline|Düşük|Yüksek|Sınırda|Sınır|Niedrig|Hoch|Bas|Élevé|Bajo|Alto|Basso))?\s*$",
     re.IGNORECASE,
 )
 
@@ -1511,7 +1491,7 @@ def _is_section_header(line: str) -> bool:
     title, rest = match.group(1).strip(), (match.group(2) or "").strip()
     # Values bölümündeki parametre satırı: değer + birim veya Reference/Normal — bölüm başlığı DEĞİL
     if re.search(r"Reference\s*:\s*|Ref\s*\.?\s*:\s*", rest, re.IGNORECASE) or re.search(
-        r"\b(Normal|Low|High|Borderline|Düşük|Yüksek|Sınırda|Sınır)\s*\.?\s*$", rest, re.IGNORECASE
+        r"\b(Normale|Normal|Low|High|Borderline|Düşük|Yüksek|Sınırda|Sınır|Niedrig|Hoch|Bas|Élevé|Bajo|Alto|Basso)\s*\.?\s*$", rest, re.IGNORECASE
     ):
         return False
     # Sayı + birim (mg/dL, g/L, ng/mL vb.) varsa parametre satırı say
@@ -1599,9 +1579,9 @@ def _normalize_status(s: str) -> str:
     s = s.strip().lower()
     if s in ("normal", "normale"):
         return "normal"
-    if s in ("low", "düşük", "basso", "baja"):
+    if s in ("low", "düşük", "basso", "baja", "bajo", "niedrig", "bas"):
         return "low"
-    if s in ("high", "yüksek", "alto", "alta"):
+    if s in ("high", "yüksek", "alto", "alta", "hoch", "élevé"):
         return "high"
     if "border" in s or "sınır" in s:
         return "border"
@@ -2324,7 +2304,7 @@ def parse_biomarkers(values_block: str) -> list[dict]:
             if not name or len(name) > 80 or _is_value_like_name(name):
                 continue
             rest = plain.group(2).strip()
-            ref_match = re.search(r"\b(?:Reference|Ref\.?)\s*:\s*([^.]+?)(?:\.\s*(Normal|Low|High|Borderline|Düşük|Yüksek|Sınırda|Sınır))?\s*\.?\s*$", rest, re.IGNORECASE)
+            ref_match = re.search(r"\b(?:Reference|Ref\.?)\s*:\s*([^.]+?)(?:\.\s*(Normale|Normal|Low|High|Borderline|Düşük|Yüksek|Sınırda|Sınır|Niedrig|Hoch|Bas|Élevé|Bajo|Alto|Basso))?\s*\.?\s*$", rest, re.IGNORECASE)
             reference = None
             status = "normal"
             value_str = rest
@@ -2722,21 +2702,28 @@ def parse_report_to_context(
 
 
 def render_pdf(context: dict) -> bytes:
-    """Jinja2 şablonunu render edip WeasyPrint ile PDF üretir (lazy import: WeasyPrint sistem kütüphaneleri sunucu başlarken gerekmez)."""
-    from weasyprint import HTML
+    """Jinja2 şablonunu render edip WeasyPrint ile PDF üretir (lazy import: WeasyPrint sistem kütüphaneleri sunucu başlarken gerekmez).
+    CSS, yazı tipi yapılandırması ve static varlıklar pdf_render bağlamında süreç başına bir kez hazırlanır."""
     context = dict(context)
-    context["logo_base64"] = _logo_base64()
-    template = _ENV.get_template("report_pdf.html")
-    html_str = template.render(**context)
-    html_doc = HTML(string=html_str, base_url=str(_PROJECT_ROOT))
-    pdf_bytes = html_doc.write_pdf()
-    return pdf_bytes
+    context["logo_url"] = static_assets().logo_url()
+    html_str = _ENV.get_template("report_pdf.html").render(**context)
+    return render_context().render_report("report", html_str)
 
 
 # Premium plan: klinik rapor şablonu (AI kelimesi yok, kurumsal görünüm)
 
 
 def _trend_svg(trend_data: dict) -> str:
+    """Trend verisi (dates, ldl, glucose, crp) ile mini bar chart SVG; aynı seri için önbellekten."""
+    keys = ("dates", "ldl", "glucose", "crp")
+    parts = tuple(
+        tuple(v if k == "dates" else quantize(v) if isinstance(v, (int, float)) else v for v in (trend_data.get(k) or []))
+        for k in keys
+    )
+    return cached_asset("trend", parts, lambda: _render_trend_svg({k: list(v) for k, v in zip(keys, parts)}))
+
+
+def _render_trend_svg(trend_data: dict) -> str:
     """Trend verisi (dates, ldl, glucose, crp) ile mini bar chart SVG. 3 tarih, her satırda 3 bar (LDL/Glucose/CRP)."""
     dates = trend_data.get("dates") or []
     ldl = trend_data.get("ldl") or []
@@ -2799,7 +2786,11 @@ def _report_icon(name: str) -> str:
 def _radar_svg(domains: dict) -> str:
     """Four-axis radar chart from domain scores (cardio, metabolic, inflammation, vitamin). viewBox 0 0 200 200."""
     order = ("cardio", "metabolic", "inflammation", "vitamin")
-    scores = [max(0, min(100, (domains.get(d) or {}).get("score", 50))) for d in order]
+    scores = tuple(quantize(max(0, min(100, (domains.get(d) or {}).get("score", 50)))) for d in order)
+    return cached_asset("radar", scores, lambda: _render_radar_svg(scores))
+
+
+def _render_radar_svg(scores: tuple) -> str:
     cx, cy, r = 100.0, 100.0, 72.0
     points = []
     for i, s in enumerate(scores):
@@ -3859,11 +3850,8 @@ def _build_premium_context(
     trend_message = _t("report_trend_need_more", "More analyses needed for trend.")
     trend_locked_label = _t("report_trend_locked", "Trend analysis is available with subscription.")
 
-    # Logo ve CSS: WeasyPrint için mutlak file:// URL (rapor ikonu: norya_report_icon.png)
-    _logo_path = _PROJECT_ROOT / "static" / "norya_report_icon.png"
-    logo_url = _logo_path.as_uri() if _logo_path.exists() else "static/norya_report_icon.png"
-    _css_path = _PROJECT_ROOT / "static" / "report_premium.css"
-    css_url = _css_path.as_uri() if _css_path.exists() else "static/report_premium.css"
+    # Logo: static/ altındaki file:// URL; PDF render'ında pdf_render fetcher'ı bellekten sunar
+    logo_url = static_assets().logo_url()
     premium_labels = _premium_template_labels(lang)
     label_glucose_yes = f"{premium_labels['glucose_label']}: {premium_labels['in_report_yes']}"
     label_glucose_no = f"{premium_labels['glucose_label']}: {premium_labels['in_report_no']}"
@@ -3889,7 +3877,6 @@ def _build_premium_context(
         "lang": lang,
         "user_id": user_id,
         "logo_url": logo_url,
-        "css_url": css_url,
         "has_glucose": has_glucose,
         "label_glucose_in_report": label_glucose_in_report,
         "risk_cards": risk_cards,
@@ -4050,24 +4037,18 @@ def _build_premium_context(
 
 def render_premium_pdf(context: dict) -> bytes:
     """Premium klinik rapor şablonu ile PDF üretir (WeasyPrint, running header/footer)."""
-    from weasyprint import HTML
     context = dict(context)
-    context["logo_base64"] = _logo_base64()
-    template = _ENV.get_template("report_premium.html")
-    html_str = template.render(**context)
-    html_doc = HTML(string=html_str, base_url=str(_PROJECT_ROOT))
-    return html_doc.write_pdf()
+    context["logo_url"] = static_assets().logo_url()
+    html_str = _ENV.get_template("report_premium.html").render(**context)
+    return render_context().render_report("premium", html_str)
 
 
 def render_doctor_pdf(context: dict) -> bytes:
     """Doktoruma götür şablonu ile PDF üretir (logo, hekime özel başlık ve uyarı metni)."""
-    from weasyprint import HTML
     context = dict(context)
-    context["logo_base64"] = _logo_base64()
-    template = _ENV.get_template("doctor_pdf.html")
-    html_str = template.render(**context)
-    html_doc = HTML(string=html_str, base_url=str(_PROJECT_ROOT))
-    return html_doc.write_pdf()
+    context["logo_url"] = static_assets().logo_url()
+    html_str = _ENV.get_template("doctor_pdf.html").render(**context)
+    return render_context().render_report("doctor", html_str)
 
 
 def _source_type_display(source: str | None, lang: str = "tr") -> str:
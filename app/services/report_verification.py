@@ -9,6 +9,7 @@ import sqlite3
 from sqlmodel import Session, select
 from sqlalchemy.exc import OperationalError as SQLOperationalError
 
+from app.charts.asset_cache import cached_asset
 from app.core.security import create_report_verification_token
 from app.models.report_verification import ReportVerification
 
@@ -25,7 +26,12 @@ def _generate_verification_code() -> str:
 
 
 def _qr_png_base64(url: str, size_px: int = 120) -> str:
-    """URL için QR kod PNG üretir; base64 string döner. WeasyPrint embed için."""
+    """URL için QR kod PNG üretir; base64 string döner. WeasyPrint embed için.
+    QR yalnızca URL'yi (doğrulama kimliği dahil) kodlar: aynı URL + boyut önbellekten döner."""
+    return cached_asset("qr", (url, size_px), lambda: _render_qr_png_base64(url, size_px))
+
+
+def _render_qr_png_base64(url: str, size_px: int) -> str:
     try:
         import qrcode
         buf = io.BytesIO()
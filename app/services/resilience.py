@@ -0,0 +1,326 @@
+"""
+Dış servis çağrıları için ortak dayanıklılık katmanı (OpenAI, Frankfurter, MinIO, PayTR, Expo).
+
+Her bağımlılık bir Upstream'dir:
+- Devre kesici: son WINDOW saniyede en az min_calls çağrının failure_ratio kadarı başarısızsa devre
+  açılır; open_seconds boyunca çağrılar beklemeden CircuitOpen ile reddedilir (worker 2 dk askıda
+  kalmaz). Süre dolunca tek deneme çağrısı (half-open) geçer; başarılıysa devre kapanır.
+- Uyarlanır zaman aşımı: başarılı çağrıların son gecikmelerinden p99 × timeout_factor, [min_timeout,
+  max_timeout] aralığında. Yeterli örnek yokken max_timeout. Çağrılan fonksiyon zaman aşımını
+  parametre olarak alır ve kendi istemcisine geçirir.
+- Yeniden deneme bütçesi: her ilk deneme retry_ratio kadar jeton biriktirir, her tekrar bir jeton
+  harcar. Kesinti sırasında tekrarlar yükü katlamaz. Bekleme: tam jitter'lı üstel geri çekilme.
+- Hedged istek: yalnızca idempotent çağrılarda (idempotent=True ve policy.hedge) ilk deneme p95
+  gecikmesini aşarsa ikinci kopya başlatılır; önce biten kazanır. İkinci kopya da bütçeden jeton harcar.
+
+Durum admin panelinde /admin/api/upstreams ile görülür (süreç başına).
+"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, TypeVar
+
+from app.core.runtime import after_fork
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+WINDOW_SECONDS = 60.0
+LATENCY_SAMPLES = 200
+# Uyarlanır zaman aşımı ve hedge eşiği için gereken en az başarılı örnek
+MIN_LATENCY_SAMPLES = 20
+
+
+class CircuitOpen(Exception):
+    """Devre açık: bağımlılık sağlıksız, çağrı yapılmadı."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} circuit open (retry in {retry_after:.0f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class Policy:
+    min_timeout: float
+    max_timeout: float
+    timeout_factor: float = 3.0
+    failure_ratio: float = 0.5
+    min_calls: int = 10
+    open_seconds: float = 30.0
+    max_retries: int = 2
+    retry_ratio: float = 0.2
+    retry_burst: float = 10.0
+    backoff_base: float = 0.5
+    backoff_max: float = 5.0
+    hedge: bool = False
+
+
+# Bağımlılık başına politika; tanımsız isim DEFAULT_POLICY alır
+POLICIES: dict[str, Policy] = {
+    # Metin (açıklama, sohbet, çeviri) ve Vision ayrı: kısa metin yanıtlarından öğrenilen zaman aşımı uzun
+    # Vision yanıtını kesip devreyi açmasın. Üst sınır eski sabit zaman aşımı.
+    "openai-text": Policy(min_timeout=20.0, max_timeout=120.0, backoff_base=1.0),
+    "openai-vision": Policy(min_timeout=60.0, max_timeout=120.0, backoff_base=1.0),
+    "frankfurter": Policy(min_timeout=1.0, max_timeout=4.0, max_retries=1, hedge=True),
+    "minio": Policy(min_timeout=5.0, max_timeout=30.0, max_retries=2),
+    # Ödeme çağrıları idempotent değil: tekrar yok, yalnızca devre ve zaman aşımı
+    "paytr": Policy(min_timeout=5.0, max_timeout=20.0, max_retries=0, min_calls=5),
+    "expo": Policy(min_timeout=2.0, max_timeout=10.0, max_retries=1, hedge=True),
+}
+DEFAULT_POLICY = Policy(min_timeout=2.0, max_timeout=30.0)
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+class Upstream:
+    """Tek bağımlılığın devre kesicisi, gecikme geçmişi ve tekrar bütçesi (thread-safe)."""
+
+    def __init__(self, name: str, policy: Policy):
+        self.name = name
+        self.policy = policy
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_inflight = False
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._latencies: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._retry_tokens = policy.retry_burst
+        self.counters = {"calls": 0, "failures": 0, "rejected": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "opened": 0}
+
+    # --- Durum ---
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            return self._state
+
+    def is_open(self) -> bool:
+        return self.state == OPEN
+
+    def _maybe_half_open(self, now: float) -> None:
+        if self._state == OPEN and now - self._opened_at >= self.policy.open_seconds:
+            self._state = HALF_OPEN
+            self._probe_inflight = False
+
+    def _admit(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._maybe_half_open(now)
+            if self._state == CLOSED:
+                return
+            if self._state == HALF_OPEN and not self._probe_inflight:
+                self._probe_inflight = True
+                return
+            self.counters["rejected"] += 1
+            retry_after = max(0.0, self.policy.open_seconds - (now - self._opened_at))
+        raise CircuitOpen(self.name, retry_after)
+
+    def _record(self, ok: bool, latency: float | None = None) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.counters["calls"] += 1
+            if ok and latency is not None:
+                self._latencies.append(latency)
+            if not ok:
+                self.counters["failures"] += 1
+            if self._state == HALF_OPEN:
+                self._probe_inflight = False
+                if ok:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                    log.info("Upstream %s circuit closed", self.name)
+                else:
+                    self._open(now)
+                return
+            self._outcomes.append((now, ok))
+            while self._outcomes and now - self._outcomes[0][0] > WINDOW_SECONDS:
+                self._outcomes.popleft()
+            if self._state == CLOSED and not ok and len(self._outcomes) >= self.policy.min_calls:
+                failed = sum(1 for _, o in self._outcomes if not o)
+                if failed / len(self._outcomes) >= self.policy.failure_ratio:
+                    self._open(now)
+
+    def _open(self, now: float) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self.counters["opened"] += 1
+        log.warning("Upstream %s circuit opened for %.0fs", self.name, self.policy.open_seconds)
+
+    # --- Zaman aşımı / bütçe ---
+
+    def _latency_percentile(self, q: float) -> float | None:
+        with self._lock:
+            if len(self._latencies) < MIN_LATENCY_SAMPLES:
+                return None
+            values = sorted(self._latencies)
+        return _percentile(values, q)
+
+    def timeout(self) -> float:
+        p99 = self._latency_percentile(0.99)
+        if p99 is None:
+            return self.policy.max_timeout
+        return min(self.policy.max_timeout, max(self.policy.min_timeout, p99 * self.policy.timeout_factor))
+
+    def _deposit(self) -> None:
+        with self._lock:
+            self._retry_tokens = min(self.policy.retry_burst, self._retry_tokens + self.policy.retry_ratio)
+
+    def _withdraw(self) -> bool:
+        with self._lock:
+            if self._retry_tokens < 1.0:
+                return False
+            self._retry_tokens -= 1.0
+            return True
+
+    def _backoff(self, attempt: int) -> float:
+        # Tam jitter: aynı anda düşen istekler aynı anda geri dönmesin
+        return random.uniform(0, min(self.policy.backoff_max, self.policy.backoff_base * (2 ** attempt)))
+
+    # --- Çağrı ---
+
+    def _attempt(self, fn: Callable[[float], T], failure_on: tuple[type[BaseException], ...]) -> T:
+        self._admit()
+        t0 = time.monotonic()
+        try:
+            result = fn(self.timeout())
+        except failure_on:
+            self._record(False)
+            raise
+        except Exception:
+            # İstemci hatası (4xx, doğrulama): bağımlılık yanıt verdi, sağlık açısından başarı
+            self._record(True)
+            raise
+        self._record(True, time.monotonic() - t0)
+        return result
+
+    def _hedged_attempt(self, fn: Callable[[float], T], failure_on: tuple[type[BaseException], ...]) -> T:
+        delay = self._latency_percentile(0.95)
+        if delay is None:
+            return self._attempt(fn, failure_on)
+        primary = _hedge_executor.submit(self._attempt, fn, failure_on)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._withdraw():
+            return primary.result()
+        with self._lock:
+            self.counters["hedges"] += 1
+        try:
+            backup = _hedge_executor.submit(self._attempt, fn, failure_on)
+        except RuntimeError:
+            return primary.result()
+        pending = {primary, backup}
+        last_exc: BaseException | None = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                if fut.exception() is None:
+                    if fut is backup:
+                        with self._lock:
+                            self.counters["hedge_wins"] += 1
+                    return fut.result()
+                last_exc = fut.exception()
+        raise last_exc
+
+    def call(
+        self,
+        fn: Callable[[float], T],
+        *,
+        failure_on: tuple[type[BaseException], ...] = (Exception,),
+        retry_on: tuple[type[BaseException], ...] | None = None,
+        idempotent: bool = False,
+    ) -> T:
+        """fn(timeout) çağrısını devre, uyarlanır zaman aşımı, bütçeli tekrar ve (idempotent ise) hedge ile yapar.
+
+        failure_on: bağımlılık sağlığını bozan hatalar (bağlantı, zaman aşımı, 5xx).
+        retry_on: tekrar denenecek hatalar (varsayılan failure_on). CircuitOpen tekrar denenmez.
+        """
+        retry_on = failure_on if retry_on is None else retry_on
+        self._deposit()
+        hedge = idempotent and self.policy.hedge
+        attempt = 0
+        while True:
+            try:
+                return self._hedged_attempt(fn, failure_on) if hedge else self._attempt(fn, failure_on)
+            except CircuitOpen:
+                raise
+            except retry_on as e:
+                if attempt >= self.policy.max_retries or self.is_open() or not self._withdraw():
+                    raise
+                attempt += 1
+                with self._lock:
+                    self.counters["retries"] += 1
+                wait_s = self._backoff(attempt)
+                log.warning("Upstream %s retry %d/%d in %.2fs after %s: %s", self.name, attempt, self.policy.max_retries, wait_s, type(e).__name__, e)
+                time.sleep(wait_s)
+
+    def snapshot(self) -> dict:
+        p50 = self._latency_percentile(0.5)
+        p95 = self._latency_percentile(0.95)
+        p99 = self._latency_percentile(0.99)
+        state = self.state
+        with self._lock:
+            window = len(self._outcomes)
+            failed = sum(1 for _, o in self._outcomes if not o)
+            tokens = self._retry_tokens
+            samples = len(self._latencies)
+            counters = dict(self.counters)
+        return {
+            "state": state,
+            "timeout_s": round(self.timeout(), 2),
+            "latency_samples": samples,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "p99_ms": round(p99 * 1000, 1) if p99 is not None else None,
+            "window_calls": window,
+            "window_failure_ratio": round(failed / window, 3) if window else 0.0,
+            "retry_tokens": round(tokens, 2),
+            **counters,
+        }
+
+
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+
+@after_fork
+def _reset_hedge_executor() -> None:
+    global _hedge_executor
+    _hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+
+_upstreams: dict[str, Upstream] = {}
+_upstreams_lock = threading.Lock()
+
+
+def upstream(name: str) -> Upstream:
+    """Bağımlılık adına göre süreç genelinde tek Upstream (lazy)."""
+    up = _upstreams.get(name)
+    if up is not None:
+        return up
+    with _upstreams_lock:
+        if name not in _upstreams:
+            _upstreams[name] = Upstream(name, POLICIES.get(name, DEFAULT_POLICY))
+        return _upstreams[name]
+
+
+def snapshot() -> dict[str, dict]:
+    """Tüm bilinen bağımlılıkların durumu (admin/metrics)."""
+    for name in POLICIES:
+        upstream(name)
+    with _upstreams_lock:
+        items = list(_upstreams.items())
+    return {name: up.snapshot() for name, up in sorted(items)}
+
+
+def reset() -> None:
+    """Tüm durumu sıfırlar (testler ve politika değişikliği sonrası)."""
+    with _upstreams_lock:
+        _upstreams.clear()
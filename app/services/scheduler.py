@@ -0,0 +1,432 @@
+"""
+Arka plan iş zamanlayıcısı: `while True: sleep` daemon thread'leri yerine kalıcı iş tablosu.
+
+- İşler kodda `scheduler.register(name, cron)` ile tanımlanır; scheduled_jobs satırı (sonraki çalışma,
+  kira, deneme sayacı) veritabanında tutulur. Cron 5 alanlıdır (dakika saat gün ay haftanın-günü, UTC).
+- Küme genelinde tek çalıştırma: her worker periyodik olarak vadesi gelen işleri tek bir koşullu UPDATE ile
+  kiralamaya çalışır (`lease_expires_at` boş / geçmiş). UPDATE'i kazanan worker çalıştırır; çöken worker'ın
+  kirası süresi dolunca başka worker'a geçer. Çalışan işin kirası her turda uzatılır (çakışma olmaz).
+- Sınırlı eşzamanlılık (scheduler_max_concurrency), iş başına zaman aşımı: aşılınca çalıştırma `timeout`
+  kaydedilir ve yeniden deneme planlanır (Python thread'i zorla durdurulamaz; kira iş bitene kadar tutulur).
+- Başarısızlıkta üstel bekleme ile `retries` kez yeniden deneme, sonra cron'daki bir sonraki zaman.
+- Her çalıştırma job_runs'a yazılır (admin: /admin/api/jobs); scheduler_run_retention_days'ten eski kayıtlar
+  `prune_runs` ile silinir. Kapanışta yeni iş alınmaz, çalışanlar scheduler_drain_s kadar beklenir; bitmeyenler
+  `interrupted` kaydedilip kiraları bırakılır.
+- `per_worker=True` işler (ör. worker'ın yerel SQLite önbelleği) kiralanmaz: her worker kendi cron zamanında
+  çalıştırır; sonraki zaman süreç belleğindedir, scheduled_jobs satırı yoktur, çalıştırmalar yine job_runs'a yazılır.
+- İş fonksiyonları hatayı yutmaz: yükselen istisna çalıştırmayı `failed` kaydeder ve yeniden denemeyi başlatır.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+from sqlalchemy import delete, or_, update
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.runtime import after_fork
+from app.models import JobRun, ScheduledJob
+
+log = logging.getLogger(__name__)
+
+# ——— Cron ———
+
+_FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))  # haftanın günü: 0 ve 7 = pazar
+
+
+def _parse_field(expr: str, lo: int, hi: int) -> set[int]:
+    values: set[int] = set()
+    for part in expr.split(","):
+        step = 1
+        if "/" in part:
+            part, step_s = part.split("/", 1)
+            step = int(step_s)
+        if part in ("*", ""):
+            start, end = lo, hi
+        elif "-" in part:
+            start, end = (int(x) for x in part.split("-", 1))
+        else:
+            start = int(part)
+            end = hi if step > 1 else start
+        if start < lo or end > hi or start > end or step < 1:
+            raise ValueError(f"cron field out of range: {expr!r}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class Cron:
+    """5 alanlı cron ifadesi; gün ve haftanın günü ikisi de kısıtlıysa biri tutması yeter (klasik cron)."""
+
+    def __init__(self, expr: str):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron needs 5 fields: {expr!r}")
+        self.expr = expr
+        self.minutes, self.hours, self.days, self.months, dows = (
+            _parse_field(f, lo, hi) for f, (lo, hi) in zip(fields, _FIELD_RANGES)
+        )
+        self.dows = {d % 7 for d in dows}
+        self._dom_any = fields[2] == "*"
+        self._dow_any = fields[4] == "*"
+
+    def _day_matches(self, dt: datetime) -> bool:
+        if dt.month not in self.months:
+            return False
+        dom, dow = dt.day in self.days, (dt.weekday() + 1) % 7 in self.dows
+        if self._dom_any or self._dow_any:
+            return dom and dow
+        return dom or dow
+
+    def next_after(self, after: datetime) -> datetime:
+        """`after`'dan kesin sonraki ilk eşleşen dakika."""
+        dt = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 5)
+        while dt < limit:
+            if not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+                continue
+            if dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+                continue
+            return dt
+        raise ValueError(f"cron never fires: {self.expr!r}")
+
+
+# ——— Zamanlayıcı ———
+
+
+@dataclass
+class Job:
+    name: str
+    cron: Cron
+    fn: Callable[[], Any]
+    timeout_s: float
+    retries: int
+    retry_backoff_s: float
+    enabled: Callable[[], bool]
+    per_worker: bool = False
+
+
+@dataclass
+class _Running:
+    job: Job
+    run_id: int
+    attempt: int
+    future: Future
+    started: float
+    timed_out: bool = False
+
+
+def _owner_id() -> str:
+    return f"{os.uname().nodename[:32]}-{os.getpid()}-{secrets.token_hex(3)}"
+
+
+class Scheduler:
+    def __init__(self, engine=None):
+        self._engine = engine
+        self.jobs: dict[str, Job] = {}
+        self.owner = _owner_id()
+        self._running: dict[str, _Running] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._pool: ThreadPoolExecutor | None = None
+        self._local_next: dict[str, datetime] = {}
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from app.core.database import engine
+
+            self._engine = engine
+        return self._engine
+
+    def register(self, name: str, cron: str, *, timeout_s: float = 600.0, retries: int = 2,
+                 retry_backoff_s: float = 60.0, enabled: Callable[[], bool] | None = None, per_worker: bool = False):
+        """Dekoratör: `@scheduler.register("drip", "0 * * * *")`."""
+        def decorator(fn: Callable[[], Any]) -> Callable[[], Any]:
+            self.jobs[name] = Job(
+                name, Cron(cron), fn, timeout_s, retries, retry_backoff_s, enabled or (lambda: True), per_worker
+            )
+            return fn
+        return decorator
+
+    # --- Tablo ---
+
+    def sync(self, now: datetime | None = None) -> None:
+        """Kayıtlı işlerin satırlarını oluşturur; cron değiştiyse sonraki zamanı yeniden hesaplar."""
+        now = now or datetime.utcnow()
+        with Session(self.engine) as db:
+            for job in self.jobs.values():
+                if job.per_worker:
+                    continue
+                row = db.get(ScheduledJob, job.name)
+                enabled = bool(job.enabled())
+                if row is None:
+                    db.add(ScheduledJob(name=job.name, cron=job.cron.expr, enabled=enabled, next_run_at=job.cron.next_after(now)))
+                elif row.cron != job.cron.expr or row.enabled != enabled:
+                    row.cron, row.enabled = job.cron.expr, enabled
+                    row.next_run_at = job.cron.next_after(now)
+                    db.add(row)
+            try:
+                db.commit()
+            except Exception:
+                # Başka worker aynı anda oluşturdu
+                db.rollback()
+
+    def _try_lease(self, db: Session, job: Job, now: datetime) -> bool:
+        stmt = (
+            update(ScheduledJob)
+            .where(
+                ScheduledJob.name == job.name,
+                ScheduledJob.enabled == True,  # noqa: E712
+                ScheduledJob.next_run_at <= now,
+                or_(ScheduledJob.lease_expires_at.is_(None), ScheduledJob.lease_expires_at < now),
+            )
+            .values(lease_owner=self.owner, lease_expires_at=now + timedelta(seconds=self._lease_s(job)))
+        )
+        won = db.execute(stmt).rowcount == 1
+        db.commit()
+        return won
+
+    def _local_due(self, job: Job, now: datetime) -> bool:
+        """Kirasız (per_worker) iş: bu worker'daki sonraki zaman geldiyse bir sonrakini planlar ve True döner."""
+        if not job.enabled():
+            return False
+        due = self._local_next.setdefault(job.name, job.cron.next_after(now))
+        if due > now:
+            return False
+        self._local_next[job.name] = job.cron.next_after(now)
+        return True
+
+    def _lease_s(self, job: Job) -> float:
+        return job.timeout_s + max(60.0, settings.scheduler_poll_s * 4)
+
+    # --- Çalıştırma ---
+
+    def run_pending(self, now: datetime | None = None) -> list[str]:
+        """Bir tur: vadesi gelen işleri kiralar ve havuza verir, bitenleri kaydeder. Başlatılan iş adlarını döner."""
+        self._reap()
+        started: list[str] = []
+        if self._stop.is_set():
+            return started
+        now = now or datetime.utcnow()
+        with Session(self.engine) as db:
+            self._renew_leases(db, now)
+            for job in self.jobs.values():
+                with self._lock:
+                    if job.name in self._running or len(self._running) >= max(1, settings.scheduler_max_concurrency):
+                        continue
+                if job.per_worker:
+                    if not self._local_due(job, now):
+                        continue
+                elif not self._try_lease(db, job, now):
+                    continue
+                row = None if job.per_worker else db.get(ScheduledJob, job.name)
+                attempt = (row.attempt if row else 0) + 1
+                run = JobRun(job_name=job.name, owner=self.owner, attempt=attempt, started_at=now)
+                db.add(run)
+                db.commit()
+                db.refresh(run)
+                future = self._executor().submit(job.fn)
+                with self._lock:
+                    self._running[job.name] = _Running(job, run.id, attempt, future, time.monotonic())
+                started.append(job.name)
+                log.info("Scheduler: started %s (attempt %d) on %s", job.name, attempt, self.owner)
+        return started
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=max(1, settings.scheduler_max_concurrency), thread_name_prefix="job")
+        return self._pool
+
+    def _renew_leases(self, db: Session, now: datetime) -> None:
+        with self._lock:
+            running = list(self._running.values())
+        for r in running:
+            db.execute(
+                update(ScheduledJob)
+                .where(ScheduledJob.name == r.job.name, ScheduledJob.lease_owner == self.owner)
+                .values(lease_expires_at=now + timedelta(seconds=self._lease_s(r.job)))
+            )
+        if running:
+            db.commit()
+
+    def _reap(self) -> None:
+        """Biten / zaman aşan çalıştırmaları kaydeder ve sonraki zamanı planlar."""
+        with self._lock:
+            running = list(self._running.values())
+        for r in running:
+            elapsed = time.monotonic() - r.started
+            if r.future.done():
+                if r.timed_out:
+                    self._release(r.job)  # sonuç zaten timeout olarak kaydedildi
+                else:
+                    exc = r.future.exception()
+                    if exc is None:
+                        self._finish(r, "success", result=r.future.result())
+                    else:
+                        self._finish(r, "failed", error=f"{type(exc).__name__}: {exc}")
+                with self._lock:
+                    self._running.pop(r.job.name, None)
+            elif not r.timed_out and elapsed > r.job.timeout_s:
+                r.timed_out = True
+                log.warning("Scheduler: %s exceeded timeout %.0fs; lease kept until it returns", r.job.name, r.job.timeout_s)
+                self._finish(r, "timeout", error=f"timeout after {r.job.timeout_s:.0f}s", release=False)
+
+    def _finish(self, r: _Running, status: str, *, result: Any = None, error: str | None = None, release: bool = True) -> None:
+        now = datetime.utcnow()
+        with Session(self.engine) as db:
+            run = db.get(JobRun, r.run_id)
+            if run is not None:
+                run.status = status
+                run.finished_at = now
+                run.duration_ms = int((time.monotonic() - r.started) * 1000)
+                run.result = None if result is None else str(result)[:500]
+                run.error = error[:2000] if error else None
+                db.add(run)
+            row = db.get(ScheduledJob, r.job.name)
+            if row is not None:
+                row.last_run_at, row.last_status = now, status
+                if status == "success" or r.attempt > r.job.retries:
+                    if status != "success":
+                        log.error("Scheduler: %s failed %d time(s); next regular run", r.job.name, r.attempt)
+                    row.attempt = 0
+                    row.next_run_at = r.job.cron.next_after(now)
+                else:
+                    row.attempt = r.attempt
+                    row.next_run_at = now + timedelta(seconds=r.job.retry_backoff_s * 2 ** (r.attempt - 1))
+                    log.warning("Scheduler: %s %s (attempt %d), retry at %s: %s", r.job.name, status, r.attempt, row.next_run_at, error)
+                if release and row.lease_owner == self.owner:
+                    row.lease_owner, row.lease_expires_at = None, None
+                db.add(row)
+            db.commit()
+
+    def _release(self, job: Job) -> None:
+        with Session(self.engine) as db:
+            db.execute(
+                update(ScheduledJob)
+                .where(ScheduledJob.name == job.name, ScheduledJob.lease_owner == self.owner)
+                .values(lease_owner=None, lease_expires_at=None)
+            )
+            db.commit()
+
+    def prune_runs(self, retention_days: float, now: datetime | None = None) -> int:
+        """retention_days'ten eski job_runs kayıtlarını siler; silinen sayıyı döner."""
+        cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+        with Session(self.engine) as db:
+            deleted = db.execute(delete(JobRun).where(JobRun.started_at < cutoff)).rowcount
+            db.commit()
+        return deleted
+
+    def trigger(self, name: str) -> bool:
+        """Admin: işi hemen vadesi gelmiş yap (bir sonraki turda bir worker çalıştırır)."""
+        with Session(self.engine) as db:
+            row = db.get(ScheduledJob, name)
+            if row is None:
+                return False
+            row.next_run_at = datetime.utcnow()
+            db.add(row)
+            db.commit()
+        return True
+
+    # --- Yaşam döngüsü ---
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.sync()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="scheduler")
+        self._thread.start()
+        log.info("Scheduler started (%d job(s), owner=%s)", len(self.jobs), self.owner)
+
+    def _loop(self) -> None:
+        # Worker'lar aynı anda açıldığında turlar dağılsın
+        self._stop.wait(secrets.randbelow(1000) / 1000 * settings.scheduler_poll_s)
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception:
+                log.exception("Scheduler tick failed")
+            self._stop.wait(settings.scheduler_poll_s)
+
+    def shutdown(self, drain_s: float | None = None) -> None:
+        """Yeni iş alma; çalışanları bekle, bitmeyenleri `interrupted` kaydet ve kiralarını bırak."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        deadline = time.monotonic() + (settings.scheduler_drain_s if drain_s is None else drain_s)
+        while time.monotonic() < deadline:
+            with self._lock:
+                pending = [r.future for r in self._running.values() if not r.future.done()]
+            if not pending:
+                break
+            time.sleep(0.05)
+        self._reap()
+        with self._lock:
+            leftovers = list(self._running.values())
+            self._running.clear()
+        for r in leftovers:
+            if not r.timed_out:
+                self._finish(r, "interrupted", error="worker shutdown")
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def reset_after_fork(self) -> None:
+        self.owner = _owner_id()
+        self._running.clear()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pool = None
+        self._local_next.clear()
+
+    def status(self, runs: int = 20) -> dict:
+        """Admin görünümü: işler, kiralar ve son çalıştırmalar."""
+        with Session(self.engine) as db:
+            jobs = db.exec(select(ScheduledJob).order_by(ScheduledJob.name)).all()
+            recent = db.exec(select(JobRun).order_by(JobRun.started_at.desc(), JobRun.id.desc()).limit(runs)).all()
+        iso = lambda d: d.isoformat() if d else None  # noqa: E731
+        return {
+            "owner": self.owner,
+            "jobs": [
+                {
+                    "name": j.name, "cron": j.cron, "enabled": j.enabled, "next_run_at": iso(j.next_run_at),
+                    "lease_owner": j.lease_owner, "lease_expires_at": iso(j.lease_expires_at),
+                    "attempt": j.attempt, "last_run_at": iso(j.last_run_at), "last_status": j.last_status,
+                    "registered": j.name in self.jobs,
+                }
+                for j in jobs
+            ] + [
+                {
+                    "name": j.name, "cron": j.cron.expr, "enabled": bool(j.enabled()),
+                    "next_run_at": iso(self._local_next.get(j.name)), "per_worker": True, "registered": True,
+                }
+                for j in self.jobs.values() if j.per_worker
+            ],
+            "runs": [
+                {
+                    "id": r.id, "job": r.job_name, "owner": r.owner, "attempt": r.attempt, "status": r.status,
+                    "started_at": iso(r.started_at), "finished_at": iso(r.finished_at),
+                    "duration_ms": r.duration_ms, "result": r.result, "error": r.error,
+                }
+                for r in recent
+            ],
+        }
+
+
+scheduler = Scheduler()
+after_fork(scheduler.reset_after_fork)
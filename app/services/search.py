@@ -0,0 +1,421 @@
+"""Analiz metinlerinde tam metin arama.
+
+- SQLite: FTS5 external-content sanal tablo (`analysis_fts`), tetikleyicilerle güncel tutulur;
+  sıralama bm25, vurgulu önizleme snippet() ile yapılır.
+- Postgres: `analysisrecord.search_vector` (tsvector) + GIN indeksi; vektör, kaydın diline
+  göre seçilen metin arama yapılandırmasıyla (turkish, english, german...) tetikleyicide üretilir.
+  Sıralama ts_rank_cd, vurgulu önizleme ts_headline ile yapılır.
+- Diğer durumlarda (FTS5 yok, indeks kurulamadı) LIKE taramasına düşülür.
+
+Vurgular önce kontrol karakterleriyle işaretlenir, metin HTML-escape edildikten sonra <mark>'a çevrilir;
+böylece kullanıcı metnindeki HTML şablona ham olarak sızmaz.
+"""
+from __future__ import annotations
+
+import html
+import logging
+import re
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import Session
+
+log = logging.getLogger(__name__)
+
+FTS_TABLE = "analysis_fts"
+SNIPPET_TOKENS = 16
+MAX_QUERY_TERMS = 8
+
+_HL_START = "\x02"
+_HL_END = "\x03"
+
+# Kayıt dili → Postgres metin arama yapılandırması. Kurulu olmayanlar "simple"a düşer.
+PG_TS_CONFIGS = {
+    "tr": "turkish",
+    "en": "english",
+    "de": "german",
+    "fr": "french",
+    "es": "spanish",
+    "it": "italian",
+    "el": "greek",
+    "ar": "arabic",
+    "hi": "hindi",
+    "sr": "serbian",
+}
+PG_DEFAULT_CONFIG = "simple"
+
+# SQLite'ta kök bulma yok (unicode61 yalnızca küçük harf + aksan temizliği yapar).
+# Sorgu tarafında yaygın çekim eklerini kırpıp önek araması yapılır: "kolesterolü" → "kolesterol*".
+# Her dilde ilk eşleşen ek kırpılır; listeler uzundan kısaya sıralıdır.
+_QUERY_SUFFIXES = {
+    "tr": (
+        "lerinin", "larının", "lerini", "larını", "leri", "ları", "inde", "ında", "unda", "ünde",
+        "ler", "lar", "nin", "nın", "nun", "nün", "nde", "nda", "dir", "dır", "dur", "dür",
+        "ine", "ına", "ini", "ını", "de", "da", "te", "ta", "in", "ın", "un", "ün", "yi", "yı", "yu", "yü",
+        "i", "ı", "u", "ü", "e", "a",
+    ),
+    "en": ("ations", "ation", "ing", "ies", "es", "ed", "s"),
+    "de": ("ungen", "ung", "en", "er", "es", "e", "n", "s"),
+    "fr": ("ements", "ement", "es", "s", "e"),
+    "es": ("ciones", "ción", "es", "os", "as", "s"),
+    "it": ("zioni", "zione", "i", "e", "o", "a"),
+}
+_MIN_STEM_LEN = 4
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+_fts_ready: dict[str, bool] = {}
+# Postgres'te kurulu (PG_TS_CONFIGS ∩ pg_ts_config) yapılandırmalar; ensure_search_index doldurur
+_pg_configs: list[str] = []
+
+
+@dataclass
+class SearchHit:
+    analysis_id: int
+    rank: float
+    snippet: str
+
+
+def _dialect(bind) -> str:
+    return bind.dialect.name if bind is not None else ""
+
+
+def fts_available(bind) -> bool:
+    """ensure_search_index başarıyla çalıştıysa True (dialect bazında)."""
+    return _fts_ready.get(_dialect(bind), False)
+
+
+# --- Şema -------------------------------------------------------------------------
+
+
+def _ensure_sqlite(conn) -> None:
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type='table' AND name=:n"), {"n": FTS_TABLE}
+    ).first()
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "input_text, result_text, content='analysisrecord', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS analysisrecord_fts_ai AFTER INSERT ON analysisrecord BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, input_text, result_text) VALUES (new.id, new.input_text, new.result_text); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS analysisrecord_fts_ad AFTER DELETE ON analysisrecord BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, input_text, result_text) "
+        "VALUES ('delete', old.id, old.input_text, old.result_text); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS analysisrecord_fts_au AFTER UPDATE OF input_text, result_text ON analysisrecord BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, input_text, result_text) "
+        "VALUES ('delete', old.id, old.input_text, old.result_text); "
+        f"INSERT INTO {FTS_TABLE}(rowid, input_text, result_text) VALUES (new.id, new.input_text, new.result_text); END"
+    ))
+    if not exists:
+        # İlk kurulum: mevcut kayıtları indeksle
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def _pg_config_case(available: set[str]) -> str:
+    parts = [
+        f"WHEN '{lang}' THEN '{cfg}'"
+        for lang, cfg in PG_TS_CONFIGS.items()
+        if cfg in available
+    ]
+    return f"CASE lower(coalesce(NEW.lang, '')) {' '.join(parts)} ELSE '{PG_DEFAULT_CONFIG}' END"
+
+
+def _ensure_postgres(conn) -> None:
+    available = {r[0] for r in conn.execute(text("SELECT cfgname FROM pg_ts_config")).all()}
+    _pg_configs[:] = sorted({cfg for cfg in PG_TS_CONFIGS.values() if cfg in available})
+    conn.execute(text("ALTER TABLE analysisrecord ADD COLUMN IF NOT EXISTS search_config regconfig"))
+    conn.execute(text("ALTER TABLE analysisrecord ADD COLUMN IF NOT EXISTS search_vector tsvector"))
+    # Sonuç metni (A) girdiden (B) ağır basar; yapılandırma satırda saklanır ki sorgu aynı kökleri üretsin
+    conn.execute(text(
+        "CREATE OR REPLACE FUNCTION analysisrecord_search_update() RETURNS trigger AS $$ "
+        "BEGIN "
+        f"NEW.search_config := ({_pg_config_case(available)})::regconfig; "
+        "NEW.search_vector := "
+        "setweight(to_tsvector(NEW.search_config, coalesce(NEW.result_text, '')), 'A') || "
+        "setweight(to_tsvector(NEW.search_config, coalesce(NEW.input_text, '')), 'B'); "
+        "RETURN NEW; "
+        "END $$ LANGUAGE plpgsql"
+    ))
+    conn.execute(text("DROP TRIGGER IF EXISTS analysisrecord_search_tg ON analysisrecord"))
+    conn.execute(text(
+        "CREATE TRIGGER analysisrecord_search_tg BEFORE INSERT OR UPDATE OF input_text, result_text, lang "
+        "ON analysisrecord FOR EACH ROW EXECUTE FUNCTION analysisrecord_search_update()"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_analysisrecord_search_vector ON analysisrecord USING GIN (search_vector)"
+    ))
+    # Geri doldurma: tetikleyici UPDATE OF result_text ile çalışır
+    conn.execute(text("UPDATE analysisrecord SET result_text = result_text WHERE search_vector IS NULL"))
+
+
+def _ensure(conn, dialect: str) -> None:
+    if dialect == "sqlite":
+        _ensure_sqlite(conn)
+    else:
+        _ensure_postgres(conn)
+
+
+def ensure_search_index(bind: Engine | Connection) -> bool:
+    """FTS şemasını (sanal tablo / tsvector sütunu, tetikleyiciler, indeks) idempotent kurar.
+
+    Engine verilirse kendi transaction'ında; Connection verilirse (Alembic) savepoint içinde çalışır.
+    """
+    dialect = bind.dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        _fts_ready[dialect] = False
+        return False
+    try:
+        if isinstance(bind, Engine):
+            with bind.begin() as conn:
+                _ensure(conn, dialect)
+        else:
+            with bind.begin_nested():
+                _ensure(bind, dialect)
+        _fts_ready[dialect] = True
+    except Exception as e:
+        log.warning("Full-text search index unavailable (%s), falling back to LIKE: %s", dialect, e)
+        _fts_ready[dialect] = False
+    return _fts_ready[dialect]
+
+
+def detect_search_index(engine: Engine) -> bool:
+    """DDL çalıştırmadan FTS şemasının kurulu olup olmadığını okur (şema güncelken worker açılışı)."""
+    dialect = engine.dialect.name
+    try:
+        with engine.connect() as conn:
+            if dialect == "sqlite":
+                ready = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type='table' AND name=:n"), {"n": FTS_TABLE}
+                ).first() is not None
+            elif dialect == "postgresql":
+                ready = conn.execute(text(
+                    "SELECT 1 FROM information_schema.columns "
+                    "WHERE table_name = 'analysisrecord' AND column_name = 'search_vector'"
+                )).first() is not None
+                available = {r[0] for r in conn.execute(text("SELECT cfgname FROM pg_ts_config")).all()}
+                _pg_configs[:] = sorted({cfg for cfg in PG_TS_CONFIGS.values() if cfg in available})
+            else:
+                ready = False
+    except Exception as e:
+        log.warning("Full-text search index check failed (%s): %s", dialect, e)
+        ready = False
+    _fts_ready[dialect] = ready
+    return ready
+
+
+# --- Sorgu ------------------------------------------------------------------------
+
+
+def query_terms(q: str) -> list[str]:
+    """Sorgudan kelimeleri çıkarır (operatör/karakter enjeksiyonu yok, en fazla MAX_QUERY_TERMS)."""
+    # "İ".lower() birleşik nokta üretir ve kelimeyi böler; önce düz "i"ye çevrilir
+    return [t.lower() for t in _TERM_RE.findall((q or "").replace("İ", "i"))][:MAX_QUERY_TERMS]
+
+
+def stem_term(term: str, lang: str | None = None) -> str:
+    """Yaygın çekim eklerini kırpar; kök MIN_STEM_LEN'den kısa kalacaksa kelimeye dokunmaz."""
+    langs = [lang] if lang in _QUERY_SUFFIXES else list(_QUERY_SUFFIXES)
+    best = term
+    for code in langs:
+        for suffix in _QUERY_SUFFIXES[code]:
+            if term.endswith(suffix) and len(term) - len(suffix) >= _MIN_STEM_LEN:
+                cand = term[: -len(suffix)]
+                if len(cand) < len(best):
+                    best = cand
+                break
+    return best
+
+
+def build_fts5_query(q: str, lang: str | None = None) -> str:
+    """Kullanıcı girdisini güvenli bir FTS5 MATCH ifadesine çevirir (AND'lenmiş önek terimleri)."""
+    parts = []
+    for term in query_terms(q):
+        stem = stem_term(term, lang)
+        parts.append(f'"{stem}"*' if len(stem) >= 2 else f'"{stem}"')
+    return " ".join(parts)
+
+
+def render_snippet(raw: str | None) -> str:
+    """İşaretli önizlemeyi HTML-güvenli <mark> vurgulu metne çevirir."""
+    escaped = html.escape(raw or "")
+    return escaped.replace(_HL_START, "<mark>").replace(_HL_END, "</mark>")
+
+
+def _like_snippet(body: str, terms: list[str], width: int = 160) -> str:
+    lower = body.lower()
+    pos = -1
+    for t in terms:
+        pos = lower.find(t)
+        if pos >= 0:
+            break
+    start = max(0, pos - width // 3) if pos >= 0 else 0
+    chunk = body[start:start + width]
+    marked = chunk
+    for t in terms:
+        marked = re.sub(re.escape(t), lambda m: f"{_HL_START}{m.group(0)}{_HL_END}", marked, flags=re.IGNORECASE)
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if start + width < len(body) else ""
+    return prefix + render_snippet(marked) + suffix
+
+
+def _filters_sql(
+    params: dict,
+    *,
+    user_id: int | None = None,
+    user_ids: list[int] | None = None,
+    source: str | None = None,
+    favorite_only: bool = False,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+) -> str:
+    """Ek WHERE koşulları (" AND ..." ile başlar); değerler params'a bağlanır."""
+    clauses = []
+    if user_id is not None:
+        clauses.append("a.user_id = :user_id")
+        params["user_id"] = user_id
+    if user_ids is not None:
+        if not user_ids:
+            clauses.append("1 = 0")
+        else:
+            names = []
+            for i, v in enumerate(user_ids):
+                params[f"uid{i}"] = v
+                names.append(f":uid{i}")
+            clauses.append(f"a.user_id IN ({', '.join(names)})")
+    if source:
+        clauses.append("a.source = :source")
+        params["source"] = source
+    if favorite_only:
+        clauses.append("a.is_favorite = :fav")
+        params["fav"] = True
+    if created_from is not None:
+        clauses.append("a.created_at >= :created_from")
+        params["created_from"] = created_from
+    if created_to is not None:
+        clauses.append("a.created_at <= :created_to")
+        params["created_to"] = created_to
+    return "".join(f" AND {c}" for c in clauses)
+
+
+def _search_sqlite(db, q: str, lang: str | None, where: str, params: dict) -> list[SearchHit]:
+    match = build_fts5_query(q, lang)
+    if not match:
+        return []
+    params["match"] = match
+    # bm25: küçük değer = daha alakalı; result_text sütunu girdiden 2 kat ağır
+    sql = text(
+        f"SELECT a.id, bm25({FTS_TABLE}, 1.0, 2.0) AS rank, "
+        f"snippet({FTS_TABLE}, -1, '{_HL_START}', '{_HL_END}', '…', {SNIPPET_TOKENS}) AS snip "
+        f"FROM {FTS_TABLE} JOIN analysisrecord a ON a.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH :match{where} "
+        "ORDER BY rank, a.id DESC LIMIT :limit OFFSET :offset"
+    )
+    return [SearchHit(int(r[0]), -float(r[1]), render_snippet(r[2])) for r in db.execute(sql, params).all()]
+
+
+def _pg_tsquery_sql(lang: str | None) -> str:
+    """Sabit tsquery ifadesi (GIN indeksi kullanılabilsin diye satıra bağlı değil).
+
+    Dil ipucu varsa o yapılandırma + 'simple'; yoksa kurulu tüm dillerin kökleri OR'lanır.
+    Yapılandırma adları sabit tablodan gelir, kullanıcı girdisi yalnızca :q parametresidir.
+    """
+    cfg = PG_TS_CONFIGS.get((lang or "").lower())
+    configs = [cfg] if cfg in _pg_configs else list(_pg_configs)
+    parts = [f"websearch_to_tsquery('{c}', :q)" for c in configs] + ["websearch_to_tsquery('simple', :q)"]
+    return "(" + " || ".join(parts) + ")"
+
+
+def _search_postgres(db, q: str, lang: str | None, where: str, params: dict) -> list[SearchHit]:
+    terms = query_terms(q)
+    if not terms:
+        return []
+    tsq = _pg_tsquery_sql(lang)
+    params["q"] = " ".join(terms)
+    headline_opts = f"StartSel={_HL_START}, StopSel={_HL_END}, MaxWords=24, MinWords=8, MaxFragments=2, FragmentDelimiter=\" … \""
+    # ts_headline pahalı: yalnızca sayfadaki satırlar için (dış sorguda) hesaplanır
+    sql = text(
+        "WITH hits AS ("
+        f" SELECT a.id, a.search_config, ts_rank_cd(a.search_vector, {tsq}) AS rank, {tsq} AS tsq"
+        f" FROM analysisrecord a WHERE a.search_vector @@ {tsq}{where}"
+        " ORDER BY rank DESC, a.id DESC LIMIT :limit OFFSET :offset"
+        ") SELECT h.id, h.rank, "
+        f"ts_headline(h.search_config, a.result_text, h.tsq, '{headline_opts}') "
+        "FROM hits h JOIN analysisrecord a ON a.id = h.id ORDER BY h.rank DESC, h.id DESC"
+    )
+    return [SearchHit(int(r[0]), float(r[1]), render_snippet(r[2])) for r in db.execute(sql, params).all()]
+
+
+def _search_like(db, q: str, where: str, params: dict) -> list[SearchHit]:
+    terms = query_terms(q)
+    if not terms:
+        return []
+    conds = []
+    for i, t in enumerate(terms):
+        params[f"t{i}"] = f"%{t}%"
+        conds.append(f"(lower(a.input_text) LIKE :t{i} OR lower(a.result_text) LIKE :t{i})")
+    sql = text(
+        f"SELECT a.id, a.result_text, a.input_text FROM analysisrecord a WHERE {' AND '.join(conds)}{where} "
+        "ORDER BY a.created_at DESC, a.id DESC LIMIT :limit OFFSET :offset"
+    )
+    hits = []
+    for r in db.execute(sql, params).all():
+        body = r[1] or ""
+        if not any(t in body.lower() for t in terms):
+            body = r[2] or ""
+        hits.append(SearchHit(int(r[0]), 0.0, _like_snippet(body, terms)))
+    return hits
+
+
+def search_analyses(
+    db: Session,
+    q: str,
+    *,
+    lang: str | None = None,
+    limit: int = 50,
+    offset: int = 0,
+    **filters,
+) -> list[SearchHit]:
+    """Analiz kayıtlarında tam metin arama; alaka sırasına göre (id, rank, vurgulu önizleme) döner.
+
+    filters: user_id, user_ids, source, favorite_only, created_from, created_to (bkz. _filters_sql).
+    lang: sorgu dili ipucu (kök bulma için); verilmezse tüm desteklenen dillerin ekleri/kökleri denenir.
+    """
+    params = {"limit": limit, "offset": offset}
+    where = _filters_sql(params, **filters)
+    bind = db.get_bind()
+    dialect = _dialect(bind)
+    if fts_available(bind):
+        try:
+            if dialect == "sqlite":
+                return _search_sqlite(db, q, lang, where, dict(params))
+            if dialect == "postgresql":
+                return _search_postgres(db, q, lang, where, dict(params))
+        except Exception as e:
+            log.warning("Full-text search failed, falling back to LIKE: %s", e)
+            db.rollback()
+    return _search_like(db, q, where, dict(params))
+
+
+def user_ids_by_email_prefix(db: Session, q: str, limit: int = 500) -> list[int]:
+    """E-posta önekiyle kullanıcı arar; `contains` yerine indeksli aralık taraması (email >= q AND email < q+U+FFFF).
+
+    E-postalar kayıtta küçültülmediğinden yazıldığı hali ve küçük harf hali ayrı aralıklar olarak denenir.
+    """
+    from sqlalchemy import and_, or_, select as sa_select
+
+    from app.models.user import User
+
+    q = (q or "").strip()
+    if not q:
+        return []
+    ranges = [and_(User.email >= p, User.email < p + "\uffff") for p in {q, q.lower()}]
+    stmt = sa_select(User.id).where(or_(*ranges)).limit(limit)
+    return [r[0] for r in db.execute(stmt).all()]
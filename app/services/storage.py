@@ -1,10 +1,14 @@
 """
 MinIO (S3 uyumlu) object storage: PDF raporları yüklenir, presigned URL ile indirme.
+
+Yüklemeler resilience.upstream("minio") üzerinden: ağ hatasında bütçeli tekrar (put_object aynı
+nesne adına idempotent), depolama kesintisinde devre açıkken beklemeden None.
 """
 import io
 from datetime import timedelta
 
 from app.core.config import settings
+from app.services.resilience import POLICIES, upstream
 
 _MINIO_CLIENT = None
 
@@ -17,6 +21,7 @@ def _minio_client():
     if not (settings.minio_endpoint and settings.minio_access_key and settings.minio_secret_key):
         return None
     try:
+        import urllib3
         from minio import Minio
 
         endpoint = (settings.minio_endpoint or "").strip()
@@ -28,12 +33,36 @@ def _minio_client():
             access_key=settings.minio_access_key,
             secret_key=settings.minio_secret_key,
             secure=settings.minio_secure,
+            # Varsayılan istemci yanıtı sınırsız bekler; tekrarlar resilience katmanında
+            http_client=urllib3.PoolManager(
+                timeout=urllib3.Timeout(connect=5, read=POLICIES["minio"].max_timeout),
+                retries=False,
+                maxsize=10,
+            ),
         )
         return _MINIO_CLIENT
     except Exception:
         return None
 
 
+def _put_object(client, bucket: str, object_name: str, data, length: int, content_type: str) -> bool:
+    """put_object'i devre/tekrar ile yapar; her denemede akış başa sarılır. Başarısızsa False."""
+    import urllib3
+
+    def _put(timeout: float) -> None:
+        # Okuma zaman aşımı istemcide sabit (POLICIES["minio"].max_timeout)
+        data.seek(0)
+        client.put_object(bucket, object_name, data, length=length, content_type=content_type)
+
+    try:
+        upstream("minio").call(
+            _put, failure_on=(OSError, urllib3.exceptions.HTTPError), retry_on=(OSError, urllib3.exceptions.HTTPError)
+        )
+        return True
+    except Exception:
+        return False
+
+
 def ensure_bucket(client, bucket: str) -> None:
     """Bucket yoksa oluşturur."""
     try:
@@ -61,18 +90,11 @@ def upload_report_pdf(
     bucket = (settings.minio_bucket or "norya-pdf").strip()
     if not bucket:
         return None
+    if upstream("minio").is_open():
+        return None
     ensure_bucket(client, bucket)
     object_name = f"reports/{analysis_id}/{filename}"
-    data = io.BytesIO(pdf_bytes)
-    try:
-        client.put_object(
-            bucket,
-            object_name,
-            data,
-            length=len(pdf_bytes),
-            content_type="application/pdf",
-        )
-    except Exception:
+    if not _put_object(client, bucket, object_name, io.BytesIO(pdf_bytes), len(pdf_bytes), "application/pdf"):
         return None
     try:
         from minio.helpers import HTTPQueryDict
@@ -90,3 +112,104 @@ def upload_report_pdf(
         return url
     except Exception:
         return None
+
+
+def _presigned_download(client, bucket: str, object_name: str, filename: str, expiry_seconds: int) -> str | None:
+    try:
+        from minio.helpers import HTTPQueryDict
+
+        return client.get_presigned_url(
+            "GET",
+            bucket_name=bucket,
+            object_name=object_name,
+            expires=timedelta(seconds=expiry_seconds),
+            extra_query_params=HTTPQueryDict(
+                {"response-content-disposition": f'attachment; filename="{filename}"'}
+            ),
+        )
+    except Exception:
+        return None
+
+
+def export_storage_available() -> bool:
+    """Büyük dışa aktarımlar için object storage yapılandırılmış mı?"""
+    return _minio_client() is not None and bool((settings.minio_bucket or "").strip())
+
+
+def upload_export_file(
+    object_name: str,
+    fileobj,
+    length: int,
+    content_type: str,
+    filename: str,
+    presigned_expiry_seconds: int = 24 * 3600,
+) -> str | None:
+    """
+    Diskteki dışa aktarım dosyasını (seek(0) yapılmış) MinIO'ya akıtarak yükler, presigned URL döner.
+    put_object dosyayı part_size parçalarla okur; dosya belleğe alınmaz.
+    """
+    client = _minio_client()
+    if not client:
+        return None
+    bucket = (settings.minio_bucket or "").strip()
+    if not bucket:
+        return None
+    if upstream("minio").is_open():
+        return None
+    ensure_bucket(client, bucket)
+    if not _put_object(client, bucket, object_name, fileobj, length, content_type):
+        return None
+    return _presigned_download(client, bucket, object_name, filename, presigned_expiry_seconds)
+
+
+def put_small_object(object_name: str, data: bytes, content_type: str = "application/json") -> bool:
+    """Küçük durum/işaret nesnesi yazar (ör. dışa aktarım hata kaydı)."""
+    client = _minio_client()
+    bucket = (settings.minio_bucket or "").strip()
+    if not client or not bucket:
+        return False
+    ensure_bucket(client, bucket)
+    try:
+        client.put_object(bucket, object_name, io.BytesIO(data), length=len(data), content_type=content_type)
+        return True
+    except Exception:
+        return False
+
+
+def get_small_object(object_name: str) -> bytes | None:
+    """Küçük durum/işaret nesnesini okur (yoksa veya storage erişilemezse None)."""
+    client = _minio_client()
+    bucket = (settings.minio_bucket or "").strip()
+    if not client or not bucket:
+        return None
+    resp = None
+    try:
+        resp = client.get_object(bucket, object_name)
+        return resp.read()
+    except Exception:
+        return None
+    finally:
+        if resp is not None:
+            resp.close()
+            resp.release_conn()
+
+
+def object_exists(object_name: str) -> bool:
+    client = _minio_client()
+    bucket = (settings.minio_bucket or "").strip()
+    if not client or not bucket:
+        return False
+    try:
+        client.stat_object(bucket, object_name)
+        return True
+    except Exception:
+        return False
+
+
+def presigned_download_url(object_name: str, filename: str, presigned_expiry_seconds: int = 3600) -> str | None:
+    """Var olan bir nesne için indirme URL'si (yoksa None)."""
+    client = _minio_client()
+    bucket = (settings.minio_bucket or "").strip()
+    if not client or not bucket or not object_exists(object_name):
+        return None
+    return _presigned_download(client, bucket, object_name, filename, presigned_expiry_seconds)
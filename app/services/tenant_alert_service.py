@@ -3,8 +3,12 @@
 Sends email notifications when a tenant's wallet balance falls below the threshold.
 """
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from html import escape
 
+from sqlalchemy import or_, update
 from sqlmodel import Session, select
 
 from app.models.institution import Institution
@@ -13,70 +17,121 @@ from app.core.config import settings
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class LowBalanceAlert:
+    """Plain copy of the fields an alert email needs; safe to hand to pool threads (no Session access)."""
+
+    institution_id: int
+    name: str
+    tenant_slug: str | None
+    contact_email: str
+    balance: int
+    threshold: int
+    cost_per_analysis: int
+
+    @classmethod
+    def from_institution(cls, inst: Institution) -> "LowBalanceAlert":
+        return cls(
+            institution_id=inst.id,
+            name=inst.name,
+            tenant_slug=inst.tenant_slug,
+            contact_email=inst.contact_email,
+            balance=inst.billing_wallet_balance,
+            threshold=inst.wallet_low_threshold,
+            cost_per_analysis=inst.cost_per_analysis,
+        )
+
+
 def check_and_send_low_balance_alerts(session: Session) -> list[dict]:
     """Check all active tenants for low balance and send email alerts.
 
+    Candidates come from the (is_active, billing_wallet_balance) index. Each tenant is
+    claimed with a conditional UPDATE of wallet_last_alert before its email is sent, so
+    a rerun never alerts twice within 24 hours; emails go out on a bounded pool and a
+    failed send restores the previous timestamp.
+
     Returns list of alerts that were sent.
     """
+    now = datetime.utcnow()
+    cutoff = now - timedelta(hours=24)
     stmt = select(Institution).where(
         Institution.is_active == True,
         Institution.status == "active",
         Institution.billing_wallet_balance <= Institution.wallet_low_threshold,
         Institution.alert_email_enabled == True,
         Institution.contact_email.isnot(None),
+        # Avoid spamming - only alert if last alert was > 24 hours ago
+        or_(Institution.wallet_last_alert.is_(None), Institution.wallet_last_alert < cutoff),
     )
     institutions = session.exec(stmt).all()
 
-    alerts_sent = []
+    claimed = []
     for inst in institutions:
-        # Avoid spamming - only alert if last alert was > 24 hours ago
-        if inst.wallet_last_alert:
-            time_since_last = datetime.utcnow() - inst.wallet_last_alert
-            if time_since_last < timedelta(hours=24):
-                continue
-
-        # Send email alert
-        success = _send_low_balance_email(inst)
-        if success:
-            inst.wallet_last_alert = datetime.utcnow()
-            session.add(inst)
-            alerts_sent.append({
-                "institution_id": inst.id,
-                "name": inst.name,
-                "tenant_slug": inst.tenant_slug,
-                "contact_email": inst.contact_email,
-                "balance": inst.billing_wallet_balance,
-                "threshold": inst.wallet_low_threshold,
-            })
-
-    if alerts_sent:
-        session.commit()
+        previous = inst.wallet_last_alert
+        won = session.execute(
+            update(Institution)
+            .where(
+                Institution.id == inst.id,
+                or_(Institution.wallet_last_alert.is_(None), Institution.wallet_last_alert < cutoff),
+            )
+            .values(wallet_last_alert=now)
+        ).rowcount == 1
+        if won:
+            # Copied before commit: commit expires the instances, and pool threads must not lazy-load through the Session
+            claimed.append((LowBalanceAlert.from_institution(inst), previous))
+    session.commit()
+    if not claimed:
+        return []
+
+    workers = max(1, min(settings.billing_job_concurrency, len(claimed)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="low-balance") as pool:
+        results = list(pool.map(lambda c: _send_low_balance_email(c[0]), claimed))
+
+    alerts_sent = []
+    for (alert, previous), success in zip(claimed, results):
+        if not success:
+            # Release the claim so the next run retries this tenant
+            session.execute(
+                update(Institution)
+                .where(Institution.id == alert.institution_id, Institution.wallet_last_alert == now)
+                .values(wallet_last_alert=previous)
+            )
+            continue
+        alerts_sent.append({
+            "institution_id": alert.institution_id,
+            "name": alert.name,
+            "tenant_slug": alert.tenant_slug,
+            "contact_email": alert.contact_email,
+            "balance": alert.balance,
+            "threshold": alert.threshold,
+        })
+    session.commit()
 
     return alerts_sent
 
 
-def _send_low_balance_email(institution: Institution) -> bool:
+def _send_low_balance_email(alert: LowBalanceAlert) -> bool:
     """Send low balance alert email to institution contact."""
     try:
-        from app.services.email_service import send_email
+        from app.services.email_sender import send_email
 
-        balance_formatted = f"${institution.billing_wallet_balance / 100:.2f}"
-        threshold_formatted = f"${institution.wallet_low_threshold / 100:.2f}"
+        balance_formatted = f"${alert.balance / 100:.2f}"
+        threshold_formatted = f"${alert.threshold / 100:.2f}"
 
-        subject = f"[NoryaAI] Düşük Bakiye Uyarısı - {institution.name}"
+        subject = f"[NoryaAI] Düşük Bakiye Uyarısı - {alert.name}"
         body = f"""
-Sayın {institution.name} Yetkilisi,
+Sayın {alert.name} Yetkilisi,
 
 Hesabınızın bakiyesi düşük seviyeye ulaşmıştır.
 
 Mevcut Bakiye: {balance_formatted}
 Uyarı Eşiği: {threshold_formatted}
-Analiz Başına Maliyet: ${institution.cost_per_analysis / 100:.2f}
-Kalan Analiz Hakkı: {institution.billing_wallet_balance // institution.cost_per_analysis if institution.cost_per_analysis > 0 else 0}
+Analiz Başına Maliyet: ${alert.cost_per_analysis / 100:.2f}
+Kalan Analiz Hakkı: {alert.balance // alert.cost_per_analysis if alert.cost_per_analysis > 0 else 0}
 
 Lütfen hesabınıza kredi yükleyerek analiz hizmetinizin kesintisiz devam etmesini sağlayın.
 
-Portal: https://noryaai.com/hastane/{institution.tenant_slug}/billing
+Portal: https://noryaai.com/hastane/{alert.tenant_slug}/billing
 
 Bu bir otomatik mesajdır. Lütfen yanıtlamayın.
 
@@ -84,27 +139,29 @@ Saygılarımızla,
 NoryaAI Ekibi
         """.strip()
 
-        send_email(
-            to_email=institution.contact_email,
+        sent = send_email(
+            to=alert.contact_email,
             subject=subject,
-            body=body,
+            html_body=escape(body).replace("\n", "<br>\n"),
         )
+        if not sent:
+            return False
 
         logger.info(
-            f"Low balance alert sent to {institution.contact_email} "
-            f"for institution {institution.name} (balance: {balance_formatted})"
+            f"Low balance alert sent to {alert.contact_email} "
+            f"for institution {alert.name} (balance: {balance_formatted})"
         )
         return True
 
     except ImportError:
         # email_service not available, log warning
         logger.warning(
-            f"Low balance alert for {institution.name} - email service not configured. "
-            f"Balance: ${institution.billing_wallet_balance / 100:.2f}"
+            f"Low balance alert for {alert.name} - email service not configured. "
+            f"Balance: ${alert.balance / 100:.2f}"
         )
         return False
     except Exception as e:
-        logger.error(f"Failed to send low balance alert to {institution.contact_email}: {e}")
+        logger.error(f"Failed to send low balance alert to {alert.contact_email}: {e}")
         return False
 
 
@@ -119,4 +176,4 @@ def send_manual_low_balance_alert(
     if not inst:
         return False
 
-    return _send_low_balance_email(inst)
+    return _send_low_balance_email(LowBalanceAlert.from_institution(inst))
@@ -1,6 +1,7 @@
 """Tenant audit logging service.
 
 Records all tenant-scoped activities for KVKK/GDPR compliance and internal auditing.
+Each logged action also bumps the tenant's daily rollup counters (app.services.tenant_rollups).
 """
 import json
 import logging
@@ -8,7 +9,9 @@ from datetime import datetime
 
 from sqlmodel import Session, select
 
+from app.core.pagination import Page, keyset_page
 from app.models.tenant_audit_log import TenantAuditLog
+from app.services.tenant_rollups import period_start, prefixed, read_rollups, summarize
 
 logger = logging.getLogger(__name__)
 
@@ -64,14 +67,15 @@ def get_tenant_audit_logs(
     session: Session,
     institution_id: int,
     limit: int = 100,
+    cursor: str | None = None,
     offset: int = 0,
     action: str | None = None,
     user_id: int | None = None,
     entity_type: str | None = None,
     date_from: datetime | None = None,
     date_to: datetime | None = None,
-) -> list[TenantAuditLog]:
-    """Get audit logs for a tenant with optional filters."""
+) -> Page:
+    """Get a keyset page of audit logs for a tenant with optional filters (newest first)."""
     stmt = select(TenantAuditLog).where(
         TenantAuditLog.institution_id == institution_id
     )
@@ -87,8 +91,9 @@ def get_tenant_audit_logs(
     if date_to:
         stmt = stmt.where(TenantAuditLog.created_at <= date_to)
 
-    stmt = stmt.order_by(TenantAuditLog.created_at.desc()).offset(offset).limit(limit)
-    return list(session.exec(stmt).all())
+    return keyset_page(
+        session, stmt, ts_col=TenantAuditLog.created_at, id_col=TenantAuditLog.id, cursor=cursor, limit=limit, offset=offset,
+    )
 
 
 def get_tenant_audit_stats(
@@ -96,27 +101,13 @@ def get_tenant_audit_stats(
     institution_id: int,
     days: int = 30,
 ) -> dict:
-    """Get audit log statistics for a tenant."""
-    from datetime import timedelta
-
-    cutoff = datetime.utcnow() - timedelta(days=days)
-
-    stmt = select(TenantAuditLog).where(
-        TenantAuditLog.institution_id == institution_id,
-        TenantAuditLog.created_at >= cutoff,
-    )
-    logs = session.exec(stmt).all()
-
-    action_counts = {}
-    user_counts = {}
-    for log in logs:
-        action_counts[log.action] = action_counts.get(log.action, 0) + 1
-        if log.user_id:
-            user_counts[log.user_id] = user_counts.get(log.user_id, 0) + 1
+    """Get audit log statistics for a tenant (read from the daily rollups, not the log)."""
+    period, _, _ = summarize(read_rollups(session, institution_id, period_start(days)))
+    user_counts = {int(uid): count for uid, count in prefixed(period, "user:").items()}
 
     return {
-        "total_actions": len(logs),
-        "action_counts": action_counts,
+        "total_actions": period.get("actions", 0),
+        "action_counts": prefixed(period, "action:"),
         "unique_users": len(user_counts),
         "user_counts": user_counts,
         "period_days": days,
@@ -0,0 +1,251 @@
+"""Per-tenant daily rollup counters.
+
+Tenant dashboards read pre-aggregated counters from ``tenant_daily_stats`` instead of
+counting raw cases, audit logs and wallet transactions, so their cost depends on the
+number of days (and active users) shown, not on how much work a hospital records.
+
+Counters are bumped by mapper events in the same transaction as the row that caused
+them (ORM inserts only; bulk Core inserts must call :func:`rebuild_tenant_rollups`):
+
+- ``analyses``: AnalysisRecord rows with an institution
+- ``cases`` / ``reports``: EnterpriseCase / EnterpriseReport rows
+- ``credits_spent`` / ``credits_loaded``: TenantWalletTransaction amounts (cents)
+- ``actions``, ``action:<name>``, ``user:<id>``: TenantAuditLog rows
+- On ``TOTALS_DAY``: all-time ``cases`` and ``status:<status>`` (kept in step with case
+  status changes and deletes)
+
+Counter rows are locked in (day, metric) order within a bump, so concurrent writers do not
+deadlock on them. Every case insert, status change and delete of a tenant updates its
+``TOTALS_DAY``/``cases`` or ``status:*`` rows, so those writes serialize per tenant until
+commit; keep case transactions short.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, event, func, or_, select, update
+from sqlalchemy import inspect as sa_inspect
+from sqlmodel import Session
+
+from app.models.analysis import AnalysisRecord
+from app.models.enterprise_case import EnterpriseCase, EnterpriseReport
+from app.models.tenant_audit_log import TenantAuditLog
+from app.models.tenant_daily_stat import TenantDailyStat
+from app.models.tenant_wallet_transaction import TenantWalletTransaction
+
+logger = logging.getLogger(__name__)
+
+# All-time counters live on a fixed sentinel day so one range scan returns them with the period
+TOTALS_DAY = date(1970, 1, 1)
+
+_table = TenantDailyStat.__table__
+
+
+def _day(ts: datetime | None) -> date:
+    return (ts or datetime.utcnow()).date()
+
+
+def bump(connection, institution_id: int, day: date, deltas: dict[str, int]) -> None:
+    """Add ``deltas`` to the tenant's counters for ``day`` (UPSERT where supported)."""
+    deltas = {metric: value for metric, value in deltas.items() if value}
+    if not deltas or institution_id is None:
+        return
+    # Sorted so every transaction takes the row locks in the same order
+    rows = [{"institution_id": institution_id, "day": day, "metric": m, "value": deltas[m]} for m in sorted(deltas)]
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(_table).values(rows)
+        connection.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["institution_id", "day", "metric"],
+                set_={"value": _table.c.value + stmt.excluded.value},
+            )
+        )
+        return
+    for row in rows:
+        result = connection.execute(
+            update(_table)
+            .where(
+                _table.c.institution_id == row["institution_id"],
+                _table.c.day == row["day"],
+                _table.c.metric == row["metric"],
+            )
+            .values(value=_table.c.value + row["value"])
+        )
+        if result.rowcount == 0:
+            connection.execute(_table.insert().values(**row))
+
+
+# --- Incremental updates ---
+
+
+@event.listens_for(AnalysisRecord, "after_insert")
+def _on_analysis(mapper, connection, target):
+    if target.institution_id:
+        bump(connection, target.institution_id, _day(target.created_at), {"analyses": 1})
+
+
+@event.listens_for(EnterpriseCase, "after_insert")
+def _on_case_insert(mapper, connection, target):
+    bump(connection, target.institution_id, _day(target.created_at), {"cases": 1})
+    bump(connection, target.institution_id, TOTALS_DAY, {"cases": 1, f"status:{target.status}": 1})
+
+
+@event.listens_for(EnterpriseCase, "after_update")
+def _on_case_update(mapper, connection, target):
+    history = sa_inspect(target).attrs.status.history
+    if not history.has_changes() or not history.deleted:
+        return
+    old, new = history.deleted[0], target.status
+    if old != new:
+        bump(connection, target.institution_id, TOTALS_DAY, {f"status:{old}": -1, f"status:{new}": 1})
+
+
+@event.listens_for(EnterpriseCase, "after_delete")
+def _on_case_delete(mapper, connection, target):
+    bump(connection, target.institution_id, TOTALS_DAY, {"cases": -1, f"status:{target.status}": -1})
+
+
+@event.listens_for(EnterpriseReport, "after_insert")
+def _on_report(mapper, connection, target):
+    institution_id = connection.execute(
+        select(EnterpriseCase.institution_id).where(EnterpriseCase.id == target.case_id)
+    ).scalar()
+    if institution_id:
+        bump(connection, institution_id, _day(target.created_at), {"reports": 1})
+
+
+@event.listens_for(TenantWalletTransaction, "after_insert")
+def _on_wallet_transaction(mapper, connection, target):
+    amount = target.amount_cents or 0
+    metric = "credits_spent" if amount < 0 else "credits_loaded"
+    bump(connection, target.institution_id, _day(target.created_at), {metric: abs(amount)})
+
+
+@event.listens_for(TenantAuditLog, "after_insert")
+def _on_audit_log(mapper, connection, target):
+    deltas = {"actions": 1, f"action:{target.action}": 1}
+    if target.user_id:
+        deltas[f"user:{target.user_id}"] = 1
+    bump(connection, target.institution_id, _day(target.created_at), deltas)
+
+
+# --- Reads ---
+
+
+def period_start(days: int, today: date | None = None) -> date:
+    """First day of a ``days``-long window ending today (inclusive)."""
+    return (today or datetime.utcnow().date()) - timedelta(days=max(1, days) - 1)
+
+
+def read_rollups(session: Session, institution_id: int, since: date, include_totals: bool = False) -> list[tuple[date, str, int]]:
+    """(day, metric, value) rows for the tenant from ``since`` on: one range scan of the primary key."""
+    day_filter = TenantDailyStat.day >= since
+    if include_totals:
+        day_filter = or_(day_filter, TenantDailyStat.day == TOTALS_DAY)
+    stmt = select(TenantDailyStat.day, TenantDailyStat.metric, TenantDailyStat.value).where(
+        TenantDailyStat.institution_id == institution_id, day_filter
+    )
+    return [(day, metric, value) for day, metric, value in session.execute(stmt).all()]
+
+
+def case_totals(session: Session, institution_id: int) -> dict[str, int]:
+    """All-time ``cases`` and ``status:<status>`` counters of the tenant (a handful of primary-key rows)."""
+    stmt = select(TenantDailyStat.metric, TenantDailyStat.value).where(
+        TenantDailyStat.institution_id == institution_id, TenantDailyStat.day == TOTALS_DAY
+    )
+    return {metric: value for metric, value in session.execute(stmt).all()}
+
+
+def summarize(
+    rows: list[tuple[date, str, int]], since: date | None = None
+) -> tuple[dict[str, int], dict[date, dict[str, int]], dict[str, int]]:
+    """Split rollup rows into (period totals by metric from ``since``, per-day counters, all-time totals)."""
+    period: dict[str, int] = defaultdict(int)
+    by_day: dict[date, dict[str, int]] = defaultdict(dict)
+    totals: dict[str, int] = {}
+    for day, metric, value in rows:
+        if day == TOTALS_DAY:
+            totals[metric] = value
+            continue
+        by_day[day][metric] = value
+        if since is None or day >= since:
+            period[metric] += value
+    return dict(period), dict(by_day), totals
+
+
+def prefixed(counters: dict[str, int], prefix: str) -> dict[str, int]:
+    """``{"action:login": 3}`` -> ``{"login": 3}`` for the given prefix, dropping zero counters."""
+    return {metric[len(prefix):]: value for metric, value in counters.items() if metric.startswith(prefix) and value}
+
+
+# --- Backfill ---
+
+
+def rebuild_tenant_rollups(connection, institution_id: int | None = None) -> int:
+    """Recompute counters from the source tables (migration backfill / repair). Returns rows written."""
+    scope = [] if institution_id is None else [_table.c.institution_id == institution_id]
+    connection.execute(delete(_table).where(*scope))
+    counters: dict[tuple[int, date, str], int] = defaultdict(int)
+
+    def as_date(value) -> date:
+        return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+    def grouped(model, *extra_cols, where=()):
+        inst_col = model.institution_id
+        cond = [inst_col.isnot(None), *where]
+        if institution_id is not None:
+            cond.append(inst_col == institution_id)
+        day_col = func.date(model.created_at)
+        return connection.execute(
+            select(inst_col, day_col, *extra_cols, func.count())
+            .where(*cond)
+            .group_by(inst_col, day_col, *extra_cols)
+        ).all()
+
+    for inst, day, n in grouped(AnalysisRecord):
+        counters[(inst, as_date(day), "analyses")] += n
+    for inst, day, n in grouped(EnterpriseCase):
+        counters[(inst, as_date(day), "cases")] += n
+    for inst, status, n in connection.execute(
+        select(EnterpriseCase.institution_id, EnterpriseCase.status, func.count())
+        .where(*([] if institution_id is None else [EnterpriseCase.institution_id == institution_id]))
+        .group_by(EnterpriseCase.institution_id, EnterpriseCase.status)
+    ).all():
+        counters[(inst, TOTALS_DAY, "cases")] += n
+        counters[(inst, TOTALS_DAY, f"status:{status}")] += n
+    report_day = func.date(EnterpriseReport.created_at)
+    for inst, day, n in connection.execute(
+        select(EnterpriseCase.institution_id, report_day, func.count())
+        .join(EnterpriseCase, EnterpriseCase.id == EnterpriseReport.case_id)
+        .where(*([] if institution_id is None else [EnterpriseCase.institution_id == institution_id]))
+        .group_by(EnterpriseCase.institution_id, report_day)
+    ).all():
+        counters[(inst, as_date(day), "reports")] += n
+    tx_day = func.date(TenantWalletTransaction.created_at)
+    is_spend = TenantWalletTransaction.amount_cents < 0
+    for inst, day, spend, total in connection.execute(
+        select(TenantWalletTransaction.institution_id, tx_day, is_spend, func.sum(TenantWalletTransaction.amount_cents))
+        .where(*([] if institution_id is None else [TenantWalletTransaction.institution_id == institution_id]))
+        .group_by(TenantWalletTransaction.institution_id, tx_day, is_spend)
+    ).all():
+        counters[(inst, as_date(day), "credits_spent" if spend else "credits_loaded")] += abs(total or 0)
+    for inst, day, action, n in grouped(TenantAuditLog, TenantAuditLog.action):
+        counters[(inst, as_date(day), "actions")] += n
+        counters[(inst, as_date(day), f"action:{action}")] += n
+    for inst, day, user_id, n in grouped(TenantAuditLog, TenantAuditLog.user_id, where=[TenantAuditLog.user_id.isnot(None)]):
+        counters[(inst, as_date(day), f"user:{user_id}")] += n
+
+    rows = [
+        {"institution_id": inst, "day": day, "metric": metric, "value": value}
+        for (inst, day, metric), value in counters.items()
+        if value
+    ]
+    for i in range(0, len(rows), 500):
+        connection.execute(_table.insert(), rows[i:i + 500])
+    logger.info("Tenant rollups rebuilt: %d counter row(s)", len(rows))
+    return len(rows)
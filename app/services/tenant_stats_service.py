@@ -1,17 +1,17 @@
 """Tenant dashboard statistics service.
 
-Provides daily/weekly/monthly analytics for tenant dashboards.
+Provides daily/weekly/monthly analytics for tenant dashboards. Activity figures come
+from the per-tenant daily rollups (app.services.tenant_rollups), so a dashboard view
+costs one range scan regardless of how many cases or actions the tenant has.
 """
 import logging
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 from sqlmodel import Session, select, func
 
-from app.models.enterprise_case import EnterpriseCase
-from app.models.tenant_audit_log import TenantAuditLog
-from app.models.tenant_wallet_transaction import TenantWalletTransaction
 from app.models.user import User
 from app.models.institution import InstitutionMembership
+from app.services.tenant_rollups import period_start, prefixed, read_rollups, summarize
 
 logger = logging.getLogger(__name__)
 
@@ -22,41 +22,17 @@ def get_tenant_stats(
     days: int = 30,
 ) -> dict:
     """Get comprehensive statistics for a tenant dashboard."""
-    cutoff = datetime.utcnow() - timedelta(days=days)
-
-    # Total cases
-    total_cases = session.exec(
-        select(func.count(EnterpriseCase.id)).where(
-            EnterpriseCase.institution_id == institution_id
-        )
-    ).first() or 0
-
-    # Cases by status
-    status_counts = {}
-    status_rows = session.exec(
-        select(EnterpriseCase.status, func.count(EnterpriseCase.id))
-        .where(EnterpriseCase.institution_id == institution_id)
-        .group_by(EnterpriseCase.status)
-    ).all()
-    for status, count in status_rows:
-        status_counts[status] = count
-
-    # Cases in period
-    cases_in_period = session.exec(
-        select(func.count(EnterpriseCase.id)).where(
-            EnterpriseCase.institution_id == institution_id,
-            EnterpriseCase.created_at >= cutoff,
-        )
-    ).first() or 0
-
-    # Active users (users who performed actions in period)
-    active_users = session.exec(
-        select(func.count(func.distinct(TenantAuditLog.user_id))).where(
-            TenantAuditLog.institution_id == institution_id,
-            TenantAuditLog.created_at >= cutoff,
-            TenantAuditLog.user_id.isnot(None),
-        )
-    ).first() or 0
+    since = period_start(days)
+    # The 7-day breakdown may reach before a shorter period; both come from the same scan
+    rows = read_rollups(session, institution_id, min(since, period_start(7)), include_totals=True)
+    period, by_day, totals = summarize(rows, since)
+
+    # Active users (users who performed actions in period) and their action counts
+    user_actions = {int(uid): count for uid, count in prefixed(period, "user:").items()}
+    # Deleted users keep their audit counters but are left out of the top list
+    names = dict(session.exec(select(User.id, User.full_name).where(User.id.in_(user_actions))).all()) if user_actions else {}
+    top_ids = sorted(names, key=lambda uid: (-user_actions[uid], uid))[:10]
+    top_users = [{"name": names[uid] or "", "actions": user_actions[uid]} for uid in top_ids]
 
     # Total members
     total_members = session.exec(
@@ -66,66 +42,30 @@ def get_tenant_stats(
         )
     ).first() or 0
 
-    # Wallet stats
-    wallet_spent = session.exec(
-        select(func.sum(TenantWalletTransaction.amount_cents)).where(
-            TenantWalletTransaction.institution_id == institution_id,
-            TenantWalletTransaction.amount_cents < 0,
-            TenantWalletTransaction.created_at >= cutoff,
-        )
-    ).first() or 0
-
-    wallet_loaded = session.exec(
-        select(func.sum(TenantWalletTransaction.amount_cents)).where(
-            TenantWalletTransaction.institution_id == institution_id,
-            TenantWalletTransaction.amount_cents > 0,
-            TenantWalletTransaction.created_at >= cutoff,
-        )
-    ).first() or 0
-
-    # Top users by activity
-    top_users_stmt = (
-        select(User.full_name, func.count(TenantAuditLog.id).label("action_count"))
-        .join(TenantAuditLog, User.id == TenantAuditLog.user_id)
-        .where(
-            TenantAuditLog.institution_id == institution_id,
-            TenantAuditLog.created_at >= cutoff,
-        )
-        .group_by(User.full_name)
-        .order_by(func.count(TenantAuditLog.id).desc())
-        .limit(10)
-    )
-    top_users = [
-        {"name": name, "actions": count}
-        for name, count in session.exec(top_users_stmt).all()
-    ]
+    wallet_spent = period.get("credits_spent", 0)
+    wallet_loaded = period.get("credits_loaded", 0)
 
     # Daily breakdown (last 7 days)
+    first_day = period_start(7)
     daily_breakdown = []
     for i in range(7):
-        day_start = datetime.utcnow() - timedelta(days=6 - i)
-        day_end = day_start + timedelta(days=1)
-        day_cases = session.exec(
-            select(func.count(EnterpriseCase.id)).where(
-                EnterpriseCase.institution_id == institution_id,
-                EnterpriseCase.created_at >= day_start,
-                EnterpriseCase.created_at < day_end,
-            )
-        ).first() or 0
+        day = first_day + timedelta(days=i)
         daily_breakdown.append({
-            "date": day_start.strftime("%Y-%m-%d"),
-            "cases": day_cases,
+            "date": day.strftime("%Y-%m-%d"),
+            "cases": by_day.get(day, {}).get("cases", 0),
         })
 
     return {
-        "total_cases": total_cases,
-        "cases_in_period": cases_in_period,
+        "total_cases": totals.get("cases", 0),
+        "cases_in_period": period.get("cases", 0),
+        "analyses_in_period": period.get("analyses", 0),
+        "reports_in_period": period.get("reports", 0),
         "period_days": days,
-        "status_counts": status_counts,
-        "active_users": active_users,
+        "status_counts": prefixed(totals, "status:"),
+        "active_users": len(user_actions),
         "total_members": total_members,
-        "wallet_spent_cents": abs(wallet_spent),
-        "wallet_spent_formatted": f"${abs(wallet_spent) / 100:.2f}",
+        "wallet_spent_cents": wallet_spent,
+        "wallet_spent_formatted": f"${wallet_spent / 100:.2f}",
         "wallet_loaded_cents": wallet_loaded,
         "wallet_loaded_formatted": f"${wallet_loaded / 100:.2f}",
         "top_users": top_users,
@@ -9,7 +9,8 @@ from datetime import datetime
 
 from sqlmodel import Session, select
 
-from app.core.security import hash_password
+from app.core.pagination import Page, keyset_page
+from app.core.passwords import password_hasher
 from app.models.user import User
 from app.models.institution import Institution
 
@@ -49,7 +50,7 @@ def create_tenant_user(
 
     user = User(
         email=email.lower(),
-        hashed_password=hash_password(temp_password),
+        hashed_password=password_hasher.hash(temp_password),
         full_name=full_name,
         institution_id=institution_id,
         tenant_role=role,
@@ -81,17 +82,12 @@ def get_tenant_users(
     db: Session,
     institution_id: int,
     limit: int = 50,
+    cursor: str | None = None,
     offset: int = 0,
-) -> list[User]:
-    """Get all users associated with a hospital tenant."""
-    stmt = (
-        select(User)
-        .where(User.institution_id == institution_id)
-        .order_by(User.created_at.desc())
-        .offset(offset)
-        .limit(limit)
-    )
-    return list(db.exec(stmt).all())
+) -> Page:
+    """Get a keyset page of users associated with a hospital tenant (newest first, by id)."""
+    stmt = select(User).where(User.institution_id == institution_id)
+    return keyset_page(db, stmt, id_col=User.id, cursor=cursor, limit=limit, offset=offset)
 
 
 def get_tenant_user(db: Session, institution_id: int, user_id: int) -> User | None:
@@ -145,7 +141,7 @@ def reset_tenant_user_password(
         return {"success": False, "error": "Kullanıcı bulunamadı."}
 
     temp_password = secrets.token_urlsafe(12)
-    user.hashed_password = hash_password(temp_password)
+    user.hashed_password = password_hasher.hash(temp_password)
     db.add(user)
     db.commit()
 
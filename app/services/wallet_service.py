@@ -7,6 +7,7 @@ from datetime import datetime
 
 from sqlmodel import Session, select
 
+from app.core.pagination import Page, keyset_page
 from app.models.institution import Institution
 from app.models.tenant_wallet_transaction import TenantWalletTransaction
 
@@ -277,17 +278,15 @@ def get_transactions(
     session: Session,
     institution_id: int,
     limit: int = 50,
+    cursor: str | None = None,
     offset: int = 0,
-) -> list[TenantWalletTransaction]:
-    """Get transaction history for an institution."""
-    stmt = (
-        select(TenantWalletTransaction)
-        .where(TenantWalletTransaction.institution_id == institution_id)
-        .order_by(TenantWalletTransaction.created_at.desc())
-        .offset(offset)
-        .limit(limit)
+) -> Page:
+    """Get a keyset page of transaction history for an institution (newest first)."""
+    stmt = select(TenantWalletTransaction).where(TenantWalletTransaction.institution_id == institution_id)
+    return keyset_page(
+        session, stmt, ts_col=TenantWalletTransaction.created_at, id_col=TenantWalletTransaction.id,
+        cursor=cursor, limit=limit, offset=offset,
     )
-    return list(session.exec(stmt).all())
 
 
 def check_low_balance_alerts(session: Session) -> list[dict]:
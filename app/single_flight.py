@@ -0,0 +1,182 @@
+"""
+AI önbelleği için single-flight: aynı cache_key ile eşzamanlı gelen istekler tek LLM çağrısını paylaşır
+(çift tıklama, kararsız ağda mobil yeniden deneme, kurumsal tekrar yükleme).
+
+- Süreç içi: anahtar başına bir Future. İlk gelen (lider) hesaplar; o sırada katılanlar aynı sonucu ya da
+  aynı istisnayı alır. Hesaplama bitince Future kaldırılır; sonra gelen istek hatayı miras almaz.
+- Worker'lar arası: ai_cache ile aynı SQLite dosyasındaki ai_cache_lease satırı. Kirayı alamayan lider,
+  önbellekte sonuç belirene ya da beklediği sahibin kirası hata durumuna geçene kadar yoklar; kira sahibi
+  çökerse süresi dolan kira devralınır. Hata satırı yalnızca o anda bekleyenler içindir: yeni gelen
+  lease_acquire onu siler ve yeniden hesaplar (geçici OpenAI hatası önbelleğe alınmaz).
+- Zaman aşımı: WAIT_TIMEOUT_SECONDS içinde sonuç gelmezse bekleyen kendi hesaplamasını yapar (eski davranış).
+
+compute() yanıtı `store` ile önbelleğe yazmaktan sorumludur (kira bırakılmadan önce), böylece diğer
+worker'lar kira kalktığında cache_get ile sonucu bulur. `store` kira işlemleriyle aynı bağlantı kilidini
+kullanır; ortak sqlite3 bağlantısı iş parçacıkları arasında eşzamanlı kullanılmaz. Uç noktaların doğrudan
+önbellek okuması (lookup) ve süresi dolanların temizliği (purge_expired) de aynı kilitten geçer.
+"""
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable
+
+from fastapi import HTTPException
+
+from app.cache_db import (
+    cache_get, cache_set, lease_acquire, lease_fail, lease_get, lease_release, purge_expired as _purge_expired,
+)
+from app.core.runtime import after_fork
+
+log = logging.getLogger(__name__)
+
+# OpenAI istemci zaman aşımı 120 sn + fallback; bekleyenler bundan biraz uzun bekler
+WAIT_TIMEOUT_SECONDS = 180.0
+LEASE_TTL_SECONDS = 240.0
+# Hata, o kirayı yoklayan worker'lar görsün diye en fazla bu kadar kira satırında kalır
+ERROR_KEEP_SECONDS = 10.0
+POLL_MIN_SECONDS = 0.05
+POLL_MAX_SECONDS = 1.0
+
+_OWNER_PREFIX = f"{os.getpid()}-{secrets.token_hex(4)}"
+
+
+@after_fork
+def _new_owner_prefix() -> None:
+    """preload: import master'da olur; her worker kendi kira sahibi önekini almalı."""
+    global _OWNER_PREFIX
+    _OWNER_PREFIX = f"{os.getpid()}-{secrets.token_hex(4)}"
+
+_inflight: dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+# Ortak sqlite3 bağlantısında kira okuma/yazmaları iş parçacıkları arasında sıralanır
+_conn_lock = threading.Lock()
+
+
+def store(conn: sqlite3.Connection, **fields) -> None:
+    """compute() içinden ai_cache'e yazar (cache_set alanları); kira okuma/yazmalarıyla aynı kilit altında."""
+    with _conn_lock:
+        cache_set(conn, **fields)
+
+
+def lookup(conn: sqlite3.Connection, cache_key: str) -> dict | None:
+    """Kira beklemeden ai_cache okur (hızlı yol); kira okuma/yazmalarıyla aynı kilit altında."""
+    with _conn_lock:
+        return cache_get(conn, cache_key)
+
+
+def purge_expired(conn: sqlite3.Connection) -> int:
+    """Süresi dolan ai_cache kayıtlarını siler (zamanlanmış iş / admin); silinen satır sayısını döner."""
+    with _conn_lock:
+        return _purge_expired(conn)
+
+
+def _error_payload(exc: BaseException) -> dict:
+    if isinstance(exc, HTTPException):
+        return {"kind": "http", "status_code": exc.status_code, "detail": exc.detail}
+    if isinstance(exc, ValueError):
+        return {"kind": "value", "detail": str(exc)[:500]}
+    return {"kind": "http", "status_code": 503, "detail": "Analiz şu an yapılamadı. Lütfen tekrar deneyin."}
+
+
+def _raise_from_payload(error: dict) -> None:
+    if error.get("kind") == "value":
+        raise ValueError(error.get("detail") or "")
+    raise HTTPException(status_code=int(error.get("status_code") or 503), detail=error.get("detail"))
+
+
+def _wait_for_other_worker(
+    conn: sqlite3.Connection, cache_key: str, owner: str, holder: str | None, deadline: float
+) -> tuple[dict | None, bool]:
+    """Başka worker'ın (holder) kirası bitene kadar yoklar. (sonuç, kira_alındı) döner; ikisi de boşsa zaman aşımı.
+
+    Yalnızca beklenen sahibin hatası iletilir; başka birinin eski hata satırı boş kira sayılır.
+    """
+    delay = POLL_MIN_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(delay)
+        delay = min(delay * 2, POLL_MAX_SECONDS)
+        with _conn_lock:
+            cached = cache_get(conn, cache_key)
+            if cached is not None:
+                return cached, False
+            lease = lease_get(conn, cache_key)
+            if lease and lease["status"] == "error" and lease["owner"] == holder:
+                _raise_from_payload(lease["error"] or {})
+            if lease and lease["status"] == "running":
+                # Kira el değiştirdiyse (devralındı) yeni sahibi bekle
+                holder = lease["owner"]
+                continue
+            if lease_acquire(conn, cache_key, owner, LEASE_TTL_SECONDS):
+                # Sahip sonuç yazmadan çıktı ya da çöktü: hesaplamayı biz devralıyoruz
+                return None, True
+    return None, False
+
+
+def _lead(conn: sqlite3.Connection, cache_key: str, compute: Callable[[], dict], wait_timeout: float) -> tuple[dict, bool]:
+    owner = f"{_OWNER_PREFIX}-{threading.get_ident()}"
+    with _conn_lock:
+        cached = cache_get(conn, cache_key)
+        acquired = cached is None and lease_acquire(conn, cache_key, owner, LEASE_TTL_SECONDS)
+        lease = None if cached is not None or acquired else lease_get(conn, cache_key)
+    if cached is not None:
+        return cached, True
+    if not acquired:
+        log.info("SINGLE-FLIGHT wait (other worker) key=%s", cache_key[:16])
+        holder = lease["owner"] if lease else None
+        cached, acquired = _wait_for_other_worker(conn, cache_key, owner, holder, time.monotonic() + wait_timeout)
+        if cached is not None:
+            return cached, True
+        if not acquired:
+            log.warning("SINGLE-FLIGHT timeout key=%s; computing locally", cache_key[:16])
+            return compute(), False
+    try:
+        result = compute()
+    except BaseException as exc:
+        with _conn_lock:
+            lease_fail(conn, cache_key, owner, _error_payload(exc), ERROR_KEEP_SECONDS)
+        raise
+    with _conn_lock:
+        lease_release(conn, cache_key, owner)
+    return result, False
+
+
+def run(
+    conn: sqlite3.Connection,
+    cache_key: str,
+    compute: Callable[[], dict],
+    *,
+    wait_timeout: float = WAIT_TIMEOUT_SECONDS,
+) -> tuple[dict[str, Any], bool]:
+    """cache_key için yanıtı döner: (yanıt, paylaşıldı). paylaşıldı=True ise compute bu çağrıda çalışmadı.
+
+    Bloklayan çağrıdır; async uç noktalardan run_in_threadpool ile kullanılır. compute'un istisnası
+    o anda aynı anahtarı bekleyen çağıranlara (diğer worker'lar dahil) iletilir; sonradan gelen yeniden dener.
+    """
+    with _inflight_lock:
+        fut = _inflight.get(cache_key)
+        leader = fut is None
+        if leader:
+            fut = Future()
+            _inflight[cache_key] = fut
+    if not leader:
+        log.info("SINGLE-FLIGHT join key=%s", cache_key[:16])
+        try:
+            return fut.result(timeout=wait_timeout)[0], True
+        except FutureTimeoutError:
+            log.warning("SINGLE-FLIGHT timeout key=%s; computing locally", cache_key[:16])
+            return compute(), False
+    try:
+        result = _lead(conn, cache_key, compute, wait_timeout)
+    except BaseException as exc:
+        fut.set_exception(exc)
+        raise
+    else:
+        fut.set_result(result)
+        return result
+    finally:
+        with _inflight_lock:
+            _inflight.pop(cache_key, None)
@@ -8,7 +8,8 @@ from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlmodel import Session, select
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
+from app.core.pagination import page_links
 from app.core.templating import templates
 from app.models.institution import Institution, InstitutionMembership
 from app.models.enterprise_case import EnterpriseCase
@@ -41,7 +42,7 @@ async def tenant_dashboard(
     request: Request,
     tenant: Institution = Depends(require_tenant_active),
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Hospital dashboard showing overview stats."""
     institution_id = tenant.id
@@ -174,9 +175,10 @@ async def tenant_audit_log_page(
     tenant: Institution = Depends(require_tenant_active),
     user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
+    cursor: str | None = None,
 ):
-    """Tenant audit log viewer."""
-    logs = tenant_audit_service.get_tenant_audit_logs(db, tenant.id, limit=100)
+    """Tenant audit log viewer (100 entries per page, older entries via cursor links)."""
+    page = tenant_audit_service.get_tenant_audit_logs(db, tenant.id, limit=100, cursor=cursor)
 
     return templates.TemplateResponse(
         "tenant/audit_log.html",
@@ -185,7 +187,8 @@ async def tenant_audit_log_page(
             "tenant": tenant,
             "tenant_slug": tenant.tenant_slug,
             "user": user,
-            "logs": logs,
+            "logs": page.items,
+            **page_links(request, page),
         },
     )
 
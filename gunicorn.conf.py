@@ -0,0 +1,113 @@
+"""
+Gunicorn çalışma profili (gunicorn çalışma dizinindeki bu dosyayı otomatik okur; açıkça: -c gunicorn.conf.py).
+
+- preload_app: uygulama master'da bir kez import edilir; büyük i18n / blog verisi worker'lar arasında
+  copy-on-write paylaşılır. Fork öncesi gc.freeze() bu nesneleri GC taramasından çıkarır (sayfa kopyası olmaz).
+- post_fork: master'dan kalan DB havuzları, SQLite handle'ları ve thread havuzları worker'da yeniden açılır
+  (app.core.runtime.reinit_after_fork).
+- Worker sayısı: WEB_CONCURRENCY verilmişse o; yoksa CPU (affinity / cgroup kotası) ve bellek sınırından
+  (WEB_MEMORY_PER_WORKER_MB) hesaplanır, WEB_MAX_WORKERS ile sınırlanır.
+- Birden çok worker varken SHARED_CACHE_URL boşsa worker'lar arası önbellek için NORYA_RUNTIME_DIR altında
+  yerel SQLite dosyası seçilir. Dizin yalnız bu kullanıcıya açık (0700) olmalı; ayarlı değilse açılış durur
+  (paylaşılan /tmp'de başka bir kullanıcı önbellek dosyasını önceden açıp içeriğini değiştirebilirdi).
+"""
+import gc
+import os
+
+
+def _cgroup_cpu_limit() -> float | None:
+    """cgroup v2 cpu.max (ör. "200000 100000" = 2 çekirdek); sınırsız / yoksa None."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        return None
+
+
+def cpu_limit() -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = _cgroup_cpu_limit()
+    if quota:
+        cpus = min(cpus, max(1, int(quota + 0.5)))
+    return max(1, cpus)
+
+
+def memory_limit_mb() -> int | None:
+    """Konteyner (cgroup v2 memory.max) ya da makine belleği (MB)."""
+    try:
+        with open("/sys/fs/cgroup/memory.max") as f:
+            raw = f.read().strip()
+        if raw != "max":
+            return int(raw) // (1024 * 1024)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def auto_workers(cpus: int | None = None, mem_mb: int | None = None, per_worker_mb: int | None = None,
+                 max_workers: int | None = None) -> int:
+    """Async (uvicorn) worker: çekirdek başına bir; bellek ve üst sınırla kısılır, en az 1."""
+    cpus = cpu_limit() if cpus is None else cpus
+    mem_mb = memory_limit_mb() if mem_mb is None else mem_mb
+    per_worker_mb = per_worker_mb or int(os.getenv("WEB_MEMORY_PER_WORKER_MB", "350"))
+    max_workers = max_workers or int(os.getenv("WEB_MAX_WORKERS", "8"))
+    workers = cpus
+    if mem_mb:
+        # Master + paylaşılan sayfalar için bir worker payı ayrılır
+        workers = min(workers, max(1, mem_mb // per_worker_mb - 1))
+    return max(1, min(workers, max_workers))
+
+
+def local_shared_cache_url(runtime_dir: str | None) -> str:
+    """Özel çalışma dizinindeki SQLite önbellek dosyası; dizin yoksa 0700 açılır, başkasına açıksa hata."""
+    if not runtime_dir:
+        raise RuntimeError(
+            "Multiple workers need a shared cache: set SHARED_CACHE_URL or NORYA_RUNTIME_DIR (a private directory)"
+        )
+    os.makedirs(runtime_dir, mode=0o700, exist_ok=True)
+    st = os.stat(runtime_dir)
+    if st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise RuntimeError(f"NORYA_RUNTIME_DIR {runtime_dir} must be owned by the server user with mode 0700")
+    return "sqlite:///" + os.path.join(runtime_dir, "norya-shared-cache.db")
+
+
+bind = os.getenv("GUNICORN_BIND") or f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY") or 0) or auto_workers()
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") != "0"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+# Uzun süre çalışan worker'ların bellek büyümesini sınırlamak için (0 = kapalı); jitter aynı anda yeniden başlamayı önler
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+if workers > 1 and not os.getenv("SHARED_CACHE_URL"):
+    os.environ["SHARED_CACHE_URL"] = local_shared_cache_url(os.getenv("NORYA_RUNTIME_DIR"))
+
+
+def when_ready(server):
+    server.log.info("Norya serving with %d worker(s), preload=%s, shared cache=%s",
+                    workers, preload_app, os.getenv("SHARED_CACHE_URL") or "memory")
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    from app.core.runtime import reinit_after_fork
+
+    reinit_after_fork()
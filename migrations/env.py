@@ -12,6 +12,7 @@ if str(BASE_DIR) not in sys.path:
     sys.path.append(str(BASE_DIR))
 
 from app.core.database import DATABASE_URL  # noqa: E402
+from app.core.migrate import disable_session_timeouts  # noqa: E402
 
 # Alembic Config nesnesi; alembic.ini'den gelir
 config = context.config
@@ -20,9 +21,14 @@ config = context.config
 if config.get_main_option("sqlalchemy.url") != str(DATABASE_URL):
     config.set_main_option("sqlalchemy.url", str(DATABASE_URL))
 
-# Log yapılandırması (config dosyası yoksa veya okunamazsa sessizce atla)
+# Log yapılandırması (config dosyası yoksa veya okunamazsa sessizce atla).
+# app.core.migrate uygulama içinden çağırırken configure_logger=False verir; uygulama logging'i ezilmez.
 try:
-    if config.config_file_name is not None and Path(config.config_file_name).exists():
+    if (
+        config.attributes.get("configure_logger", True)
+        and config.config_file_name is not None
+        and Path(config.config_file_name).exists()
+    ):
         fileConfig(config.config_file_name)
 except Exception:
     pass
@@ -47,6 +53,13 @@ def run_migrations_offline() -> None:
 
 def run_migrations_online() -> None:
     """'online' mod: gerçek veritabanı bağlantısı ile migration çalıştırır."""
+    # app.core.migrate: kilidi tutan bağlantı ve transaction'ı dışarıdan verir
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        context.configure(connection=connection, target_metadata=target_metadata, compare_type=True)
+        context.run_migrations()
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section),
         prefix="sqlalchemy.",
@@ -54,6 +67,7 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
+        disable_session_timeouts(connection)
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
@@ -0,0 +1,38 @@
+"""push_subscriptions: is_active, deactivated_at, last_error
+
+Expo DeviceNotRegistered dönen mobil token'lar silinmek yerine pasifleştirilir;
+gönderim listesi sadece aktif token'ları okur.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0010_push_subscription_is_active"
+down_revision: Union[str, None] = "0009_add_tenant_multi_tenancy"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    try:
+        op.add_column("push_subscriptions", sa.Column("is_active", sa.Boolean(), nullable=False, server_default=sa.true()))
+    except Exception:
+        pass
+    try:
+        op.add_column("push_subscriptions", sa.Column("deactivated_at", sa.DateTime(), nullable=True))
+    except Exception:
+        pass
+    try:
+        op.add_column("push_subscriptions", sa.Column("last_error", sa.String(64), nullable=True))
+    except Exception:
+        pass
+    try:
+        op.create_index("ix_push_subscriptions_is_active", "push_subscriptions", ["is_active"])
+    except Exception:
+        pass
+
+
+def downgrade() -> None:
+    pass  # SQLite DROP COLUMN desteklenmiyor
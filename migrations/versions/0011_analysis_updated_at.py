@@ -0,0 +1,30 @@
+"""analysisrecord.updated_at + (user_id, updated_at, id) indeksi
+
+Mobil delta-sync için değişiklik zamanı; mevcut kayıtlar created_at ile doldurulur.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0011_analysis_updated_at"
+down_revision: Union[str, None] = "0010_push_subscription_is_active"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    try:
+        op.add_column("analysisrecord", sa.Column("updated_at", sa.DateTime(), nullable=True))
+    except Exception:
+        pass
+    op.execute("UPDATE analysisrecord SET updated_at = created_at WHERE updated_at IS NULL")
+    try:
+        op.create_index("ix_analysisrecord_user_updated", "analysisrecord", ["user_id", "updated_at", "id"])
+    except Exception:
+        pass
+
+
+def downgrade() -> None:
+    pass
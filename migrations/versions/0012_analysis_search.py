@@ -0,0 +1,39 @@
+"""analysisrecord.lang + tam metin arama şeması (FTS5 / tsvector + GIN)
+
+Sanal tablo/sütun, tetikleyiciler ve indeks app.services.search.ensure_search_index ile
+kurulur (init_db de aynı fonksiyonu çağırır; idempotent).
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0012_analysis_search"
+down_revision: Union[str, None] = "0011_analysis_updated_at"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    try:
+        op.add_column("analysisrecord", sa.Column("lang", sa.String(length=8), nullable=True))
+    except Exception:
+        pass
+    from app.services.search import ensure_search_index
+
+    ensure_search_index(op.get_bind())
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        for trg in ("analysisrecord_fts_ai", "analysisrecord_fts_ad", "analysisrecord_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trg}")
+        op.execute("DROP TABLE IF EXISTS analysis_fts")
+    elif bind.dialect.name == "postgresql":
+        op.execute("DROP TRIGGER IF EXISTS analysisrecord_search_tg ON analysisrecord")
+        op.execute("DROP FUNCTION IF EXISTS analysisrecord_search_update()")
+        op.execute("DROP INDEX IF EXISTS ix_analysisrecord_search_vector")
+        op.execute("ALTER TABLE analysisrecord DROP COLUMN IF EXISTS search_vector")
+        op.execute("ALTER TABLE analysisrecord DROP COLUMN IF EXISTS search_config")
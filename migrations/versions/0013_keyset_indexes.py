@@ -0,0 +1,39 @@
+"""Keyset sayfalama için (…, created_at, id) bileşik indeksleri
+
+Geçmiş, admin ve tenant listeleri OFFSET yerine (created_at, id) cursor'ı ile sayfalanır.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "0013_keyset_indexes"
+down_revision: Union[str, None] = "0012_analysis_search"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_INDEXES = (
+    ("ix_analysisrecord_user_created", "analysisrecord", ["user_id", "created_at", "id"]),
+    ("ix_analysisrecord_created_id", "analysisrecord", ["created_at", "id"]),
+    ("ix_user_inst_id", "user", ["institution_id", "id"]),
+    ("ix_auditlog_inst_created", "auditlog", ["institution_id", "created_at", "id"]),
+    ("ix_enterprise_cases_inst_created", "enterprise_cases", ["institution_id", "created_at", "id"]),
+    ("ix_tenant_audit_logs_inst_created", "tenant_audit_logs", ["institution_id", "created_at", "id"]),
+    ("ix_tenant_wallet_tx_inst_created", "tenant_wallet_transactions", ["institution_id", "created_at", "id"]),
+)
+
+
+def upgrade() -> None:
+    for name, table, cols in _INDEXES:
+        try:
+            op.create_index(name, table, cols)
+        except Exception:
+            pass
+
+
+def downgrade() -> None:
+    for name, table, _ in _INDEXES:
+        try:
+            op.drop_index(name, table_name=table)
+        except Exception:
+            pass
@@ -0,0 +1,25 @@
+"""analysis_jobs.cached_tokens
+
+Prompt token'larının sağlayıcı önek önbelleğinden gelen kısmı (maliyet hesabında indirimli).
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0014_analysis_job_cached_tokens"
+down_revision: Union[str, None] = "0013_keyset_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    try:
+        op.add_column("analysis_jobs", sa.Column("cached_tokens", sa.Integer(), nullable=True))
+    except Exception:
+        pass
+
+
+def downgrade() -> None:
+    pass
@@ -0,0 +1,692 @@
+"""startup-free schema: init_db ALTER listesi migration'a taşındı
+
+Worker açılışında DDL çalışmaz (app.core.migrate). 0001 boş bir taban olduğundan tablolar o güne dek her
+açılışta create_all ile açılıyordu; bu revizyon o günkü şemayı (0015 anındaki modeller) açık create_table
+çağrılarıyla dondurur ve yalnız eksik tabloları açar. Sonra eski init_db'nin sütun / indeks eklerini yalnız
+eksik olanlar için bir kez uygular. Sonraki model değişiklikleri bu dosyayı etkilemez; yeni revizyon ister.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0015_startup_free_schema"
+down_revision: Union[str, None] = "0014_analysis_job_cached_tokens"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # Eski init_db'nin create_all ile açtığı tablolar olduğu gibi kalır
+    existing = set(sa.inspect(bind).get_table_names())
+    if "auditlog" not in existing:
+        op.create_table(
+            "auditlog",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("event", sa.String(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column("ip", sa.String(), nullable=True),
+            sa.Column("country", sa.String(), nullable=True),
+            sa.Column("city", sa.String(), nullable=True),
+            sa.Column("institution_id", sa.Integer(), nullable=True),
+            sa.Column("entity_type", sa.String(length=64), nullable=True),
+            sa.Column("entity_id", sa.Integer(), nullable=True),
+            sa.Column("metadata_json", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_auditlog_event", "auditlog", ["event"])
+        op.create_index("ix_auditlog_inst_created", "auditlog", ["institution_id", "created_at", "id"])
+        op.create_index("ix_auditlog_institution_id", "auditlog", ["institution_id"])
+        op.create_index("ix_auditlog_user_id", "auditlog", ["user_id"])
+    if "blog_posts" not in existing:
+        op.create_table(
+            "blog_posts",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("slug", sa.String(), nullable=False),
+            sa.Column("lang", sa.String(), nullable=False),
+            sa.Column("title", sa.String(), nullable=False),
+            sa.Column("meta_title", sa.String(), nullable=True),
+            sa.Column("meta_description", sa.String(), nullable=True),
+            sa.Column("content_json", sa.String(), nullable=False),
+            sa.Column("cover_image", sa.String(), nullable=True),
+            sa.Column("category", sa.String(), nullable=True),
+            sa.Column("tags_json", sa.String(), nullable=True),
+            sa.Column("author_name", sa.String(), nullable=True),
+            sa.Column("published_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.Column("is_published", sa.Boolean(), nullable=False),
+            sa.Column("is_featured", sa.Boolean(), nullable=False),
+            sa.Column("canonical_url", sa.String(), nullable=True),
+            sa.Column("reading_time_minutes", sa.Integer(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_blog_posts_category", "blog_posts", ["category"])
+        op.create_index("ix_blog_posts_created_at", "blog_posts", ["created_at"])
+        op.create_index("ix_blog_posts_is_published", "blog_posts", ["is_published"])
+        op.create_index("ix_blog_posts_lang", "blog_posts", ["lang"])
+        op.create_index("ix_blog_posts_published_at", "blog_posts", ["published_at"])
+        op.create_index("ix_blog_posts_slug", "blog_posts", ["slug"], unique=True)
+    if "discountcode" not in existing:
+        op.create_table(
+            "discountcode",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("code", sa.String(length=64), nullable=False),
+            sa.Column("discount_type", sa.String(length=16), nullable=False),
+            sa.Column("discount_value", sa.Integer(), nullable=False),
+            sa.Column("valid_from", sa.Date(), nullable=True),
+            sa.Column("valid_until", sa.Date(), nullable=True),
+            sa.Column("valid_days_of_month", sa.String(length=128), nullable=True),
+            sa.Column("max_uses", sa.Integer(), nullable=True),
+            sa.Column("use_count", sa.Integer(), nullable=False),
+            sa.Column("products", sa.String(length=64), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("is_active", sa.Boolean(), nullable=False),
+            sa.Column("auto_show_on_checkout", sa.Boolean(), nullable=False),
+            sa.Column("auto_apply", sa.Boolean(), nullable=False),
+            sa.Column("display_label", sa.String(length=120), nullable=True),
+            sa.Column("display_note", sa.String(length=256), nullable=True),
+            sa.Column("campaign_badge", sa.String(length=64), nullable=True),
+            sa.Column("old_price_single_cents", sa.Integer(), nullable=True),
+            sa.Column("new_price_single_cents", sa.Integer(), nullable=True),
+            sa.Column("old_price_monthly_cents", sa.Integer(), nullable=True),
+            sa.Column("new_price_monthly_cents", sa.Integer(), nullable=True),
+            sa.Column("old_price_yearly_cents", sa.Integer(), nullable=True),
+            sa.Column("new_price_yearly_cents", sa.Integer(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_discountcode_code", "discountcode", ["code"], unique=True)
+    if "drip_email_logs" not in existing:
+        op.create_table(
+            "drip_email_logs",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("email", sa.String(length=255), nullable=False),
+            sa.Column("step", sa.Integer(), nullable=False),
+            sa.Column("sent_at", sa.DateTime(), nullable=False),
+            sa.Column("opened", sa.Boolean(), nullable=False),
+            sa.Column("clicked", sa.Boolean(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_drip_email_logs_email", "drip_email_logs", ["email"])
+        op.create_index("ix_drip_email_logs_step", "drip_email_logs", ["step"])
+    if "email_leads" not in existing:
+        op.create_table(
+            "email_leads",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("email", sa.String(length=255), nullable=False),
+            sa.Column("name", sa.String(length=255), nullable=True),
+            sa.Column("source", sa.String(length=64), nullable=True),
+            sa.Column("locale", sa.String(length=16), nullable=True),
+            sa.Column("consent_kvkk", sa.Boolean(), nullable=False),
+            sa.Column("consent_gdpr", sa.Boolean(), nullable=False),
+            sa.Column("consent_at", sa.DateTime(), nullable=True),
+            sa.Column("ip", sa.String(length=64), nullable=True),
+            sa.Column("user_agent", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("utm_source", sa.String(length=128), nullable=True),
+            sa.Column("utm_medium", sa.String(length=128), nullable=True),
+            sa.Column("utm_campaign", sa.String(length=128), nullable=True),
+            sa.Column("utm_content", sa.String(length=128), nullable=True),
+            sa.Column("utm_term", sa.String(length=128), nullable=True),
+            sa.Column("drip_step", sa.Integer(), nullable=False),
+            sa.Column("drip_last_sent_at", sa.DateTime(), nullable=True),
+            sa.Column("unsubscribed", sa.Boolean(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_email_leads_email", "email_leads", ["email"])
+    if "emailverifytoken" not in existing:
+        op.create_table(
+            "emailverifytoken",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("token", sa.String(), nullable=False),
+            sa.Column("expires_at", sa.DateTime(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_emailverifytoken_email", "emailverifytoken", ["email"])
+        op.create_index("ix_emailverifytoken_expires_at", "emailverifytoken", ["expires_at"])
+        op.create_index("ix_emailverifytoken_token", "emailverifytoken", ["token"], unique=True)
+    if "enterprise_leads" not in existing:
+        op.create_table(
+            "enterprise_leads",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("kurum_adi", sa.String(length=255), nullable=False),
+            sa.Column("yetkili_ad", sa.String(length=255), nullable=False),
+            sa.Column("email", sa.String(length=255), nullable=False),
+            sa.Column("telefon", sa.String(length=64), nullable=True),
+            sa.Column("kurum_tipi", sa.String(length=64), nullable=True),
+            sa.Column("aylik_rapor", sa.String(length=64), nullable=True),
+            sa.Column("mesaj", sa.String(), nullable=True),
+            sa.Column("kvkk_accepted", sa.Boolean(), nullable=False),
+            sa.Column("ip", sa.String(length=64), nullable=True),
+            sa.Column("user_agent", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_enterprise_leads_email", "enterprise_leads", ["email"])
+    if "error_logs" not in existing:
+        op.create_table(
+            "error_logs",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column("endpoint", sa.String(), nullable=True),
+            sa.Column("method", sa.String(), nullable=True),
+            sa.Column("error_message", sa.String(), nullable=True),
+            sa.Column("stack_trace", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_error_logs_user_id", "error_logs", ["user_id"])
+    if "institutions" not in existing:
+        op.create_table(
+            "institutions",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(length=255), nullable=False),
+            sa.Column("type", sa.String(length=64), nullable=False),
+            sa.Column("status", sa.String(length=32), nullable=False),
+            sa.Column("plan", sa.String(length=32), nullable=False),
+            sa.Column("seat_limit", sa.Integer(), nullable=False),
+            sa.Column("monthly_quota", sa.Integer(), nullable=False),
+            sa.Column("quota_used_this_month", sa.Integer(), nullable=False),
+            sa.Column("quota_reset_day", sa.Integer(), nullable=False),
+            sa.Column("active_languages", sa.String(length=255), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=False),
+            sa.Column("contract_start", sa.DateTime(), nullable=True),
+            sa.Column("contract_end", sa.DateTime(), nullable=True),
+            sa.Column("contact_email", sa.String(length=255), nullable=True),
+            sa.Column("contact_phone", sa.String(length=64), nullable=True),
+            sa.Column("notes", sa.String(), nullable=True),
+            sa.Column("onboarding_completed", sa.Boolean(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=False),
+            sa.Column("tenant_slug", sa.String(length=128), nullable=True),
+            sa.Column("billing_wallet_balance", sa.Integer(), nullable=False),
+            sa.Column("cost_per_analysis", sa.Integer(), nullable=False),
+            sa.Column("subdomain", sa.String(length=255), nullable=True),
+            sa.Column("wallet_low_threshold", sa.Integer(), nullable=False),
+            sa.Column("wallet_last_alert", sa.DateTime(), nullable=True),
+            sa.Column("logo_url", sa.String(length=512), nullable=True),
+            sa.Column("primary_color", sa.String(length=16), nullable=True),
+            sa.Column("secondary_color", sa.String(length=16), nullable=True),
+            sa.Column("report_header_text", sa.String(length=256), nullable=True),
+            sa.Column("report_footer_text", sa.String(length=256), nullable=True),
+            sa.Column("custom_css", sa.String(), nullable=True),
+            sa.Column("daily_analysis_limit", sa.Integer(), nullable=True),
+            sa.Column("hourly_analysis_limit", sa.Integer(), nullable=True),
+            sa.Column("alert_email_enabled", sa.Boolean(), nullable=False),
+            sa.Column("alert_sms_enabled", sa.Boolean(), nullable=False),
+            sa.Column("alert_phone", sa.String(length=64), nullable=True),
+            sa.Column("auto_renew_enabled", sa.Boolean(), nullable=False),
+            sa.Column("auto_renew_amount_cents", sa.Integer(), nullable=False),
+            sa.Column("auto_renew_threshold_cents", sa.Integer(), nullable=False),
+            sa.Column("auto_renew_interval_days", sa.Integer(), nullable=False),
+            sa.Column("auto_renew_last_at", sa.DateTime(), nullable=True),
+            sa.Column("paytr_utoken", sa.String(length=256), nullable=True),
+            sa.Column("paytr_ctoken", sa.String(length=256), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_institutions_name", "institutions", ["name"])
+        op.create_index("ix_institutions_tenant_slug", "institutions", ["tenant_slug"], unique=True)
+    if "passwordresettoken" not in existing:
+        op.create_table(
+            "passwordresettoken",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("token", sa.String(), nullable=False),
+            sa.Column("expires_at", sa.DateTime(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_passwordresettoken_email", "passwordresettoken", ["email"])
+        op.create_index("ix_passwordresettoken_expires_at", "passwordresettoken", ["expires_at"])
+        op.create_index("ix_passwordresettoken_token", "passwordresettoken", ["token"], unique=True)
+    if "paymentorder" not in existing:
+        op.create_table(
+            "paymentorder",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("merchant_oid", sa.String(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("customer_email", sa.String(), nullable=True),
+            sa.Column("product", sa.String(), nullable=False),
+            sa.Column("amount_kurus", sa.Integer(), nullable=False),
+            sa.Column("quantity", sa.Integer(), nullable=False),
+            sa.Column("currency", sa.String(), nullable=False),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("paytr_transaction_id", sa.String(), nullable=True),
+            sa.Column("is_processed", sa.Boolean(), nullable=False),
+            sa.Column("processed_at", sa.DateTime(), nullable=True),
+            sa.Column("coupon_code_used", sa.String(length=64), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("admin_note", sa.String(), nullable=True),
+            sa.Column("paid_at", sa.DateTime(), nullable=True),
+            sa.Column("paytr_payment_amount", sa.String(), nullable=True),
+            sa.Column("paytr_status", sa.String(), nullable=True),
+            sa.Column("raw_callback_json", sa.String(), nullable=True),
+            sa.Column("invoice_ettn", sa.String(), nullable=True),
+            sa.Column("invoice_gib_no", sa.String(), nullable=True),
+            sa.Column("refunded_at", sa.DateTime(), nullable=True),
+            sa.Column("refund_amount_kurus", sa.Integer(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_paymentorder_customer_email", "paymentorder", ["customer_email"])
+        op.create_index("ix_paymentorder_invoice_ettn", "paymentorder", ["invoice_ettn"])
+        op.create_index("ix_paymentorder_merchant_oid", "paymentorder", ["merchant_oid"], unique=True)
+        op.create_index("ix_paymentorder_paytr_transaction_id", "paymentorder", ["paytr_transaction_id"])
+    if "presence" not in existing:
+        op.create_table(
+            "presence",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("last_seen_at", sa.DateTime(), nullable=False),
+            sa.Column("ip", sa.String(), nullable=True),
+            sa.Column("country", sa.String(), nullable=True),
+            sa.Column("current_page", sa.String(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_presence_user_id", "presence", ["user_id"], unique=True)
+    if "pricingplan" not in existing:
+        op.create_table(
+            "pricingplan",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("code", sa.String(length=32), nullable=False),
+            sa.Column("product", sa.String(length=16), nullable=False),
+            sa.Column("price_cents", sa.Integer(), nullable=False),
+            sa.Column("display_order", sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_pricingplan_code", "pricingplan", ["code"], unique=True)
+    if "security_logs" not in existing:
+        op.create_table(
+            "security_logs",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("event", sa.String(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column("ip", sa.String(), nullable=True),
+            sa.Column("endpoint", sa.String(), nullable=True),
+            sa.Column("detail", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_security_logs_event", "security_logs", ["event"])
+        op.create_index("ix_security_logs_user_id", "security_logs", ["user_id"])
+    if "upload_logs" not in existing:
+        op.create_table(
+            "upload_logs",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column("filename", sa.String(), nullable=True),
+            sa.Column("file_size_bytes", sa.Integer(), nullable=True),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("error_message", sa.String(), nullable=True),
+            sa.Column("duration_ms", sa.Integer(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_upload_logs_user_id", "upload_logs", ["user_id"])
+    if "userregistration" not in existing:
+        op.create_table(
+            "userregistration",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("full_name", sa.String(), nullable=False),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column("verification_mail_sent_at", sa.DateTime(), nullable=True),
+            sa.Column("mail_send_error", sa.String(), nullable=True),
+            sa.Column("source", sa.String(), nullable=True),
+            sa.Column("ip_address", sa.String(), nullable=True),
+            sa.Column("frontend_ip_address", sa.String(), nullable=True),
+            sa.Column("user_agent", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("verified_at", sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_userregistration_created_at", "userregistration", ["created_at"])
+        op.create_index("ix_userregistration_email", "userregistration", ["email"])
+        op.create_index("ix_userregistration_status", "userregistration", ["status"])
+        op.create_index("ix_userregistration_user_id", "userregistration", ["user_id"])
+    if "enterprise_subscriptions" not in existing:
+        op.create_table(
+            "enterprise_subscriptions",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("institution_id", sa.Integer(), nullable=False),
+            sa.Column("plan_name", sa.String(length=64), nullable=False),
+            sa.Column("billing_status", sa.String(length=32), nullable=False),
+            sa.Column("start_date", sa.DateTime(), nullable=True),
+            sa.Column("end_date", sa.DateTime(), nullable=True),
+            sa.Column("quota_limit", sa.Integer(), nullable=False),
+            sa.Column("seat_limit", sa.Integer(), nullable=False),
+            sa.Column("notes", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(["institution_id"], ["institutions.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_enterprise_subscriptions_institution_id", "enterprise_subscriptions", ["institution_id"])
+    if "institution_invites" not in existing:
+        op.create_table(
+            "institution_invites",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("institution_id", sa.Integer(), nullable=False),
+            sa.Column("email", sa.String(length=255), nullable=False),
+            sa.Column("role", sa.String(length=32), nullable=False),
+            sa.Column("token", sa.String(length=128), nullable=False),
+            sa.Column("invited_by", sa.Integer(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("expires_at", sa.DateTime(), nullable=True),
+            sa.Column("accepted_at", sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(["institution_id"], ["institutions.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_institution_invites_email", "institution_invites", ["email"])
+        op.create_index("ix_institution_invites_institution_id", "institution_invites", ["institution_id"])
+        op.create_index("ix_institution_invites_token", "institution_invites", ["token"], unique=True)
+    if "tenant_wallet_transactions" not in existing:
+        op.create_table(
+            "tenant_wallet_transactions",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("institution_id", sa.Integer(), nullable=False),
+            sa.Column("amount_cents", sa.Integer(), nullable=False),
+            sa.Column("transaction_type", sa.String(length=32), nullable=False),
+            sa.Column("description", sa.String(length=512), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(["institution_id"], ["institutions.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(
+            "ix_tenant_wallet_transactions_institution_id", "tenant_wallet_transactions", ["institution_id"]
+        )
+        op.create_index(
+            "ix_tenant_wallet_tx_inst_created", "tenant_wallet_transactions", ["institution_id", "created_at", "id"]
+        )
+    if "user" not in existing:
+        op.create_table(
+            "user",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column("full_name", sa.String(), nullable=False),
+            sa.Column("email_verified_at", sa.DateTime(), nullable=True),
+            sa.Column("plan", sa.String(), nullable=False),
+            sa.Column("extra_credits", sa.Integer(), nullable=False),
+            sa.Column("phone", sa.String(), nullable=True),
+            sa.Column("country", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("is_banned", sa.Boolean(), nullable=False),
+            sa.Column("last_login_at", sa.DateTime(), nullable=True),
+            sa.Column("account_claimed_at", sa.DateTime(), nullable=True),
+            sa.Column("institution_id", sa.Integer(), nullable=True),
+            sa.Column("tenant_role", sa.String(length=32), nullable=False),
+            sa.Column("tenant_is_active", sa.Boolean(), nullable=False),
+            sa.ForeignKeyConstraint(["institution_id"], ["institutions.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_user_email", "user", ["email"], unique=True)
+        op.create_index("ix_user_inst_id", "user", ["institution_id", "id"])
+        op.create_index("ix_user_institution_id", "user", ["institution_id"])
+    if "analysis_jobs" not in existing:
+        op.create_table(
+            "analysis_jobs",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("analysis_record_id", sa.Integer(), nullable=True),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("duration_ms", sa.Integer(), nullable=True),
+            sa.Column("prompt_tokens", sa.Integer(), nullable=True),
+            sa.Column("completion_tokens", sa.Integer(), nullable=True),
+            sa.Column("cached_tokens", sa.Integer(), nullable=True),
+            sa.Column("error_message", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_analysis_jobs_analysis_record_id", "analysis_jobs", ["analysis_record_id"])
+        op.create_index("ix_analysis_jobs_user_id", "analysis_jobs", ["user_id"])
+    if "analysisrecord" not in existing:
+        op.create_table(
+            "analysisrecord",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("input_text", sa.String(), nullable=False),
+            sa.Column("result_text", sa.String(), nullable=False),
+            sa.Column("source", sa.String(), nullable=False),
+            sa.Column("doctor_notes", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.Column("original_filename", sa.String(), nullable=True),
+            sa.Column("original_stored_path", sa.String(), nullable=True),
+            sa.Column("is_favorite", sa.Boolean(), nullable=False),
+            sa.Column("plan_type", sa.String(length=16), nullable=False),
+            sa.Column("institution_id", sa.Integer(), nullable=True),
+            sa.Column("lang", sa.String(length=8), nullable=True),
+            sa.ForeignKeyConstraint(["institution_id"], ["institutions.id"]),
+            sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_analysisrecord_created_id", "analysisrecord", ["created_at", "id"])
+        op.create_index("ix_analysisrecord_institution_id", "analysisrecord", ["institution_id"])
+        op.create_index("ix_analysisrecord_plan_type", "analysisrecord", ["plan_type"])
+        op.create_index("ix_analysisrecord_user_created", "analysisrecord", ["user_id", "created_at", "id"])
+        op.create_index("ix_analysisrecord_user_id", "analysisrecord", ["user_id"])
+        op.create_index("ix_analysisrecord_user_updated", "analysisrecord", ["user_id", "updated_at", "id"])
+    if "guestlogintoken" not in existing:
+        op.create_table(
+            "guestlogintoken",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("token", sa.String(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("used", sa.Boolean(), nullable=False),
+            sa.Column("expires_at", sa.DateTime(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_guestlogintoken_expires_at", "guestlogintoken", ["expires_at"])
+        op.create_index("ix_guestlogintoken_token", "guestlogintoken", ["token"], unique=True)
+        op.create_index("ix_guestlogintoken_user_id", "guestlogintoken", ["user_id"])
+    if "institution_memberships" not in existing:
+        op.create_table(
+            "institution_memberships",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("institution_id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("role", sa.String(length=32), nullable=False),
+            sa.Column("invited_by", sa.Integer(), nullable=True),
+            sa.Column("invited_at", sa.DateTime(), nullable=True),
+            sa.Column("accepted_at", sa.DateTime(), nullable=True),
+            sa.Column("is_active", sa.Boolean(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(["institution_id"], ["institutions.id"]),
+            sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_institution_memberships_institution_id", "institution_memberships", ["institution_id"])
+        op.create_index("ix_institution_memberships_user_id", "institution_memberships", ["user_id"])
+    if "push_subscriptions" not in existing:
+        op.create_table(
+            "push_subscriptions",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("endpoint", sa.String(), nullable=False),
+            sa.Column("p256dh", sa.String(), nullable=False),
+            sa.Column("auth", sa.String(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=False),
+            sa.Column("deactivated_at", sa.DateTime(), nullable=True),
+            sa.Column("last_error", sa.String(length=64), nullable=True),
+            sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_push_subscriptions_endpoint", "push_subscriptions", ["endpoint"])
+        op.create_index("ix_push_subscriptions_is_active", "push_subscriptions", ["is_active"])
+        op.create_index("ix_push_subscriptions_user_id", "push_subscriptions", ["user_id"])
+    if "referral_codes" not in existing:
+        op.create_table(
+            "referral_codes",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("code", sa.String(length=32), nullable=False),
+            sa.Column("uses", sa.Integer(), nullable=False),
+            sa.Column("max_uses", sa.Integer(), nullable=True),
+            sa.Column("discount_percent", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=False),
+            sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_referral_codes_code", "referral_codes", ["code"], unique=True)
+        op.create_index("ix_referral_codes_user_id", "referral_codes", ["user_id"])
+    if "tenant_api_keys" not in existing:
+        op.create_table(
+            "tenant_api_keys",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("institution_id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(length=128), nullable=False),
+            sa.Column("key_hash", sa.String(length=128), nullable=False),
+            sa.Column("key_prefix", sa.String(length=16), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=False),
+            sa.Column("last_used_at", sa.DateTime(), nullable=True),
+            sa.Column("expires_at", sa.DateTime(), nullable=True),
+            sa.Column("created_by_user_id", sa.Integer(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(["created_by_user_id"], ["user.id"]),
+            sa.ForeignKeyConstraint(["institution_id"], ["institutions.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_tenant_api_keys_institution_id", "tenant_api_keys", ["institution_id"])
+        op.create_index("ix_tenant_api_keys_key_hash", "tenant_api_keys", ["key_hash"], unique=True)
+    if "tenant_audit_logs" not in existing:
+        op.create_table(
+            "tenant_audit_logs",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("institution_id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column("action", sa.String(length=64), nullable=False),
+            sa.Column("entity_type", sa.String(length=64), nullable=True),
+            sa.Column("entity_id", sa.Integer(), nullable=True),
+            sa.Column("ip_address", sa.String(length=64), nullable=True),
+            sa.Column("user_agent", sa.String(length=512), nullable=True),
+            sa.Column("detail", sa.String(length=1024), nullable=True),
+            sa.Column("metadata_json", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(["institution_id"], ["institutions.id"]),
+            sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_tenant_audit_logs_entity_id", "tenant_audit_logs", ["entity_id"])
+        op.create_index(
+            "ix_tenant_audit_logs_inst_created", "tenant_audit_logs", ["institution_id", "created_at", "id"]
+        )
+        op.create_index("ix_tenant_audit_logs_institution_id", "tenant_audit_logs", ["institution_id"])
+        op.create_index("ix_tenant_audit_logs_user_id", "tenant_audit_logs", ["user_id"])
+    if "enterprise_cases" not in existing:
+        op.create_table(
+            "enterprise_cases",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("institution_id", sa.Integer(), nullable=False),
+            sa.Column("uploaded_by_user_id", sa.Integer(), nullable=False),
+            sa.Column("source_filename", sa.String(length=512), nullable=True),
+            sa.Column("source_type", sa.String(length=32), nullable=False),
+            sa.Column("stored_path", sa.String(length=512), nullable=True),
+            sa.Column("input_text", sa.String(), nullable=True),
+            sa.Column("status", sa.String(length=32), nullable=False),
+            sa.Column("reviewed_by_user_id", sa.Integer(), nullable=True),
+            sa.Column("reviewed_at", sa.DateTime(), nullable=True),
+            sa.Column("review_notes", sa.String(), nullable=True),
+            sa.Column("analysis_record_id", sa.Integer(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(["analysis_record_id"], ["analysisrecord.id"]),
+            sa.ForeignKeyConstraint(["institution_id"], ["institutions.id"]),
+            sa.ForeignKeyConstraint(["reviewed_by_user_id"], ["user.id"]),
+            sa.ForeignKeyConstraint(["uploaded_by_user_id"], ["user.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(
+            "ix_enterprise_cases_inst_created", "enterprise_cases", ["institution_id", "created_at", "id"]
+        )
+        op.create_index("ix_enterprise_cases_institution_id", "enterprise_cases", ["institution_id"])
+        op.create_index("ix_enterprise_cases_status", "enterprise_cases", ["status"])
+        op.create_index("ix_enterprise_cases_uploaded_by_user_id", "enterprise_cases", ["uploaded_by_user_id"])
+    if "referral_usages" not in existing:
+        op.create_table(
+            "referral_usages",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("referral_code_id", sa.Integer(), nullable=False),
+            sa.Column("referred_user_id", sa.Integer(), nullable=False),
+            sa.Column("referrer_user_id", sa.Integer(), nullable=False),
+            sa.Column("reward_granted", sa.Boolean(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(["referral_code_id"], ["referral_codes.id"]),
+            sa.ForeignKeyConstraint(["referred_user_id"], ["user.id"]),
+            sa.ForeignKeyConstraint(["referrer_user_id"], ["user.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_referral_usages_referral_code_id", "referral_usages", ["referral_code_id"])
+        op.create_index("ix_referral_usages_referred_user_id", "referral_usages", ["referred_user_id"])
+        op.create_index("ix_referral_usages_referrer_user_id", "referral_usages", ["referrer_user_id"])
+    if "reportverification" not in existing:
+        op.create_table(
+            "reportverification",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("report_id", sa.String(), nullable=False),
+            sa.Column("analysis_id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("package_type", sa.String(), nullable=False),
+            sa.Column("language", sa.String(length=8), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("verification_code", sa.String(length=32), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=False),
+            sa.Column("report_status", sa.String(length=32), nullable=False),
+            sa.ForeignKeyConstraint(["analysis_id"], ["analysisrecord.id"]),
+            sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_reportverification_analysis_id", "reportverification", ["analysis_id"], unique=True)
+        op.create_index("ix_reportverification_is_active", "reportverification", ["is_active"])
+        op.create_index("ix_reportverification_language", "reportverification", ["language"])
+        op.create_index("ix_reportverification_package_type", "reportverification", ["package_type"])
+        op.create_index("ix_reportverification_report_id", "reportverification", ["report_id"], unique=True)
+        op.create_index("ix_reportverification_user_id", "reportverification", ["user_id"])
+        op.create_index("ix_reportverification_verification_code", "reportverification", ["verification_code"])
+    if "sharetoken" not in existing:
+        op.create_table(
+            "sharetoken",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("analysis_id", sa.Integer(), nullable=False),
+            sa.Column("token", sa.String(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(["analysis_id"], ["analysisrecord.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_sharetoken_analysis_id", "sharetoken", ["analysis_id"])
+        op.create_index("ix_sharetoken_token", "sharetoken", ["token"], unique=True)
+    if "enterprise_reports" not in existing:
+        op.create_table(
+            "enterprise_reports",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("case_id", sa.Integer(), nullable=False),
+            sa.Column("language", sa.String(length=8), nullable=False),
+            sa.Column("report_text", sa.String(), nullable=True),
+            sa.Column("approval_status", sa.String(length=32), nullable=False),
+            sa.Column("export_status", sa.String(length=32), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(["case_id"], ["enterprise_cases.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_enterprise_reports_case_id", "enterprise_reports", ["case_id"])
+
+    from app.core.migrate import apply_legacy_ddl
+    from app.services.search import ensure_search_index
+
+    apply_legacy_ddl(bind)
+    ensure_search_index(bind)
+
+
+def downgrade() -> None:
+    pass
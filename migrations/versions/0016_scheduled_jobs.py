@@ -0,0 +1,50 @@
+"""scheduled_jobs + job_runs
+
+Küme genelinde tek çalıştırma için iş başına satır kirası ve admin'de görünen çalıştırma geçmişi
+(app.services.scheduler).
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0016_scheduled_jobs"
+down_revision: Union[str, None] = "0015_startup_free_schema"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "scheduled_jobs",
+        sa.Column("name", sa.String(length=64), primary_key=True),
+        sa.Column("cron", sa.String(length=64), nullable=False),
+        sa.Column("enabled", sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column("next_run_at", sa.DateTime(), nullable=False),
+        sa.Column("lease_owner", sa.String(length=64), nullable=True),
+        sa.Column("lease_expires_at", sa.DateTime(), nullable=True),
+        sa.Column("attempt", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_run_at", sa.DateTime(), nullable=True),
+        sa.Column("last_status", sa.String(length=16), nullable=True),
+    )
+    op.create_index("ix_scheduled_jobs_next_run_at", "scheduled_jobs", ["next_run_at"])
+    op.create_table(
+        "job_runs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("job_name", sa.String(length=64), nullable=False),
+        sa.Column("owner", sa.String(length=64), nullable=False),
+        sa.Column("attempt", sa.Integer(), nullable=False, server_default="1"),
+        sa.Column("status", sa.String(length=16), nullable=False, server_default="running"),
+        sa.Column("started_at", sa.DateTime(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.Column("duration_ms", sa.Integer(), nullable=True),
+        sa.Column("result", sa.String(length=500), nullable=True),
+        sa.Column("error", sa.String(length=2000), nullable=True),
+    )
+    op.create_index("ix_job_runs_job_started", "job_runs", ["job_name", "started_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("job_runs")
+    op.drop_table("scheduled_jobs")
@@ -0,0 +1,58 @@
+"""auto_renew_attempts + kurum bakiye indeksleri
+
+Otomatik yenileme (kurum, dönem) başına tek deneme satırı tutar (çift çekim olmaz) ve periyodik işler
+yalnız eşik altındaki kurumları (auto_renew_enabled / is_active, billing_wallet_balance) indeksinden okur.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0017_auto_renew_attempts"
+down_revision: Union[str, None] = "0016_scheduled_jobs"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_INDEXES = (
+    ("ix_institutions_auto_renew_balance", "institutions", ["auto_renew_enabled", "billing_wallet_balance"]),
+    ("ix_institutions_active_balance", "institutions", ["is_active", "billing_wallet_balance"]),
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "auto_renew_attempts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("institution_id", sa.Integer(), sa.ForeignKey("institutions.id"), nullable=False),
+        sa.Column("period", sa.String(length=16), nullable=False),
+        sa.Column("merchant_oid", sa.String(length=64), nullable=False, unique=True),
+        sa.Column("attempt", sa.Integer(), nullable=False, server_default="1"),
+        sa.Column("amount_cents", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(length=16), nullable=False, server_default="pending"),
+        sa.Column("reason", sa.String(length=512), nullable=True),
+        sa.Column("reference_no", sa.String(length=64), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint("institution_id", "period", name="uq_auto_renew_attempts_inst_period"),
+    )
+    op.create_index(
+        "ix_auto_renew_attempts_inst_created", "auto_renew_attempts", ["institution_id", "created_at", "id"]
+    )
+    # Büyük tabloda elle (ör. CREATE INDEX CONCURRENTLY) önceden açılmış indeks atlanır
+    existing = _institution_indexes()
+    for name, table, cols in _INDEXES:
+        if name not in existing:
+            op.create_index(name, table, cols)
+
+
+def downgrade() -> None:
+    existing = _institution_indexes()
+    for name, table, _ in _INDEXES:
+        if name in existing:
+            op.drop_index(name, table_name=table)
+    op.drop_table("auto_renew_attempts")
+
+
+def _institution_indexes() -> set[str]:
+    return {ix["name"] for ix in sa.inspect(op.get_bind()).get_indexes("institutions")}
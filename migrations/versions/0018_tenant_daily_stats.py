@@ -0,0 +1,65 @@
+"""tenant_daily_stats: kurum bazlı günlük sayaçlar
+
+Kurum panosu istatistikleri (get_tenant_stats / get_tenant_audit_stats) ham vaka, denetim ve cüzdan
+kayıtlarını saymak yerine bu tablodan tek aralık taramasıyla okunur. Mevcut kayıtlardan SQL ile doldurulur
+(app.services.tenant_rollups.rebuild_tenant_rollups ile aynı sayaçlar; uygulama koduna bağlı değildir).
+"""
+
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0018_tenant_daily_stats"
+down_revision: Union[str, None] = "0017_auto_renew_attempts"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Tüm zamanlar sayaçlarının tutulduğu sabit gün (tenant_rollups.TOTALS_DAY)
+_TOTALS_DAY = date(1970, 1, 1)
+
+# (kurum, gün, metrik, değer) seçimleri; her biri ayrı metrikler üretir, birincil anahtar çakışmaz
+_BACKFILL = (
+    "SELECT institution_id, DATE(created_at), 'analyses', COUNT(*) FROM analysisrecord "
+    "WHERE institution_id IS NOT NULL GROUP BY institution_id, DATE(created_at)",
+    "SELECT institution_id, DATE(created_at), 'cases', COUNT(*) FROM enterprise_cases "
+    "WHERE institution_id IS NOT NULL GROUP BY institution_id, DATE(created_at)",
+    "SELECT institution_id, :totals_day, 'cases', COUNT(*) FROM enterprise_cases "
+    "WHERE institution_id IS NOT NULL GROUP BY institution_id",
+    "SELECT institution_id, :totals_day, 'status:' || status, COUNT(*) FROM enterprise_cases "
+    "WHERE institution_id IS NOT NULL AND status IS NOT NULL GROUP BY institution_id, status",
+    "SELECT c.institution_id, DATE(r.created_at), 'reports', COUNT(*) FROM enterprise_reports r "
+    "JOIN enterprise_cases c ON c.id = r.case_id "
+    "WHERE c.institution_id IS NOT NULL GROUP BY c.institution_id, DATE(r.created_at)",
+    "SELECT institution_id, DATE(created_at), 'credits_spent', -SUM(amount_cents) FROM tenant_wallet_transactions "
+    "WHERE institution_id IS NOT NULL AND amount_cents < 0 GROUP BY institution_id, DATE(created_at)",
+    "SELECT institution_id, DATE(created_at), 'credits_loaded', SUM(amount_cents) FROM tenant_wallet_transactions "
+    "WHERE institution_id IS NOT NULL AND amount_cents > 0 GROUP BY institution_id, DATE(created_at)",
+    "SELECT institution_id, DATE(created_at), 'actions', COUNT(*) FROM tenant_audit_logs "
+    "WHERE institution_id IS NOT NULL GROUP BY institution_id, DATE(created_at)",
+    "SELECT institution_id, DATE(created_at), 'action:' || action, COUNT(*) FROM tenant_audit_logs "
+    "WHERE institution_id IS NOT NULL AND action IS NOT NULL GROUP BY institution_id, DATE(created_at), action",
+    "SELECT institution_id, DATE(created_at), 'user:' || CAST(user_id AS VARCHAR), COUNT(*) FROM tenant_audit_logs "
+    "WHERE institution_id IS NOT NULL AND user_id IS NOT NULL GROUP BY institution_id, DATE(created_at), user_id",
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "tenant_daily_stats",
+        sa.Column("institution_id", sa.Integer(), sa.ForeignKey("institutions.id"), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("metric", sa.String(length=80), primary_key=True),
+        sa.Column("value", sa.Integer(), nullable=False, server_default="0"),
+    )
+    bind = op.get_bind()
+    for select_sql in _BACKFILL:
+        stmt = sa.text(f"INSERT INTO tenant_daily_stats (institution_id, day, metric, value) {select_sql}")
+        if ":totals_day" in select_sql:
+            stmt = stmt.bindparams(sa.bindparam("totals_day", _TOTALS_DAY, type_=sa.Date()))
+        bind.execute(stmt)
+
+
+def downgrade() -> None:
+    op.drop_table("tenant_daily_stats")
@@ -16,7 +16,7 @@ export type RootStackParamList = {
   Login: undefined;
   Register: undefined;
   Analyze: undefined;
-  Report: { result: string };
+  Report: { result: string; analysisId?: number };
   History: undefined;
 };
 
@@ -65,6 +65,7 @@ export default function App() {
             {({ navigation, route }) => (
               <ReportScreen
                 result={route.params.result}
+                analysisId={route.params.analysisId}
                 onBack={() => navigation.goBack()}
               />
             )}
@@ -72,7 +73,7 @@ export default function App() {
           <Stack.Screen name="History">
             {({ navigation }) => (
               <HistoryScreen
-                onOpenReport={(text) => navigation.navigate('Report', { result: text })}
+                onOpenReport={(text, analysisId) => navigation.navigate('Report', { result: text, analysisId })}
                 onBack={() => navigation.goBack()}
               />
             )}
@@ -1,4 +1,5 @@
-import { api } from './client';
+import { api, apiRevalidate } from './client';
+import { readCache, writeCache } from './cache';
 
 export type AnalyzeResponse = {
   sonuc: string;
@@ -82,3 +83,66 @@ export type AnalysisDetail = {
 export async function getAnalysisDetail(id: number) {
   return api<AnalysisDetail>(`/analyze/history/${id}`);
 }
+
+/** Delta-sync liste öğesi: result_text taşımaz, sadece önizleme. */
+export type HistorySyncItem = {
+  id: number;
+  result_preview: string;
+  source: string;
+  created_at: string;
+  updated_at: string;
+  is_favorite: boolean;
+  plan_type?: string;
+};
+
+type HistorySyncPage = {
+  items: HistorySyncItem[];
+  has_more: boolean;
+  next_cursor: string | null;
+  sync_cursor: string | null;
+};
+
+type HistoryCache = { cursor: string | null; items: HistorySyncItem[] };
+
+const HISTORY_CACHE_KEY = 'history-v1';
+const SYNC_PAGE_SIZE = 200;
+
+function sortHistory(items: HistorySyncItem[]): HistorySyncItem[] {
+  return items.sort((a, b) => (a.created_at < b.created_at ? 1 : a.created_at > b.created_at ? -1 : b.id - a.id));
+}
+
+/** Önbellekteki geçmiş (ağ beklemeden ekrana basmak için). */
+export async function getCachedHistory(): Promise<HistorySyncItem[]> {
+  const cached = await readCache<HistoryCache>(HISTORY_CACHE_KEY);
+  return cached?.items ?? [];
+}
+
+/**
+ * Geçmişi sunucuyla eşitler: sadece son cursor'dan sonra eklenen/değişen kayıtları indirir,
+ * önbellekle birleştirip yeni cursor ile birlikte saklar.
+ */
+export async function syncHistory(): Promise<{ data: HistorySyncItem[]; error?: string; status: number }> {
+  const cached = (await readCache<HistoryCache>(HISTORY_CACHE_KEY)) ?? { cursor: null, items: [] };
+  const byId = new Map(cached.items.map((i) => [i.id, i]));
+  let cursor = cached.cursor;
+  let status = 200;
+  for (;;) {
+    const qs = `limit=${SYNC_PAGE_SIZE}${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`;
+    const res = await api<HistorySyncPage>(`/api/mobile/history/sync?${qs}`);
+    status = res.status;
+    if (res.error || !res.data) {
+      return { data: sortHistory([...byId.values()]), error: res.error, status };
+    }
+    for (const item of res.data.items) byId.set(item.id, item);
+    cursor = res.data.next_cursor;
+    if (!res.data.has_more) break;
+  }
+  const items = sortHistory([...byId.values()]);
+  await writeCache<HistoryCache>(HISTORY_CACHE_KEY, { cursor, items });
+  return { data: items, status };
+}
+
+/** Rapor gövdesi; ETag ile yeniden doğrulanır, değişmediyse önbellekten gelir (304). */
+export async function getReport(id: number) {
+  return apiRevalidate<AnalysisDetail>(`/api/mobile/history/${id}/report`, `report-${id}`);
+}
@@ -0,0 +1,42 @@
+import { Directory, File, Paths } from 'expo-file-system';
+
+/**
+ * Yerel JSON önbelleği (cihazın cache dizini).
+ * Geçmiş listesi + sync cursor ve ETag'li rapor gövdeleri burada tutulur;
+ * OS cache'i temizlerse uygulama bir sonraki açılışta tam senkronizasyon yapar.
+ */
+const CACHE_DIR = new Directory(Paths.cache, 'norya-api');
+
+function cacheFile(key: string): File {
+  return new File(CACHE_DIR, `${key.replace(/[^a-zA-Z0-9_-]/g, '_')}.json`);
+}
+
+export async function readCache<T>(key: string): Promise<T | null> {
+  try {
+    const file = cacheFile(key);
+    if (!file.exists) return null;
+    return JSON.parse(await file.text()) as T;
+  } catch {
+    return null;
+  }
+}
+
+export async function writeCache<T>(key: string, value: T): Promise<void> {
+  try {
+    if (!CACHE_DIR.exists) CACHE_DIR.create({ intermediates: true });
+    const file = cacheFile(key);
+    if (!file.exists) file.create();
+    file.write(JSON.stringify(value));
+  } catch (e) {
+    console.warn('Cache write failed:', e);
+  }
+}
+
+/** Çıkışta kullanıcıya ait tüm önbelleği siler. */
+export async function clearCache(): Promise<void> {
+  try {
+    if (CACHE_DIR.exists) CACHE_DIR.delete();
+  } catch {
+    // yok say
+  }
+}
@@ -1,5 +1,6 @@
 import * as SecureStore from 'expo-secure-store';
 import { API_BASE_URL } from '../config';
+import { clearCache, readCache, writeCache } from './cache';
 
 const TOKEN_KEY = 'norya_token';
 
@@ -13,7 +14,11 @@ export async function getStoredToken(): Promise<string | null> {
 
 export async function setStoredToken(token: string | null): Promise<void> {
   if (token) await SecureStore.setItemAsync(TOKEN_KEY, token);
-  else await SecureStore.deleteItemAsync(TOKEN_KEY);
+  else {
+    await SecureStore.deleteItemAsync(TOKEN_KEY);
+    // Çıkışta önceki kullanıcının geçmiş/rapor önbelleği kalmasın
+    await clearCache();
+  }
 }
 
 export async function api<T>(
@@ -50,3 +55,46 @@ export async function api<T>(
     return { error: msg, status: 0 };
   }
 }
+
+type CachedResponse<T> = { etag: string | null; data: T };
+
+/**
+ * ETag ile yeniden doğrulanan GET: önbellekte kayıt varsa If-None-Match gönderir,
+ * 304 gelirse gövde indirilmeden önbellekteki veri döner.
+ * Ağ hatasında önbellekteki veri (varsa) `stale: true` ile döner.
+ */
+export async function apiRevalidate<T>(
+  path: string,
+  cacheKey: string
+): Promise<{ data?: T; error?: string; status: number; stale?: boolean }> {
+  const cached = await readCache<CachedResponse<T>>(cacheKey);
+  const headers: Record<string, string> = {};
+  if (cached?.etag) headers['If-None-Match'] = cached.etag;
+  const auth = await getStoredToken();
+  if (auth) headers['Authorization'] = `Bearer ${auth}`;
+
+  const url = `${API_BASE_URL.replace(/\/$/, '')}${path.startsWith('/') ? path : `/${path}`}`;
+  try {
+    const res = await fetch(url, { headers });
+    if (res.status === 304 && cached) {
+      return { data: cached.data, status: 304 };
+    }
+    const text = await res.text();
+    let data: T | undefined;
+    try {
+      data = text ? (JSON.parse(text) as T) : undefined;
+    } catch {
+      return { error: text || res.statusText, status: res.status };
+    }
+    if (!res.ok) {
+      const errMsg = (data as { detail?: string })?.detail || text || res.statusText;
+      return { error: typeof errMsg === 'string' ? errMsg : JSON.stringify(errMsg), status: res.status };
+    }
+    await writeCache<CachedResponse<T>>(cacheKey, { etag: res.headers.get('ETag'), data: data as T });
+    return { data: data as T, status: res.status };
+  } catch (e) {
+    if (cached) return { data: cached.data, status: 0, stale: true };
+    const msg = e instanceof Error ? e.message : 'Bağlantı hatası';
+    return { error: msg, status: 0 };
+  }
+}
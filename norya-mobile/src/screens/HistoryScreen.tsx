@@ -9,24 +9,30 @@ import {
   Alert,
   RefreshControl,
 } from 'react-native';
-import { getHistory, getAnalysisDetail } from '../api/analyze';
-import type { HistoryItem } from '../api/analyze';
+import { getCachedHistory, getReport, syncHistory } from '../api/analyze';
+import type { HistorySyncItem } from '../api/analyze';
 import { colors } from '../theme/colors';
 
 export default function HistoryScreen({
   onOpenReport,
   onBack,
 }: {
-  onOpenReport: (text: string) => void;
+  onOpenReport: (text: string, analysisId: number) => void;
   onBack: () => void;
 }) {
-  const [items, setItems] = useState<HistoryItem[]>([]);
+  const [items, setItems] = useState<HistorySyncItem[]>([]);
   const [loading, setLoading] = useState(true);
   const [refreshing, setRefreshing] = useState(false);
 
   const load = useCallback(async () => {
-    const res = await getHistory();
-    setItems(res.data ?? []);
+    // Önce önbellek (anında), sonra sadece değişen kayıtlar için delta-sync
+    const cached = await getCachedHistory();
+    if (cached.length) {
+      setItems(cached);
+      setLoading(false);
+    }
+    const res = await syncHistory();
+    setItems(res.data);
     setLoading(false);
     setRefreshing(false);
     if (res.error && res.status === 401) return;
@@ -43,19 +49,19 @@ export default function HistoryScreen({
   };
 
   const openItem = async (id: number) => {
-    const res = await getAnalysisDetail(id);
-    if (res.data) onOpenReport(res.data.result_text);
+    const res = await getReport(id);
+    if (res.data) onOpenReport(res.data.result_text, id);
     else if (res.error) Alert.alert('Hata', res.error);
   };
 
-  const renderItem = ({ item }: { item: HistoryItem }) => (
+  const renderItem = ({ item }: { item: HistorySyncItem }) => (
     <TouchableOpacity
       style={styles.item}
       onPress={() => openItem(item.id)}
       activeOpacity={0.7}
     >
       <Text style={styles.itemPreview} numberOfLines={2}>
-        {item.result_preview || item.input_preview}
+        {item.result_preview}
       </Text>
       <Text style={styles.itemMeta}>
         {item.source} • {formatDate(item.created_at)}
@@ -1,14 +1,31 @@
-import React from 'react';
+import React, { useEffect, useState } from 'react';
 import { View, Text, StyleSheet, ScrollView, TouchableOpacity } from 'react-native';
+import { getReport } from '../api/analyze';
 import { colors } from '../theme/colors';
 
 export default function ReportScreen({
   result,
+  analysisId,
   onBack,
 }: {
   result: string;
+  analysisId?: number;
   onBack: () => void;
 }) {
+  const [text, setText] = useState(result);
+
+  useEffect(() => {
+    // Sadece id ile açılan rapor (örn. bildirimden): önbellek + ETag ile yükle; değişmediyse sunucu 304 döner
+    if (analysisId == null || result) return;
+    let active = true;
+    getReport(analysisId).then((res) => {
+      if (active && res.data?.result_text) setText(res.data.result_text);
+    });
+    return () => {
+      active = false;
+    };
+  }, [analysisId, result]);
+
   return (
     <View style={styles.container}>
       <View style={styles.header}>
@@ -22,7 +39,7 @@ export default function ReportScreen({
         contentContainerStyle={styles.scrollContent}
         showsVerticalScrollIndicator={true}
       >
-        <Text style={styles.body}>{result}</Text>
+        <Text style={styles.body}>{text}</Text>
       </ScrollView>
     </View>
   );
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Birim testlerinden çıkarılan süre ölçümleri: önce/sonra karşılaştırmaları.
+
+Testler yalnız davranışı ve sınırları doğrular; buradaki sayılar makineye göre değişir, CI'da koşulmaz.
+Ölçüm girdileri (PDF, tahlil metni, rapor HTML'i) bu dosyada üretilir; tests/ paketine bağımlı değildir.
+Kullanım: proje kökünden  .venv/bin/python scripts/bench_hot_paths.py [pdf_extract|asset_cache|pdf_render|db_saves|replica_writes|login_flood|guest_cpu ...]
+NORYA_BENCH_PG_URL verilirse db_saves Postgres profilini de ölçer.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+LAB_TEXT = (
+    "LDL 162 mg/dL 0-100\nHemoglobin 10.9 g/dL 12-16\nGlukoz 92 mg/dL 70-100\nTSH 2.1 mIU/L 0.4-4.0\n"
+    "Ferritin 8 ng/mL 15-150\nHDL 45 mg/dL 40-60\nALT 22 U/L 0-40\nB12 300 pg/mL 200-900"
+)
+VERIFY_URL = "https://noryaai.com/verify/3f9c2a"
+TREND = {"dates": ["2026-01-10", "2026-04-02", "2026-07-15"], "ldl": [171, 165, 162], "glucose": [95, 90, 92], "crp": [3.1, 2.0, 1.2]}
+
+
+@contextmanager
+def patched(obj, name, value):
+    """Ölçüm süresince tek bir özniteliği değiştirir."""
+    old = getattr(obj, name)
+    setattr(obj, name, value)
+    try:
+        yield
+    finally:
+        setattr(obj, name, old)
+
+
+def lab_pdf(n_pages: int) -> bytes:
+    """Helvetica ile her sayfasında birkaç tahlil satırı olan düz metin PDF."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for i in range(n_pages):
+        lines = [f"Sayfa {i + 1}", f"Hemoglobin {12 + i * 0.1:.1f} g/dL 12-16", f"Glukoz {80 + i} mg/dL 70-100",
+                 f"Ferritin {20 + i} ng/mL 15-150"]
+        stream = "\n".join(["BT", "/F1 11 Tf", "14 TL", "72 760 Td", *(f"({line}) Tj T*" for line in lines), "ET"])
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def bench_pdf_extract(tmp):
+    """Sayfa/sn: süreç havuzu vs sıralı (1/10/50 sayfa)."""
+    from app.services import pdf_extract
+
+    pdf_extract.PARALLEL_MIN_PAGES = 1
+    pdf_extract.PDF_WORKERS = max(2, pdf_extract.PDF_WORKERS)
+    get_pool = pdf_extract._get_pool
+    for n_pages in (1, 10, 50):
+        content = lab_pdf(n_pages)
+        rates = {}
+        for label, pool_fn in (("paralel", get_pool), ("sıralı", lambda: None)):
+            pdf_extract._get_pool = pool_fn
+            pdf_extract.extract_pdf(content)  # havuz ısınması
+            t0 = time.perf_counter()
+            for _ in range(5):
+                pdf_extract.extract_pdf(content)
+            rates[label] = n_pages * 5 / (time.perf_counter() - t0)
+        pdf_extract._get_pool = get_pool
+        print(f"[pdf {n_pages:>2} sayfa] paralel({pdf_extract.PDF_WORKERS} worker) "
+              f"{rates['paralel']:,.0f} sayfa/sn, sıralı {rates['sıralı']:,.0f} sayfa/sn")
+    pdf_extract.shutdown_pool()
+
+
+def bench_asset_cache(tmp):
+    """Premium render (WeasyPrint hariç): önbelleksiz vs önbellekli."""
+    from app.charts.asset_cache import asset_cache
+    from app.services import report_pdf
+    from app.services.analyze import degraded_blood_test_report
+    from app.services.report_verification import _qr_png_base64
+
+    def html_only(context):
+        return report_pdf._ENV.get_template("report_premium.html").render(**context).encode("utf-8")
+
+    sonuc = degraded_blood_test_report(LAB_TEXT, "tr")["sonuc"]
+
+    def render():
+        verification = {"report_id": "r-1", "verification_url": VERIFY_URL, "verification_code": "K7M2P9QX",
+                        "qr_image_base64": _qr_png_base64(VERIFY_URL)}
+        return report_pdf.build_report_pdf(sonuc, lang="tr", plan_name="yearly", trend_data=TREND, verification_info=verification)
+
+    with patched(report_pdf, "render_premium_pdf", html_only):
+        render()
+        cold, warm = [], []
+        for _ in range(5):
+            asset_cache().clear()
+            t0 = time.perf_counter()
+            render()
+            cold.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            render()
+            warm.append(time.perf_counter() - t0)
+    print(f"[premium render] önbelleksiz {min(cold) * 1000:.1f} ms, önbellekli {min(warm) * 1000:.1f} ms (WeasyPrint hariç)")
+
+
+def bench_pdf_render(tmp):
+    """Render/sn/çekirdek: satır içi CSS vs paylaşılan render bağlamı."""
+    from weasyprint import HTML
+
+    from app.services import pdf_render, report_pdf
+    from app.services.analyze import degraded_blood_test_report
+    from app.services.pdf_render import REPORT_STYLESHEETS, STATIC_DIR
+
+    class Capture:
+        def render_report(self, kind, html):
+            self.page = (kind, html)
+            return b""
+
+    capture = Capture()
+    with patched(report_pdf, "render_context", lambda: capture):
+        report_pdf.build_report_pdf(degraded_blood_test_report(LAB_TEXT, "tr")["sonuc"], lang="tr", plan_name="yearly")
+    kind, html = capture.page
+    css = "\n".join((STATIC_DIR / name).read_text(encoding="utf-8") for name in REPORT_STYLESHEETS[kind])
+    inline_html = html.replace("<head>", f"<head>\n<style>\n{css}\n</style>", 1)
+    ctx = pdf_render.render_context()
+    ctx.render_report(kind, html)
+
+    def per_second(render, n=5):
+        t0 = time.process_time()
+        for _ in range(n):
+            render()
+        return n / (time.process_time() - t0)
+
+    # Eski yol: stiller HTML'de satır içi, her render'da ayrıştırma, varsayılan fetcher
+    legacy = per_second(lambda: HTML(string=inline_html, base_url=str(pdf_render._PROJECT_ROOT)).write_pdf())
+    shared = per_second(lambda: ctx.render_report(kind, html))
+    print(f"[pdf render/s/core] satır içi CSS {legacy:.2f}, paylaşılan bağlam {shared:.2f} ({shared / legacy:.2f}x)")
+
+
+def saves_per_second(engine, writers=4, readers=4, seconds=1.0) -> tuple[float, int]:
+    """Yazan thread'ler analiz kaydeder, okuyanlar geçmiş listeler; (kayıt/s, kilit hatası) döner."""
+    from sqlalchemy.exc import OperationalError
+    from sqlmodel import Session, SQLModel, func, select
+
+    from app.models import AnalysisRecord
+
+    SQLModel.metadata.create_all(engine, tables=[AnalysisRecord.__table__])
+    stop = time.perf_counter() + seconds
+    saved, errors, lock = [0], [0], threading.Lock()
+
+    def write(user_id):
+        while time.perf_counter() < stop:
+            try:
+                with Session(engine) as db:
+                    db.add(AnalysisRecord(user_id=user_id, input_text=LAB_TEXT, result_text="rapor"))
+                    db.commit()
+                with lock:
+                    saved[0] += 1
+            except OperationalError:
+                with lock:
+                    errors[0] += 1
+
+    def read(user_id):
+        while time.perf_counter() < stop:
+            try:
+                with Session(engine) as db, db.begin():
+                    db.exec(select(func.count()).select_from(AnalysisRecord).where(AnalysisRecord.user_id == user_id)).one()
+                    db.exec(select(AnalysisRecord).where(AnalysisRecord.user_id == user_id)
+                            .order_by(AnalysisRecord.created_at.desc()).limit(20)).all()
+            except OperationalError:
+                with lock:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=read, args=(i,)) for i in range(readers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    rate = saved[0] / (time.perf_counter() - started)
+    engine.dispose()
+    return rate, errors[0]
+
+
+def bench_db_saves(tmp):
+    """Kayıt/sn (4 yazan + 4 okuyan): varsayılan SQLite vs WAL profili (ve isteğe bağlı Postgres)."""
+    from sqlmodel import create_engine
+
+    from app.core.db_profiles import build_engine
+
+    default_rate, default_errors = saves_per_second(
+        create_engine(f"sqlite:///{tmp}/default.db", connect_args={"check_same_thread": False})
+    )
+    tuned_rate, tuned_errors = saves_per_second(build_engine(f"sqlite:///{tmp}/tuned.db"))
+    lines = [
+        f"sqlite varsayılan {default_rate:.0f}/s (kilit hatası {default_errors}), "
+        f"WAL profili {tuned_rate:.0f}/s (kilit hatası {tuned_errors})"
+    ]
+    pg_url = os.environ.get("NORYA_BENCH_PG_URL")
+    if pg_url:
+        pg_rate, pg_errors = saves_per_second(build_engine(pg_url))
+        lines.append(f"postgres profili {pg_rate:.0f}/s (hata {pg_errors})")
+    print("[db kayıt/s, 4 yazan + 4 okuyan] " + "; ".join(lines))
+
+
+def bench_replica_writes(tmp):
+    """Analitik sorguları birincilde vs replikada çalışırken yazma gecikmesi (p95, ms)."""
+    from sqlmodel import Session, SQLModel, select
+
+    from app.core.db_profiles import build_engine
+    from app.models import AnalysisRecord
+
+    primary = build_engine(f"sqlite:///{tmp}/primary.db")
+    replica = build_engine(f"sqlite:///{tmp}/replica.db")
+    for eng in (primary, replica):
+        SQLModel.metadata.create_all(eng, tables=[AnalysisRecord.__table__])
+        with Session(eng) as db:
+            db.add_all([AnalysisRecord(user_id=i % 50, input_text=LAB_TEXT, result_text="r" * 500) for i in range(5000)])
+            db.commit()
+
+    def write_p95(analytics_engine) -> float:
+        stop = threading.Event()
+
+        def analytics():
+            while not stop.is_set():
+                with Session(analytics_engine) as db:
+                    db.exec(select(AnalysisRecord.user_id, AnalysisRecord.result_text)
+                            .order_by(AnalysisRecord.result_text, AnalysisRecord.user_id)).all()
+
+        readers = [threading.Thread(target=analytics) for _ in range(2)]
+        for t in readers:
+            t.start()
+        latencies = []
+        try:
+            for _ in range(40):
+                t0 = time.perf_counter()
+                with Session(primary) as db:
+                    db.add(AnalysisRecord(user_id=1, input_text=LAB_TEXT, result_text="rapor"))
+                    db.commit()
+                latencies.append(time.perf_counter() - t0)
+        finally:
+            stop.set()
+            for t in readers:
+                t.join()
+        latencies.sort()
+        return latencies[int(len(latencies) * 0.95)] * 1000
+
+    on_primary, on_replica = write_p95(primary), write_p95(replica)
+    primary.dispose()
+    replica.dispose()
+    print(f"[yazma p95 ms] analitik birincilde {on_primary:.1f}, replikada {on_replica:.1f}")
+
+
+async def max_loop_lag(flood) -> float:
+    """flood() sürerken event loop'taki en büyük gecikme (sn)."""
+    lags, stop = [], asyncio.Event()
+
+    async def ticker():
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lags.append(time.perf_counter() - t0 - 0.005)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0.02)
+    await flood()
+    stop.set()
+    await tick
+    return max(lags)
+
+
+def bench_login_flood(tmp):
+    """Eşzamanlı 8 doğrulama sırasında event loop'taki en büyük gecikme (ms): senkron vs KDF havuzu."""
+    import bcrypt
+
+    from app.core.passwords import PasswordHasher
+    from app.core.security import verify_password
+
+    hashed = bcrypt.hashpw(b"flood-sifre", bcrypt.gensalt(rounds=10)).decode()
+    hasher = PasswordHasher(workers=2, queue_max=16)
+
+    async def sync_flood():
+        for _ in range(8):
+            verify_password("flood-sifre", hashed)
+            await asyncio.sleep(0)
+
+    async def pooled_flood():
+        await asyncio.gather(*(hasher.verify_async("flood-sifre", hashed) for _ in range(8)))
+
+    blocking = asyncio.run(max_loop_lag(sync_flood)) * 1000
+    pooled = asyncio.run(max_loop_lag(pooled_flood)) * 1000
+    print(f"[giriş seli, loop max gecikme ms] senkron bcrypt {blocking:.1f}, KDF havuzu {pooled:.1f}")
+
+
+def bench_guest_cpu(tmp):
+    """Yeni misafir başına CPU: eski yol (bcrypt) vs şifresiz upsert."""
+    from sqlmodel import Session, SQLModel
+
+    from app.api.deps import _get_or_create_anonymous_user
+    from app.core.db_profiles import build_engine
+    from app.core.security import hash_password
+
+    file_engine = build_engine(f"sqlite:///{tmp}/burst.db")
+    SQLModel.metadata.create_all(file_engine)
+    n = 50
+    t0 = time.process_time()
+    for _ in range(3):
+        hash_password("x" * 64)
+    bcrypt_per_guest = (time.process_time() - t0) / 3
+    with Session(file_engine) as db:
+        t0 = time.process_time()
+        for i in range(n):
+            _get_or_create_anonymous_user(db, f"10.0.{i // 256}.{i % 256}")
+        upsert_per_guest = (time.process_time() - t0) / n
+    file_engine.dispose()
+    print(f"[yeni misafir CPU ms] bcrypt {bcrypt_per_guest * 1000:.1f}, şifresiz upsert {upsert_per_guest * 1000:.2f}")
+
+
+BENCHES = {
+    "pdf_extract": bench_pdf_extract,
+    "asset_cache": bench_asset_cache,
+    "pdf_render": bench_pdf_render,
+    "db_saves": bench_db_saves,
+    "replica_writes": bench_replica_writes,
+    "login_flood": bench_login_flood,
+    "guest_cpu": bench_guest_cpu,
+}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("names", nargs="*", help="ölçümler (boş = hepsi): " + ", ".join(BENCHES))
+    args = ap.parse_args()
+    unknown = [n for n in args.names if n not in BENCHES]
+    if unknown:
+        ap.error("bilinmeyen ölçüm: " + ", ".join(unknown))
+    for name in args.names or BENCHES:
+        with tempfile.TemporaryDirectory() as tmp:
+            BENCHES[name](tmp)
+
+
+if __name__ == "__main__":
+    main()
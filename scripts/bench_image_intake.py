@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Görsel ön işleme ölçümü: bir klasördeki örnek tahlil fotoğraflarında istek boyutu ve hazırlama süresi.
+
+--live verilirse her görsel OpenAI Vision'a ham ve hazırlanmış olarak gönderilir; gecikme ve token karşılaştırılır.
+Kullanım: proje kökünden  .venv/bin/python scripts/bench_image_intake.py ./ornek_fotograflar [--live] [--lang tr]
+"""
+import argparse
+import base64
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+MIME = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png"}
+
+
+def _payload_bytes(data: bytes) -> int:
+    """data URL olarak istek gövdesine giren bayt (base64)."""
+    return len(base64.standard_b64encode(data))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("folder")
+    ap.add_argument("--live", action="store_true")
+    ap.add_argument("--lang", default="tr")
+    args = ap.parse_args()
+
+    from app.services.analyze import VISION_DETAIL, analyze_blood_test_from_image
+    from app.services.image_intake import prepare_image
+
+    files = sorted(
+        f for f in os.listdir(args.folder) if os.path.splitext(f)[1].lower() in MIME
+    )
+    if not files:
+        print("Klasörde JPG/PNG yok.")
+        return 1
+    tot_raw = tot_prep = 0
+    by_fingerprint: dict[str, list[str]] = {}
+    for name in files:
+        path = os.path.join(args.folder, name)
+        mime = MIME[os.path.splitext(name)[1].lower()]
+        with open(path, "rb") as fh:
+            raw = fh.read()
+        t0 = time.perf_counter()
+        p = prepare_image(raw, mime, detail=VISION_DETAIL)
+        prep_ms = (time.perf_counter() - t0) * 1000
+        tot_raw += _payload_bytes(raw)
+        tot_prep += _payload_bytes(p.data)
+        by_fingerprint.setdefault(p.fingerprint, []).append(name)
+        print(
+            f"{name}: {_payload_bytes(raw) // 1024} KB -> {_payload_bytes(p.data) // 1024} KB "
+            f"({p.width}x{p.height}) hazırlama={prep_ms:.0f} ms phash={p.phash}"
+        )
+        if args.live:
+            for label, data, m in (("ham", raw, mime), ("hazır", p.data, p.mime)):
+                t0 = time.perf_counter()
+                _, usage = analyze_blood_test_from_image(data, m, lang=args.lang)
+                print(f"    {label}: {round((time.perf_counter() - t0) * 1000)} ms usage={usage}")
+    dupes = [names for names in by_fingerprint.values() if len(names) > 1]
+    print(f"toplam istek gövdesi: {tot_raw // 1024} KB -> {tot_prep // 1024} KB ({(1 - tot_prep / max(tot_raw, 1)) * 100:.1f}% daha az)")
+    print(f"önbellekten karşılanacak tekrarlar: {sum(len(d) - 1 for d in dupes)} {dupes or ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Sabit tahlil derleminde AI açıklama prompt'unun token / gecikme ölçümü.
+
+Eski düzen (dil talimatı + talimat + JSON, ham metin [:1500]) ile prompt_budget düzenini karşılaştırır.
+--live verilirse her örnek için OpenAI'ye iki kez istek atılır (ikincisinde önek önbelleği ölçülür).
+Kullanım: proje kökünden  .venv/bin/python scripts/bench_prompt_budget.py [--live] [--lang tr] [--plan single]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+CORPUS = [
+    "Hemoglobin 11.2 g/dL 12-16\nFerritin 8 ng/mL 15-150\nDemir 35 ug/dL 60-170\nB12 180 pg/mL 200-900\n"
+    "Folat 6.1 ng/mL 3-17\nWBC 6.4 10^3/uL 4-10\nPLT 250 10^3/uL 150-400",
+    "Glukoz 118 mg/dL 70-100\nHbA1c 6.1 % 4-5.6\nLDL 162 mg/dL 0-130\nHDL 38 mg/dL 40-60\n"
+    "Trigliserid 210 mg/dL 0-150\nKolesterol 245 mg/dL 0-200\nCRP 4.2 mg/L 0-5",
+    "TSH 6.2 mIU/L 0.4-4.0\nVitamin D 14 ng/mL 30-100\nALT 22 U/L 0-41\nAST 25 U/L 0-40\n"
+    "GGT 30 U/L 8-61\nKreatinin 0.9 mg/dL 0.6-1.2\neGFR 95 mL/min 90-120",
+    "\n".join(f"Parametre{i} {i * 1.5:.1f} mg/dL {i}-{i * 2}" for i in range(1, 120)),
+]
+
+
+def _old_prompt(risk_summary, labs_norm, lang, plan):
+    from app.services.analyze import AI_EXPLANATION_PROMPT, SINGLE_PLAN_EXPLANATION_PROMPT, _language_instruction
+
+    payload = {"labs_norm_preview": (labs_norm.get("t") or "")[:1500], "doctor_notes": None, "risk_summary": risk_summary, "plan": plan}
+    base = SINGLE_PLAN_EXPLANATION_PROMPT if plan == "single" else AI_EXPLANATION_PROMPT
+    return _language_instruction(lang) + "\n\n" + base + "\n\nInput (JSON):\n" + json.dumps(payload, ensure_ascii=False, indent=0)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--live", action="store_true")
+    ap.add_argument("--lang", default="tr")
+    ap.add_argument("--plan", default="free")
+    args = ap.parse_args()
+
+    from app.services.analyze import (
+        AI_EXPLANATION_PROMPT,
+        SINGLE_PLAN_EXPLANATION_PROMPT,
+        _language_instruction,
+        ai_generate_explanation,
+        build_tables,
+    )
+    from app.services.lab_parser import parse_lab_text
+    from app.services.prompt_budget import _encoding, build_explanation_prompt, count_tokens
+    from app.services.risk_engine import compute_risk
+
+    print(f"tokenizer: {'tiktoken o200k_base' if _encoding() is not None else 'yaklaşık sayım'}")
+    base = SINGLE_PLAN_EXPLANATION_PROMPT if args.plan == "single" else AI_EXPLANATION_PROMPT
+    tot_old = tot_new = 0
+    for i, text in enumerate(CORPUS, 1):
+        lab_values = parse_lab_text(text)
+        risk_summary = compute_risk(lab_values)
+        tables = build_tables(lab_values)
+        labs_norm = {"t": " ".join(text.split()), "dn": None}
+        old = count_tokens(_old_prompt(risk_summary, labs_norm, args.lang, args.plan))
+        plan = build_explanation_prompt(
+            static_prompt=base,
+            lang_instruction=_language_instruction(args.lang),
+            risk_summary=risk_summary,
+            labs_norm=labs_norm,
+            tables=tables,
+            plan=args.plan,
+        )
+        tot_old += old
+        tot_new += plan.prompt_tokens_estimate
+        print(f"#{i}: eski={old} yeni={plan.prompt_tokens_estimate} max_tokens={plan.max_tokens} {plan.stats}")
+        if args.live:
+            for attempt in (1, 2):
+                t0 = time.perf_counter()
+                _, usage = ai_generate_explanation(risk_summary, labs_norm, args.lang, args.plan, tables=tables)
+                print(f"    canlı {attempt}: {round((time.perf_counter() - t0) * 1000)} ms usage={usage}")
+    print(f"toplam: eski={tot_old} yeni={tot_new} ({(1 - tot_new / max(tot_old, 1)) * 100:.1f}% daha az)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
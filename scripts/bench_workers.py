@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Çok worker ölçeklenme yük testi: gunicorn.conf.py profiliyle 1..N worker başlatır, CPU ağırlıklı bir
+endpoint'e (varsayılan /sitemap.xml) eşzamanlı istek atar ve worker sayısına göre istek/sn ile verimi yazar.
+
+Verim = (N worker istek/sn) / (N × 1 worker istek/sn); çekirdek sayısına kadar ~1'e yakın olmalı.
+Geçici SQLite veritabanı ve paylaşılan önbellek kullanılır; rate limit test için yükseltilir.
+Kullanım: proje kökünden  .venv/bin/python scripts/bench_workers.py [--max-workers 4] [--seconds 10] [--path /sitemap.xml]
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(port: int, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.3)
+    raise RuntimeError("server did not become ready")
+
+
+def _load(port: int, path: str, seconds: float, clients: int) -> tuple[int, int]:
+    ok, errors = [0], [0]
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def client():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        n_ok = n_err = 0
+        while time.monotonic() < stop:
+            try:
+                conn.request("GET", path)
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status == 200:
+                    n_ok += 1
+                else:
+                    n_err += 1
+            except OSError:
+                n_err += 1
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        with lock:
+            ok[0] += n_ok
+            errors[0] += n_err
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return ok[0], errors[0]
+
+
+def run(workers: int, path: str, seconds: float, clients: int, tmp: str) -> float:
+    port = _free_port()
+    env = dict(
+        os.environ,
+        WEB_CONCURRENCY=str(workers),
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+        DATABASE_URL=f"sqlite:///{tmp}/bench-{workers}.db",
+        SHARED_CACHE_URL=f"sqlite:///{tmp}/bench-cache-{workers}.db",
+        RATE_LIMIT_PER_MINUTE="100000000",
+        NORYA_INIT_DB_LOCK=f"{tmp}/migrate.lock",
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_ready(port)
+        _load(port, path, 2.0, clients)  # ısınma (şablon / blog verisi önbellekleri)
+        ok, errors = _load(port, path, seconds, clients)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    rps = ok / seconds
+    print(f"workers={workers:<3} req/s={rps:8.1f}  errors={errors}")
+    return rps
+
+
+def main():
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--max-workers", type=int, default=cores)
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--path", default="/sitemap.xml")
+    ap.add_argument("--clients-per-worker", type=int, default=4)
+    args = ap.parse_args()
+
+    print(f"cores={cores} path={args.path}")
+    with tempfile.TemporaryDirectory() as tmp:
+        base = None
+        for n in range(1, args.max_workers + 1):
+            rps = run(n, args.path, args.seconds, args.clients_per_worker * n, tmp)
+            base = base or rps
+            print(f"           scaling={rps / base:5.2f}x  efficiency={rps / (base * n):5.0%}")
+
+
+if __name__ == "__main__":
+    main()
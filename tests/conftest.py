@@ -9,6 +9,8 @@ os.environ["SECRET_KEY"] = "test-secret-key"
 os.environ["OPENAI_API_KEY"] = "sk-test-dummy"
 # Kayıt rate limit yüksek olsun ki tüm testler geçebilsin
 os.environ["RATE_LIMIT_REGISTER_PER_MINUTE"] = "100"
+# Arka plan iş zamanlayıcısı testlerde çalışmaz (tests/test_scheduler.py kendi motoruyla çalıştırır)
+os.environ["SCHEDULER_ENABLED"] = "false"
 
 from app.main import app
 
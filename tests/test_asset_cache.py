@@ -0,0 +1,98 @@
+"""Rapor varlık önbelleği: grafik/QR yeniden kullanımı, LRU, disk katmanı ve budaması, premium render."""
+import base64
+import os
+import time
+
+from app.charts import range_bar_svg, range_bar_svg_base64
+from app.charts.asset_cache import AssetCache, asset_cache
+from app.services import report_pdf
+from app.services.analyze import degraded_blood_test_report
+from app.services.report_verification import _qr_png_base64
+
+LAB_TEXT = (
+    "LDL 162 mg/dL 0-100\nHemoglobin 10.9 g/dL 12-16\nGlukoz 92 mg/dL 70-100\nTSH 2.1 mIU/L 0.4-4.0\n"
+    "Ferritin 8 ng/mL 15-150\nHDL 45 mg/dL 40-60\nALT 22 U/L 0-40\nB12 300 pg/mL 200-900"
+)
+VERIFY_URL = "https://noryaai.com/verify/3f9c2a"
+TREND = {"dates": ["2026-01-10", "2026-04-02", "2026-07-15"], "ldl": [171, 165, 162], "glucose": [95, 90, 92], "crp": [3.1, 2.0, 1.2]}
+
+
+def test_lru_and_disk_tier(tmp_path):
+    builds = []
+
+    def build(v):
+        return lambda: builds.append(v) or f"asset-{v}"
+
+    cache = AssetCache(max_items=2, disk_dir=str(tmp_path))
+    for v in ("a", "b", "a", "c"):
+        cache.get_or_build("svg", (v,), build(v))
+    assert builds == ["a", "b", "c"] and cache.snapshot()["items"] == 2
+
+    # Yeni süreç gibi: bellek boş, disk katmanı doludur
+    fresh = AssetCache(max_items=2, disk_dir=str(tmp_path))
+    assert fresh.get_or_build("svg", ("b",), build("b")) == "asset-b"
+    assert builds == ["a", "b", "c"] and fresh.stats["disk_hits"] == 1
+
+
+def test_disk_tier_is_pruned_by_age_and_size(tmp_path):
+    cache = AssetCache(max_items=0, disk_dir=str(tmp_path), max_bytes=3 * 100, max_age_s=3600)
+    for v in range(5):
+        cache.get_or_build("svg", (v,), lambda v=v: str(v) * 100)
+    assert len(list(tmp_path.glob("svg/*.txt"))) == 5
+    now = time.time()
+    # 0: süresi dolmuş; 1-4: sırayla daha yeni
+    for age, v in zip((7200, 40, 30, 20, 10), range(5)):
+        path = cache._disk_path(cache.make_key("svg", (v,)))
+        os.utime(path, (now - age, now - age))
+    assert cache.get_or_build("svg", (1,), lambda: "yeniden") == "1" * 100  # okuma tazeler
+
+    assert cache.prune_disk() == 2
+    assert {p.read_text() for p in tmp_path.glob("svg/*.txt")} == {"1" * 100, "3" * 100, "4" * 100}
+    assert cache.snapshot()["pruned"] == 2
+    # Sınırsız önbellek (eski davranış) hiçbir şey silmez
+    assert AssetCache(max_items=0, disk_dir=str(tmp_path)).prune_disk() == 0
+
+
+def test_charts_quantized_and_identical_to_fresh_render():
+    asset_cache().clear()
+    args = dict(name="LDL", unit="mg/dL", ref_min=0.0, ref_max=100.0, status="high", status_label="Yüksek")
+    first = range_bar_svg_base64(value=162.0, display_min=-30.0, display_max=192.6, **args)
+    # Gösterim hassasiyetinin altındaki fark aynı varlığı kullanır
+    again = range_bar_svg_base64(value=162.0000000001, display_min=-30.0, display_max=192.6, **args)
+    assert again == first and asset_cache().stats["hits"] == 1
+    fresh = range_bar_svg(value=162.0, display_min=-30.0, display_max=192.6, **args)
+    assert base64.b64decode(first).decode("utf-8") == fresh
+
+    assert _qr_png_base64(VERIFY_URL) == _qr_png_base64(VERIFY_URL) != _qr_png_base64(VERIFY_URL + "x")
+
+
+def _render_premium(monkeypatch):
+    """WeasyPrint'e kadar olan premium hattı (bağlam + grafikler + QR + şablon); PDF rasterı hariç."""
+
+    def html_only(context):
+        return report_pdf._ENV.get_template("report_premium.html").render(**context).encode("utf-8")
+
+    monkeypatch.setattr(report_pdf, "render_premium_pdf", html_only)
+    sonuc = degraded_blood_test_report(LAB_TEXT, "tr")["sonuc"]
+
+    def render():
+        verification = {"report_id": "r-1", "verification_url": VERIFY_URL, "verification_code": "K7M2P9QX",
+                        "qr_image_base64": _qr_png_base64(VERIFY_URL)}
+        return report_pdf.build_report_pdf(sonuc, lang="tr", plan_name="yearly", trend_data=TREND, verification_info=verification)
+
+    return render
+
+
+def test_premium_render_reuses_assets(monkeypatch):
+    render = _render_premium(monkeypatch)
+    render()  # şablon/modül ısınması
+    context = report_pdf.parse_report_to_context(degraded_blood_test_report(LAB_TEXT, "tr")["sonuc"], lang="tr")
+    # Tablo satırları ("- **LDL:** 162 mg/dL (Ref: 0-100) — high") grafik alır
+    assert len(context["biomarkers"]) >= 6 and all(b.get("chart_svg_base64") for b in context["biomarkers"])
+
+    asset_cache().clear()
+    html_cold = render()
+    html_warm = render()
+    assert html_cold == html_warm
+    stats = asset_cache().snapshot()
+    assert stats["misses"] >= 10 and stats["hits"] >= stats["misses"]
@@ -0,0 +1,181 @@
+"""Otomatik yenileme ve düşük bakiye uyarıları: yerel PayTR taklidiyle paralel, idempotent toplu işleme."""
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.core.config import settings
+from app.models import AutoRenewAttempt, Institution, TenantDailyStat, TenantWalletTransaction
+from app.services import paytr_recurring, tenant_alert_service
+
+PAYTR_DELAY_S = 0.3
+
+
+class _PaytrStub(BaseHTTPRequestHandler):
+    """Kayıtlı kart çekimi: utoken=declined reddedilir, utoken=drop yanıt vermeden bağlantıyı keser."""
+
+    def do_POST(self):
+        form = {k: v[0] for k, v in parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode()).items()}
+        self.server.calls.append(form["merchant_oid"])
+        time.sleep(PAYTR_DELAY_S)
+        if form["utoken"] == "drop":
+            self.close_connection = True
+            return
+        if form["utoken"] == "declined":
+            body = {"status": "failed", "reason": "Kart reddedildi"}
+        else:
+            body = {"status": "success", "reference_no": "R" + form["merchant_oid"][-12:]}
+        raw = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def paytr(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _PaytrStub)
+    server.calls = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(settings, "paytr_recurring_url", f"http://127.0.0.1:{server.server_port}/odeme")
+    monkeypatch.setattr(settings, "paytr_merchant_id", "123")
+    monkeypatch.setattr(settings, "paytr_merchant_key", "key")
+    monkeypatch.setattr(settings, "paytr_merchant_salt", "salt")
+    monkeypatch.setattr(settings, "billing_job_concurrency", 4)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def engine(tmp_path):
+    eng = create_engine(f"sqlite:///{tmp_path / 'billing.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(
+        eng,
+        tables=[Institution.__table__, AutoRenewAttempt.__table__, TenantWalletTransaction.__table__, TenantDailyStat.__table__],
+    )
+    yield eng
+    eng.dispose()
+
+
+def _institution(db, name, balance, utoken="card", **kw):
+    fields = dict(
+        name=name, tenant_slug=name, status="active", billing_wallet_balance=balance,
+        auto_renew_enabled=True, auto_renew_amount_cents=50000, auto_renew_threshold_cents=20000,
+        paytr_utoken=utoken, paytr_ctoken="ctoken", contact_email=f"billing@{name}.test",
+    )
+    inst = Institution(**{**fields, **kw})
+    db.add(inst)
+    db.commit()
+    return inst.id
+
+
+def test_auto_renewals_are_parallel_and_idempotent(engine, paytr):
+    with Session(engine) as db:
+        ok = [_institution(db, f"hastane-{i}", 1000 * i) for i in range(3)]
+        declined = _institution(db, "declined", 500, utoken="declined")
+        _institution(db, "zengin", 90000)
+        _institution(db, "kapali", 100, auto_renew_enabled=False)
+
+        started = time.monotonic()
+        results = paytr_recurring.process_all_auto_renewals(db)
+        elapsed = time.monotonic() - started
+
+    # Yalnız eşik altı ve yenilemesi açık kurumlar; yavaş PayTR çağrıları sırayla beklenmez
+    assert sorted(r["institution_id"] for r in results) == sorted(ok + [declined])
+    assert elapsed < PAYTR_DELAY_S * 3
+    assert {r["institution_id"]: r["status"] for r in results}[declined] == "failed"
+    assert len(paytr.calls) == 4
+    with Session(engine) as db:
+        assert [db.get(Institution, i).billing_wallet_balance for i in ok] == [50000, 51000, 52000]
+        assert len(db.exec(select(TenantWalletTransaction)).all()) == 3
+        # Kart ödemesi alınmış bir kurumun bakiyesi tekrar düştü ve son yenileme bilgisi kayboldu: aynı dönem yine çekilmez
+        inst = db.get(Institution, ok[0])
+        inst.billing_wallet_balance, inst.auto_renew_last_at = 0, None
+        db.add(inst)
+        db.commit()
+
+        again = {r["institution_id"]: r for r in paytr_recurring.process_all_auto_renewals(db)}
+        assert again[ok[0]]["status"] == "skipped" and again[declined]["status"] == "failed"
+        attempts = {a.institution_id: a for a in db.exec(select(AutoRenewAttempt)).all()}
+    assert len(paytr.calls) == 5 and len(set(paytr.calls)) == 5
+    assert attempts[ok[0]].status == "success" and attempts[ok[0]].reference_no
+    assert attempts[declined].attempt == 2 and attempts[declined].reason == "Kart reddedildi"
+    assert attempts[declined].merchant_oid.endswith("_2")
+
+
+def test_unknown_payment_outcome_is_never_retried(engine, paytr):
+    with Session(engine) as db:
+        inst_id = _institution(db, "kopuk", 0, utoken="drop")
+        assert paytr_recurring.process_auto_renew_for_institution(db, inst_id)["status"] == "failed"
+        assert paytr_recurring.process_auto_renew_for_institution(db, inst_id)["status"] == "skipped"
+        attempt = db.exec(select(AutoRenewAttempt)).one()
+        assert db.get(Institution, inst_id).billing_wallet_balance == 0
+    assert attempt.status == "pending" and len(paytr.calls) == 1
+
+
+def test_stale_pending_attempts_are_listed_and_reconciled(engine, paytr):
+    with Session(engine) as db:
+        paid = _institution(db, "kopuk-odendi", 0, utoken="drop")
+        unpaid = _institution(db, "kopuk-odenmedi", 0, utoken="drop")
+        for inst_id in (paid, unpaid):
+            paytr_recurring.process_auto_renew_for_institution(db, inst_id)
+        assert paytr_recurring.stale_pending_attempts(db) == []
+        stale = {a.institution_id: a.id for a in paytr_recurring.stale_pending_attempts(db, older_than_min=-1)}
+        assert set(stale) == {paid, unpaid}
+
+        assert paytr_recurring.resolve_pending_attempt(db, stale[paid], "success", reference_no="R1")["ok"]
+        # İkinci kapatma krediyi tekrar eklemez
+        assert paytr_recurring.resolve_pending_attempt(db, stale[paid], "success")["error"] == "not_pending"
+        assert paytr_recurring.resolve_pending_attempt(db, stale[unpaid], "failed", note="PayTR: kayıt yok")["ok"]
+        assert db.get(Institution, paid).billing_wallet_balance == 50000
+        assert len(db.exec(select(TenantWalletTransaction)).all()) == 1
+        assert paytr_recurring.stale_pending_attempts(db, older_than_min=-1) == []
+
+        # Başarısız kapatılan dönem yeni merchant_oid ile yeniden denenir
+        inst = db.get(Institution, unpaid)
+        inst.paytr_utoken = "card"
+        db.add(inst)
+        db.commit()
+        assert paytr_recurring.process_auto_renew_for_institution(db, unpaid)["status"] == "success"
+    assert paytr.calls[-1].endswith("_2")
+
+
+def test_low_balance_alerts_are_concurrent_and_claimed(engine, monkeypatch):
+    monkeypatch.setattr(settings, "billing_job_concurrency", 4)
+    sent = []
+
+    def fake_send(alert):
+        # Havuz thread'leri Session'a bağlı nesne değil düz kopya alır
+        assert isinstance(alert, tenant_alert_service.LowBalanceAlert)
+        time.sleep(PAYTR_DELAY_S)
+        sent.append(alert.tenant_slug)
+        return alert.tenant_slug != "smtp-hatasi"
+
+    monkeypatch.setattr(tenant_alert_service, "_send_low_balance_email", fake_send)
+    earlier = datetime.utcnow() - timedelta(days=3)
+    with Session(engine) as db:
+        for i in range(3):
+            _institution(db, f"dusuk-{i}", 100)
+        failing = _institution(db, "smtp-hatasi", 100, wallet_last_alert=earlier)
+        _institution(db, "yeni-uyarildi", 100, wallet_last_alert=datetime.utcnow())
+        _institution(db, "yuksek", 90000)
+
+        started = time.monotonic()
+        alerts = tenant_alert_service.check_and_send_low_balance_alerts(db)
+        assert time.monotonic() - started < PAYTR_DELAY_S * 3
+        assert sorted(a["tenant_slug"] for a in alerts) == ["dusuk-0", "dusuk-1", "dusuk-2"]
+        # Gönderilemeyen uyarının talebi geri alınır; sonraki turda yalnız o tekrar denenir
+        assert db.get(Institution, failing).wallet_last_alert == earlier
+        sent.clear()
+        assert tenant_alert_service.check_and_send_low_balance_alerts(db) == []
+    assert sent == ["smtp-hatasi"]
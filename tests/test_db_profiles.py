@@ -0,0 +1,104 @@
+"""Veritabanı motor profilleri: SQLite WAL/PRAGMA, Postgres havuz ayarları, havuz bekleme ölçümü ve eşzamanlı kayıtta kilit hatası olmaması."""
+import threading
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlmodel import Session, SQLModel, func, select
+
+from app.core.config import settings
+from app.core.db_profiles import TimedQueuePool, build_engine, engine_options, pool_snapshot
+from app.models import AnalysisRecord
+
+LAB_TEXT = "LDL 162 mg/dL 0-100\nHemoglobin 10.9 g/dL 12-16"
+
+
+def test_sqlite_file_gets_wal_and_busy_timeout(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'norya.db'}")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == settings.db_sqlite_busy_timeout_ms
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+    assert pool_snapshot(engine)["connects"] == 1
+    engine.dispose()
+    # In-memory (testler): tek bağlantılı StaticPool, WAL yok
+    assert engine_options("sqlite:///:memory:")["poolclass"].__name__ == "StaticPool"
+
+
+def test_postgres_profile_without_connecting(monkeypatch):
+    monkeypatch.setattr(settings, "db_pool_size", 7)
+    engine = build_engine("postgresql+psycopg://u:p@127.0.0.1:1/norya")
+    assert isinstance(engine.pool, TimedQueuePool)
+    assert engine.pool.size() == 7 and engine.pool._pre_ping and engine.pool._recycle == settings.db_pool_recycle
+    args = engine_options("postgresql+psycopg://u:p@127.0.0.1:1/norya")["connect_args"]
+    assert "statement_timeout=30000" in args["options"] and "idle_in_transaction_session_timeout" in args["options"]
+    assert args["prepare_threshold"] == 5
+
+    monkeypatch.setattr(settings, "db_prepared_cache_size", 0)
+    assert engine_options("postgresql+psycopg://u:p@h/db")["connect_args"]["prepare_threshold"] is None
+
+
+def test_pool_wait_and_timeout_are_recorded(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "db_pool_size", 1)
+    monkeypatch.setattr(settings, "db_max_overflow", 0)
+    monkeypatch.setattr(settings, "db_pool_timeout", 0.2)
+    engine = build_engine(f"sqlite:///{tmp_path / 'pool.db'}")
+    held = engine.connect()
+    released = threading.Timer(0.05, held.close)
+    released.start()
+    with engine.connect():  # havuz boşalana kadar bekler
+        pass
+    with engine.connect(), pytest.raises(PoolTimeout):
+        engine.connect()
+    snap = pool_snapshot(engine)
+    assert snap["timeouts"] == 1 and snap["size"] == 1 and snap["checked_out"] == 0
+    assert snap["wait_ms"]["max"] >= 150 and snap["hold_ms"]["p50"] >= 0
+    engine.dispose()
+
+
+def _saves_per_second(engine, writers=4, readers=4, seconds=1.0) -> tuple[float, int]:
+    """Yazan thread'ler analiz kaydeder, okuyanlar geçmiş listeler; (kayıt/s, kilit hatası) döner."""
+    SQLModel.metadata.create_all(engine, tables=[AnalysisRecord.__table__])
+    stop = time.perf_counter() + seconds
+    saved, errors, lock = [0], [0], threading.Lock()
+
+    def write(user_id):
+        while time.perf_counter() < stop:
+            try:
+                with Session(engine) as db:
+                    db.add(AnalysisRecord(user_id=user_id, input_text=LAB_TEXT, result_text="rapor"))
+                    db.commit()
+                with lock:
+                    saved[0] += 1
+            except OperationalError:
+                with lock:
+                    errors[0] += 1
+
+    def read(user_id):
+        while time.perf_counter() < stop:
+            try:
+                with Session(engine) as db, db.begin():
+                    db.exec(select(func.count()).select_from(AnalysisRecord).where(AnalysisRecord.user_id == user_id)).one()
+                    db.exec(select(AnalysisRecord).where(AnalysisRecord.user_id == user_id)
+                            .order_by(AnalysisRecord.created_at.desc()).limit(20)).all()
+            except OperationalError:
+                with lock:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=read, args=(i,)) for i in range(readers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    rate = saved[0] / (time.perf_counter() - started)
+    engine.dispose()
+    return rate, errors[0]
+
+
+def test_concurrent_saves_without_lock_errors(tmp_path):
+    rate, errors = _saves_per_second(build_engine(f"sqlite:///{tmp_path / 'tuned.db'}"), seconds=0.5)
+    assert errors == 0 and rate > 0
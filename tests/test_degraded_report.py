@@ -0,0 +1,96 @@
+"""Bozulmuş mod: LLM yokken kural tabanlı rapor, aşırı yük kabulü, önbelleğe yazmama ve anlık önizleme."""
+import secrets
+import time
+
+import httpx
+import openai
+import pytest
+from sqlmodel import Session
+
+import app.main as main
+from app.core.config import settings
+from app.core.database import engine
+from app.models import AnalysisRecord
+from app.services import analyze as analyze_service
+from app.services import degraded_report
+from app.services.analyze import build_tables
+from app.services.degraded_report import LlmUnavailable, build_explanation, llm_admission
+from app.services.lab_parser import parse_lab_text
+from app.services.report_pdf import BIOMARKER_LINE, _map_section_key
+from app.services.risk_engine import compute_risk
+
+LAB_TEXT = "LDL 162 mg/dL 0-100\nHemoglobin 10.9 g/dL 12-16\nGlukoz 92 mg/dL 70-100\nTSH 2.1 mIU/L 0.4-4.0"
+
+
+def _inputs():
+    values = parse_lab_text(LAB_TEXT)
+    return compute_risk(values), build_tables(values)
+
+
+@pytest.mark.parametrize("lang", ["tr", "en", "de"])
+def test_explanation_has_all_sections(lang):
+    risk_summary, tables = _inputs()
+    t0 = time.perf_counter()
+    text = build_explanation(risk_summary, tables, lang)
+    assert time.perf_counter() - t0 < 0.05
+
+    headings = [line.strip("*") for line in text.splitlines() if line.startswith("**") and line.endswith("**")]
+    assert [_map_section_key(h) for h in headings] == [
+        "summary", "risk_indicators", "values", "possible_causes", "recommendations"
+    ]
+    ldl = next(line for line in text.splitlines() if line.startswith("**LDL:**"))
+    assert BIOMARKER_LINE.match(ldl)
+    # Bilinmeyen dil İngilizceye düşer
+    assert build_explanation(risk_summary, tables, "xx") == build_explanation(risk_summary, tables, "en")
+
+
+def test_admission_modes(monkeypatch):
+    monkeypatch.setattr(settings, "llm_degraded_mode", "force")
+    with llm_admission() as reason:
+        assert reason == "forced"
+
+    monkeypatch.setattr(settings, "llm_degraded_mode", "auto")
+    monkeypatch.setattr(settings, "llm_max_inflight", 1)
+    with llm_admission() as first:
+        assert first is None and degraded_report.llm_inflight() == 1
+        with llm_admission() as second:
+            assert second == "overload"
+    assert degraded_report.llm_inflight() == 0
+
+
+def test_auth_failure_is_not_degraded(monkeypatch):
+    # Geçersiz anahtar geçici değil: kural tabanlı rapor yerine yapılandırma hatası yüzeye çıkar
+    def bad_key(create_fn):
+        response = httpx.Response(401, request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+        raise openai.AuthenticationError("invalid api key", response=response, body=None)
+
+    monkeypatch.setattr(analyze_service, "get_openai_keys", lambda: ["sk-test-invalid"])
+    monkeypatch.setattr(analyze_service, "_openai_safe_call", bad_key)
+    risk_summary, tables = _inputs()
+    for fallback in (True, False):
+        with pytest.raises(analyze_service.LlmConfigError) as exc:
+            analyze_service.ai_generate_explanation(risk_summary, {"t": LAB_TEXT}, "tr", "free", tables=tables, fallback=fallback)
+        assert exc.value.status_code == 503
+
+
+def test_llm_outage_falls_back_without_caching(client, _auth_token, monkeypatch):
+    def unavailable(*args, **kwargs):
+        raise LlmUnavailable("connection error")
+
+    monkeypatch.setattr(analyze_service, "ai_generate_explanation", unavailable)
+    stored = []
+    monkeypatch.setattr(main.single_flight, "store", lambda *a, **k: stored.append(k))
+    headers = {"Authorization": f"Bearer {_auth_token}", "X-Test-Mode": "1"}
+
+    r = client.post("/analyze", json={"text": LAB_TEXT + f"\nProtokol {secrets.randbelow(10**6)}", "lang": "en"}, headers=headers)
+    assert r.status_code == 200, r.text
+    assert r.json()["degraded"] == "llm_unavailable" and "Possible causes" in r.json()["sonuc"]
+    assert not stored
+    with Session(engine) as db:
+        # Ortak test kullanıcısının geçmişini sonraki modüller için eski hâline getir
+        db.delete(db.get(AnalysisRecord, r.json()["analiz_id"]))
+        db.commit()
+
+    r = client.post("/analyze/preview", json={"text": LAB_TEXT, "lang": "tr"}, headers=headers)
+    assert r.status_code == 200, r.text
+    assert r.json()["degraded"] == "preview" and r.json()["risk_summary"] and "LDL" in r.json()["sonuc"]
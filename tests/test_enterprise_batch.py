@@ -0,0 +1,157 @@
+"""Kurumsal toplu rapor: tek LLM çağrısıyla çok dilli çeviri, kural tabanlı yedek ve havuzlu PDF/ZIP dışa aktarımı."""
+import io
+import json
+import re
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.database import engine
+from app.enterprise import batch_reports, dashboard
+from app.enterprise.batch_reports import interpretation_of, translate_report
+from app.models import AnalysisRecord, AuditLog
+from app.models.enterprise_case import EnterpriseCase, EnterpriseReport
+from app.models.institution import Institution, InstitutionMembership
+from app.services import analyze as analyze_service
+from app.services import storage
+from app.services.analyze import degraded_blood_test_report
+from app.services.resilience import CircuitOpen
+
+LAB_TEXT = "LDL 162 mg/dL 0-100\nHemoglobin 10.9 g/dL 12-16\nGlukoz 92 mg/dL 70-100\nTSH 2.1 mIU/L 0.4-4.0"
+CANONICAL = degraded_blood_test_report(LAB_TEXT, "tr", plan="enterprise")["sonuc"]
+
+
+def _values_block(report: str) -> list[str]:
+    return [line for line in report.splitlines() if line.startswith("- **") and "(Ref:" in line]
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """Sahte OpenAI istemcisi: istemde istenen dil kodlarına JSON çeviri döner; çağrıları sayar."""
+    state = SimpleNamespace(calls=[], fail=None)
+
+    def create(**kwargs):
+        state.calls.append(kwargs)
+        codes = re.findall(r"\b([a-z]{2}) \(", kwargs["messages"][0]["content"].split("these keys:")[1])
+        content = json.dumps({c: f"[{c}] Yorum çevirisi" for c in codes})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    def create_with_fallback(create_fn):
+        if state.fail:
+            state.calls.append(None)
+            raise state.fail
+        return create_fn(SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+
+    monkeypatch.setattr(analyze_service, "_openai_create_with_fallback", create_with_fallback)
+    monkeypatch.setattr(analyze_service, "analyze_blood_test", lambda *a, **k: pytest.fail("re-analysis"))
+    return state
+
+
+def test_one_llm_call_translates_all_languages(llm):
+    out = translate_report(CANONICAL, LAB_TEXT, "tr", ["tr", "en", "de", "fr"])
+    assert len(llm.calls) == 1 and set(out) == {"tr", "en", "de", "fr"}
+    assert out["tr"] == CANONICAL
+    for lang in ("en", "de", "fr"):
+        # Deterministik bölümler yeniden analiz edilmeden aynı kalır, yalnızca yorum çevrilir
+        assert interpretation_of(out[lang]) == f"[{lang}] Yorum çevirisi"
+        assert _values_block(out[lang]) == _values_block(CANONICAL)
+
+
+def test_llm_outage_uses_rule_based_interpretation(llm):
+    llm.fail = CircuitOpen("openai-text", 5.0)
+    out = translate_report(CANONICAL, LAB_TEXT, "tr", ["de", "en"])
+    assert set(out) == {"de", "en"} and len(llm.calls) == 1
+    assert _values_block(out["de"]) == _values_block(CANONICAL)
+    assert interpretation_of(out["de"]) != interpretation_of(out["en"])
+
+    # Değer okunamayan (Vision) raporda yedek yok: dil sonuçtan çıkarılır
+    assert translate_report("Serbest metin rapor", "[Görsel: a.jpg]", "tr", ["de"]) == {}
+
+
+@pytest.fixture
+def enterprise_case(client, _auth_token):
+    headers = {"Authorization": f"Bearer {_auth_token}"}
+    user_id = client.get("/auth/me", headers=headers).json()["id"]
+    with Session(engine) as db:
+        inst = Institution(name="Batch Hastanesi", active_languages="tr,en")
+        db.add(inst)
+        db.flush()
+        membership = InstitutionMembership(institution_id=inst.id, user_id=user_id, role="admin")
+        rec = AnalysisRecord(user_id=user_id, input_text=LAB_TEXT, result_text=CANONICAL, lang="tr", institution_id=inst.id)
+        db.add_all([membership, rec])
+        db.flush()
+        cases = [
+            EnterpriseCase(institution_id=inst.id, uploaded_by_user_id=user_id, source_filename=f"lab{i}.pdf",
+                           analysis_record_id=rec.id, status="approved")
+            for i in range(2)
+        ]
+        db.add_all(cases)
+        db.flush()
+        db.add_all([
+            EnterpriseReport(case_id=cases[0].id, language="tr", report_text=CANONICAL, approval_status="approved"),
+            EnterpriseReport(case_id=cases[0].id, language="en", report_text="EN", approval_status="approved"),
+            EnterpriseReport(case_id=cases[1].id, language="tr", report_text=CANONICAL, approval_status="approved"),
+        ])
+        db.commit()
+        ids = (inst.id, membership.id, rec.id, [c.id for c in cases])
+    yield headers, ids
+    inst_id, membership_id, rec_id, case_ids = ids
+    # Ortak test kullanıcısının kurum üyeliği ve geçmişi sonraki modüller için geri alınır
+    with Session(engine) as db:
+        for model, column, values in (
+            (EnterpriseReport, EnterpriseReport.case_id, case_ids),
+            (EnterpriseCase, EnterpriseCase.id, case_ids),
+            (AuditLog, AuditLog.institution_id, [inst_id]),
+        ):
+            for row in db.exec(select(model).where(column.in_(values))).all():
+                db.delete(row)
+        db.flush()
+        db.delete(db.get(AnalysisRecord, rec_id))
+        db.delete(db.get(InstitutionMembership, membership_id))
+        db.flush()
+        db.delete(db.get(Institution, inst_id))
+        db.commit()
+
+
+def test_regenerate_and_batch_export(client, enterprise_case, llm, monkeypatch):
+    headers, (_, _, _, case_ids) = enterprise_case
+    r = client.post(f"/enterprise/case/{case_ids[1]}/regenerate", data={"target_lang": ["de", "fr"]},
+                    headers=headers, follow_redirects=False)
+    assert r.status_code == 303 and len(llm.calls) == 1
+    with Session(engine) as db:
+        new = db.exec(select(EnterpriseReport).where(
+            EnterpriseReport.case_id == case_ids[1], EnterpriseReport.approval_status == "pending")).all()
+        assert sorted(rep.language for rep in new) == ["de", "fr"]
+
+    # Kaynak dilde yeniden üretim analizi tekrar çalıştırır; diğer diller yine çeviriyle gelir
+    analyses = []
+
+    def fresh_analysis(text, lang=None, **kwargs):
+        analyses.append(lang)
+        return {"sonuc": CANONICAL.replace("LDL", "LDL ", 1)}, None
+
+    monkeypatch.setattr(dashboard, "analyze_blood_test", fresh_analysis)
+    r = client.post(f"/enterprise/case/{case_ids[1]}/regenerate", data={"target_lang": ["tr", "en"]},
+                    headers=headers, follow_redirects=False)
+    assert r.status_code == 303 and analyses == ["tr"] and len(llm.calls) == 2
+    with Session(engine) as db:
+        new = {rep.language: rep.report_text for rep in db.exec(select(EnterpriseReport).where(
+            EnterpriseReport.case_id == case_ids[1], EnterpriseReport.approval_status == "pending")).all()}
+        assert set(new) == {"de", "fr", "tr", "en"} and new["tr"] != CANONICAL
+
+    monkeypatch.setattr(settings, "enterprise_pdf_workers", 1)
+    monkeypatch.setattr(storage, "export_storage_available", lambda: False)
+    monkeypatch.setattr(batch_reports, "generate_report_pdf", lambda **kw: f"%PDF {kw['language']}".encode())
+    r = client.post("/enterprise/cases/export-batch", data={"case_ids": case_ids, "languages": ["tr", "en"]},
+                    headers=headers)
+    assert r.status_code == 200 and r.headers["content-type"] == "application/zip"
+    zf = zipfile.ZipFile(io.BytesIO(r.content))
+    pdfs = sorted(n for n in zf.namelist() if n.endswith(".pdf"))
+    assert pdfs == [f"case_{case_ids[0]}/NoryaAI_lab0_en.pdf", f"case_{case_ids[0]}/NoryaAI_lab0_tr.pdf",
+                    f"case_{case_ids[1]}/NoryaAI_lab1_tr.pdf"]
+    assert zf.read(pdfs[0]) == b"%PDF en"
+    # Onaylanmamış (pending) raporlar dışa aktarılmaz
+    assert json.loads(zf.read("manifest.json"))["missing"] == [f"{case_ids[1]}:en"]
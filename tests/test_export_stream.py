@@ -0,0 +1,134 @@
+"""Akışlı dışa aktarım: JSON geriye uyumluluğu, NDJSON/CSV/ZIP gövdeleri, parça parça üretim ve idle timeout muafiyeti."""
+import csv
+import io
+import json
+import threading
+import time
+import zipfile
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.core.database import engine
+from app.core.db_profiles import exempt_from_idle_timeout
+from app.main import app
+from app.models import AnalysisRecord
+from app.services import export_stream
+
+
+@pytest.fixture(scope="module")
+def export_user(_auth_token):
+    headers = {"Authorization": f"Bearer {_auth_token}"}
+    with TestClient(app) as c:
+        user_id = c.get("/auth/me", headers=headers).json()["id"]
+    recs = [
+        AnalysisRecord(user_id=user_id, input_text=f"export {i}", result_text="Dışa aktarım, \"takip\"", lang="tr")
+        for i in range(3)
+    ]
+    with Session(engine) as db:
+        db.add_all(recs)
+        db.commit()
+    yield headers, user_id
+    # Ortak test kullanıcısının geçmişini sonraki modüller için eski hâline getir
+    with Session(engine) as db:
+        for rec in recs:
+            db.delete(db.merge(rec))
+        db.commit()
+
+
+def test_default_json_shape_is_unchanged(client: TestClient, export_user):
+    headers, _ = export_user
+    r = client.get("/analyze/export", headers=headers)
+    assert r.status_code == 200
+    assert "content-length" not in r.headers
+    body = r.json()
+    assert body["exported_at"].endswith("Z")
+    assert len(body["analyses"]) >= 3
+    assert {"id", "input_text", "result_text", "source", "created_at", "doctor_notes"} <= set(body["analyses"][0])
+
+
+def test_ndjson_csv_zip_formats(client: TestClient, export_user):
+    headers, user_id = export_user
+    with Session(engine) as db:
+        n = len(db.exec(export_stream.export_statement(user_id=user_id)).all())
+
+    r = client.get("/analyze/export?format=ndjson", headers=headers)
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert len(lines) == n and r.headers["content-type"].startswith("application/x-ndjson")
+
+    r = client.get("/analyze/export?format=csv", headers=headers)
+    rows = list(csv.DictReader(io.StringIO(r.content.decode("utf-8-sig"))))
+    assert len(rows) == n and rows[0]["result_text"] == 'Dışa aktarım, "takip"'
+
+    r = client.get("/analyze/export?format=zip", headers=headers)
+    with zipfile.ZipFile(io.BytesIO(r.content)) as zf:
+        assert zf.testzip() is None
+        names = zf.namelist()
+        assert len(names) == n
+        assert json.loads(zf.read(names[0]))["user_id"] == user_id
+
+    assert client.get("/analyze/export?format=xml", headers=headers).status_code == 400
+
+
+def test_export_yields_bounded_chunks(client: TestClient, export_user, monkeypatch):
+    _, user_id = export_user
+    monkeypatch.setattr(export_stream, "CHUNK_BYTES", 64)
+    chunks = list(export_stream.iter_export(export_stream.export_statement(user_id=user_id), "ndjson"))
+    assert len(chunks) >= 3
+    assert all(len(c) < 64 + 512 for c in chunks)
+
+
+def test_streaming_transaction_is_exempt_from_idle_timeout(monkeypatch):
+    # Postgres'te yavaş okuyan istemci "idle in transaction" sınırına takılıp akışı kesmesin
+    executed = []
+    pg = SimpleNamespace(get_bind=lambda: SimpleNamespace(dialect=SimpleNamespace(name="postgresql")),
+                         execute=lambda stmt: executed.append(str(stmt)))
+    exempt_from_idle_timeout(pg)
+    assert executed == ["SET LOCAL idle_in_transaction_session_timeout = 0"]
+
+    calls = []
+    monkeypatch.setattr(export_stream, "exempt_from_idle_timeout", calls.append)
+    list(export_stream.iter_rows(export_stream.export_statement(user_id=-1)))
+    assert len(calls) == 1
+
+
+@pytest.fixture
+def fake_storage(monkeypatch):
+    objects: dict[str, bytes] = {}
+
+    def put(name, data, content_type="application/json"):
+        objects[name] = data
+        return True
+
+    monkeypatch.setattr(export_stream.storage, "put_small_object", put)
+    monkeypatch.setattr(export_stream.storage, "get_small_object", objects.get)
+    monkeypatch.setattr(export_stream.storage, "presigned_download_url", lambda name, filename: None)
+    return objects
+
+
+def test_async_export_status_is_never_pending_forever(fake_storage, monkeypatch):
+    assert export_stream.async_export_status(7, "csv-doesnotexist")["status"] == "unknown"
+
+    gate = threading.Event()
+
+    def failing_export(stmt, fmt):
+        gate.wait(5)
+        raise RuntimeError("db gone")
+        yield b""
+
+    monkeypatch.setattr(export_stream, "iter_export", failing_export)
+    export_id = export_stream.start_async_export(7, "csv")
+    assert export_stream.async_export_status(7, export_id)["status"] == "pending"
+    gate.set()
+    deadline = time.monotonic() + 5
+    while export_stream.async_export_status(7, export_id)["status"] == "pending" and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert export_stream.async_export_status(7, export_id)["status"] == "failed"
+
+    # İşi yürüten worker öldü: "running" işareti süre aşımından sonra başarısız sayılır
+    stale = (datetime.utcnow() - timedelta(seconds=export_stream.ASYNC_EXPORT_MAX_SECONDS + 1)).isoformat()
+    fake_storage[export_stream._state_marker(7, "csv-crashed")] = json.dumps({"status": "running", "started_at": stale}).encode()
+    assert export_stream.async_export_status(7, "csv-crashed")["status"] == "failed"
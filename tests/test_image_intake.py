@@ -0,0 +1,57 @@
+"""Görsel ön işleme: EXIF yönü, kenar kırpma, vision boyutuna küçültme ve önbellek parmak izi."""
+import io
+
+from PIL import Image, ImageDraw
+
+from app.services.image_intake import LOW_DETAIL_MAX_SIDE, prepare_image, target_size
+
+
+def _lab_photo(values: str, size=(3000, 4000), orientation: int | None = None, quality=95) -> bytes:
+    """Beyaz kenarlı, metin satırlı sahte tahlil fotoğrafı."""
+    img = Image.new("RGB", size, "white")
+    d = ImageDraw.Draw(img)
+    d.rectangle((300, 300, size[0] - 300, size[1] - 300), fill=(245, 245, 240), outline="black", width=8)
+    for i, line in enumerate(values.split(",")):
+        y = 500 + i * 300
+        d.rectangle((400, y, 400 + 120 * len(line), y + 120), fill="black")
+        d.text((420, y + 20), line, fill="white")
+    out = io.BytesIO()
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    img.save(out, format="JPEG", quality=quality, exif=exif.tobytes())
+    return out.getvalue()
+
+
+def test_target_size_matches_vision_tiers():
+    assert target_size(3000, 4000, "low") == (384, 512)
+    assert target_size(300, 200, "low") == (300, 200)  # büyütme yok
+    assert target_size(4000, 3000, "high") == (1024, 768)
+
+
+def test_prepare_downscales_rotates_and_trims():
+    raw = _lab_photo("Hb 11.2,Ferritin 8", orientation=6)  # 90° döndürülmüş çekim
+    p = prepare_image(raw, "image/jpeg")
+    assert p.preprocessed and p.mime == "image/jpeg"
+    assert max(p.width, p.height) <= LOW_DETAIL_MAX_SIDE
+    assert p.width > p.height  # EXIF 6: dikey kare yatay olarak düzeltildi
+    assert len(p.data) < len(raw) / 5
+    assert len(p.phash) == 16
+
+
+def test_fingerprint_stable_on_reupload_but_separates_values():
+    raw = _lab_photo("Hb 11.2,Ferritin 8")
+    a = prepare_image(raw)
+    # Mesajlaşma uygulaması gibi: yarı boyuta indirilip düşük kalitede yeniden kaydedilmiş kopya
+    out = io.BytesIO()
+    Image.open(io.BytesIO(raw)).resize((1500, 2000)).save(out, format="JPEG", quality=70)
+    recompressed = prepare_image(out.getvalue())
+    other = prepare_image(_lab_photo("Hb 11.2,Ferritin 80000"))
+    assert a.fingerprint == prepare_image(raw).fingerprint
+    assert bin(int(a.phash, 16) ^ int(recompressed.phash, 16)).count("1") <= 4
+    assert a.fingerprint != other.fingerprint
+
+
+def test_unreadable_image_falls_back_to_original_bytes():
+    p = prepare_image(b"not an image", "image/png")
+    assert not p.preprocessed and p.data == b"not an image" and p.mime == "image/png"
@@ -0,0 +1,156 @@
+"""Şema yönetimi: açılışta sabit süreli sürüm kontrolü, kilit altında tek migration ve eski (sürümsüz) veritabanı."""
+import threading
+
+import pytest
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import event, inspect, text
+from sqlmodel import Session, SQLModel
+
+from app.core import migrate
+from app.core.config import settings
+from app.core.db_profiles import build_engine
+from app.core.migrate import SCHEMA_HEAD, current_revision, ensure_schema
+from app.models.enterprise_case import EnterpriseCase
+from app.models.institution import Institution
+from app.services import tenant_rollups
+
+
+@pytest.fixture
+def db_engine(tmp_path, monkeypatch):
+    monkeypatch.setenv("NORYA_INIT_DB_LOCK", str(tmp_path / "migrate.lock"))
+    engine = build_engine(f"sqlite:///{tmp_path / 'norya.db'}")
+    yield engine
+    engine.dispose()
+
+
+def _statements(engine, fn) -> list[str]:
+    seen = []
+
+    def record(conn, cursor, statement, *args):
+        seen.append(statement.strip().split()[0].upper())
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return seen
+
+
+def test_schema_head_matches_alembic_scripts():
+    cfg = Config(str(migrate._ROOT / "alembic.ini"))
+    cfg.set_main_option("script_location", str(migrate._ROOT / "migrations"))
+    assert ScriptDirectory.from_config(cfg).get_current_head() == SCHEMA_HEAD
+
+
+def test_fresh_database_bootstraps_once_then_startup_runs_no_ddl(db_engine):
+    assert ensure_schema(db_engine) is True
+    assert current_revision(db_engine) == SCHEMA_HEAD
+    assert {"user", "analysisrecord", "analysis_fts"} <= set(inspect(db_engine).get_table_names())
+    # Migration'larla açılan şema modellerin tüm tablo ve sütunlarını içerir
+    insp = inspect(db_engine)
+    for table in SQLModel.metadata.sorted_tables:
+        assert {c.name for c in table.columns} <= {c["name"] for c in insp.get_columns(table.name)}, table.name
+
+    # Sonraki worker açılışları: sürüm + FTS katalog okuması, DDL yok
+    seen = _statements(db_engine, lambda: ensure_schema(db_engine))
+    assert seen == ["SELECT", "SELECT"]
+
+
+def test_legacy_unversioned_database_is_caught_up(db_engine):
+    with db_engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE analysisrecord (id INTEGER PRIMARY KEY, user_id INTEGER, input_text TEXT, "
+            "result_text TEXT, source TEXT, created_at DATETIME)"
+        ))
+        conn.execute(text("INSERT INTO analysisrecord (user_id, input_text, result_text, source, created_at) "
+                          "VALUES (1, 'LDL 162', 'rapor', 'text', '2025-01-01')"))
+    ensure_schema(db_engine)
+    columns = {c["name"] for c in inspect(db_engine).get_columns("analysisrecord")}
+    assert {"doctor_notes", "plan_type", "updated_at", "lang", "institution_id"} <= columns
+    with db_engine.connect() as conn:
+        assert conn.execute(text("SELECT updated_at FROM analysisrecord")).scalar() is not None
+        assert conn.execute(text("SELECT count(*) FROM analysis_fts WHERE analysis_fts MATCH 'ldl'")).scalar() == 1
+    assert current_revision(db_engine) == SCHEMA_HEAD
+
+
+def test_unversioned_database_with_data_runs_later_revisions(db_engine):
+    # Eski init_db: create_all ile açılmış tablolar ve kayıtlar, alembic_version yok, 0016-0018 uygulanmamış
+    later = {"scheduled_jobs", "job_runs", "auto_renew_attempts", "tenant_daily_stats"}
+    with db_engine.begin() as conn:
+        SQLModel.metadata.create_all(conn, tables=[t for t in SQLModel.metadata.sorted_tables if t.name not in later])
+        for index in ("ix_institutions_auto_renew_balance", "ix_institutions_active_balance"):
+            conn.execute(text(f"DROP INDEX {index}"))
+        inst_id = conn.execute(Institution.__table__.insert().values(name="Eski Hastane")).inserted_primary_key[0]
+        for status in ("new", "new", "approved"):
+            conn.execute(EnterpriseCase.__table__.insert().values(
+                institution_id=inst_id, uploaded_by_user_id=1, source_type="pdf", status=status,
+            ))
+    assert current_revision(db_engine) is None
+
+    assert ensure_schema(db_engine) is True
+    assert current_revision(db_engine) == SCHEMA_HEAD
+    assert later <= set(inspect(db_engine).get_table_names())
+    assert {"ix_institutions_auto_renew_balance", "ix_institutions_active_balance"} <= {
+        ix["name"] for ix in inspect(db_engine).get_indexes("institutions")
+    }
+    # 0018 doldurması mevcut vakaları sayar; sonraki durum değişiklikleri gerçek sayılardan devam eder
+    with Session(db_engine) as db:
+        assert tenant_rollups.case_totals(db, inst_id) == {"cases": 3, "status:new": 2, "status:approved": 1}
+
+
+def _rewind_to_0014(engine):
+    """Head'e açılmış şemadan 0016-0018'in eklediklerini kaldırıp 0014'e damgalar (sürüm yükseltmesi öncesi gibi)."""
+    with engine.begin() as conn:
+        for table in ("tenant_daily_stats", "auto_renew_attempts", "job_runs", "scheduled_jobs"):
+            conn.execute(text(f"DROP TABLE {table}"))
+        for index in ("ix_institutions_auto_renew_balance", "ix_institutions_active_balance"):
+            conn.execute(text(f"DROP INDEX {index}"))
+        conn.execute(text("UPDATE alembic_version SET version_num = '0014_analysis_job_cached_tokens'"))
+
+
+def test_outstanding_revision_runs_once_under_lock(db_engine, monkeypatch):
+    ensure_schema(db_engine)
+    _rewind_to_0014(db_engine)
+
+    # Kapalıyken worker migration çalıştırmaz
+    monkeypatch.setattr(settings, "db_migrate_on_startup", False)
+    assert ensure_schema(db_engine) is False and current_revision(db_engine) != SCHEMA_HEAD
+
+    monkeypatch.setattr(settings, "db_migrate_on_startup", True)
+    calls = []
+    real_legacy_ddl = migrate.apply_legacy_ddl
+    monkeypatch.setattr(migrate, "apply_legacy_ddl", lambda conn: (calls.append(1), real_legacy_ddl(conn))[1])
+    barrier = threading.Barrier(3)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(ensure_schema(db_engine))
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # 0015 yalnızca bir kez; kilidi bekleyenler sürümü yeniden okuyup atlar
+    assert len(calls) == 1 and len(results) == 3
+    assert current_revision(db_engine) == SCHEMA_HEAD
+    assert {"scheduled_jobs", "job_runs", "auto_renew_attempts", "tenant_daily_stats"} <= set(
+        inspect(db_engine).get_table_names()
+    )
+
+
+def test_frozen_0015_creates_missing_tables_without_live_models(db_engine):
+    with db_engine.begin() as conn:
+        conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL PRIMARY KEY)"))
+        conn.execute(text("INSERT INTO alembic_version VALUES ('0014_analysis_job_cached_tokens')"))
+    migrate.migrate(db_engine)
+    tables = set(inspect(db_engine).get_table_names())
+    assert {"user", "analysisrecord", "institutions", "enterprise_cases", "tenant_daily_stats"} <= tables
+    assert current_revision(db_engine) == SCHEMA_HEAD
+    # 0017'nin kurum indeksleri ve eski init_db sütun ekleri de uygulanmış olur
+    assert {"ix_institutions_auto_renew_balance", "ix_institutions_active_balance"} <= {
+        ix["name"] for ix in inspect(db_engine).get_indexes("institutions")
+    }
@@ -0,0 +1,72 @@
+"""Mobil delta-sync: keyset cursor, alan seçimi, ETag/304."""
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.core.database import engine
+from app.main import app
+from app.models import AnalysisRecord
+
+
+@pytest.fixture(scope="module")
+def sync_user(_auth_token):
+    """Test kullanıcısına 3 analiz kaydı ekler; (headers, kayıt id'leri) döner."""
+    headers = {"Authorization": f"Bearer {_auth_token}"}
+    with TestClient(app) as c:
+        user_id = c.get("/auth/me", headers=headers).json()["id"]
+    ids = []
+    with Session(engine) as db:
+        for i in range(3):
+            rec = AnalysisRecord(user_id=user_id, input_text=f"LDL {i}", result_text="x" * 5000)
+            db.add(rec)
+            db.commit()
+            ids.append(rec.id)
+    return headers, ids
+
+
+def test_sync_pages_with_cursor_and_skips_heavy_text(client: TestClient, sync_user):
+    headers, ids = sync_user
+    r = client.get("/api/mobile/history/sync?limit=2", headers=headers)
+    assert r.status_code == 200
+    page = r.json()
+    assert [i["id"] for i in page["items"]] == ids[:2]
+    assert page["has_more"] is True and page["sync_cursor"] is None
+    assert "result_text" not in page["items"][0]
+    assert len(page["items"][0]["result_preview"]) == 200
+
+    r = client.get(f"/api/mobile/history/sync?limit=2&cursor={page['next_cursor']}", headers=headers)
+    last = r.json()
+    assert [i["id"] for i in last["items"]] == ids[2:]
+    assert last["has_more"] is False and last["sync_cursor"]
+
+    # Değişiklik yok → boş delta
+    r = client.get(f"/api/mobile/history/sync?cursor={last['sync_cursor']}", headers=headers)
+    assert r.json()["items"] == []
+
+    # Favori değişikliği updated_at'i ilerletir → delta'da tekrar görünür
+    client.patch(f"/analyze/history/{ids[0]}", headers=headers)
+    r = client.get(f"/api/mobile/history/sync?cursor={last['sync_cursor']}&fields=id,is_favorite", headers=headers)
+    assert r.json()["items"] == [{"id": ids[0], "is_favorite": True}]
+
+
+def test_sync_rejects_unknown_fields(client: TestClient, sync_user):
+    headers, _ = sync_user
+    r = client.get("/api/mobile/history/sync?fields=id,hashed_password", headers=headers)
+    assert r.status_code == 400
+
+
+def test_report_etag_and_304(client: TestClient, sync_user):
+    headers, ids = sync_user
+    r = client.get(f"/api/mobile/history/{ids[1]}/report", headers=headers)
+    assert r.status_code == 200
+    etag = r.headers["ETag"]
+    assert r.json()["result_text"] == "x" * 5000
+
+    r = client.get(f"/api/mobile/history/{ids[1]}/report", headers={**headers, "If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+
+    client.patch(f"/analyze/history/{ids[1]}", headers=headers)
+    r = client.get(f"/api/mobile/history/{ids[1]}/report", headers={**headers, "If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["ETag"] != etag
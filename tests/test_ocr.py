@@ -0,0 +1,142 @@
+"""Yerel OCR katmanı: yeterli biyobelirteç okunursa görsel Vision yerine metin yoluna gider."""
+import io
+import secrets
+
+import pytest
+from PIL import Image
+from sqlmodel import Session
+
+import app.main as main
+from app.core.config import settings
+from app.core.database import engine
+from app.models import AnalysisRecord
+from app.services import ocr, pdf_extract
+from app.services.ocr import OcrText, RouteStats
+
+LAB_TEXT = "Hemoglobin 11.2 g/dL 12-16\nFerritin 8 ng/mL 15-150\nGlukoz 92 mg/dL 70-100\nTSH 2.1 mIU/L 0.4-4.0"
+
+
+class FakeEngine:
+    name = "fake"
+
+    def __init__(self, text=LAB_TEXT, confidence=91.0):
+        self.text, self.confidence, self.calls = text, confidence, 0
+
+    def available(self):
+        return True
+
+    def recognize(self, image):
+        self.calls += 1
+        assert image.mode == "L" and image.width >= ocr.OCR_MIN_WIDTH
+        return OcrText(text=self.text, confidence=self.confidence)
+
+
+@pytest.fixture
+def use_engine(monkeypatch):
+    def _use(engine):
+        ocr.register_engine("fake", lambda: engine)
+        monkeypatch.setattr(settings, "ocr_engine", "fake")
+        return engine
+
+    yield _use
+    ocr.register_engine("fake", lambda: None)
+
+
+def _png(mark: int = 0, fmt: str = "PNG") -> bytes:
+    """Beyaz sayfa; mark farklı görseller (ayrı önbellek anahtarları) üretir."""
+    img = Image.new("RGB", (600, 800), "white")
+    img.paste((mark % 256, mark // 256 % 256, mark // 65536 % 256), (100, 100, 500, 300))
+    buf = io.BytesIO()
+    img.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+def test_acceptance_needs_biomarkers_and_confidence(use_engine, monkeypatch):
+    use_engine(FakeEngine())
+    outcome = ocr.ocr_image(_png())
+    assert outcome.accepted and outcome.recognized == 4 and outcome.engine == "fake"
+
+    use_engine(FakeEngine(confidence=40.0))
+    assert not ocr.ocr_image(_png()).accepted
+    use_engine(FakeEngine(text="Hemoglobin 11.2 g/dL 12-16\nSayfa 1"))
+    assert not ocr.ocr_image(_png()).accepted
+
+    monkeypatch.setattr(settings, "ocr_engine", "off")
+    assert ocr.ocr_image(_png()) is None
+
+
+def test_route_stats_snapshot():
+    stats = RouteStats()
+    for ms in (10, 20, 30, 40):
+        stats.record("ocr_text", ms / 1000)
+    stats.record("vision", 2.5)
+    snap = stats.snapshot()
+    assert snap["ocr_text"]["count"] == 4 and snap["ocr_text"]["avg_ms"] == 25.0
+    assert snap["ocr_text"]["p95_ms"] == 40.0 and snap["vision"]["p50_ms"] == 2500.0
+
+
+def test_upload_uses_text_path_when_ocr_is_confident(client, _auth_token, use_engine, monkeypatch):
+    use_engine(FakeEngine(text=LAB_TEXT + f"\nProtokol {secrets.randbelow(10**6)}"))
+    texts = []
+
+    def fake_analyze(text, **kwargs):
+        texts.append(text)
+        return {"sonuc": "ocr rapor", "risk_summary": None, "explanation": {}, "tables": [], "meta": {}}, None
+
+    monkeypatch.setattr(main, "analyze_blood_test", fake_analyze)
+    monkeypatch.setattr(main, "analyze_blood_test_from_image", lambda *a, **k: pytest.fail("vision should not run"))
+    ocr.route_stats.reset()
+
+    r = client.post(
+        "/analyze/upload",
+        files={"file": ("tahlil.png", _png(secrets.randbelow(10**6)), "image/png")},
+        headers={"Authorization": f"Bearer {_auth_token}", "X-Test-Mode": "1"},
+    )
+    assert r.status_code == 200, r.text
+    assert r.json()["sonuc"] == "ocr rapor" and "Ferritin 8" in texts[0]
+    assert ocr.route_stats.snapshot()["ocr_text"]["count"] == 1
+    with Session(engine) as db:
+        rec = db.get(AnalysisRecord, r.json()["analiz_id"])
+        assert rec.source == "image"
+        # Ortak test kullanıcısının geçmişini sonraki modüller için eski hâline getir
+        db.delete(rec)
+        db.commit()
+
+
+def test_image_reupload_hits_cache_before_ocr(client, _auth_token, use_engine, monkeypatch):
+    fake = use_engine(FakeEngine(text=LAB_TEXT + f"\nProtokol {secrets.randbelow(10**6)}"))
+    monkeypatch.setattr(
+        main, "analyze_blood_test",
+        lambda text, **k: ({"sonuc": "ocr rapor", "risk_summary": None, "explanation": {}, "tables": [], "meta": {}}, None),
+    )
+    monkeypatch.setattr(main, "analyze_blood_test_from_image", lambda *a, **k: pytest.fail("vision should not run"))
+    photo = _png(secrets.randbelow(10**6))
+    ids = []
+    for _ in range(2):
+        r = client.post(
+            "/analyze/upload",
+            files={"file": ("tahlil.png", photo, "image/png")},
+            headers={"Authorization": f"Bearer {_auth_token}", "X-Test-Mode": "1"},
+        )
+        assert r.status_code == 200, r.text
+        assert r.json()["sonuc"] == "ocr rapor"
+        ids.append(r.json()["analiz_id"])
+    # İkinci yükleme görsel anahtarında bulundu: OCR tekrar çalışmadı
+    assert fake.calls == 1 and r.json()["cached"] is True
+    with Session(engine) as db:
+        for aid in ids:
+            db.delete(db.get(AnalysisRecord, aid))
+        db.commit()
+
+
+def test_scanned_pdf_images_are_read_in_the_limited_pool(use_engine, monkeypatch):
+    fake = use_engine(FakeEngine())
+    scanned = _png(fmt="PDF")
+    try:
+        outcome = ocr.ocr_pdf(scanned)
+        assert outcome.accepted and fake.calls == 1
+        # Sayfa görsellerini çıkaran görev belge CPU sınırını aşınca motor hiç çağrılmaz
+        monkeypatch.setattr(pdf_extract, "DOC_CPU_SECONDS", 0.0001)
+        assert ocr.ocr_pdf(scanned) is None and fake.calls == 1
+    finally:
+        pdf_extract.shutdown_pool()
@@ -0,0 +1,109 @@
+"""Keyset sayfalama: (created_at, id) cursor'ı, eşit zaman damgaları, geri gitme ve yaklaşık sayım."""
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.core.database import engine
+from app.api.admin import router as admin_api_router
+from app.core.config import settings
+from app.core.pagination import approximate_count, capped_count, decode_cursor, keyset_page
+from app.main import app
+from app.models import AnalysisRecord
+
+SAME_TS = datetime(2024, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture(scope="module")
+def paged_user(_auth_token):
+    """Test kullanıcısına aynı created_at'li 5 kayıt ekler (id ile sıra kırılır)."""
+    headers = {"Authorization": f"Bearer {_auth_token}"}
+    with TestClient(app) as c:
+        user_id = c.get("/auth/me", headers=headers).json()["id"]
+    ids = []
+    with Session(engine) as db:
+        for i in range(5):
+            rec = AnalysisRecord(
+                user_id=user_id, input_text=f"page {i}", result_text="r", source="pdf", created_at=SAME_TS,
+            )
+            db.add(rec)
+            db.commit()
+            ids.append(rec.id)
+    return headers, user_id, ids
+
+
+def _pages(db, stmt, limit):
+    seen, cursor = [], None
+    while True:
+        page = keyset_page(db, stmt, ts_col=AnalysisRecord.created_at, id_col=AnalysisRecord.id, cursor=cursor, limit=limit)
+        seen.append(page)
+        if not page.next_cursor:
+            return seen
+        cursor = page.next_cursor
+
+
+def test_keyset_walks_forward_and_back_with_ties(client: TestClient, paged_user):
+    _, user_id, ids = paged_user
+    stmt = select(AnalysisRecord).where(AnalysisRecord.user_id == user_id, AnalysisRecord.source == "pdf")
+    with Session(engine) as db:
+        pages = _pages(db, stmt, 2)
+        walked = [r.id for p in pages for r in p.items]
+        assert walked == sorted(ids, reverse=True)
+        assert [len(p.items) for p in pages] == [2, 2, 1]
+        assert pages[0].prev_cursor is None and pages[1].prev_cursor
+
+        back = keyset_page(
+            db, stmt, ts_col=AnalysisRecord.created_at, id_col=AnalysisRecord.id, cursor=pages[2].prev_cursor, limit=2,
+        )
+        assert [r.id for r in back.items] == [r.id for r in pages[1].items]
+        assert back.prev_cursor and back.next_cursor
+
+
+def test_history_cursor_header_and_bad_cursor(client: TestClient, paged_user):
+    headers, _, ids = paged_user
+    r = client.get("/analyze/history?source=pdf&limit=3", headers=headers)
+    assert [i["id"] for i in r.json()] == sorted(ids, reverse=True)[:3]
+    nxt = r.headers["x-next-cursor"]
+    assert decode_cursor(nxt)[1] == sorted(ids, reverse=True)[2]
+    r = client.get(f"/analyze/history?source=pdf&limit=3&cursor={nxt}", headers=headers)
+    assert [i["id"] for i in r.json()] == sorted(ids, reverse=True)[3:]
+    assert "x-next-cursor" not in r.headers
+    assert client.get("/analyze/history?cursor=not-a-cursor", headers=headers).status_code == 400
+
+
+def test_approximate_count_is_exact_for_small_tables(client: TestClient, paged_user):
+    with Session(engine) as db:
+        exact = len(db.exec(select(AnalysisRecord.id)).all())
+        assert approximate_count(db, AnalysisRecord) == exact
+
+
+def test_legacy_offset_and_capped_count(client: TestClient, paged_user):
+    _, user_id, ids = paged_user
+    stmt = select(AnalysisRecord).where(AnalysisRecord.user_id == user_id, AnalysisRecord.source == "pdf")
+    with Session(engine) as db:
+        page = keyset_page(db, stmt, ts_col=AnalysisRecord.created_at, id_col=AnalysisRecord.id, offset=2, limit=2)
+        assert [r.id for r in page.items] == sorted(ids, reverse=True)[2:4]
+        # offset'li istemci sonraki sayfada cursor'a geçebilir
+        rest = keyset_page(
+            db, stmt, ts_col=AnalysisRecord.created_at, id_col=AnalysisRecord.id, cursor=page.next_cursor, limit=2,
+        )
+        assert [r.id for r in rest.items] == sorted(ids, reverse=True)[4:] and page.prev_cursor
+        assert capped_count(db, stmt) == (5, False)
+        assert capped_count(db, stmt, cap=3) == (3, True)
+
+
+def test_admin_json_list_keeps_list_body(client: TestClient, paged_user, monkeypatch):
+    # Eski JSON paneli: ana uygulamada /admin/analyses yeni HTML paneline düşer, router ayrı bağlanır
+    legacy = FastAPI()
+    legacy.include_router(admin_api_router)
+    monkeypatch.setattr(settings, "admin_secret", "test-admin-secret")
+    headers = {"X-Admin-Secret": "test-admin-secret"}
+    client = TestClient(legacy)
+    r = client.get("/admin/analyses?limit=2", headers=headers)
+    assert r.status_code == 200 and isinstance(r.json(), list) and len(r.json()) == 2
+    assert int(r.headers["x-total-estimate"]) >= 5
+    nxt = client.get(f"/admin/analyses?limit=2&cursor={r.headers['x-next-cursor']}", headers=headers).json()
+    by_offset = client.get("/admin/analyses?limit=2&offset=2", headers=headers).json()
+    assert [a["id"] for a in nxt] == [a["id"] for a in by_offset]
@@ -0,0 +1,62 @@
+"""Şifresiz (anonim / misafir) kullanıcılar: KDF'siz oluşturma, eşzamanlı ilk istekte tek satır, giriş yapılamaz."""
+import threading
+
+import bcrypt
+from sqlmodel import Session, SQLModel, select
+
+from app.api.deps import ANON_EMAIL_DOMAIN, _get_or_create_anonymous_user
+from app.core.database import engine
+from app.core.db_profiles import build_engine
+from app.core.security import has_usable_password, verify_password
+from app.models import User
+
+
+def test_concurrent_first_hits_share_one_row(tmp_path):
+    file_engine = build_engine(f"sqlite:///{tmp_path / 'anon.db'}")
+    SQLModel.metadata.create_all(file_engine)
+    barrier = threading.Barrier(4)
+    ids = []
+
+    def first_hit():
+        barrier.wait()
+        with Session(file_engine) as db:
+            ids.append(_get_or_create_anonymous_user(db, "203.0.113.7").id)
+
+    threads = [threading.Thread(target=first_hit) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    with Session(file_engine) as db:
+        rows = db.exec(select(User).where(User.email.endswith(ANON_EMAIL_DOMAIN))).all()
+    file_engine.dispose()
+    assert len(rows) == 1 and set(ids) == {rows[0].id}
+    assert not has_usable_password(rows[0].hashed_password)
+    assert verify_password("", rows[0].hashed_password) is False
+
+
+def test_anonymous_user_cannot_log_in(client):
+    with Session(engine) as db:
+        user = _get_or_create_anonymous_user(db, "198.51.100.9")
+        email, user_id, stored = user.email, user.id, user.hashed_password
+    try:
+        # Giriş rate limit'i dar: tek deneme, kalan şifreler doğrudan
+        assert client.post("/auth/login", data={"email": email, "password": stored}).status_code == 401
+        assert not any(verify_password(p, stored) for p in ("", "test123456", stored[1:]))
+    finally:
+        with Session(engine) as db:
+            db.delete(db.get(User, user_id))
+            db.commit()
+
+
+def test_new_guests_never_run_the_kdf(tmp_path, monkeypatch):
+    def no_kdf(*args, **kwargs):
+        raise AssertionError("misafir oluşturma KDF çalıştırmamalı")
+
+    monkeypatch.setattr(bcrypt, "hashpw", no_kdf)
+    file_engine = build_engine(f"sqlite:///{tmp_path / 'burst.db'}")
+    SQLModel.metadata.create_all(file_engine)
+    with Session(file_engine) as db:
+        users = [_get_or_create_anonymous_user(db, f"10.0.0.{i}") for i in range(20)]
+        assert len({u.id for u in users}) == 20 and not any(has_usable_password(u.hashed_password) for u in users)
+    file_engine.dispose()
@@ -0,0 +1,86 @@
+"""Şifre KDF servisi: sınırlı havuz doluyken 429, maliyet değişiminde girişte yeniden hash, giriş selinde loop gecikmesi sınırı."""
+import asyncio
+import threading
+import time
+
+import bcrypt
+from sqlmodel import Session
+
+from app.api import auth
+from app.core.config import settings
+from app.core.database import engine
+from app.core.passwords import PasswordHasher, verify_and_upgrade
+from app.core.security import verify_password
+from app.models import User
+
+
+def _bcrypt(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=rounds)).decode()
+
+
+def test_saturated_pool_fails_fast_with_429(client, monkeypatch):
+    hasher = PasswordHasher(workers=1, queue_max=0)
+    monkeypatch.setattr(auth, "password_hasher", hasher)
+    release = threading.Event()
+    hasher.submit(release.wait)
+    try:
+        t0 = time.perf_counter()
+        r = client.post("/auth/register", data={
+            "email": "kdf-busy@example.com", "password": "test123456", "full_name": "Yoğun",
+            "phone": "+905551112233", "country": "TR",
+        })
+        assert r.status_code == 429 and r.headers.get("retry-after")
+        assert time.perf_counter() - t0 < 1.0
+        assert hasher.stats["rejected"] == 1
+    finally:
+        release.set()
+
+
+def test_login_rehashes_when_cost_changes(client, monkeypatch):
+    monkeypatch.setattr(settings, "bcrypt_rounds", 4)
+    with Session(engine) as db:
+        user = User(email="rehash@example.com", hashed_password=_bcrypt("eski-maliyet-1", 5))
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        try:
+            assert asyncio.run(verify_and_upgrade(db, user, "yanlis-sifre")) is False
+            assert user.hashed_password.split("$")[2] == "05"
+            assert asyncio.run(verify_and_upgrade(db, user, "eski-maliyet-1")) is True
+            assert user.hashed_password.split("$")[2] == "04"
+            assert verify_password("eski-maliyet-1", user.hashed_password)
+        finally:
+            db.delete(user)
+            db.commit()
+
+
+async def max_loop_lag(flood) -> float:
+    """flood() sürerken event loop'taki en büyük gecikme (sn)."""
+    lags, stop = [], asyncio.Event()
+
+    async def ticker():
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lags.append(time.perf_counter() - t0 - 0.005)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0.02)
+    await flood()
+    stop.set()
+    await tick
+    return max(lags)
+
+
+def test_event_loop_stays_responsive_during_login_flood():
+    # Eşzamanlı 8 doğrulama (her biri ~50 ms bcrypt) havuzda: loop tek bir doğrulama kadar bile bloklanmaz
+    hashed = _bcrypt("flood-sifre", 10)
+    hasher = PasswordHasher(workers=2, queue_max=16)
+
+    async def pooled_flood():
+        assert all(await asyncio.gather(*(hasher.verify_async("flood-sifre", hashed) for _ in range(8))))
+
+    t0 = time.process_time()
+    verify_password("flood-sifre", hashed)
+    one_verify = time.process_time() - t0
+    assert asyncio.run(max_loop_lag(pooled_flood)) < max(one_verify, 0.05)
@@ -0,0 +1,117 @@
+"""PDF metin çıkarma: her belge sınırlı havuzda (küçükler tek görevde), paralel aralıklar, güvenli erken çıkış ve CPU sınırı."""
+import pytest
+
+from app.services import pdf_extract
+
+LAB_LINES = ["Hemoglobin {v} g/dL 12-16", "Glukoz {g} mg/dL 70-100", "Ferritin {f} ng/mL 15-150"]
+NARRATIVE = ["Bu rapor bilgilendirme amaclidir.", "Sonuclar hekiminiz tarafindan degerlendirilmelidir."]
+
+
+def _make_pdf(pages: list[list[str]]) -> bytes:
+    """Helvetica ile düz metin sayfaları olan küçük bir PDF üretir."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        ops = ["BT", "/F1 11 Tf", "14 TL", "72 760 Td"]
+        for line in lines:
+            escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            ops.append(f"({escaped}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops)
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def _lab_page(i: int) -> list[str]:
+    return [f"Sayfa {i + 1}"] + [line.format(v=12 + i * 0.1, g=80 + i, f=20 + i) for line in LAB_LINES]
+
+
+def _lab_pdf(n: int) -> bytes:
+    return _make_pdf([_lab_page(i) for i in range(n)])
+
+
+@pytest.fixture
+def force_pool(monkeypatch):
+    """Paralel yolu küçük test belgelerinde ve tek çekirdekli makinede de çalıştırır."""
+    monkeypatch.setattr(pdf_extract, "PDF_WORKERS", 2)
+    monkeypatch.setattr(pdf_extract, "PARALLEL_MIN_PAGES", 1)
+    yield
+    pdf_extract.shutdown_pool()
+
+
+def test_parallel_matches_sequential(force_pool, monkeypatch):
+    content = _lab_pdf(12)
+    parallel = pdf_extract.extract_pdf(content)
+    assert parallel.page_count == 12 and parallel.pages_read == 12 and not parallel.limited
+    # Sayfa sırası korunur
+    assert parallel.text.index("Sayfa 2") < parallel.text.index("Sayfa 11")
+
+    monkeypatch.setattr(pdf_extract, "_get_pool", lambda: None)
+    sequential = pdf_extract.extract_pdf(content)
+    assert sequential.text == parallel.text
+
+
+def test_small_documents_run_as_one_pool_task(monkeypatch):
+    monkeypatch.setattr(pdf_extract, "PDF_WORKERS", 2)
+    pool = pdf_extract._get_pool()
+    submits = []
+
+    class CountingPool:
+        def submit(self, *args):
+            submits.append(args[2:4])
+            return pool.submit(*args)
+
+    def no_in_process_parse(*args, **kwargs):
+        raise AssertionError("PDF istek sürecinde açılmamalı (sayfa sayımı dahil)")
+
+    monkeypatch.setattr(pdf_extract, "_get_pool", lambda: CountingPool())
+    monkeypatch.setattr(pdf_extract, "PdfReader", no_in_process_parse)
+    n = pdf_extract.PARALLEL_MIN_PAGES - 1
+    result = pdf_extract.extract_pdf(_lab_pdf(n))
+    assert result.pages_read == result.page_count == n and not result.limited
+    assert len(submits) == 1
+
+    # Küçük belge de belge başına CPU sınırı altında okunur
+    monkeypatch.setattr(pdf_extract, "DOC_CPU_SECONDS", 0.0001)
+    assert pdf_extract.extract_pdf(_lab_pdf(n)).limited == "cpu"
+
+
+def test_early_exit_after_lab_section_keeps_short_gaps():
+    window = pdf_extract.EARLY_EXIT_DRY_PAGES
+    # Lab sayfaları arasındaki kısa açıklama / metinsiz (taranmış) sayfalar sonraki lab sayfalarını düşürmez
+    pages = [_lab_page(i) for i in range(3)] + [NARRATIVE] * (window - 1) + [[]] * 10 + [_lab_page(40)]
+    result = pdf_extract.extract_pdf(_make_pdf(pages))
+    assert result.pages_read == result.page_count == len(pages) and not result.stopped_early
+    assert "Sayfa 41" in result.text and ("Glucose", 120.0) in {(v["name"], v["value"]) for v in result.lab_values}
+
+    # Lab bölümünden sonra uzun açıklama kuyruğu okunmaz
+    tail = pdf_extract.extract_pdf(_make_pdf([_lab_page(i) for i in range(3)] + [NARRATIVE] * 30))
+    assert tail.stopped_early and tail.pages_read == 3 + window and tail.page_count == 33
+    # Lab değeri hiç görülmeyen belge sonuna kadar okunur; MAX_PAGES üst sınırı korunur
+    assert pdf_extract.extract_pdf(_make_pdf([NARRATIVE] * 12)).pages_read == 12
+    capped = pdf_extract.extract_pdf(_lab_pdf(pdf_extract.MAX_PAGES + 5))
+    assert capped.pages_read == pdf_extract.MAX_PAGES and f"Sayfa {pdf_extract.MAX_PAGES + 1}" not in capped.text
+
+
+def test_cpu_budget_and_unreadable(force_pool, monkeypatch):
+    monkeypatch.setattr(pdf_extract, "DOC_CPU_SECONDS", 0.0001)
+    result = pdf_extract.extract_pdf(_lab_pdf(30))
+    assert result.limited == "cpu" and result.pages_read < 30
+
+    assert pdf_extract.extract_text_from_pdf(b"not a pdf") == pdf_extract.FAILED_TEXT
+    assert pdf_extract.extract_text_from_pdf(_make_pdf([[]])) == pdf_extract.FAILED_TEXT
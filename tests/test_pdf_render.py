@@ -0,0 +1,159 @@
+"""PDF render bağlamı: bellek içi static varlıklar, değişiklik öncesi şablonlarla görsel eşdeğerlik, CSS tekrar ayrıştırılmaz."""
+import base64
+import re
+from pathlib import Path
+
+import pytest
+from jinja2 import Environment, FileSystemLoader
+
+from app.services import pdf_render, report_pdf
+from app.services.analyze import degraded_blood_test_report
+from app.services.pdf_render import REPORT_STYLESHEETS, STATIC_DIR, StaticAssets
+
+LAB_TEXT = (
+    "LDL 162 mg/dL 0-100\nHemoglobin 10.9 g/dL 12-16\nGlukoz 92 mg/dL 70-100\nTSH 2.1 mIU/L 0.4-4.0\n"
+    "Ferritin 8 ng/mL 15-150\nHDL 45 mg/dL 40-60"
+)
+
+
+# Stillerin static/css'e taşınmasından önceki şablonlar (satır içi <style>, base64 logo, bağlı premium CSS)
+LEGACY_TEMPLATES = Path(__file__).parent / "fixtures" / "pdf_legacy"
+TEMPLATES = {"report": "report_pdf.html", "premium": "report_premium.html", "doctor": "doctor_pdf.html"}
+
+
+class _Capture:
+    """render_context() yerine: WeasyPrint'e giden (tür, HTML) çiftini ve şablon bağlamını toplar."""
+
+    def __init__(self):
+        self.pages = []
+        self.contexts = []
+
+    def render_report(self, kind, html):
+        self.pages.append((kind, html, self.contexts[-1]))
+        return html.encode("utf-8")
+
+
+def _report_renders(monkeypatch) -> list[tuple[str, str, dict]]:
+    """(tür, yeni HTML, şablon bağlamı) üçlüleri: standart, premium ve doktor raporu."""
+    capture = _Capture()
+    monkeypatch.setattr(report_pdf, "render_context", lambda: capture)
+    get_template = report_pdf._ENV.get_template
+
+    class _Recording:
+        def __init__(self, template):
+            self.template = template
+
+        def render(self, **context):
+            capture.contexts.append(context)
+            return self.template.render(**context)
+
+    monkeypatch.setattr(report_pdf._ENV, "get_template", lambda name: _Recording(get_template(name)))
+    sonuc = degraded_blood_test_report(LAB_TEXT, "tr")["sonuc"]
+    # Tüm planlar premium düzene gider; standart şablon doğrudan render_pdf ile
+    report_pdf.render_pdf(report_pdf.parse_report_to_context(sonuc, lang="tr"))
+    report_pdf.build_report_pdf(sonuc, lang="tr", plan_name="yearly")
+    report_pdf.build_doctor_pdf(sonuc, lang="tr")
+    return capture.pages
+
+
+def _report_html(monkeypatch) -> list[tuple[str, str]]:
+    return [(kind, html) for kind, html, _ in _report_renders(monkeypatch)]
+
+
+def _weasyprint():
+    try:
+        import weasyprint
+    except (ImportError, OSError) as e:  # sistem kütüphaneleri (pango) yoksa OSError
+        pytest.skip(f"WeasyPrint yüklenemiyor: {e}")
+    return weasyprint
+
+
+def _legacy_pdf(kind: str, context: dict) -> bytes:
+    """Eski yol: aynı bağlam değişiklik öncesi şablonla; stiller satır içi, logo base64, varsayılan fetcher."""
+    from weasyprint import HTML
+
+    logo = STATIC_DIR / "norya_report_icon.png"
+    context = dict(
+        context,
+        logo_base64=base64.b64encode(logo.read_bytes()).decode("ascii"),
+        css_url=(STATIC_DIR / "report_premium.css").as_uri(),
+    )
+    env = Environment(loader=FileSystemLoader(str(LEGACY_TEMPLATES)), autoescape=True)
+    html = env.get_template(TEMPLATES[kind]).render(**context)
+    return HTML(string=html, base_url=str(pdf_render._PROJECT_ROOT)).write_pdf()
+
+
+def _css_rules(css: str) -> list[str]:
+    import tinycss2
+
+    rules = tinycss2.parse_stylesheet(css, skip_comments=True, skip_whitespace=True)
+    return [" ".join(tinycss2.serialize([rule]).split()) for rule in rules]
+
+
+def _document_css(template: Path) -> list[str]:
+    """Şablonun belge sırasıyla stil kuralları (bağlı premium CSS yerinde açılır)."""
+    parts = []
+    for m in re.finditer(r'<link rel="stylesheet" href="\{\{ css_url \}\}" />|<style>(.*?)</style>', template.read_text(encoding="utf-8"), re.S):
+        parts.append((STATIC_DIR / "report_premium.css").read_text(encoding="utf-8") if m.group(1) is None else m.group(1))
+    return [rule for part in parts for rule in _css_rules(part)]
+
+
+def test_templates_use_static_assets_from_memory(monkeypatch, tmp_path):
+    pages = _report_html(monkeypatch)
+    assert [kind for kind, _ in pages] == ["report", "premium", "doctor"]
+    logo = pdf_render.static_assets().logo_url()
+    for kind, html in pages:
+        # Logo data URI değil static/ URL'i; stiller şablonda değil ayrı dosyalarda
+        assert logo and logo in html and "data:image/png;base64,iVBOR" not in html
+        assert "<link" not in html and all((STATIC_DIR / name).is_file() for name in REPORT_STYLESHEETS[kind])
+
+    (tmp_path / "static").mkdir()
+    (tmp_path / "static" / "a.png").write_bytes(b"png")
+    (tmp_path / "secret.txt").write_text("x")
+    assets = StaticAssets(tmp_path / "static")
+    url = assets.url("a.png")
+    assert assets.get(url) == (b"png", "image/png")
+    (tmp_path / "static" / "a.png").unlink()
+    assert assets.get(url) == (b"png", "image/png") and assets.stats == {"hits": 1, "loads": 1}
+    # static/ dışı ve file:// olmayan URL'ler varsayılan fetcher'a bırakılır
+    assert assets.get((tmp_path / "static" / ".." / "secret.txt").as_uri()) is None
+    assert assets.get("https://noryaai.com/static/a.png") is None
+
+
+def test_extracted_stylesheets_keep_every_legacy_rule_in_order():
+    pytest.importorskip("tinycss2")
+    for kind, name in TEMPLATES.items():
+        legacy = _document_css(LEGACY_TEMPLATES / name)
+        current = [rule for sheet in REPORT_STYLESHEETS[kind] for rule in _css_rules((STATIC_DIR / sheet).read_text(encoding="utf-8"))]
+        current += _document_css(report_pdf._TEMPLATES_DIR / name)
+        # Doktor raporunun çevrilen @page alt bilgisi şablonda kaldı; @page dışı kuralların sırası birebir aynı olmalı
+        for is_page in (False, True):
+            assert [r for r in current if r.startswith("@page") == is_page] == [r for r in legacy if r.startswith("@page") == is_page], kind
+
+
+def test_pages_rasterize_identically_to_legacy_templates(monkeypatch):
+    _weasyprint()
+    pdfium = pytest.importorskip("pypdfium2")
+    from PIL import ImageChops
+
+    def raster(pdf: bytes):
+        doc = pdfium.PdfDocument(pdf)
+        return [doc[i].render(scale=1).to_pil().convert("RGB") for i in range(len(doc))]
+
+    ctx = pdf_render.render_context()
+    for kind, html, context in _report_renders(monkeypatch):
+        new, old = raster(ctx.render_report(kind, html)), raster(_legacy_pdf(kind, context))
+        assert len(new) == len(old), kind
+        for page_new, page_old in zip(new, old):
+            assert ImageChops.difference(page_new, page_old).getbbox() is None, kind
+
+
+def test_shared_context_parses_stylesheets_once(monkeypatch):
+    _weasyprint()
+    ctx = pdf_render.render_context()
+    kind, html = _report_html(monkeypatch)[1]  # premium: en ağır şablon
+    ctx.render_report(kind, html)  # ilk render: CSS ayrıştırma + font yapılandırması
+    parsed = ctx.stats["sheets_parsed"]
+    for _ in range(2):
+        assert ctx.render_report(kind, html).startswith(b"%PDF")
+    assert ctx.stats["sheets_parsed"] == parsed
@@ -0,0 +1,88 @@
+"""Durumsuz kimlik doğrulama: önbellek isabetinde User okunmaz, şifre/plan/ban değişiklikleri anında yansır."""
+import re
+
+import pytest
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from app.api.principal import REFRESHED_TOKEN_HEADER, issue_access_token, principal_cache
+from app.core.database import engine
+from app.core.security import hash_password
+from app.models import Presence, User
+
+
+@pytest.fixture
+def member(client):
+    with Session(engine) as db:
+        user = User(email="principal@example.com", hashed_password=hash_password("eski-sifre-123"))
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        user_id, token = user.id, issue_access_token(user)
+    yield user_id, {"Authorization": f"Bearer {token}"}
+    principal_cache.invalidate(user_id)
+    with Session(engine) as db:
+        for row in db.exec(select(Presence).where(Presence.user_id == user_id)).all():
+            db.delete(row)
+        db.delete(db.get(User, user_id))
+        db.commit()
+
+
+def _update_user(user_id: int, **fields) -> None:
+    with Session(engine) as db:
+        user = db.get(User, user_id)
+        for key, value in fields.items():
+            setattr(user, key, value)
+        db.add(user)
+        db.commit()
+
+
+def _user_selects(fn) -> int:
+    seen = []
+
+    def record(conn, cursor, statement, *args):
+        if re.search(r'^\s*SELECT\b.*\bFROM\s+"?user"?\b', statement, re.S | re.I):
+            seen.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return len(seen)
+
+
+def test_cached_principal_skips_user_fetch(client, member):
+    user_id, headers = member
+    principal_cache.invalidate(user_id)
+    # Soğuk önbellek: tek User okuması, sonra isabet
+    assert _user_selects(lambda: client.post("/auth/heartbeat", headers=headers)) == 1
+    for _ in range(3):
+        assert _user_selects(lambda: client.post("/auth/heartbeat", headers=headers)) == 0
+
+
+def test_password_change_revokes_old_tokens(client, member):
+    user_id, headers = member
+    r = client.post(
+        "/auth/change-password",
+        headers=headers,
+        json={"current_password": "eski-sifre-123", "new_password": "yeni-sifre-456"},
+    )
+    assert r.status_code == 200
+    assert client.post("/auth/heartbeat", headers=headers).status_code == 401
+    fresh = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    assert client.post("/auth/heartbeat", headers=fresh).status_code == 200
+
+
+def test_plan_change_refreshes_token_and_ban_blocks(client, member):
+    user_id, headers = member
+    assert REFRESHED_TOKEN_HEADER not in client.post("/auth/heartbeat", headers=headers).headers
+
+    _update_user(user_id, plan="pro")
+    r = client.post("/auth/heartbeat", headers=headers)
+    assert r.status_code == 200 and REFRESHED_TOKEN_HEADER in r.headers
+    refreshed = {"Authorization": f"Bearer {r.headers[REFRESHED_TOKEN_HEADER]}"}
+    assert REFRESHED_TOKEN_HEADER not in client.post("/auth/heartbeat", headers=refreshed).headers
+
+    _update_user(user_id, is_banned=True)
+    assert client.post("/auth/heartbeat", headers=refreshed).status_code == 403
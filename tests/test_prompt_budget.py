@@ -0,0 +1,65 @@
+"""Prompt düzeni: sabit system öneki, sıkıştırılmış lab tablosu, token bütçesi ve önbellek kullanımı."""
+from types import SimpleNamespace
+
+from app.services.analyze import AI_EXPLANATION_PROMPT, _language_instruction, build_tables
+from app.services.lab_parser import parse_lab_text
+from app.services.prompt_budget import (
+    PLAN_BUDGETS,
+    build_explanation_prompt,
+    count_tokens,
+    usage_from_response,
+)
+from app.services.risk_engine import compute_risk
+
+LABS = "Hemoglobin 11.2 g/dL 12-16\nFerritin 8 ng/mL 15-150\nWBC 6.4 10^3/uL 4-10\nPLT 250 10^3/uL 150-400"
+
+
+def _plan(text, lang="tr", plan="free", tables=True):
+    values = parse_lab_text(text)
+    return build_explanation_prompt(
+        static_prompt=AI_EXPLANATION_PROMPT,
+        lang_instruction=_language_instruction(lang),
+        risk_summary=compute_risk(values),
+        labs_norm={"t": " ".join(text.split()), "dn": None},
+        tables=build_tables(values) if tables else None,
+        plan=plan,
+    )
+
+
+def test_static_prompt_is_stable_prefix_and_table_is_compact():
+    tr, en = _plan(LABS, "tr"), _plan(LABS, "en")
+    assert tr.messages[0] == en.messages[0] == {"role": "system", "content": AI_EXPLANATION_PROMPT}
+    user = tr.messages[1]["content"]
+    assert user.startswith(_language_instruction("tr"))
+    table = user.split("labs (name|value unit|ref|status):\n", 1)[1].splitlines()
+    # Referans dışı değerler önce
+    assert [r.split("|")[-1] for r in table][:2] == ["low", "low"]
+    assert "labs_norm:" not in user  # tablo ham metni kapsıyor
+
+
+def test_budget_drops_normal_rows_and_truncates_raw_text():
+    many = "\n".join(f"Parametre{i} {i * 1.5:.1f} mg/dL {i}-{i * 2}" for i in range(1, 200))
+    p = _plan("Ferritin 8 ng/mL 15-150\n" + many)
+    assert p.stats["dropped_rows"] > 0
+    assert "Ferritin|8 ng/mL|15.0-150.0|low" in p.messages[1]["content"]
+    assert p.prompt_tokens_estimate <= PLAN_BUDGETS["default"].input_tokens + 40
+
+    raw_only = _plan(many, tables=False)
+    assert raw_only.stats["raw_truncated"] and "labs_norm:" in raw_only.messages[1]["content"]
+    assert raw_only.prompt_tokens_estimate <= PLAN_BUDGETS["default"].input_tokens + 5
+
+
+def test_max_tokens_scales_with_flags_under_plan_cap():
+    assert _plan(LABS).max_tokens == PLAN_BUDGETS["default"].output_base + 2 * PLAN_BUDGETS["default"].output_per_flag
+    assert _plan(LABS, plan="single").max_tokens <= PLAN_BUDGETS["single"].output_max
+    assert count_tokens("") == 0 and count_tokens("Hemoglobin düşük") > 0
+
+
+def test_usage_records_cached_prompt_tokens():
+    resp = SimpleNamespace(usage=SimpleNamespace(
+        prompt_tokens=1200, completion_tokens=300, prompt_tokens_details=SimpleNamespace(cached_tokens=1024),
+    ))
+    assert usage_from_response(resp, estimate=1180) == {
+        "prompt_tokens": 1200, "completion_tokens": 300, "cached_tokens": 1024, "prompt_tokens_estimate": 1180,
+    }
+    assert usage_from_response(SimpleNamespace(usage=None)) is None
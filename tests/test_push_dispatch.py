@@ -0,0 +1,194 @@
+"""Expo push dispatcher: yerel HTTP stub ile paketleme, keep-alive ve DeviceNotRegistered temizliği."""
+import http.client
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.push_dispatch import ExpoPushDispatcher, _ConnectionPool
+
+DEAD = "ExponentPushToken[dead]"
+RECEIPT_DEAD = "ExponentPushToken[receipt-dead]"
+
+
+class _ExpoStub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, obj):
+        raw = json.dumps(obj).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        srv = self.server
+        with srv.lock:
+            srv.peers.add(self.client_address)
+        if self.path.endswith("/push/send"):
+            with srv.lock:
+                srv.batches.append(len(body))
+            tickets = []
+            for msg in body:
+                if msg["to"] == DEAD:
+                    tickets.append({"status": "error", "details": {"error": "DeviceNotRegistered"}})
+                else:
+                    tid = "t-" + msg["to"]
+                    srv.ticket_tokens[tid] = msg["to"]
+                    tickets.append({"status": "ok", "id": tid})
+            self._reply({"data": tickets})
+        else:
+            receipts = {}
+            for tid in body["ids"]:
+                if srv.ticket_tokens.get(tid) == RECEIPT_DEAD:
+                    receipts[tid] = {"status": "error", "details": {"error": "DeviceNotRegistered"}}
+                else:
+                    receipts[tid] = {"status": "ok"}
+            self._reply({"data": receipts})
+
+
+@pytest.fixture
+def expo_stub():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _ExpoStub)
+    srv.lock = threading.Lock()
+    srv.peers = set()
+    srv.batches = []
+    srv.ticket_tokens = {}
+    t = threading.Thread(target=srv.serve_forever, daemon=True)
+    t.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def _dispatcher(srv, dead_sink, **kw):
+    host, port = srv.server_address
+    return ExpoPushDispatcher(
+        f"http://{host}:{port}",
+        access_token="",
+        max_concurrency=2,
+        on_dead_tokens=lambda tokens: dead_sink.extend(tokens) or len(tokens),
+        **kw,
+    )
+
+
+def _msgs(n):
+    return [{"to": f"ExponentPushToken[{i}]", "title": "t", "body": "b"} for i in range(n)]
+
+
+def test_send_chunks_into_100_and_reuses_connections(expo_stub):
+    dead = []
+    d = _dispatcher(expo_stub, dead)
+    tickets = d.send(_msgs(250) + [{"to": DEAD, "title": "t", "body": "b"}])
+    d.send(_msgs(50))
+    d.stop()
+    assert sorted(expo_stub.batches) == [50, 51, 100, 100]
+    assert len(tickets) == 251
+    # 4 istek, en fazla 2 paralel bağlantı üzerinden
+    assert len(expo_stub.peers) <= 2
+    assert dead == [DEAD]
+    assert d.stats["sent"] == 300
+
+
+def test_receipts_deactivate_dead_tokens(expo_stub):
+    dead = []
+    d = _dispatcher(expo_stub, dead, receipt_min_age_sec=3600)
+    d.send([{"to": RECEIPT_DEAD, "title": "t", "body": "b"}] + _msgs(3))
+    assert d.poll_receipts() == []  # henüz hazır değil
+    assert d.poll_receipts(force=True) == [RECEIPT_DEAD]
+    assert dead == [RECEIPT_DEAD]
+    assert d.pending_receipt_count == 0
+    d.stop()
+
+
+def test_direct_send_starts_receipt_polling(expo_stub):
+    dead = []
+    d = _dispatcher(expo_stub, dead, receipt_min_age_sec=0, receipt_poll_interval_sec=0.05)
+    # broadcast_to_mobile_users gibi kuyruk dışı gönderim: receipt'ler yine de yoklanır
+    d.send([{"to": RECEIPT_DEAD, "title": "t", "body": "b"}] + _msgs(2))
+    deadline = time.monotonic() + 5
+    while d.pending_receipt_count and time.monotonic() < deadline:
+        time.sleep(0.02)
+    d.stop()
+    assert dead == [RECEIPT_DEAD] and d.pending_receipt_count == 0
+    assert d.stats["requests"] == 1 and d.stats["deactivated"] == 1
+
+
+def test_enqueue_and_flush(expo_stub):
+    d = _dispatcher(expo_stub, [])
+    d.enqueue_many(_msgs(120))
+    assert d.flush(timeout=10)
+    d.stop()
+    assert sum(expo_stub.batches) == 120
+
+
+def _content_length(data: bytes) -> int:
+    for line in data.split(b"\r\n\r\n", 1)[0].split(b"\r\n"):
+        if line.lower().startswith(b"content-length:"):
+            return int(line.split(b":", 1)[1])
+    return 0
+
+
+def _raw_server(handler):
+    """Tek bağlantı başına `handler(conn, request_bytes)` çağıran ham TCP sunucusu; alınan istek sayısını tutar."""
+    srv = socket.socket()
+    srv.bind(("127.0.0.1", 0))
+    srv.listen(8)
+    requests = []
+
+    def serve():
+        while True:
+            try:
+                conn, _ = srv.accept()
+            except OSError:
+                return
+            with conn:
+                data = b""
+                while b"\r\n\r\n" not in data or len(data.split(b"\r\n\r\n", 1)[1]) < _content_length(data):
+                    chunk = conn.recv(65536)
+                    if not chunk:
+                        break
+                    data += chunk
+                if data:
+                    requests.append(data)
+                    handler(conn, data)
+
+    threading.Thread(target=serve, daemon=True).start()
+    return srv, requests
+
+
+def test_request_is_not_resent_after_it_was_written():
+    # Expo isteği aldı ama yanıt gelmeden bağlantı koptu: ikinci gönderim çift bildirim olurdu
+    srv, requests = _raw_server(lambda conn, data: None)
+    pool = _ConnectionPool(f"http://127.0.0.1:{srv.getsockname()[1]}", size=1, timeout=2)
+    with pytest.raises((http.client.HTTPException, OSError)):
+        pool.post_json("/push/send", [{"to": "x"}], {"Content-Type": "application/json"})
+    srv.close()
+    assert len(requests) == 1
+
+
+def test_stale_pooled_connection_is_replaced_before_writing():
+    ok = b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: 2\r\nConnection: keep-alive\r\n\r\n{}"
+
+    def reply_then_half_close(conn, data):
+        # Boşta zaman aşımı gibi: sunucu yazma yönünü kapatır; yazılan istek hata vermez ama yanıt gelmez
+        conn.sendall(ok)
+        conn.shutdown(socket.SHUT_WR)
+        time.sleep(0.3)
+
+    srv, requests = _raw_server(reply_then_half_close)
+    pool = _ConnectionPool(f"http://127.0.0.1:{srv.getsockname()[1]}", size=1, timeout=2)
+    headers = {"Content-Type": "application/json"}
+    assert pool.post_json("/push/send", [], headers) == {}
+    time.sleep(0.1)
+    assert pool.post_json("/push/send", [], headers) == {}
+    srv.close()
+    assert len(requests) == 2
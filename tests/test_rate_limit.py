@@ -1,5 +1,11 @@
 """Rate limit: /debug/rate-test 5/minute returns 429 after 5 requests."""
 from fastapi.testclient import TestClient
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+from app.core import rate_limit
+from app.core.config import settings
 
 
 def test_debug_rate_test_200_then_429(client: TestClient):
@@ -12,3 +18,18 @@ def test_debug_rate_test_200_then_429(client: TestClient):
     j = r.json()
     assert j.get("error") == "Too many requests"
     assert "detail" in j
+
+
+def test_sqlite_shared_cache_gives_workers_one_counter(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'shared.db'}"
+    monkeypatch.setattr(settings, "rate_limit_storage_uri", "")
+    monkeypatch.setattr(settings, "shared_cache_url", url)
+    uri = rate_limit._storage_uri()
+    assert uri == "norya+" + url
+    # İki worker: aynı dosyada ayrı bağlantılar, tek sayaç
+    workers = [FixedWindowRateLimiter(storage_from_string(uri)) for _ in range(2)]
+    limit = parse("3/minute")
+    assert [w.hit(limit, "1.2.3.4") for w in workers + workers] == [True, True, True, False]
+    assert not workers[1].test(limit, "1.2.3.4") and workers[0].test(limit, "5.6.7.8")
+    reset_at, remaining = workers[1].get_window_stats(limit, "1.2.3.4")
+    assert remaining == 0 and reset_at > 0
@@ -0,0 +1,117 @@
+"""Okuma replikası yönlendirmesi: get_read_db replikaya gider, lag'de birincile düşer, yazan kullanıcı birincilden okur."""
+import time
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session, SQLModel
+
+from app.core import database
+from app.core.config import settings
+from app.core.database import _Replica, engine, read_session
+from app.core.security import create_access_token, decode_access_token
+from app.core.shared_cache import SharedCache
+from app.models import AnalysisRecord
+
+LAB_TEXT = "LDL 162 mg/dL 0-100\nHemoglobin 10.9 g/dL 12-16"
+
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch):
+    """Birincilin (in-memory) boş bir kopyası gibi davranan dosya SQLite replikası."""
+    rep = _Replica(f"sqlite:///{tmp_path / 'replica.db'}")
+    SQLModel.metadata.create_all(rep.engine, tables=[AnalysisRecord.__table__])
+    monkeypatch.setattr(database, "_replicas", [rep])
+    monkeypatch.setattr(database, "_recent_writers", SharedCache().namespace("rw", ttl=60))
+    yield rep
+    rep.engine.dispose()
+
+
+@pytest.fixture
+def own_record(client, _auth_token):
+    headers = {"Authorization": f"Bearer {_auth_token}"}
+    user_id = client.get("/auth/me", headers=headers).json()["id"]
+    with Session(engine) as db:
+        rec = AnalysisRecord(user_id=user_id, input_text=LAB_TEXT, result_text="rapor")
+        db.add(rec)
+        db.commit()
+        rec_id = rec.id
+    yield headers, rec_id
+    # Ortak test kullanıcısının geçmişi sonraki modüller (mobil sync) için temizlenir
+    with Session(engine) as db:
+        db.delete(db.get(AnalysisRecord, rec_id))
+        db.commit()
+
+
+def _history_ids(client, headers) -> list[int]:
+    r = client.get("/analyze/history", headers=headers)
+    assert r.status_code == 200
+    return [item["id"] for item in r.json()]
+
+
+def test_history_routes_to_replica_until_own_write(client, replica, own_record):
+    headers, rec_id = own_record
+    # Replika henüz kaydı almadı: okuma oradan yapılır
+    assert rec_id not in _history_ids(client, headers)
+
+    # Replika gecikmesi eşiği aşınca birincile düşülür
+    replica._measure_lag = lambda: 60.0
+    replica.checked_at = 0.0
+    assert rec_id in _history_ids(client, headers)
+    replica._measure_lag = lambda: 0.0
+    replica.checked_at = 0.0
+    assert rec_id not in _history_ids(client, headers)
+
+    # Kullanıcı kendi kaydını güncelledi: sonraki okumaları birincilden (kendi yazdığını görür)
+    r = client.patch(f"/analyze/history/{rec_id}", headers=headers)
+    assert r.status_code == 200 and database.READ_YOUR_WRITES_COOKIE in r.cookies
+    assert rec_id in _history_ids(client, headers)
+    # Cookie olmadan da (mobil / başka istemci) yapışkanlık paylaşılan önbellekte kullanıcıya bağlıdır:
+    # aynı kullanıcının başka bir token'ı da birincilden okur
+    client.cookies.clear()
+    assert rec_id in _history_ids(client, headers)
+    sub = decode_access_token(headers["Authorization"].split()[1])["sub"]
+    other_token = SimpleNamespace(headers={"authorization": f"Bearer {create_access_token({'sub': sub})}"}, cookies={})
+    assert database._is_sticky(other_token)
+    assert not database._is_sticky(SimpleNamespace(headers={"authorization": "Bearer başka"}, cookies={}))
+
+
+def test_core_writes_mark_the_request(own_record):
+    _, rec_id = own_record
+    holder = [False]
+    token = database._request_writes.set(holder)
+    try:
+        with Session(engine) as db:
+            db.execute(select(AnalysisRecord.id).where(AnalysisRecord.id == rec_id)).all()
+            assert holder == [False]
+            # Atomik cüzdan güncellemeleri gibi ORM flush'ı olmayan Core yazımı da yapışkanlığı başlatır
+            db.execute(update(AnalysisRecord).where(AnalysisRecord.id == rec_id).values(result_text="güncel"))
+            db.commit()
+    finally:
+        database._request_writes.reset(token)
+    assert holder == [True]
+
+
+def test_read_session_rejects_writes(replica):
+    with read_session() as db:
+        assert db.get_bind() is replica.engine
+        db.add(AnalysisRecord(user_id=1, input_text="x", result_text="y"))
+        with pytest.raises(RuntimeError, match="read-only"):
+            db.flush()
+    # Ulaşılamayan replika: birincil kullanılır
+    replica._measure_lag = lambda: (_ for _ in ()).throw(OSError("down"))
+    replica.checked_at = 0.0
+    assert database.read_engine() is engine
+    assert database.replica_status()[0]["lag_s"] == "unreachable"
+
+
+def test_lag_probe_uses_unpooled_bounded_connection(monkeypatch):
+    monkeypatch.setattr(settings, "db_replica_probe_timeout_s", 1)
+    rep = _Replica("postgresql+psycopg://u:p@127.0.0.1:1/norya")
+    probe = rep._probe_engine()
+    assert isinstance(probe.pool, NullPool) and probe is not rep.engine
+    started = time.monotonic()
+    assert rep.current_lag() == float("inf")
+    assert time.monotonic() - started < 5
+    rep.engine.dispose()
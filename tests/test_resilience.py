@@ -0,0 +1,127 @@
+"""Dayanıklılık katmanı: devre kesici, uyarlanır zaman aşımı, tekrar bütçesi ve hedged istek."""
+import threading
+import time
+
+import httpx
+import pytest
+from openai import APIConnectionError
+
+from app.services import resilience
+from app.services.analyze import OPENAI_VISION_UPSTREAM, _openai_safe_call
+from app.services.degraded_report import llm_admission
+from app.services.resilience import CLOSED, HALF_OPEN, OPEN, CircuitOpen, Policy, Upstream
+
+
+def _failing(timeout):
+    raise ConnectionError("down")
+
+
+def _bad_request(timeout):
+    raise ValueError("bad request")
+
+
+def _fast_policy(**overrides) -> Policy:
+    base = dict(min_timeout=0.01, max_timeout=5.0, min_calls=4, open_seconds=0.05, max_retries=0, backoff_base=0.0)
+    base.update(overrides)
+    return Policy(**base)
+
+
+def test_circuit_opens_rejects_fast_and_recovers():
+    up = Upstream("test", _fast_policy())
+    for _ in range(4):
+        with pytest.raises(ConnectionError):
+            up.call(_failing, failure_on=(ConnectionError,))
+    assert up.state == OPEN
+
+    calls = []
+    t0 = time.perf_counter()
+    with pytest.raises(CircuitOpen):
+        up.call(lambda t: calls.append(t), failure_on=(ConnectionError,))
+    assert not calls and time.perf_counter() - t0 < 0.01
+
+    time.sleep(0.06)
+    assert up.state == HALF_OPEN
+    assert up.call(lambda t: "ok", failure_on=(ConnectionError,)) == "ok"
+    assert up.state == CLOSED and up.snapshot()["opened"] == 1
+
+    # İstemci hatası (ör. 4xx) sağlığı bozmaz
+    for _ in range(6):
+        with pytest.raises(ValueError):
+            up.call(_bad_request, failure_on=(ConnectionError,))
+    assert up.state == CLOSED
+
+
+def test_adaptive_timeout_tracks_latency_percentile():
+    up = Upstream("test", _fast_policy(min_timeout=0.5, max_timeout=30.0, timeout_factor=3.0))
+    assert up.timeout() == 30.0  # örnek yokken üst sınır
+    for _ in range(resilience.MIN_LATENCY_SAMPLES):
+        up._record(True, 0.4)
+    assert up.timeout() == pytest.approx(1.2)
+    seen = []
+    up.call(lambda t: seen.append(t), failure_on=(ConnectionError,))
+    assert seen[0] == pytest.approx(1.2)
+
+
+def test_retry_budget_limits_retries():
+    up = Upstream("test", _fast_policy(min_calls=1000, max_retries=2, retry_burst=2.0, retry_ratio=0.0))
+    attempts = []
+
+    def flaky(timeout):
+        attempts.append(timeout)
+        raise ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        up.call(flaky, failure_on=(ConnectionError,))
+    assert len(attempts) == 3
+    # Bütçe tükendi: sonraki çağrı tekrar denenmez
+    with pytest.raises(ConnectionError):
+        up.call(flaky, failure_on=(ConnectionError,))
+    assert len(attempts) == 4 and up.snapshot()["retries"] == 2
+
+
+def test_hedged_request_returns_faster_copy():
+    up = Upstream("test", _fast_policy(hedge=True))
+    for _ in range(resilience.MIN_LATENCY_SAMPLES):
+        up._record(True, 0.01)
+    first = threading.Event()
+
+    def slow_then_fast(timeout):
+        if not first.is_set():
+            first.set()
+            time.sleep(0.5)
+            return "slow"
+        return "fast"
+
+    t0 = time.perf_counter()
+    assert up.call(slow_then_fast, failure_on=(ConnectionError,), idempotent=True) == "fast"
+    assert time.perf_counter() - t0 < 0.3
+    snap = up.snapshot()
+    assert snap["hedges"] == 1 and snap["hedge_wins"] == 1
+
+
+def test_open_openai_circuit_degrades_llm(monkeypatch):
+    up = Upstream("openai-text", _fast_policy(open_seconds=60))
+    monkeypatch.setitem(resilience._upstreams, "openai-text", up)
+    for _ in range(4):
+        with pytest.raises(ConnectionError):
+            up.call(_failing, failure_on=(ConnectionError,))
+    with llm_admission() as reason:
+        assert reason == "circuit_open"
+    assert resilience.snapshot()["openai-text"]["state"] == OPEN
+
+
+def test_vision_failures_do_not_open_the_text_circuit(monkeypatch):
+    text, vision = (Upstream(name, _fast_policy(open_seconds=60)) for name in ("openai-text", "openai-vision"))
+    monkeypatch.setitem(resilience._upstreams, "openai-text", text)
+    monkeypatch.setitem(resilience._upstreams, "openai-vision", vision)
+
+    def vision_timeout(timeout):
+        raise APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+    for _ in range(4):
+        with pytest.raises(APIConnectionError):
+            _openai_safe_call(vision_timeout, OPENAI_VISION_UPSTREAM)
+    assert _openai_safe_call(lambda timeout: "metin") == "metin"
+    assert vision.state == OPEN and text.state == CLOSED
+    with llm_admission() as reason:
+        assert reason is None
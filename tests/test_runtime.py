@@ -0,0 +1,127 @@
+"""Çok süreçli çalışma: worker'lar arası paylaşılan önbellek, fork sonrası kaynak yenileme, worker sayısı hesabı."""
+import importlib.util
+import multiprocessing
+import os
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+
+from app import main
+from app.cache_db import get_conn
+from app.core import runtime
+from app.core.shared_cache import MemoryBackend, SharedCache, SqliteBackend
+
+ROOT = Path(__file__).resolve().parents[1]
+_fork = multiprocessing.get_context("fork")
+
+
+def _hammer(backend, n):
+    for _ in range(n):
+        backend.incr("analyze_hourly:u_1", 3600)
+    backend.set(f"geo:10.0.0.{os.getpid() % 250}", ("TR", "Istanbul"), 60)
+
+
+def test_sqlite_backend_is_shared_across_forked_workers(tmp_path):
+    backend = SqliteBackend(str(tmp_path / "shared.db"))
+    # Master'da açılan bağlantı (preload) worker'larda kullanılmaz: pid değişince yeniden açılır
+    backend.set("fx:EUR", {"EUR": 1.0, "TRY": 35.2}, 60)
+    workers = [_fork.Process(target=_hammer, args=(backend, 50)) for _ in range(4)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join(timeout=30)
+        assert p.exitcode == 0
+    assert backend.incr("analyze_hourly:u_1", 3600) == 201
+    assert backend.get("fx:EUR") == {"EUR": 1.0, "TRY": 35.2}
+    assert backend.get(f"geo:10.0.0.{workers[0].pid % 250}") == ["TR", "Istanbul"]
+    backend.set("pdf:x", b"%PDF", -1)
+    assert backend.get("pdf:x") is None
+
+
+def test_shared_values_are_json_not_pickle(tmp_path):
+    import pickle
+    import sqlite3
+
+    cache = SharedCache(f"sqlite:///{tmp_path / 'shared.db'}")
+    pdf = cache.namespace("pdf", ttl=60)
+    pdf.set("r1", b"%PDF-1.7\x00\xff")
+    assert pdf.get("r1") == b"%PDF-1.7\x00\xff"
+    # Dosyaya yazabilen biri pickle bırakırsa çözülmez, kaçak sayılır
+    with sqlite3.connect(tmp_path / "shared.db") as raw:
+        stored = raw.execute("SELECT value FROM shared_cache WHERE key = 'pdf:r1'").fetchone()[0]
+        assert stored.startswith('{"__b64__"')
+        raw.execute("UPDATE shared_cache SET value = ? WHERE key = 'pdf:r1'", (pickle.dumps(b"x"),))
+    assert pdf.get("r1") is None
+    # JSON'a çevrilemeyen değer yazılmaz, istek düşmez
+    pdf.set("obj", object())
+    assert pdf.get("obj") is None
+
+
+def test_hourly_analyze_limit_counts_across_workers(tmp_path, monkeypatch):
+    cache = SharedCache(f"sqlite:///{tmp_path / 'limit.db'}")
+    monkeypatch.setattr(main, "_analyze_hourly", cache.namespace("analyze_hourly", ttl=3600))
+    # Limitin yarısı başka bir worker'da tüketildi
+    child = _fork.Process(target=lambda: [main._check_analyze_hourly_limit(42) for _ in range(15)])
+    child.start()
+    child.join(timeout=30)
+    assert child.exitcode == 0
+    for _ in range(main.ANALYZE_HOURLY_LIMIT - 15):
+        main._check_analyze_hourly_limit(42)
+    with pytest.raises(HTTPException) as exc:
+        main._check_analyze_hourly_limit(42)
+    assert exc.value.status_code == 429
+    # Başka kullanıcı etkilenmez; bellek arka ucu aynı sözleşme
+    main._check_analyze_hourly_limit(43)
+    memory = MemoryBackend()
+    assert [memory.incr("k", 3600) for _ in range(3)] == [1, 2, 3]
+
+
+def _child_checks(conn, queue):
+    queue.put((runtime.reinit_after_fork() > 0, conn.execute("SELECT 1").fetchone()[0], conn._pid == os.getpid()))
+
+
+def test_post_fork_reopens_inherited_handles(tmp_path):
+    conn = get_conn(str(tmp_path / "cache.db"))
+    conn.execute("SELECT 1")
+    parent_sqlite = conn._conn
+    queue = _fork.Queue()
+    child = _fork.Process(target=_child_checks, args=(conn, queue))
+    child.start()
+    hooks_ran, value, own_handle = queue.get(timeout=30)
+    child.join(timeout=30)
+    assert hooks_ran and value == 1 and own_handle
+    assert conn._conn is parent_sqlite
+
+
+def _load_gunicorn_conf(monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    spec = importlib.util.spec_from_file_location("norya_gunicorn_conf", ROOT / "gunicorn.conf.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_gunicorn_profile_sizes_workers(monkeypatch):
+    conf = _load_gunicorn_conf(monkeypatch)
+    assert conf.preload_app and conf.workers == 1 and callable(conf.post_fork)
+    assert conf.worker_class == "uvicorn.workers.UvicornWorker"
+    assert conf.auto_workers(cpus=8, mem_mb=16000, per_worker_mb=350, max_workers=8) == 8
+    # Bellek sınırı: 1 GB konteynerde 350 MB/worker → 1 worker (master payı düşülür)
+    assert conf.auto_workers(cpus=8, mem_mb=1024, per_worker_mb=350, max_workers=8) == 1
+    assert conf.auto_workers(cpus=4, mem_mb=2048, per_worker_mb=350, max_workers=8) == 4
+    assert conf.auto_workers(cpus=16, mem_mb=None, per_worker_mb=350, max_workers=6) == 6
+    assert conf.auto_workers(cpus=1, mem_mb=128, per_worker_mb=350, max_workers=8) == 1
+    assert conf.cpu_limit() >= 1
+
+
+def test_local_shared_cache_needs_a_private_runtime_dir(monkeypatch, tmp_path):
+    conf = _load_gunicorn_conf(monkeypatch)
+    with pytest.raises(RuntimeError):
+        conf.local_shared_cache_url(None)
+    run_dir = tmp_path / "run"
+    assert conf.local_shared_cache_url(str(run_dir)) == f"sqlite:///{run_dir}/norya-shared-cache.db"
+    assert run_dir.stat().st_mode & 0o777 == 0o700
+    run_dir.chmod(0o755)
+    with pytest.raises(RuntimeError):
+        conf.local_shared_cache_url(str(run_dir))
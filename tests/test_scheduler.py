@@ -0,0 +1,156 @@
+"""Arka plan iş zamanlayıcısı: cron hesabı, küme genelinde tek çalıştırma, yeniden deneme, zaman aşımı ve kapanış."""
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.models import JobRun, ScheduledJob
+from app.services.scheduler import Cron, Scheduler
+
+T0 = datetime(2026, 3, 2, 10, 7)  # pazartesi
+
+
+@pytest.fixture
+def engine(tmp_path):
+    eng = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(eng, tables=[ScheduledJob.__table__, JobRun.__table__])
+    yield eng
+    eng.dispose()
+
+
+def _due(engine, name):
+    with Session(engine) as db:
+        row = db.get(ScheduledJob, name)
+        row.next_run_at = T0
+        db.add(row)
+        db.commit()
+
+
+def _wait_idle(sched, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while sched._running and time.monotonic() < deadline:
+        sched.run_pending(T0)
+        time.sleep(0.02)
+
+
+def _runs(engine, name):
+    with Session(engine) as db:
+        return db.exec(select(JobRun).where(JobRun.job_name == name).order_by(JobRun.id)).all()
+
+
+def test_cron_next_run():
+    assert Cron("0 * * * *").next_after(T0) == datetime(2026, 3, 2, 11, 0)
+    assert Cron("0 */6 * * *").next_after(T0) == datetime(2026, 3, 2, 12, 0)
+    assert Cron("30 3 * * *").next_after(T0) == datetime(2026, 3, 3, 3, 30)
+    assert Cron("*/15 9-17 * * 1-5").next_after(datetime(2026, 3, 6, 17, 50)) == datetime(2026, 3, 9, 9, 0)
+    # Gün ve haftanın günü birlikte kısıtlıysa biri yeter; 7 = pazar
+    assert Cron("0 0 1 * 0").next_after(T0) == datetime(2026, 3, 8, 0, 0)
+    assert Cron("0 0 * * 7").next_after(T0) == datetime(2026, 3, 8, 0, 0)
+    with pytest.raises(ValueError):
+        Cron("61 * * * *")
+
+
+def test_due_job_runs_once_across_workers(engine):
+    calls, gate = [], threading.Event()
+    workers = []
+    for _ in range(3):
+        s = Scheduler(engine)
+        s.register("drip_campaign", "0 * * * *")(lambda: calls.append(1) or gate.wait(5))
+        s.sync(T0)
+        workers.append(s)
+    _due(engine, "drip_campaign")
+    started = [s.run_pending(T0) for s in workers]
+    assert sum(len(x) for x in started) == 1
+    # Kira süresi içinde ikinci tur da almaz
+    assert not any(s.run_pending(T0 + timedelta(seconds=30)) for s in workers if not s._running)
+    gate.set()
+    for s in workers:
+        _wait_idle(s)
+    assert calls == [1]
+    (run,) = _runs(engine, "drip_campaign")
+    assert run.status == "success" and run.duration_ms is not None
+    with Session(engine) as db:
+        row = db.get(ScheduledJob, "drip_campaign")
+        assert row.lease_owner is None and row.attempt == 0 and row.last_status == "success"
+        assert row.next_run_at > T0
+
+
+def test_failure_retries_with_backoff_then_next_slot(engine):
+    sched = Scheduler(engine)
+    sched.register("auto_renew", "0 */6 * * *", retries=1, retry_backoff_s=60)(lambda: 1 / 0)
+    sched.sync(T0)
+    _due(engine, "auto_renew")
+    sched.run_pending(T0)
+    _wait_idle(sched)
+    with Session(engine) as db:
+        row = db.get(ScheduledJob, "auto_renew")
+        assert row.attempt == 1 and row.last_status == "failed"
+        retry_at = row.next_run_at
+    assert timedelta(seconds=50) < retry_at - datetime.utcnow() < timedelta(seconds=70)
+    _due(engine, "auto_renew")
+    sched.run_pending(T0)
+    _wait_idle(sched)
+    runs = _runs(engine, "auto_renew")
+    assert [(r.attempt, r.status) for r in runs] == [(1, "failed"), (2, "failed")]
+    assert "ZeroDivisionError" in runs[0].error
+    with Session(engine) as db:
+        row = db.get(ScheduledJob, "auto_renew")
+        # Denemeler tükendi: sayaç sıfırlanır, cron'daki bir sonraki zamana geçilir
+        assert row.attempt == 0 and row.next_run_at - datetime.utcnow() > timedelta(minutes=1)
+
+
+def test_timeout_and_graceful_shutdown(engine):
+    release = threading.Event()
+    sched = Scheduler(engine)
+    sched.register("slow", "* * * * *", timeout_s=0.05, retries=0)(lambda: release.wait(5))
+    sched.register("stuck", "* * * * *", timeout_s=60)(lambda: release.wait(5))
+    sched.sync(T0)
+    _due(engine, "slow")
+    _due(engine, "stuck")
+    assert sorted(sched.run_pending(T0)) == ["slow", "stuck"]
+    time.sleep(0.1)
+    sched.run_pending(T0)
+    (slow,) = _runs(engine, "slow")
+    assert slow.status == "timeout"
+    # Thread bitene kadar kira tutulur: iş ikinci kez başlamaz
+    with Session(engine) as db:
+        assert db.get(ScheduledJob, "slow").lease_owner == sched.owner
+    sched.shutdown(drain_s=0.05)
+    (stuck,) = _runs(engine, "stuck")
+    assert stuck.status == "interrupted"
+    with Session(engine) as db:
+        assert db.get(ScheduledJob, "stuck").lease_owner is None
+    assert sched.run_pending(T0) == []
+    release.set()
+    status = sched.status()
+    assert {j["name"] for j in status["jobs"]} == {"slow", "stuck"} and len(status["runs"]) == 2
+
+
+def test_per_worker_job_runs_in_every_worker_and_runs_are_pruned(engine):
+    purged = []
+    workers = []
+    for i in range(2):
+        s = Scheduler(engine)
+        s.register("ai_cache_purge", "30 3 * * *", per_worker=True)(lambda i=i: purged.append(i) or i)
+        s.sync(T0)
+        workers.append(s)
+    # Satır / kira yok; ilk turda yalnız sonraki zaman planlanır
+    with Session(engine) as db:
+        assert db.get(ScheduledJob, "ai_cache_purge") is None
+    assert [s.run_pending(T0) for s in workers] == [[], []]
+    at = datetime(2026, 3, 3, 3, 30)
+    assert [s.run_pending(at) for s in workers] == [["ai_cache_purge"], ["ai_cache_purge"]]
+    for s in workers:
+        _wait_idle(s)
+    assert sorted(purged) == [0, 1] and workers[0].run_pending(at) == []
+    assert [r.status for r in _runs(engine, "ai_cache_purge")] == ["success", "success"]
+    assert workers[0].status()["jobs"][0]["next_run_at"] == "2026-03-04T03:30:00"
+
+    # Saklama süresinden eski çalıştırmalar silinir
+    with Session(engine) as db:
+        db.add(JobRun(job_name="drip_campaign", owner="w", status="success", started_at=at - timedelta(days=40)))
+        db.commit()
+    assert workers[0].prune_runs(30, now=at + timedelta(days=1)) == 1
+    assert not _runs(engine, "drip_campaign") and len(_runs(engine, "ai_cache_purge")) == 2
@@ -0,0 +1,74 @@
+"""Tam metin arama: FTS5 tetikleyicileri, ek kırpma, sıralama ve güvenli vurgulu önizleme."""
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.core.database import engine
+from app.main import app
+from app.models import AnalysisRecord
+from app.services.search import build_fts5_query, fts_available, search_analyses, stem_term
+
+
+@pytest.fixture(scope="module")
+def search_user(_auth_token):
+    headers = {"Authorization": f"Bearer {_auth_token}"}
+    with TestClient(app) as c:
+        user_id = c.get("/auth/me", headers=headers).json()["id"]
+    ids = {}
+    rows = {
+        "tr": ("Ferritin 8", "Ferritin düşük; demir eksikliği anemisi olası. Ferritin takibi önerilir.", "tr"),
+        "en": ("TSH 6.2", "Thyroid stimulating hormone is elevated, suggesting hypothyroidism.", "en"),
+        "xss": ("<script>alert(1)</script> zinkwert", "Zinkwert <b>niedrig</b>.", "de"),
+    }
+    with Session(engine) as db:
+        for key, (inp, res, lang) in rows.items():
+            rec = AnalysisRecord(user_id=user_id, input_text=inp, result_text=res, lang=lang)
+            db.add(rec)
+            db.commit()
+            ids[key] = rec.id
+    return headers, user_id, ids
+
+
+def test_stem_and_query_building():
+    assert stem_term("kolesterolü", "tr") == "kolesterol"
+    assert stem_term("demir", "tr") == "demir"  # kök 4 harften kısa kalacaksa dokunma
+    assert stem_term("eksikliğinde", "tr") == "eksikliğ"
+    assert build_fts5_query('ferritin" NEAR *', "tr") == '"ferrit"* "near"*'
+    assert build_fts5_query("İnsülin", "tr") == '"insül"*'  # İ → i (birleşik nokta yok)
+
+
+def test_fts_triggers_index_inserts_updates_deletes(client: TestClient, search_user):
+    _, user_id, ids = search_user
+    with Session(engine) as db:
+        assert fts_available(db.get_bind())
+        hits = search_analyses(db, "ferritin", user_id=user_id)
+        assert [h.analysis_id for h in hits] == [ids["tr"]]
+        # Ek kırpma + önek: "eksikliğinde" → "eksikliğ*"
+        assert [h.analysis_id for h in search_analyses(db, "eksikliğinde", user_id=user_id, lang="tr")] == [ids["tr"]]
+        assert [h.analysis_id for h in search_analyses(db, "hypothyroidism elevated", user_id=user_id)] == [ids["en"]]
+
+        rec = db.get(AnalysisRecord, ids["en"])
+        rec.result_text = "Vitamin B12 normal."
+        db.add(rec)
+        db.commit()
+        assert search_analyses(db, "hypothyroidism", user_id=user_id) == []
+        assert [h.analysis_id for h in search_analyses(db, "vitamin", user_id=user_id)] == [ids["en"]]
+
+
+def test_snippet_is_highlighted_and_escaped(client: TestClient, search_user):
+    _, user_id, ids = search_user
+    with Session(engine) as db:
+        [hit] = search_analyses(db, "zinkwert", user_id=user_id)
+    assert hit.analysis_id == ids["xss"]
+    assert "<mark>" in hit.snippet
+    assert "<script>" not in hit.snippet and "<b>" not in hit.snippet
+
+
+def test_history_endpoint_uses_search(client: TestClient, search_user):
+    headers, _, ids = search_user
+    r = client.get("/analyze/history?q=ferritin", headers=headers)
+    assert r.status_code == 200
+    items = r.json()
+    assert [i["id"] for i in items] == [ids["tr"]]
+    assert "<mark>" in items[0]["snippet"].lower()
+    assert client.get("/analyze/history?q=ferritin&source=pdf", headers=headers).json() == []
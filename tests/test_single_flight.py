@@ -0,0 +1,126 @@
+"""Single-flight: aynı cache_key için eşzamanlı istekler tek hesaplamayı (LLM çağrısını) paylaşır."""
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app import single_flight
+from app.cache_db import cache_set, get_conn, init_cache, lease_acquire, lease_fail, lease_release
+from app.cache_utils import now_iso
+
+
+@pytest.fixture
+def conn(tmp_path):
+    c = get_conn(str(tmp_path / "cache.db"))
+    init_cache(c)
+    yield c
+    c.close()
+
+
+def _store(conn, key, obj):
+    cache_set(conn, cache_key=key, created_at=now_iso(), expires_at=None, model="m", input_summary={}, response_obj=obj)
+
+
+def _replay(n, fn):
+    """n eşzamanlı çağrı; (sonuçlar, istisnalar)."""
+    results, errors = [], []
+    start = threading.Barrier(n)
+
+    def call():
+        start.wait()
+        try:
+            results.append(fn())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    return results, errors
+
+
+def test_duplicate_submissions_make_one_call(conn):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        obj = {"sonuc": "rapor"}
+        _store(conn, "k1", obj)
+        return obj
+
+    results, errors = _replay(10, lambda: single_flight.run(conn, "k1", compute))
+    assert errors == [] and len(calls) == 1
+    assert all(r[0] == {"sonuc": "rapor"} for r in results)
+    assert sorted(shared for _, shared in results) == [False] + [True] * 9
+    # Sonraki istek önbellekten
+    assert single_flight.run(conn, "k1", compute) == ({"sonuc": "rapor"}, True) and len(calls) == 1
+
+
+def test_error_reaches_every_waiter(conn):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        raise HTTPException(status_code=503, detail="OpenAI down")
+
+    results, errors = _replay(5, lambda: single_flight.run(conn, "k2", compute))
+    assert results == [] and len(calls) == 1
+    assert len(errors) == 5 and all(e.status_code == 503 for e in errors)
+    # Hata önbelleğe alınmaz: bitişten sonra gelen istek yeniden hesaplar
+    assert single_flight.run(conn, "k2", lambda: {"sonuc": "tekrar"}) == ({"sonuc": "tekrar"}, False)
+
+
+def test_waits_for_lease_held_by_other_worker(conn):
+    assert lease_acquire(conn, "k3", "other-worker", 30)
+
+    def finish():
+        time.sleep(0.2)
+        _store(conn, "k3", {"sonuc": "diğer worker"})
+        lease_release(conn, "k3", "other-worker")
+
+    threading.Thread(target=finish).start()
+    result = single_flight.run(conn, "k3", lambda: pytest.fail("compute should not run"))
+    assert result == ({"sonuc": "diğer worker"}, True)
+
+
+def test_other_worker_error_and_expired_lease(conn):
+    assert lease_acquire(conn, "k4", "other-worker", 30)
+
+    def fail():
+        time.sleep(0.2)
+        lease_fail(conn, "k4", "other-worker", {"kind": "http", "status_code": 429, "detail": "busy"}, 5)
+
+    threading.Thread(target=fail).start()
+    with pytest.raises(HTTPException) as exc:
+        single_flight.run(conn, "k4", lambda: pytest.fail("compute should not run"))
+    assert exc.value.status_code == 429
+    # Hata satırı yalnızca bekleyenler içindi; yeni istek kirayı alıp hesaplar
+    assert single_flight.run(conn, "k4", lambda: {"sonuc": "yeni"}) == ({"sonuc": "yeni"}, False)
+
+    # Sahibi çökmüş kira süresi dolunca devralınır
+    assert lease_acquire(conn, "k5", "crashed-worker", 0.1)
+    result = single_flight.run(conn, "k5", lambda: {"sonuc": "devralındı"})
+    assert result == ({"sonuc": "devralındı"}, False)
+
+
+def test_lookup_and_purge_wait_for_the_connection_lock(conn):
+    _store(conn, "k6", {"sonuc": "önbellek"})
+    done = []
+
+    def read_and_purge():
+        done.append(single_flight.lookup(conn, "k6"))
+        done.append(single_flight.purge_expired(conn))
+
+    with single_flight._conn_lock:
+        t = threading.Thread(target=read_and_purge)
+        t.start()
+        t.join(0.2)
+        # Kira işlemi sürerken ortak bağlantıya dokunulmaz
+        assert t.is_alive() and done == []
+    t.join(5)
+    assert done == [{"sonuc": "önbellek"}, 0]
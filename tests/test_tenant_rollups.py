@@ -0,0 +1,155 @@
+"""Kurum günlük sayaçları: artımlı güncelleme, yeniden hesaplama ile tutarlılık ve hacimden bağımsız pano sorguları."""
+import re
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, text
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.core.migrate import SCHEMA_HEAD, migrate
+from app.models import (
+    AnalysisRecord,
+    EnterpriseCase,
+    EnterpriseReport,
+    Institution,
+    InstitutionMembership,
+    TenantDailyStat,
+    TenantWalletTransaction,
+    User,
+)
+from app.services import tenant_rollups
+from app.services.tenant_audit_service import get_tenant_audit_stats, log_tenant_action
+from app.services.tenant_stats_service import get_tenant_stats
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rollups.db'}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def _counters(db) -> dict:
+    rows = db.exec(select(TenantDailyStat)).all()
+    return {(r.institution_id, r.day, r.metric): r.value for r in rows if r.value}
+
+
+def _seed(db):
+    inst = Institution(name="Şehir Hastanesi", tenant_slug="sehir")
+    other = Institution(name="Diğer", tenant_slug="diger")
+    db.add_all([inst, other])
+    db.commit()
+    ayse, mehmet = User(email="ayse@sehir.test", hashed_password="!", full_name="Ayşe"), User(
+        email="mehmet@sehir.test", hashed_password="!", full_name="Mehmet"
+    )
+    db.add_all([ayse, mehmet])
+    db.commit()
+    db.add(InstitutionMembership(institution_id=inst.id, user_id=ayse.id))
+    old = datetime.utcnow() - timedelta(days=40)
+    cases = [
+        EnterpriseCase(institution_id=inst.id, uploaded_by_user_id=ayse.id),
+        EnterpriseCase(institution_id=inst.id, uploaded_by_user_id=ayse.id, status="approved"),
+        EnterpriseCase(institution_id=inst.id, uploaded_by_user_id=mehmet.id, created_at=old),
+        EnterpriseCase(institution_id=other.id, uploaded_by_user_id=mehmet.id),
+    ]
+    db.add_all(cases)
+    db.add_all([
+        AnalysisRecord(user_id=ayse.id, input_text="x", result_text="y", institution_id=inst.id),
+        AnalysisRecord(user_id=ayse.id, input_text="x", result_text="y"),
+        TenantWalletTransaction(institution_id=inst.id, amount_cents=100000, transaction_type="load"),
+        TenantWalletTransaction(institution_id=inst.id, amount_cents=-300, transaction_type="spend"),
+        TenantWalletTransaction(institution_id=inst.id, amount_cents=-200, transaction_type="spend", created_at=old),
+    ])
+    db.commit()
+    db.add(EnterpriseReport(case_id=cases[0].id, language="tr", report_text="..."))
+    cases[0].status = "needs_review"
+    db.add(cases[0])
+    db.delete(cases[2])
+    db.commit()
+    for action, user in (("login", ayse), ("analyze", ayse), ("analyze", mehmet), ("export", None)):
+        log_tenant_action(db, inst.id, action, user_id=user.id if user else None)
+    log_tenant_action(db, other.id, "login", user_id=mehmet.id)
+    return inst, ayse, mehmet
+
+
+def test_counters_follow_writes_and_match_rebuild(db):
+    inst, ayse, mehmet = _seed(db)
+
+    stats = get_tenant_stats(db, inst.id, days=30)
+    assert stats["total_cases"] == 2 and stats["cases_in_period"] == 2
+    assert stats["status_counts"] == {"needs_review": 1, "approved": 1}
+    assert stats["analyses_in_period"] == 1 and stats["reports_in_period"] == 1
+    assert stats["wallet_spent_cents"] == 300 and stats["wallet_loaded_cents"] == 100000
+    assert stats["active_users"] == 2 and stats["total_members"] == 1
+    assert stats["top_users"] == [{"name": "Ayşe", "actions": 2}, {"name": "Mehmet", "actions": 1}]
+    assert stats["daily_breakdown"][-1] == {"date": datetime.utcnow().strftime("%Y-%m-%d"), "cases": 2}
+
+    audit = get_tenant_audit_stats(db, inst.id, days=30)
+    assert audit["total_actions"] == 4
+    assert audit["action_counts"] == {"login": 1, "analyze": 2, "export": 1}
+    assert audit["unique_users"] == 2 and audit["user_counts"] == {ayse.id: 2, mehmet.id: 1}
+
+    # Silinmiş kullanıcı sayaçta kalır, en aktifler listesinde boş isimle görünmez
+    log_tenant_action(db, inst.id, "login", user_id=99999)
+    log_tenant_action(db, inst.id, "analyze", user_id=99999)
+    log_tenant_action(db, inst.id, "export", user_id=99999)
+    stats = get_tenant_stats(db, inst.id, days=30)
+    assert stats["active_users"] == 3
+    assert stats["top_users"] == [{"name": "Ayşe", "actions": 2}, {"name": "Mehmet", "actions": 1}]
+
+    incremental = _counters(db)
+    with db.get_bind().begin() as conn:
+        tenant_rollups.rebuild_tenant_rollups(conn)
+    db.expire_all()
+    # Silinen 40 günlük vaka: günlük "cases" kaydı tarihsel olarak kalır, yeniden hesapta yok
+    deleted_day = lambda k: k[2] == "cases" and tenant_rollups.TOTALS_DAY < k[1] < tenant_rollups.period_start(30)  # noqa: E731
+    assert {k: v for k, v in incremental.items() if not deleted_day(k)} == _counters(db)
+
+
+def test_migration_backfill_matches_rebuild(db, tmp_path, monkeypatch):
+    _seed(db)
+    engine = db.get_bind()
+    with engine.begin() as conn:
+        tenant_rollups.rebuild_tenant_rollups(conn)
+    rebuilt = _counters(db)
+    db.close()
+
+    # 0017'deki veritabanı: tablo yok, 0018 kendi SQL'iyle doldurur
+    monkeypatch.setenv("NORYA_INIT_DB_LOCK", str(tmp_path / "migrate.lock"))
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE tenant_daily_stats"))
+        conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL PRIMARY KEY)"))
+        conn.execute(text("INSERT INTO alembic_version VALUES ('0017_auto_renew_attempts')"))
+    assert migrate(engine) == SCHEMA_HEAD
+    assert _counters(db) == rebuilt
+
+
+def test_dashboard_reads_one_range_scan_regardless_of_volume(db):
+    inst, ayse, _ = _seed(db)
+    inst_id, ayse_id = inst.id, ayse.id
+    statements = []
+
+    @event.listens_for(db.get_bind(), "before_cursor_execute")
+    def _record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    def run():
+        statements.clear()
+        get_tenant_audit_stats(db, inst_id)
+        audit_statements = list(statements)
+        get_tenant_stats(db, inst_id)
+        return audit_statements, list(statements)
+
+    before = run()
+    for _ in range(50):
+        log_tenant_action(db, inst_id, "download", user_id=ayse_id)
+    after = run()
+
+    audit_statements, all_statements = after
+    assert len(audit_statements) == 1 and "tenant_daily_stats" in audit_statements[0]
+    raw = re.compile(r"FROM (enterprise_cases|tenant_audit_logs|tenant_wallet_transactions)\b")
+    assert not any(raw.search(s) for s in all_statements)
+    assert [len(x) for x in before] == [len(x) for x in after]
+    assert get_tenant_audit_stats(db, inst_id)["action_counts"]["download"] == 50